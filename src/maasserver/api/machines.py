@@ -76,7 +76,12 @@ from maasserver.forms.filesystem import (
     MountNonStorageFilesystemForm,
     UnmountNonStorageFilesystemForm,
 )
-from maasserver.forms.pods import ComposeMachineForPodsForm
+from maasserver.forms.pods import (
+    ComposeMachineForPodsForm,
+    decompose_machines,
+    decompose_machines_on_rollback,
+    get_composed_machine,
+)
 from maasserver.models import (
     Config,
     Domain,
@@ -107,10 +112,7 @@ from maasserver.storage_layouts import (
     StorageLayoutMissingBootDiskError,
 )
 from maasserver.utils.django_urls import reverse
-from maasserver.utils.orm import (
-    get_first,
-    reload_object,
-)
+from maasserver.utils.orm import reload_object
 from piston3.utils import rc
 import yaml
 
@@ -2160,9 +2162,14 @@ class MachinesHandler(NodesHandler, PowersMixin):
         ``verbose_``, and contain the full data structure that indicates which
         machine(s) matched).
 
+        @param (int) "count" [required=false] The number of machines to
+        allocate, all matching the given constraints. Either all of them are
+        allocated or none are. When given, a list of machines is returned
+        instead of a single machine.
+
         @success (http-status-code) "200" 200
         @success (json) "success-json" A JSON object containing a newly
-        allocated machine object.
+        allocated machine object, or a list of them if "count" is given.
         @success-example "success-json" [exkey=machines-allocate]
         placeholder text
 
@@ -2185,64 +2192,89 @@ class MachinesHandler(NodesHandler, PowersMixin):
         dry_run = get_optional_param(
             request.POST, 'dry_run', default=False, validator=StringBool)
         zone = get_optional_param(request.POST, 'zone', default=None)
+        count = get_optional_param(
+            request.POST, 'count', default=None, validator=Int(min=1))
 
         if not form.is_valid():
             raise MAASAPIValidationError(form.errors)
 
-        # This lock prevents a machine we've picked as available from
-        # becoming unavailable before our transaction commits.
-        with locks.node_acquire:
-            machines = (
-                self.base_model.objects.get_available_machines_for_acquisition(
-                    request.user)
-                )
-            machines, storage, interfaces = form.filter_nodes(machines)
-            machine = get_first(machines)
-            if machine is None:
-                cores = form.cleaned_data.get('cpu_count')
-                if cores is not None:
-                    cores = int(cores)
-                memory = form.cleaned_data.get('mem')
-                if memory is not None:
-                    memory = int(memory)
-                architecture = None
-                architectures = form.cleaned_data.get('arch')
-                if architectures is not None:
-                    architecture = (
-                        None if len(architectures) == 0
-                        else min(architectures))
-                storage = form.cleaned_data.get('storage')
-                interfaces = form.cleaned_data.get('interfaces')
-                data = {
-                    "cores": cores,
-                    "memory": memory,
-                    "architecture": architecture,
-                    "storage": storage,
-                    "interfaces": interfaces,
-                }
-                pods = Pod.objects.get_pods(
-                    request.user, PodPermission.dynamic_compose)
-                if zone is not None:
-                    pods = pods.filter(zone__name=zone)
-                if pods:
-                    machine, storage, interfaces = (
-                        get_allocated_composed_machine(
+        # Candidates are found without holding any lock. Each is locked as
+        # it is claimed instead, so concurrent allocations can proceed side
+        # by side, passing over machines that another has already claimed.
+        wanted = 1 if count is None else count
+        composed = []
+        machines = (
+            self.base_model.objects.get_available_machines_for_acquisition(
+                request.user)
+            )
+        machines, storage, interfaces = form.filter_nodes(machines)
+        allocated = [
+            (machine, storage, interfaces)
+            for machine in self.base_model.objects.claim_for_acquisition(
+                machines, wanted)
+        ]
+        if len(allocated) < wanted:
+            cores = form.cleaned_data.get('cpu_count')
+            if cores is not None:
+                cores = int(cores)
+            memory = form.cleaned_data.get('mem')
+            if memory is not None:
+                memory = int(memory)
+            architecture = None
+            architectures = form.cleaned_data.get('arch')
+            if architectures is not None:
+                architecture = (
+                    None if len(architectures) == 0
+                    else min(architectures))
+            storage = form.cleaned_data.get('storage')
+            interfaces = form.cleaned_data.get('interfaces')
+            data = {
+                "cores": cores,
+                "memory": memory,
+                "architecture": architecture,
+                "storage": storage,
+                "interfaces": interfaces,
+            }
+            pods = Pod.objects.get_pods(
+                request.user, PodPermission.dynamic_compose)
+            if zone is not None:
+                pods = pods.filter(zone__name=zone)
+            if pods:
+                # Machines composed in pods must be decomposed again if the
+                # allocation fails, or they would be left on the pod hosts.
+                decompose_machines_on_rollback(composed)
+                # Composing checks and takes pod resources, so concurrent
+                # allocations take turns until this transaction ends.
+                with locks.node_acquire:
+                    while len(allocated) < wanted:
+                        result = get_allocated_composed_machine(
                             request, data, storage, interfaces, pods, form,
                             input_constraints)
-                    )
-
-            if machine is None:
-                constraints = form.describe_constraints()
-                if constraints == '':
-                    # No constraints. That means no machines at all were
-                    # available.
-                    message = "No machine available."
-                else:
-                    message = (
-                        'No available machine matches constraints: %s '
-                        '(resolved to "%s")' % (
-                            str(input_constraints), constraints))
-                raise NodesNotAvailable(message)
+                        if result[0] is None:
+                            break
+                        allocated.append(result)
+                        composed_machine = get_composed_machine(result[0])
+                        if composed_machine is not None:
+                            composed.append(composed_machine)
+
+        if len(allocated) < wanted:
+            constraints = form.describe_constraints()
+            if constraints == '':
+                # No constraints. That means no machines at all were
+                # available.
+                message = "No machine available."
+            else:
+                message = (
+                    'No available machine matches constraints: %s '
+                    '(resolved to "%s")' % (
+                        str(input_constraints), constraints))
+            if wanted > 1:
+                message = "Only %d of %d machines allocated. %s" % (
+                    len(allocated), wanted, message)
+            if len(composed) > 0:
+                decompose_machines(composed)
+            raise NodesNotAvailable(message)
+        for machine, storage, interfaces in allocated:
             if not dry_run:
                 machine.acquire(
                     request.user, get_oauth_token(request),
@@ -2276,7 +2308,11 @@ class MachinesHandler(NodesHandler, PowersMixin):
             if verbose:
                 machine.constraints_by_type['verbose_storage'] = storage
                 machine.constraints_by_type['verbose_interfaces'] = interfaces
-            return machine
+        machines = [machine for machine, _, _ in allocated]
+        if count is None:
+            return machines[0]
+        else:
+            return machines
 
     @admin_method
     @operation(idempotent=False)
@@ -8,11 +8,14 @@ __all__ = []
 import http.client
 import json
 import random
+import threading
+from unittest.mock import ANY
 
 from django.conf import settings
 from django.test import RequestFactory
 from maasserver import (
     eventloop,
+    locks,
     middleware,
 )
 from maasserver.api import (
@@ -34,6 +37,7 @@ import maasserver.forms as forms_module
 from maasserver.forms.pods import (
     ComposeMachineForm,
     ComposeMachineForPodsForm,
+    get_composed_machine,
 )
 from maasserver.models import (
     Config,
@@ -65,7 +69,10 @@ from maasserver.testing.osystems import make_usable_osystem
 from maasserver.testing.testclient import MAASSensibleOAuthClient
 from maasserver.utils import ignore_unused
 from maasserver.utils.django_urls import reverse
-from maasserver.utils.orm import reload_object
+from maasserver.utils.orm import (
+    reload_object,
+    transactional,
+)
 from maastesting.djangotestcase import count_queries
 from maastesting.matchers import (
     MockCalledOnceWith,
@@ -1128,16 +1135,92 @@ class TestMachinesAPI(APITestCase.ForUser):
         machine = Machine.objects.get(system_id=machine.system_id)
         self.assertEqual(self.user, machine.owner)
 
-    def test_POST_allocate_uses_machine_acquire_lock(self):
-        # The "allocate" operation allocates the machine it returns.
+    def test_POST_allocate_does_not_use_machine_acquire_lock(self):
         available_status = NODE_STATUS.READY
         factory.make_Node(
             status=available_status, owner=None, with_boot_disk=True)
         machine_acquire = self.patch(machines_module.locks, 'node_acquire')
         self.client.post(reverse('machines_handler'), {'op': 'allocate'})
+        self.assertThat(machine_acquire.__enter__, MockNotCalled())
+
+    def test_POST_allocate_claims_machine(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        claim_for_acquisition = self.patch(
+            Machine.objects, 'claim_for_acquisition')
+        claim_for_acquisition.return_value = [machine]
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertThat(claim_for_acquisition, MockCalledOnceWith(ANY, 1))
+
+    def test_POST_allocate_with_count_allocates_machines(self):
+        machines = [
+            factory.make_Node(
+                status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+            for _ in range(3)
+        ]
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate', 'count': 2})
+        self.assertEqual(http.client.OK, response.status_code)
+        parsed_result = json.loads(
+            response.content.decode(settings.DEFAULT_CHARSET))
+        self.assertEqual(2, len(parsed_result))
+        allocated = [
+            machine.system_id
+            for machine in machines
+            if reload_object(machine).owner == self.user
+        ]
+        self.assertItemsEqual(
+            allocated, [machine['system_id'] for machine in parsed_result])
+
+    def test_POST_allocate_with_count_allocates_all_or_nothing(self):
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate', 'count': 2})
+        self.assertEqual(http.client.CONFLICT, response.status_code)
+        self.assertIn(
+            b"Only 1 of 2 machines allocated.", response.content)
+        self.assertIsNone(reload_object(machine).owner)
+
+    def test_POST_allocate_with_count_decomposes_composed_on_failure(self):
+        pod = factory.make_Pod(architectures=["amd64/generic"])
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True,
+            bmc=pod)
+        expected = get_composed_machine(machine)
+        mock_filter_nodes = self.patch(AcquireNodeForm, 'filter_nodes')
+        mock_filter_nodes.return_value = [], {}, {}
+        mock_compose = self.patch(ComposeMachineForPodsForm, 'compose')
+        mock_compose.side_effect = [machine, None]
+        mock_decompose = self.patch(machines_module, 'decompose_machines')
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate', 'count': 2})
+        self.assertEqual(http.client.CONFLICT, response.status_code)
+        self.assertThat(mock_decompose, MockCalledOnceWith([expected]))
+
+    def test_POST_allocate_composes_holding_machine_acquire_lock(self):
+        pod = factory.make_Pod(architectures=["amd64/generic"])
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True,
+            bmc=pod)
+        mock_filter_nodes = self.patch(AcquireNodeForm, 'filter_nodes')
+        mock_filter_nodes.return_value = [], {}, {}
+        machine_acquire = self.patch(machines_module.locks, 'node_acquire')
+        mock_compose = self.patch(ComposeMachineForPodsForm, 'compose')
+        mock_compose.return_value = machine
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate'})
+        self.assertEqual(http.client.OK, response.status_code)
         self.assertThat(machine_acquire.__enter__, MockCalledOnceWith())
-        self.assertThat(
-            machine_acquire.__exit__, MockCalledOnceWith(None, None, None))
+
+    def test_POST_allocate_rejects_invalid_count(self):
+        factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True)
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate', 'count': 0})
+        self.assertEqual(http.client.BAD_REQUEST, response.status_code)
 
     def test_POST_allocate_sets_agent_name(self):
         available_status = NODE_STATUS.READY
@@ -2781,6 +2864,47 @@ class TestMachinesAPI(APITestCase.ForUser):
                 False, None, None, None, None, None))
 
 
+class TestAllocateComposesConcurrently(APITransactionTestCase.ForUser):
+
+    def test_POST_allocate_waits_for_concurrent_composition(self):
+        pod = factory.make_Pod(architectures=["amd64/generic"])
+        machine = factory.make_Node(
+            status=NODE_STATUS.READY, owner=None, with_boot_disk=True,
+            bmc=pod)
+        mock_filter_nodes = self.patch(AcquireNodeForm, 'filter_nodes')
+        mock_filter_nodes.return_value = [], {}, {}
+        locked, release = threading.Event(), threading.Event()
+
+        @transactional
+        def compose_concurrently():
+            # Another allocation is composing in a pod.
+            with locks.node_acquire:
+                locked.set()
+                release.wait(10)
+
+        thread = threading.Thread(target=compose_concurrently)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(locked.wait(10))
+
+        # This allocation must not compose until the other has finished.
+        composed_after_release = []
+
+        def compose():
+            composed_after_release.append(release.is_set())
+            return machine
+
+        self.patch(ComposeMachineForPodsForm, 'compose', compose)
+        timer = threading.Timer(0.5, release.set)
+        timer.start()
+        self.addCleanup(timer.cancel)
+        response = self.client.post(
+            reverse('machines_handler'), {'op': 'allocate'})
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual([True], composed_after_release)
+
+
 class TestPowerState(APITransactionTestCase.ForUser):
 
     def setUp(self):
@@ -15,8 +15,10 @@ __all__ = [
 ]
 
 from datetime import timedelta
+import http.client
 from operator import itemgetter
 import os
+import queue
 from subprocess import CalledProcessError
 from textwrap import dedent
 import threading
@@ -28,6 +30,7 @@ from django.db import (
 )
 from django.db.utils import load_backend
 from django.http import (
+    FileResponse,
     Http404,
     HttpResponse,
     StreamingHttpResponse,
@@ -53,6 +56,7 @@ from maasserver.enum import (
 )
 from maasserver.eventloop import services
 from maasserver.fields import LargeObjectFile
+from maasserver.imagestore import get_image_store
 from maasserver.models import (
     BootResource,
     BootResourceFile,
@@ -138,6 +142,71 @@ def get_simplestream_endpoint():
         }
 
 
+def make_database_connection(alias="default"):
+    """Return a new psycopg2 connection that is not shared with Django.
+
+    It is made with the settings of the Django database `alias`. It is not
+    in autocommit mode, so a transaction begins with the first statement
+    and ends with `commit` or `rollback`, and large objects can be used in
+    it directly.
+    """
+    db = connections.databases[alias]
+    backend = load_backend(db['ENGINE'])
+    wrapper = backend.DatabaseWrapper(db, alias)
+    return wrapper.get_new_connection(wrapper.get_connection_params())
+
+
+def parse_byte_range(header, size):
+    """Parse an HTTP Range header for content of `size` bytes.
+
+    Only a single range of bytes is supported. Anything else is ignored, as
+    RFC 7233 allows, and the whole content should be sent.
+
+    :return: A ``(start, end)`` tuple, where `end` is exclusive, or `None`
+        if there's no range to honour.
+    :raise ValueError: If the range can't be satisfied.
+    """
+    if header is None or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, _, last = spec.partition("-")
+    if not (first.isdigit() or first == "") or not (
+            last.isdigit() or last == "") or first == last == "":
+        return None
+    if first == "":
+        # A suffix: the last `last` bytes.
+        if int(last) == 0:
+            raise ValueError("Range %r is empty." % header)
+        start, end = max(0, size - int(last)), size
+    elif last == "":
+        start, end = int(first), size
+    elif int(last) < int(first):
+        return None
+    else:
+        start, end = int(first), min(int(last) + 1, size)
+    if start >= size:
+        raise ValueError("Range %r not satisfiable for %d bytes." % (
+            header, size))
+    return start, end
+
+
+def read_file_range(stream, start, length, block_size=(1 << 16)):
+    """Yield `length` bytes from `stream`, starting at `start`.
+
+    `stream` is closed once done.
+    """
+    with stream:
+        stream.seek(start)
+        while length > 0:
+            data = stream.read(min(block_size, length))
+            if len(data) == 0:
+                break
+            length -= len(data)
+            yield data
+
+
 class ConnectionWrapper:
     """Wraps `LargeObjectFile` in a new database connection.
 
@@ -146,19 +215,21 @@ class ConnectionWrapper:
 
     A new database connection is made at the start of the interation and is
     closed upon close of wrapper.
+
+    Pass `start` and `length` to stream only part of the large object.
     """
 
-    def __init__(self, largeobject, alias="default"):
+    def __init__(self, largeobject, alias="default", start=0, length=None):
         self.largeobject = largeobject
         self.alias = alias
+        self.start = start
+        self.remaining = length
         self._connection = None
         self._stream = None
 
     def _get_new_connection(self):
         """Create new database connection."""
-        db = connections.databases[self.alias]
-        backend = load_backend(db['ENGINE'])
-        return backend.DatabaseWrapper(db, self.alias)
+        return make_database_connection(self.alias)
 
     def _set_up(self):
         """Sets up the connection and stream.
@@ -168,21 +239,27 @@ class ConnectionWrapper:
         """
         if self._connection is None:
             self._connection = self._get_new_connection()
-            self._connection.connect()
-            self._connection.set_autocommit(False)
-            self._connection.in_atomic_block = True
         if self._stream is None:
-            self._stream = self.largeobject.open(
-                'rb', connection=self._connection)
+            self._stream = self._connection.lobject(
+                self.largeobject.oid, 'rb')
+            if self.start > 0:
+                self._stream.seek(self.start)
 
     def __iter__(self):
         return self
 
     def __next__(self):
+        size = self.largeobject.block_size
+        if self.remaining is not None:
+            if self.remaining <= 0:
+                raise StopIteration
+            size = min(size, self.remaining)
         self._set_up()
-        data = self._stream.read(self.largeobject.block_size)
+        data = self._stream.read(size)
         if len(data) == 0:
             raise StopIteration
+        if self.remaining is not None:
+            self.remaining -= len(data)
         return data
 
     def close(self):
@@ -191,9 +268,7 @@ class ConnectionWrapper:
             self._stream.close()
             self._stream = None
         if self._connection is not None:
-            self._connection.in_atomic_block = False
             self._connection.commit()
-            self._connection.set_autocommit(True)
             self._connection.close()
             self._connection = None
 
@@ -365,10 +440,43 @@ class SimpleStreamsHandler:
             rfile = resource_set.files.get(filename=filename)
         except BootResourceFile.DoesNotExist:
             raise Http404()
-        response = StreamingHttpResponse(
-            ConnectionWrapper(rfile.largefile.content),
-            content_type='application/octet-stream')
-        response['Content-Length'] = rfile.largefile.total_size
+        largefile = rfile.largefile
+        size = largefile.total_size
+        try:
+            byte_range = parse_byte_range(
+                request.META.get('HTTP_RANGE'), size)
+        except ValueError:
+            response = HttpResponse(
+                status=http.client.REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+        start, end = (0, size) if byte_range is None else byte_range
+        image_store = get_image_store()
+        if image_store is not None and image_store.exists(largefile.sha256):
+            stream = image_store.open(largefile.sha256)
+            if byte_range is None:
+                response = FileResponse(
+                    stream, content_type='application/octet-stream')
+            else:
+                response = StreamingHttpResponse(
+                    read_file_range(stream, start, end - start),
+                    content_type='application/octet-stream')
+        else:
+            # Content imported before the image store was configured is
+            # still in the database.
+            if byte_range is None:
+                content = ConnectionWrapper(largefile.content)
+            else:
+                content = ConnectionWrapper(
+                    largefile.content, start=start, length=end - start)
+            response = StreamingHttpResponse(
+                content, content_type='application/octet-stream')
+        if byte_range is not None:
+            response.status_code = http.client.PARTIAL_CONTENT
+            response['Content-Range'] = 'bytes %d-%d/%d' % (
+                start, end - 1, size)
+        response['Content-Length'] = end - start
+        response['Accept-Ranges'] = 'bytes'
         return response
 
 
@@ -416,9 +524,13 @@ class BootResourceStore(ObjectStore):
     # might cause high network and database load.
     write_threads = 2
 
-    # Read at 10MiB per chunk.
+    # Read and write at 10MiB per chunk.
     read_size = 1024 * 1024 * 10
 
+    # Save the size of content being written, so that progress can be
+    # reported, at most this often, in seconds.
+    progress_interval = 5
+
     def __init__(self):
         """Initialize store."""
         self.cache_current_resources()
@@ -742,7 +854,13 @@ class BootResourceStore(ObjectStore):
 
     def write_content_thread(self, rid, reader):
         """Writes the data from the given reader, into the object storage
-        for the given `BootResourceFile`."""
+        for the given `BootResourceFile`.
+
+        The data is streamed into the region's `ImageFileStore` if there is
+        one, otherwise into the large object of the file's `LargeFile`. In
+        either case it is only kept once all of it has been written and its
+        checksum matches.
+        """
 
         @transactional
         def get_rfile_and_ident():
@@ -752,44 +870,27 @@ class BootResourceStore(ObjectStore):
             return rfile, ident
 
         rfile, ident = get_rfile_and_ident()
-        cksummer = sutil.checksummer(
-            {'sha256': rfile.largefile.sha256})
+        largefile = rfile.largefile
+        cksummer = sutil.checksummer({'sha256': largefile.sha256})
         log.debug("Finalizing boot image {ident}.", ident=ident)
 
         # Ensure that the size of the largefile starts at zero.
-        rfile.largefile.size = 0
-        transactional(rfile.largefile.save)(update_fields=['size'])
+        largefile.size = 0
+        transactional(largefile.save)(update_fields=['size'])
 
-        @transactional
-        def write_chunk():
-            """Write a chunk into the database with a transaction per trunk.
-
-            This ensures that the content and the size is committed into the
-            database per chunk. This makes the process be reported correctly.
-            """
-            with rfile.largefile.content.open('wb') as stream:
-                buf = reader.read(self.read_size)
-                stream.seek(0, 2)
-                stream.write(buf)
-                cksummer.update(buf)
-                buf_len = len(buf)
-                rfile.largefile.size += buf_len
-                rfile.largefile.save(update_fields=['size'])
-                if buf_len != self.read_size:
-                    return True
-                else:
-                    return False
-
-        # Write chunks until it says its done.
-        while not self._cancel_finalize:
-            if write_chunk():
-                break
+        image_store = get_image_store()
+        if image_store is None:
+            size, verified = self.write_content_to_large_object(
+                largefile, reader, cksummer)
+        else:
+            size, verified = self.write_content_to_image_store(
+                image_store, largefile, reader, cksummer)
 
         # Don't check the checksum if finalization was cancelled.
-        if self._cancel_finalize:
+        if size is None:
             return
 
-        if not cksummer.check():
+        if not verified:
             # Calculated sha256 hash from the data does not match, what
             # simplestreams is telling us it should be. This resource file
             # will be deleted since it is corrupt.
@@ -804,40 +905,124 @@ class BootResourceStore(ObjectStore):
             maaslog.error(msg)
             transactional(rfile.delete)()
         else:
+            # The content is committed, so now the size can say so.
+            largefile.size = size
+            transactional(largefile.save)(update_fields=['size'])
             log.debug('Finalized boot image {ident}.', ident=ident)
 
-    def perform_write(self):
-        """Performs all writing of content into the object storage.
+    def write_content_to_large_object(self, largefile, reader, cksummer):
+        """Write the data from `reader` into the large object of `largefile`.
 
-        This method will spawn threads to perform the writing. Maximum of
-        `write_threads` will be running at once."""
-        threads = []
-        while True:
-            # Update list to only those that are still running.
-            threads = [thread for thread in threads if thread.isAlive()]
-            if len(threads) >= self.write_threads:
-                # Cannot start any more threads as the maximum is already
-                # running. Lets wait a second and try again.
-                time.sleep(1)
-                continue
+        This uses a database connection of its own, in one transaction that
+        is only committed if all of the data is written and its checksum
+        matches.
 
-            if self._cancel_finalize or len(self._content_to_finalize) == 0:
-                # No more threads to spawn because the finalization has been
-                # cancelled or all of the content has been de-queued. Wait for
-                # all the remaining running threads to finish.
-                for thread in threads:
-                    thread.join()
-                break
+        :return: A ``(size, verified)`` tuple; see `write_content`.
+        """
+        db_connection = make_database_connection()
+        try:
+            stream = db_connection.lobject(largefile.content.oid, 'wb')
+            try:
+                # Discard anything left over from an earlier, failed, attempt.
+                stream.truncate()
+                size = self.write_content(stream, largefile, reader, cksummer)
+            finally:
+                stream.close()
+            verified = size is not None and cksummer.check()
+            if verified:
+                db_connection.commit()
+            else:
+                db_connection.rollback()
+        finally:
+            db_connection.close()
+        return size, verified
 
-            # Spawn a writer thread with a resource file and reader from
-            # the queue of content to be saved.
-            rid, reader = self._content_to_finalize.popitem()
-            # FIXME: Use deferToDatabase and the coiterator if possible.
-            thread = threading.Thread(
-                target=self.write_content_thread,
-                args=(rid, reader))
+    def write_content_to_image_store(
+            self, image_store, largefile, reader, cksummer):
+        """Write the data from `reader` into `image_store`.
+
+        The data goes into a temporary file that is only added to the store
+        if all of it is written and its checksum matches.
+
+        :return: A ``(size, verified)`` tuple; see `write_content`.
+        """
+        stream = image_store.create_temporary()
+        try:
+            with stream:
+                size = self.write_content(stream, largefile, reader, cksummer)
+                stream.flush()
+                os.fsync(stream.fileno())
+            verified = size is not None and cksummer.check()
+            if verified:
+                image_store.add(largefile.sha256, stream.name)
+        finally:
+            if os.path.exists(stream.name):
+                os.unlink(stream.name)
+        return size, verified
+
+    def write_content(self, stream, largefile, reader, cksummer):
+        """Write the data from `reader` into `stream`.
+
+        Data is written `read_size` bytes at a time. The size of `largefile`
+        is saved at most every `progress_interval` seconds, so that progress
+        can be reported while writing; it is never saved as complete here.
+
+        :return: The number of bytes written, or `None` if finalization was
+            cancelled part way through.
+        """
+        size = 0
+        reported = time.monotonic()
+        while not self._cancel_finalize:
+            buf = reader.read(self.read_size)
+            stream.write(buf)
+            cksummer.update(buf)
+            size += len(buf)
+            if len(buf) != self.read_size:
+                return size
+            now = time.monotonic()
+            if (now - reported >= self.progress_interval and
+                    size < largefile.total_size):
+                largefile.size = size
+                transactional(largefile.save)(update_fields=['size'])
+                reported = now
+        return None
+
+    def perform_write(self):
+        """Performs all writing of content into the object storage.
+
+        The content to be saved is put on a queue, and `write_threads`
+        threads take from it until it is empty or finalization is cancelled.
+        Content is only removed from `_content_to_finalize` once a thread
+        starts on it, so anything left over can be deleted on cancellation.
+        """
+        work = queue.Queue()
+        for rid in list(self._content_to_finalize):
+            work.put(rid)
+
+        def write_content_from_queue():
+            while not self._cancel_finalize:
+                try:
+                    rid = work.get_nowait()
+                except queue.Empty:
+                    break
+                reader = self._content_to_finalize.pop(rid)
+                try:
+                    self.write_content_thread(rid, reader)
+                except Exception:
+                    log.err(None, "Failed to write boot resource content.")
+
+        # These are plain threads rather than the database thread pool: each
+        # writer holds a transaction of its own, on its own connection, for
+        # as long as it takes to download the content, which would starve
+        # the pool of threads for short transactions.
+        threads = [
+            threading.Thread(target=write_content_from_queue)
+            for _ in range(min(self.write_threads, work.qsize()))
+        ]
+        for thread in threads:
             thread.start()
-            threads.append(thread)
+        for thread in threads:
+            thread.join()
 
     def _other_resources_exists(self, os, arch, subarch, series):
         """Return `True` when simplestreams provided an image with the same
@@ -0,0 +1,43 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Invalidate boot configurations cached by rack controllers."""
+
+__all__ = [
+    "invalidate_boot_configs",
+]
+
+from maasserver.rpc import getAllClients
+from provisioningserver.logger import LegacyLogger
+from provisioningserver.rpc.cluster import InvalidateBootConfig
+from provisioningserver.utils.twisted import (
+    asynchronous,
+    FOREVER,
+)
+from twisted.protocols.amp import UnhandledCommand
+
+
+log = LegacyLogger()
+
+
+@asynchronous(timeout=FOREVER)  # This will return very quickly.
+def invalidate_boot_configs(identifiers=None):
+    """Tell every connected rack controller to discard cached boot configs.
+
+    Nothing waits for the rack controllers to respond.
+
+    :param identifiers: MAC addresses and hardware UUIDs of the machines
+        whose boot configurations have changed, or `None` to discard all
+        boot configurations.
+    """
+    if identifiers is None:
+        kwargs = {}
+    else:
+        kwargs = {"identifiers": sorted(identifiers)}
+    for client in getAllClients():
+        d = client(InvalidateBootConfig, **kwargs)
+        # Rack controllers from before 2.5 do not cache boot configurations.
+        d.addErrback(lambda failure: failure.trap(UnhandledCommand))
+        d.addErrback(
+            log.err, "Failed to invalidate boot configurations on %s." % (
+                client.ident))
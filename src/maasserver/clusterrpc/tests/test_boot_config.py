@@ -0,0 +1,77 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :py:mod:`maasserver.clusterrpc.boot_config`."""
+
+__all__ = []
+
+from unittest.mock import (
+    ANY,
+    Mock,
+)
+
+from crochet import wait_for
+from maasserver.clusterrpc import boot_config as boot_config_module
+from maasserver.clusterrpc.boot_config import invalidate_boot_configs
+from maasserver.testing.factory import factory
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from provisioningserver.rpc.cluster import InvalidateBootConfig
+from twisted.internet.defer import (
+    fail,
+    succeed,
+)
+from twisted.protocols.amp import UnhandledCommand
+
+
+wait_for_reactor = wait_for(30)  # 30 seconds.
+
+
+class TestInvalidateBootConfigs(MAASTestCase):
+    """Tests for `invalidate_boot_configs`."""
+
+    def patch_clients(self, *responses):
+        clients = []
+        for response in responses:
+            client = Mock(return_value=response)
+            client.ident = factory.make_name("system_id")
+            clients.append(client)
+        self.patch(
+            boot_config_module, "getAllClients").return_value = clients
+        return clients
+
+    @wait_for_reactor
+    def test__calls_InvalidateBootConfig_on_all_clients(self):
+        clients = self.patch_clients(succeed({}), succeed({}))
+        mac = factory.make_mac_address()
+        hardware_uuid = factory.make_UUID()
+        invalidate_boot_configs({mac, hardware_uuid})
+        for client in clients:
+            self.assertThat(client, MockCalledOnceWith(
+                InvalidateBootConfig,
+                identifiers=sorted([mac, hardware_uuid])))
+
+    @wait_for_reactor
+    def test__invalidates_everything_without_identifiers(self):
+        [client] = self.patch_clients(succeed({}))
+        invalidate_boot_configs()
+        self.assertThat(client, MockCalledOnceWith(InvalidateBootConfig))
+
+    @wait_for_reactor
+    def test__ignores_racks_without_the_command(self):
+        self.patch_clients(fail(UnhandledCommand()))
+        log_err = self.patch(boot_config_module.log, "err")
+        invalidate_boot_configs()
+        self.assertThat(log_err, MockNotCalled())
+
+    @wait_for_reactor
+    def test__logs_other_failures(self):
+        [client] = self.patch_clients(fail(ZeroDivisionError()))
+        log_err = self.patch(boot_config_module.log, "err")
+        invalidate_boot_configs()
+        self.assertThat(log_err, MockCalledOnceWith(
+            ANY, "Failed to invalidate boot configurations on %s." % (
+                client.ident)))
@@ -155,6 +155,7 @@ def prepare_tftp_root(test):
     test.tftp_root = os.path.join(test.make_dir(), 'current')
     os.mkdir(test.tftp_root)
     test.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+    test.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
     config = ClusterConfigurationFixture(tftp_root=test.tftp_root)
     test.useFixture(config)
 
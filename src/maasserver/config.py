@@ -1,4 +1,4 @@
-# Copyright 2015-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2015-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Configuration for the MAAS region."""
@@ -64,6 +64,15 @@ class RegionConfiguration(Configuration, metaclass=RegionConfigurationMeta):
         "num_workers", "The number of regiond worker process to run.",
         Int(if_missing=4, accept_python=False, min=1))
 
+    # Boot image options.
+    image_store_path = ConfigurationOption(
+        "image_store_path",
+        "Keep the content of boot images in files in this directory, instead "
+        "of in the database. Every region controller must see the same "
+        "files here, so it must be shared if there is more than one. Leave "
+        "empty to keep boot images in the database.",
+        UnicodeString(if_missing="", accept_python=False))
+
     # Debug options.
     debug = ConfigurationOption(
         "debug", "Enable debug mode for detailed error and log reporting.",
@@ -8,7 +8,10 @@ __all__ = [
     'dns_update_all_zones',
     ]
 
-from collections import defaultdict
+from collections import (
+    defaultdict,
+    namedtuple,
+)
 
 from django.conf import settings
 from maasserver.dns.zonegenerator import (
@@ -28,8 +31,12 @@ from maasserver.models.node import RackController
 from maasserver.models.subnet import Subnet
 from netaddr import IPAddress
 from provisioningserver.dns.actions import (
+    bind_freeze_zones,
     bind_reload,
     bind_reload_with_retries,
+    bind_reload_zones,
+    bind_thaw_zones,
+    bind_update_zones,
     bind_write_configuration,
     bind_write_options,
     bind_write_zones,
@@ -49,9 +56,66 @@ def is_dns_enabled():
     return settings.DNS_CONNECT
 
 
+# The source of publications that must be published in full, even if no
+# zone has changed.
+FORCE_RELOAD_SOURCE = "Force reload"
+
+
 def dns_force_reload():
     """Force the DNS to be regenerated."""
-    DNSPublication(source="Force reload").save()
+    DNSPublication(source=FORCE_RELOAD_SOURCE).save()
+
+
+# What this process last published to BIND: the configuration it was
+# published with, a `PublishedZone` for each zone by name, and the ID and
+# serial of the publication. `None` until the first publication, which always
+# writes and reloads everything.
+PUBLISHED_ZONES = None
+
+# A zone as published to BIND. `structure` is a fingerprint of everything but
+# the host records, and `host_records` is the set of those records; both are
+# only needed when sending dynamic updates, otherwise they are `None`.
+PublishedZone = namedtuple(
+    "PublishedZone", ("fingerprint", "structure", "host_records"))
+
+
+def get_published_zone(zone, zone_info, dynamic_updates):
+    """Return a `PublishedZone` for the zone in `zone_info`."""
+    fingerprint = zone.get_fingerprint(zone_info)
+    if dynamic_updates:
+        return PublishedZone(
+            fingerprint, zone.get_fingerprint(
+                zone_info, include_host_records=False),
+            zone.get_host_records(zone_info))
+    else:
+        return PublishedZone(fingerprint, None, None)
+
+
+def get_publication_id():
+    """Return the ID of the most recent `DNSPublication`, or `None`."""
+    try:
+        return DNSPublication.objects.get_most_recent().id
+    except DNSPublication.DoesNotExist:
+        return None
+
+
+def is_full_publication_needed(publication_id, serial):
+    """Must the publication `publication_id` be published in full?
+
+    It must if a reload has been forced since the last publication, or the
+    serial has moved backwards, as it can when set explicitly. Zone
+    fingerprints exclude the serial, so neither would otherwise reach BIND.
+    """
+    _, _, published_id, published_serial = PUBLISHED_ZONES
+    if int(serial) < int(published_serial):
+        return True
+    elif publication_id is None or published_id is None:
+        return publication_id != published_id
+    else:
+        forced = DNSPublication.objects.filter(
+            id__gt=published_id, id__lte=publication_id,
+            source=FORCE_RELOAD_SOURCE)
+        return forced.exists()
 
 
 def dns_update_all_zones(reload_retry=False):
@@ -60,20 +124,79 @@ def dns_update_all_zones(reload_retry=False):
     Serving these zone files means updating BIND's configuration to include
     them, then asking it to load the new configuration.
 
+    Once published, only zones whose records have changed are rewritten and
+    reloaded, unless the set of zones or the configuration has changed. With
+    the `dns_dynamic_updates` option, changes to host records are sent to
+    BIND as dynamic updates instead, and zones are rewritten only when
+    something else in them changes.
+
     :param reload_retry: Should the DNS server reload be retried in case
         of failure? Defaults to `False`.
     :type reload_retry: bool
     """
+    global PUBLISHED_ZONES
+
     if not is_dns_enabled():
         return
 
     domains = Domain.objects.filter(authoritative=True)
     subnets = Subnet.objects.exclude(rdns_mode=RDNS_MODE.DISABLED)
     default_ttl = Config.objects.get_config('default_dns_ttl')
+    publication_id = get_publication_id()
     serial = current_zone_serial()
     zones = ZoneGenerator(
         domains, subnets, default_ttl,
         serial, internal_domains=[get_internal_domain()]).as_list()
+    upstream_dns = get_upstream_dns()
+    dnssec_validation = get_dnssec_validation()
+    trusted_networks = get_trusted_networks()
+    dynamic_updates = get_dns_dynamic_updates()
+    published_zones = {
+        zone_info.zone_name: get_published_zone(
+            zone, zone_info, dynamic_updates)
+        for zone in zones
+        for zone_info in zone.zone_info
+    }
+    configuration = (
+        sorted(published_zones), upstream_dns, dnssec_validation,
+        trusted_networks, dynamic_updates)
+
+    if (PUBLISHED_ZONES is not None and
+            PUBLISHED_ZONES[0] == configuration and
+            not is_full_publication_needed(publication_id, serial)):
+        # Only records have changed; update just those zones. Their serial
+        # moves on, while unchanged zones keep theirs.
+        previous_zones = PUBLISHED_ZONES[1]
+        changed = {
+            name for name, published_zone in published_zones.items()
+            if previous_zones[name].fingerprint != published_zone.fingerprint
+        }
+        if dynamic_updates:
+            rewrite = {
+                name for name in changed
+                if previous_zones[name].structure !=
+                published_zones[name].structure
+            }
+        else:
+            rewrite = changed
+        # Until the changed zones are updated, BIND's state is unknown.
+        PUBLISHED_ZONES = None
+        if dns_update_zones(
+                zones, previous_zones, published_zones, changed, rewrite,
+                dynamic_updates):
+            PUBLISHED_ZONES = (
+                configuration, published_zones, publication_id, serial)
+        return serial, [
+            domain.name
+            for domain in domains
+            if domain.name in changed
+        ]
+
+    PUBLISHED_ZONES = None
+    if dynamic_updates:
+        # Have BIND write out pending dynamic updates and hold off new ones
+        # while the zone files are rewritten.
+        bind_freeze_zones()
     bind_write_zones(zones)
 
     # We should not be calling bind_write_options() here; call-sites should be
@@ -82,14 +205,16 @@ def dns_update_all_zones(reload_retry=False):
     # some that call it for this side-effect alone. At present all it does is
     # set the upstream DNS servers, nothing to do with serving zones at all!
     bind_write_options(
-        upstream_dns=get_upstream_dns(),
-        dnssec_validation=get_dnssec_validation())
+        upstream_dns=upstream_dns,
+        dnssec_validation=dnssec_validation)
 
     # Nor should we be rewriting ACLs that are related only to allowing
     # recursive queries to the upstream DNS servers. Again, this is legacy,
     # where the "trusted" ACL ended up in the same configuration file as the
     # zone stanzas, and so both need to be rewritten at the same time.
-    bind_write_configuration(zones, trusted_networks=get_trusted_networks())
+    bind_write_configuration(
+        zones, trusted_networks=trusted_networks,
+        dynamic_updates=dynamic_updates)
 
     # Reloading with retries may be a legacy from Celery days, or it may be
     # necessary to recover from races during start-up. We're not sure if it is
@@ -97,8 +222,15 @@ def dns_update_all_zones(reload_retry=False):
     # have a better understanding.
     if reload_retry:
         bind_reload_with_retries()
+        reloaded = True
     else:
-        bind_reload()
+        reloaded = bind_reload()
+    if dynamic_updates:
+        # Frozen zones are reloaded by thawing them.
+        reloaded = bind_thaw_zones() and reloaded
+    if reloaded:
+        PUBLISHED_ZONES = (
+            configuration, published_zones, publication_id, serial)
 
     # Return the current serial and list of domain names.
     return serial, [
@@ -107,6 +239,44 @@ def dns_update_all_zones(reload_retry=False):
     ]
 
 
+def dns_update_zones(
+        zones, previous_zones, published_zones, changed, rewrite,
+        dynamic_updates):
+    """Update the `changed` zones in BIND, which is otherwise up to date.
+
+    :param previous_zones: The `PublishedZone` for each zone, by name, as
+        BIND has it now.
+    :param published_zones: The `PublishedZone` for each zone, by name, as
+        it should be published.
+    :param changed: The names of the zones that have changed.
+    :param rewrite: The names of the changed zones that must be rewritten in
+        full; the others are sent as dynamic updates.
+    :return: True if success, False otherwise.
+    """
+    success = True
+    if len(rewrite) > 0:
+        if dynamic_updates:
+            bind_freeze_zones(sorted(rewrite))
+        bind_write_zones(zones, rewrite)
+        if dynamic_updates:
+            success = bind_thaw_zones(sorted(rewrite))
+        else:
+            success = bind_reload_zones(sorted(rewrite))
+    updates = []
+    for zone in zones:
+        for zone_info in zone.zone_info:
+            name = zone_info.zone_name
+            if name in changed and name not in rewrite:
+                previous = previous_zones[name].host_records
+                current = published_zones[name].host_records
+                updates.append((
+                    name, previous - current,
+                    (current - previous) | {zone.get_soa_record(zone_info)}))
+    if len(updates) > 0:
+        success = bind_update_zones(updates) and success
+    return success
+
+
 def get_upstream_dns():
     """Return the IP addresses of configured upstream DNS servers.
 
@@ -124,6 +294,14 @@ def get_dnssec_validation():
     return Config.objects.get_config("dnssec_validation")
 
 
+def get_dns_dynamic_updates():
+    """Return whether record changes are sent to BIND as dynamic updates.
+
+    :return: True or False.
+    """
+    return Config.objects.get_config("dns_dynamic_updates")
+
+
 def get_trusted_acls():
     """Return the configuration option for trusted ACLs.
 
@@ -8,6 +8,7 @@ __all__ = []
 from argparse import ArgumentParser
 import random
 import time
+from unittest.mock import ANY
 
 from django.conf import settings
 import dns.resolver
@@ -33,11 +34,18 @@ from maasserver.models import (
     Config,
     Domain,
 )
-from maasserver.models.dnspublication import DNSPublication
+from maasserver.models.dnspublication import (
+    DNSPublication,
+    zone_serial,
+)
 from maasserver.testing.config import RegionConfigurationFixture
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCalledWith,
+    MockNotCalled,
+)
 from netaddr import IPAddress
 from provisioningserver.dns.commands import (
     get_named_conf,
@@ -49,6 +57,7 @@ from provisioningserver.dns.config import (
 )
 from provisioningserver.dns.testing import (
     patch_dns_config_path,
+    patch_dns_port,
     patch_dns_rndc_port,
 )
 from provisioningserver.testing.bindfixture import (
@@ -64,6 +73,7 @@ from testtools.matchers import (
     HasLength,
     MatchesSetwise,
     MatchesStructure,
+    Not,
 )
 
 
@@ -113,6 +123,8 @@ class TestDNSServer(MAASServerTestCase):
         self.useFixture(RegionConfigurationFixture())
         # Immediately make DNS changes as they're needed.
         self.patch(dns_config_module, "DNS_DEFER_UPDATES", False)
+        # Start each test with nothing published.
+        self.patch(dns_config_module, "PUBLISHED_ZONES", None)
         # Create a DNS server.
         self.bind = self.useFixture(BINDServer())
         # Use the dnspython resolver for at least some queries.
@@ -120,6 +132,8 @@ class TestDNSServer(MAASServerTestCase):
         self.resolver.nameservers = ['127.0.0.1']
         self.resolver.port = self.bind.config.port
         patch_dns_config_path(self, self.bind.config.homedir)
+        # Send dynamic updates to the DNS server.
+        patch_dns_port(self, self.bind.config.port)
         # Use a random port for rndc.
         patch_dns_rndc_port(self, allocate_ports("localhost")[0])
         # This simulates what should happen when the package is
@@ -385,6 +399,242 @@ class TestDNSConfigModifications(TestDNSServer):
         ]))
 
 
+class TestDNSUpdateAllZonesIncrementally(MAASServerTestCase):
+    """Tests for `dns_update_all_zones` once zones have been published."""
+
+    def setUp(self):
+        super(TestDNSUpdateAllZonesIncrementally, self).setUp()
+        DNSPublication(source="Initial").save()
+        self.patch(settings, 'DNS_CONNECT', True)
+        self.patch(dns_config_module, "PUBLISHED_ZONES", None)
+        self.bind_write_zones = self.patch_autospec(
+            dns_config_module, "bind_write_zones")
+        self.bind_reload = self.patch_autospec(
+            dns_config_module, "bind_reload")
+        self.bind_reload.return_value = True
+        self.bind_reload_zones = self.patch_autospec(
+            dns_config_module, "bind_reload_zones")
+        self.bind_reload_zones.return_value = True
+        self.bind_freeze_zones = self.patch_autospec(
+            dns_config_module, "bind_freeze_zones")
+        self.bind_freeze_zones.return_value = True
+        self.bind_thaw_zones = self.patch_autospec(
+            dns_config_module, "bind_thaw_zones")
+        self.bind_thaw_zones.return_value = True
+        self.bind_update_zones = self.patch_autospec(
+            dns_config_module, "bind_update_zones")
+        self.bind_update_zones.return_value = True
+        self.patch_autospec(dns_config_module, "bind_write_options")
+        self.bind_write_configuration = self.patch_autospec(
+            dns_config_module, "bind_write_configuration")
+
+    def make_node_with_static_ip(self, domain):
+        subnet = factory.make_Subnet(cidr=str(factory.make_ipv4_network()))
+        node = factory.make_Node(
+            interface=True, status=NODE_STATUS.READY, domain=domain)
+        return factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.AUTO,
+            ip=factory.pick_ip_in_Subnet(subnet),
+            subnet=subnet, interface=node.get_boot_interface())
+
+    def test_first_publication_writes_and_reloads_everything(self):
+        dns_update_all_zones()
+        self.assertThat(
+            self.bind_write_zones, MockCalledOnceWith(ANY))
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+
+    def test_does_nothing_when_no_zone_changed(self):
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_reload.reset_mock()
+        serial, domains = dns_update_all_zones()
+        self.assertThat(self.bind_write_zones, MockNotCalled())
+        self.assertThat(self.bind_reload, MockNotCalled())
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+        self.assertEqual([], domains)
+
+    def test_writes_and_reloads_only_changed_zones(self):
+        domain = factory.make_Domain()
+        other_domain = factory.make_Domain()
+        static_ip = self.make_node_with_static_ip(domain)
+        self.make_node_with_static_ip(other_domain)
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_reload.reset_mock()
+
+        # Move the address within its subnet; its forward zone and reverse
+        # zone change, but the set of zones does not.
+        static_ip.ip = factory.pick_ip_in_Subnet(
+            static_ip.subnet, but_not=[static_ip.ip])
+        static_ip.save()
+        serial, domains = dns_update_all_zones()
+
+        self.assertThat(self.bind_reload, MockNotCalled())
+        [(_, changed), _] = self.bind_write_zones.call_args
+        self.assertIn(domain.name, changed)
+        self.assertNotIn(other_domain.name, changed)
+        self.assertThat(
+            self.bind_reload_zones, MockCalledOnceWith(sorted(changed)))
+        self.assertEqual([domain.name], domains)
+
+    def test_force_reload_rewrites_unchanged_zones(self):
+        domain = factory.make_Domain()
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_reload.reset_mock()
+        dns_force_reload()
+        serial, domains = dns_update_all_zones()
+        self.assertThat(self.bind_write_zones, MockCalledOnceWith(ANY))
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertIn(domain.name, domains)
+
+    def test_set_serial_rewrites_unchanged_zones_with_new_serial(self):
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_reload.reset_mock()
+        # As the set_serial API call does, with a lower serial.
+        new_serial = random.randint(1, 100)
+        zone_serial.set_value(new_serial)
+        dns_force_reload()
+        serial, domains = dns_update_all_zones()
+        self.assertEqual(new_serial, int(serial))
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        [(zones,), _] = self.bind_write_zones.call_args
+        self.assertEqual({serial}, {zone.serial for zone in zones})
+        self.assertNotEqual([], domains)
+
+    def test_writes_everything_when_serial_moves_backwards(self):
+        zone_serial.set_value(random.randint(100, 1000))
+        DNSPublication(source=factory.make_name("source")).save()
+        dns_update_all_zones()
+        self.bind_reload.reset_mock()
+        zone_serial.set_value(1)
+        DNSPublication(source=factory.make_name("source")).save()
+        dns_update_all_zones()
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+
+    def test_reloads_everything_when_zones_are_added(self):
+        dns_update_all_zones()
+        self.bind_reload.reset_mock()
+        factory.make_Domain()
+        dns_update_all_zones()
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+
+    def test_reloads_everything_after_zone_reload_fails(self):
+        static_ip = self.make_node_with_static_ip(factory.make_Domain())
+        dns_update_all_zones()
+        self.bind_reload_zones.return_value = False
+        static_ip.ip = factory.pick_ip_in_Subnet(
+            static_ip.subnet, but_not=[static_ip.ip])
+        static_ip.save()
+        dns_update_all_zones()
+        self.assertThat(self.bind_reload_zones, MockCalledOnceWith(ANY))
+        self.bind_reload.reset_mock()
+        self.bind_reload_zones.reset_mock()
+        dns_update_all_zones()
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+
+    def test_dynamic_updates_first_publication_writes_everything(self):
+        Config.objects.set_config("dns_dynamic_updates", True)
+        dns_update_all_zones()
+        self.assertThat(self.bind_freeze_zones, MockCalledOnceWith())
+        self.assertThat(self.bind_write_zones, MockCalledOnceWith(ANY))
+        self.assertThat(
+            self.bind_write_configuration, MockCalledOnceWith(
+                ANY, trusted_networks=ANY, dynamic_updates=True))
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertThat(self.bind_thaw_zones, MockCalledOnceWith())
+        self.assertThat(self.bind_update_zones, MockNotCalled())
+
+    def test_dynamic_updates_sends_changed_host_records(self):
+        Config.objects.set_config("dns_dynamic_updates", True)
+        domain = factory.make_Domain()
+        static_ip = self.make_node_with_static_ip(domain)
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_reload.reset_mock()
+
+        old_ip = static_ip.ip
+        static_ip.ip = factory.pick_ip_in_Subnet(
+            static_ip.subnet, but_not=[old_ip])
+        static_ip.save()
+        serial, domains = dns_update_all_zones()
+
+        self.assertThat(self.bind_write_zones, MockNotCalled())
+        self.assertThat(self.bind_reload, MockNotCalled())
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+        [updates], _ = self.bind_update_zones.call_args
+        updates = {
+            zone_name: (deletions, additions)
+            for zone_name, deletions, additions in updates
+        }
+        deletions, additions = updates[domain.name]
+        self.assertThat(
+            {(rrtype, data) for _, _, rrtype, data in deletions},
+            Equals({("A", old_ip)}))
+        self.assertThat(
+            {(rrtype, data) for _, _, rrtype, data in additions},
+            Equals({("A", static_ip.ip), ("SOA", ANY)}))
+        self.assertEqual([domain.name], domains)
+
+    def test_dynamic_updates_rewrites_zones_with_other_changes(self):
+        Config.objects.set_config("dns_dynamic_updates", True)
+        domain = factory.make_Domain()
+        dns_update_all_zones()
+        self.bind_write_zones.reset_mock()
+        self.bind_freeze_zones.reset_mock()
+        self.bind_thaw_zones.reset_mock()
+
+        factory.make_DNSData(
+            domain=domain, rrtype="TXT", rrdata=factory.make_name("txt"))
+        dns_update_all_zones()
+
+        self.assertThat(
+            self.bind_freeze_zones, MockCalledOnceWith([domain.name]))
+        self.assertThat(
+            self.bind_write_zones, MockCalledOnceWith(ANY, {domain.name}))
+        self.assertThat(
+            self.bind_thaw_zones, MockCalledOnceWith([domain.name]))
+        self.assertThat(self.bind_reload_zones, MockNotCalled())
+        self.assertThat(self.bind_update_zones, MockNotCalled())
+
+    def test_toggling_dynamic_updates_writes_everything(self):
+        dns_update_all_zones()
+        self.bind_reload.reset_mock()
+        Config.objects.set_config("dns_dynamic_updates", True)
+        dns_update_all_zones()
+        self.assertThat(self.bind_reload, MockCalledOnceWith())
+        self.assertThat(
+            self.bind_write_configuration, MockCalledWith(
+                ANY, trusted_networks=ANY, dynamic_updates=True))
+
+
+class TestDNSDynamicUpdates(TestDNSServer):
+    """Tests for publishing changes to BIND as dynamic updates."""
+
+    def test_moved_address_is_published_without_rewriting_zone(self):
+        self.patch(settings, 'DNS_CONNECT', True)
+        Config.objects.set_config("dns_dynamic_updates", True)
+        node, static_ip = self.create_node_with_static_ip()
+        dns_update_all_zones()
+        self.assertDNSMatches(node.hostname, node.domain.name, static_ip.ip)
+
+        static_ip.ip = factory.pick_ip_in_Subnet(
+            static_ip.subnet, but_not=[static_ip.ip])
+        static_ip.save()
+        # Move to a new serial, whether or not triggers have done so.
+        dns_force_reload()
+        dns_update_all_zones()
+
+        self.assertDNSMatches(node.hostname, node.domain.name, static_ip.ip)
+        self.assertThat(
+            compose_config_path("zone.%s" % node.domain.name),
+            FileContains(matcher=Not(Contains(static_ip.ip))))
+
+
 class TestDNSDynamicIPAddresses(TestDNSServer):
     """Allocated nodes with IP addresses in the dynamic range get a DNS
     record.
@@ -18,6 +18,7 @@ from urllib.parse import urlparse
 from maasserver import server_address
 from maasserver.dns import zonegenerator
 from maasserver.dns.zonegenerator import (
+    bucket_ip_mapping,
     get_dns_search_paths,
     get_dns_server_address,
     get_hostname_dnsdata_mapping,
@@ -25,7 +26,7 @@ from maasserver.dns.zonegenerator import (
     InternalDomain,
     InternalDomainResourse,
     InternalDomainResourseRecord,
-    lazydict,
+    NetworkIndex,
     warn_loopback,
     WARNING_MESSAGE,
     ZoneGenerator,
@@ -57,6 +58,7 @@ from maastesting.matchers import (
     MockCalledOnceWith,
     MockNotCalled,
 )
+from maastesting.testcase import MAASTestCase
 from netaddr import (
     IPAddress,
     IPNetwork,
@@ -65,7 +67,6 @@ from provisioningserver.dns.zoneconfig import (
     DNSForwardZoneConfig,
     DNSReverseZoneConfig,
 )
-from testtools import TestCase
 from testtools.matchers import (
     Equals,
     IsInstance,
@@ -177,35 +178,62 @@ class TestWarnLoopback(MAASServerTestCase):
         self.assertThat(logger.warning, MockNotCalled())
 
 
-class TestLazyDict(TestCase):
-    """Tests for `lazydict`."""
+class TestNetworkIndex(MAASTestCase):
+    """Tests for `NetworkIndex`."""
 
-    def test_empty_initially(self):
-        self.assertEqual({}, lazydict(Mock()))
+    def test_finds_nothing_when_empty(self):
+        self.assertEqual([], NetworkIndex().lookup("10.0.0.1"))
 
-    def test_populates_on_demand(self):
-        value = factory.make_name('value')
-        value_dict = lazydict(lambda key: value)
-        key = factory.make_name('key')
-        retrieved_value = value_dict[key]
-        self.assertEqual(value, retrieved_value)
-        self.assertEqual({key: value}, value_dict)
-
-    def test_remembers_elements(self):
-        value_dict = lazydict(lambda key: factory.make_name('value'))
-        key = factory.make_name('key')
-        self.assertEqual(value_dict[key], value_dict[key])
-
-    def test_holds_one_value_per_key(self):
-        value_dict = lazydict(lambda key: key)
-        key1 = factory.make_name('key')
-        key2 = factory.make_name('key')
-
-        value1 = value_dict[key1]
-        value2 = value_dict[key2]
-
-        self.assertEqual((key1, key2), (value1, value2))
-        self.assertEqual({key1: key1, key2: key2}, value_dict)
+    def test_finds_all_containing_networks(self):
+        index = NetworkIndex()
+        index.add(IPNetwork("10.0.0.0/8"), "a")
+        index.add(IPNetwork("10.1.0.0/16"), "b")
+        index.add(IPNetwork("10.1.2.0/24"), "c")
+        index.add(IPNetwork("10.1.2.0/24"), "d")
+        index.add(IPNetwork("10.2.0.0/16"), "e")
+        self.assertItemsEqual(
+            ["a", "b", "c", "d"], index.lookup("10.1.2.3"))
+        self.assertItemsEqual(["a", "b"], index.lookup("10.1.3.3"))
+        self.assertEqual([], index.lookup("192.168.0.1"))
+
+    def test_keeps_address_families_apart(self):
+        index = NetworkIndex()
+        index.add(IPNetwork("0.0.0.0/0"), "v4")
+        index.add(IPNetwork("2001:db8::/32"), "v6")
+        self.assertEqual(["v4"], index.lookup("10.0.0.1"))
+        self.assertEqual(["v6"], index.lookup("2001:db8::1"))
+        self.assertEqual([], index.lookup("2001:db9::1"))
+
+
+class TestBucketIPMapping(MAASTestCase):
+    """Tests for `bucket_ip_mapping`."""
+
+    def test_splits_mapping_by_network(self):
+        index = NetworkIndex()
+        index.add(IPNetwork("10.0.0.0/24"), "small")
+        index.add(IPNetwork("10.0.0.0/16"), "big")
+        mapping = {
+            "one.maas": HostnameIPMapping(
+                "abcdef", 30, {"10.0.0.1", "10.0.1.1", "10.1.0.1"}),
+            "two.maas": HostnameIPMapping(None, 60, {"10.0.1.2"}),
+        }
+        self.assertEqual({
+            "small": {
+                "one.maas": HostnameIPMapping("abcdef", 30, {"10.0.0.1"}),
+            },
+            "big": {
+                "one.maas": HostnameIPMapping(
+                    "abcdef", 30, {"10.0.0.1", "10.0.1.1"}),
+                "two.maas": HostnameIPMapping(None, 60, {"10.0.1.2"}),
+            },
+        }, bucket_ip_mapping(mapping, index))
+
+    def test_leaves_mapping_unchanged(self):
+        index = NetworkIndex()
+        index.add(IPNetwork("10.0.0.0/24"), "net")
+        info = HostnameIPMapping("abcdef", 30, {"10.0.0.1", "10.1.0.1"})
+        bucket_ip_mapping({"one.maas": info}, index)
+        self.assertEqual({"10.0.0.1", "10.1.0.1"}, info.ips)
 
 
 class TestGetHostnameMapping(MAASServerTestCase):
@@ -465,6 +493,38 @@ class TestZoneGenerator(MAASServerTestCase):
             zones[1]._mapping)
         self.assertEqual({}, zones[2]._mapping)
 
+    def test_reverse_zones_get_only_their_own_addresses(self):
+        default_domain = Domain.objects.get_default_domain()
+        subnet1 = factory.make_Subnet(cidr="10.0.1.0/24")
+        subnet2 = factory.make_Subnet(cidr="10.0.2.0/24")
+        node = factory.make_Node_with_Interface_on_Subnet(
+            subnet=subnet1, domain=default_domain, interface_count=2)
+        boot_iface = node.get_boot_interface()
+        other_iface = node.interface_set.exclude(id=boot_iface.id).first()
+        ip1 = factory.make_StaticIPAddress(
+            interface=boot_iface, subnet=subnet1)
+        ip2 = factory.make_StaticIPAddress(
+            interface=other_iface, subnet=subnet2)
+        zones = ZoneGenerator(
+            [], [subnet1, subnet2], default_ttl=30,
+            serial=random.randint(0, 65535)).as_list()
+        self.assertThat(
+            zones, MatchesSetwise(
+                reverse_zone(default_domain.name, "10.0.1.0/24"),
+                reverse_zone(default_domain.name, "10.0.2.0/24")))
+        mappings = {
+            str(zone._network): {
+                hostname: info.ips
+                for hostname, info in zone._mapping.items()
+            }
+            for zone in zones
+        }
+        self.assertEqual({
+            "10.0.1.0/24": {node.fqdn: {ip1.ip}},
+            "10.0.2.0/24": {
+                "%s.%s" % (other_iface.name, node.fqdn): {ip2.ip}},
+        }, mappings)
+
     def rfc2317_network(self, network):
         """Returns the network that rfc2317 glue goes in, if any."""
         net = network
@@ -683,7 +743,7 @@ class TestZoneGeneratorTTL(MAASTransactionServerTestCase):
         [boot_ip] = boot_iface.claim_auto_ips()
         dnsrr = factory.make_DNSResource(
             name=node.hostname, domain=domain,
-            address_ttl=random.randint(400, 499))
+            address_ttl=random.randint(400, 499), subnet=subnet)
         ips = {
             ip.ip for ip in dnsrr.ip_addresses.all() if ip is not None}
         ips.add(boot_ip.ip)
@@ -713,7 +773,8 @@ class TestZoneGeneratorTTL(MAASTransactionServerTestCase):
         boot_iface = node.get_boot_interface()
         [boot_ip] = boot_iface.claim_auto_ips()
         dnsrr = factory.make_DNSResource(
-            domain=domain, address_ttl=random.randint(400, 499))
+            domain=domain, address_ttl=random.randint(400, 499),
+            subnet=subnet)
         node_ips = {boot_ip.ip}
         dnsrr_ips = {
             ip.ip for ip in dnsrr.ip_addresses.all() if ip is not None}
@@ -9,6 +9,7 @@ __all__ = [
 
 
 import collections
+from copy import copy
 from itertools import chain
 import socket
 
@@ -39,24 +40,6 @@ from provisioningserver.dns.zoneconfig import (
 )
 
 
-class lazydict(dict):
-    """A `dict` that lazily populates itself.
-
-    Somewhat like a :class:`collections.defaultdict`, but that the factory
-    function is called with the missing key, and the value returned is saved.
-    """
-
-    __slots__ = ("factory", )
-
-    def __init__(self, factory):
-        super(lazydict, self).__init__()
-        self.factory = factory
-
-    def __missing__(self, key):
-        value = self[key] = self.factory(key)
-        return value
-
-
 def sequence(thing):
     """Make a sequence from `thing`.
 
@@ -88,6 +71,57 @@ def get_hostname_dnsdata_mapping(domain):
         domain, with_ids=False)
 
 
+class NetworkIndex:
+    """Find the networks that contain an IP address.
+
+    Networks are kept in a dict per IP version and prefix length, keyed by
+    network address, so a lookup costs one dict probe per distinct prefix
+    length instead of one containment test per network.
+    """
+
+    def __init__(self):
+        self._networks = collections.defaultdict(
+            lambda: collections.defaultdict(dict))
+
+    def add(self, network, value):
+        """Associate `value` with `network`, an `IPNetwork`."""
+        networks = self._networks[network.version][network.prefixlen]
+        networks.setdefault(network.first, []).append(value)
+
+    def lookup(self, ip):
+        """Return the values of all networks that contain `ip`."""
+        ip = IPAddress(ip)
+        bits = 32 if ip.version == 4 else 128
+        values = []
+        for prefixlen, networks in self._networks[ip.version].items():
+            hostbits = bits - prefixlen
+            values.extend(networks.get(
+                int(ip) >> hostbits << hostbits, ()))
+        return values
+
+
+def bucket_ip_mapping(mapping, index):
+    """Split `mapping` by the networks in `index` containing each address.
+
+    :param mapping: A `{hostnames -> HostnameIPMapping}` dict.
+    :param index: A `NetworkIndex`.
+    :return: A dict of `{value -> {hostnames -> HostnameIPMapping}}` for
+        each value in `index`, each holding only the addresses within
+        the network of that value.
+    """
+    buckets = collections.defaultdict(dict)
+    for hostname, info in mapping.items():
+        for ip in info.ips:
+            for value in index.lookup(ip):
+                bucket = buckets[value]
+                entry = bucket.get(hostname)
+                if entry is None:
+                    entry = bucket[hostname] = copy(info)
+                    entry.ips = set()
+                entry.ips.add(ip)
+    return buckets
+
+
 WARNING_MESSAGE = (
     "The DNS server will use the address '%s',  which is inside the "
     "loopback network.  This may not be a problem if you're not using "
@@ -203,13 +237,14 @@ class ZoneGenerator:
 
     @staticmethod
     def _get_mappings():
-        """Return a lazily evaluated mapping dict."""
-        return lazydict(get_hostname_ip_mapping)
+        """Return the hostname mappings of every domain, by domain ID."""
+        return StaticIPAddress.objects.get_hostname_ip_mappings_by_domain()
 
     @staticmethod
     def _get_rrset_mappings():
-        """Return a lazily evaluated mapping dict."""
-        return lazydict(get_hostname_dnsdata_mapping)
+        """Return the RRset mappings of every domain, by domain ID."""
+        return DNSData.objects.get_hostname_dnsdata_mappings_by_domain(
+            with_ids=False)
 
     @staticmethod
     def _gen_forward_zones(
@@ -233,11 +268,11 @@ class ZoneGenerator:
             # discard that part of the return.
             mapping = {
                 separate_fqdn(hostname, domainname=domain.name)[0]: info
-                for hostname, info in mappings[domain].items()
+                for hostname, info in mappings.get(domain.id, {}).items()
             }
             # 2a. Create non-address records.  Specifically ignore any CNAME
             # records that collide with addresses in mapping.
-            other_mapping = rrset_mappings[domain]
+            other_mapping = rrset_mappings[domain.id]
 
             # 2b. Capture NS RRsets for anything that is a child of this domain
             domain.add_delegations(
@@ -300,7 +335,7 @@ class ZoneGenerator:
 
     @staticmethod
     def _gen_reverse_zones(
-            subnets, serial, ns_host_name, mappings, default_ttl):
+            subnets, serial, ns_host_name, mapping, default_ttl):
         """Generator of reverse zones, sorted by network."""
 
         subnets = set(subnets)
@@ -327,10 +362,13 @@ class ZoneGenerator:
                         IPNetwork("%s/124" % network.network).network)
                     rfc2317_glue.setdefault(basenet, set()).add(network)
 
-        # Since get_hostname_ip_mapping(Subnet) ignores Subnet.id, so we can
-        # just do it once and be happy.  LP#1600259
-        if len(subnets):
-            mappings['reverse'] = mappings[Subnet.objects.first()]
+        # Sort the map of all of the nodes, including all DNSResource-
+        # associated addresses, into the subnets containing each address.
+        index = NetworkIndex()
+        for subnet in subnets:
+            if subnet.rdns_mode != RDNS_MODE.DISABLED:
+                index.add(IPNetwork(subnet.cidr), subnet)
+        subnet_mappings = bucket_ip_mapping(mapping, index)
 
         # For each of the zones that we are generating (one or more per
         # subnet), compile the zone from:
@@ -359,12 +397,10 @@ class ZoneGenerator:
                 for ip_range in subnet.get_dynamic_ranges()
             ]
 
-            # 2. Start with the map of all of the nodes, including all
-            # DNSResource-associated addresses.  We will prune this to just
-            # entries for the subnet when we actually generate the zonefile.
-            # If we get here, then we have subnets, so we noticed that above
-            # and created mappings['reverse'].  LP#1600259
-            mapping = mappings['reverse']
+            # 2. The nodes with addresses in this subnet, including all
+            # DNSResource-associated addresses.  This is pruned further to
+            # each zone of the subnet when we generate the zonefile.
+            mapping = subnet_mappings.get(subnet, {})
 
             # Use the default_domain as the name for the NS host in the reverse
             # zones.  If this network is actually a parent rfc2317 glue
@@ -412,17 +448,28 @@ class ZoneGenerator:
         # we get to this point, we really need one.
         assert not (self.serial is None), ("No serial number specified.")
 
-        mappings = self._get_mappings()
         ns_host_name = self.default_domain.name
-        rrset_mappings = self._get_rrset_mappings()
         serial = self.serial
         default_ttl = self.default_ttl
+        # Each of these queries runs once, for all domains or subnets, and
+        # the results are sorted into zones as they are generated.
+        if len(self.domains) > 0:
+            mappings = self._get_mappings()
+            rrset_mappings = self._get_rrset_mappings()
+        else:
+            mappings = rrset_mappings = {}
+        if len(self.subnets) > 0:
+            # get_hostname_ip_mapping(Subnet) ignores Subnet.id, so any
+            # subnet gets the mapping for all of them.  LP#1600259
+            mapping = get_hostname_ip_mapping(self.subnets[0])
+        else:
+            mapping = {}
         return chain(
             self._gen_forward_zones(
                 self.domains, serial, ns_host_name, mappings,
                 rrset_mappings, default_ttl, self.internal_domains),
             self._gen_reverse_zones(
-                self.subnets, serial, ns_host_name, mappings, default_ttl),
+                self.subnets, serial, ns_host_name, mapping, default_ttl),
             )
 
     def as_list(self):
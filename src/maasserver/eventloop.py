@@ -160,6 +160,18 @@ def make_ReverseDNSService(postgresListener):
     return ReverseDNSService(postgresListener)
 
 
+def make_ConfigCacheService(postgresListener):
+    from maasserver.regiondservices.config_cache import ConfigCacheService
+    return ConfigCacheService(reactor, postgresListener)
+
+
+def make_SubnetIndexService(postgresListener):
+    from maasserver.regiondservices.subnet_index import (
+        SubnetIndexService
+    )
+    return SubnetIndexService(reactor, postgresListener)
+
+
 def make_NetworkTimeProtocolService():
     from maasserver.regiondservices import ntp
     return ntp.RegionNetworkTimeProtocolService(reactor)
@@ -321,6 +333,16 @@ class RegionEventLoop:
             "factory": make_ReverseDNSService,
             "requires": ["postgres-listener-master"],
         },
+        "subnet-index": {
+            "only_on_master": False,
+            "factory": make_SubnetIndexService,
+            "requires": ["postgres-listener-worker"],
+        },
+        "config-cache": {
+            "only_on_master": False,
+            "factory": make_ConfigCacheService,
+            "requires": ["postgres-listener-worker"],
+        },
         "rack-controller": {
             "only_on_master": False,
             "factory": make_RackControllerService,
@@ -7,6 +7,7 @@ __all__ = [
     "PodForm",
     ]
 
+from collections import namedtuple
 from functools import partial
 
 import crochet
@@ -25,6 +26,7 @@ from maasserver.clusterrpc.driver_parameters import (
 )
 from maasserver.clusterrpc.pods import (
     compose_machine,
+    decompose_machine,
     discover_pod,
     get_best_discovered_result,
 )
@@ -58,7 +60,10 @@ from maasserver.node_constraint_filter_forms import (
 )
 from maasserver.rpc import getClientFromIdentifiers
 from maasserver.utils.forms import set_form_error
-from maasserver.utils.orm import transactional
+from maasserver.utils.orm import (
+    post_commit,
+    transactional,
+)
 from maasserver.utils.threads import deferToDatabase
 import petname
 from provisioningserver.drivers import SETTING_SCOPE
@@ -76,8 +81,15 @@ from provisioningserver.enum import (
 )
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.network import get_ifname_for_label
-from provisioningserver.utils.twisted import asynchronous
-from twisted.internet.defer import inlineCallbacks
+from provisioningserver.utils.twisted import (
+    asynchronous,
+    FOREVER,
+)
+from twisted.internet.defer import (
+    CancelledError,
+    DeferredList,
+    inlineCallbacks,
+)
 from twisted.python.threadable import isInIOThread
 
 
@@ -723,3 +735,73 @@ class ComposeMachineForPodsForm(forms.Form):
         if len(self.valid_pod_forms) == 0:
             self.add_error(
                 "__all__", "No current pod resources match constraints.")
+
+
+# What is needed to decompose a composed machine once its row is gone.
+ComposedMachine = namedtuple("ComposedMachine", (
+    "machine_id", "client_idents", "pod_type", "context", "pod_id",
+    "pod_name"))
+
+
+def get_composed_machine(machine):
+    """Return a `ComposedMachine` for `machine`.
+
+    Returns `None` if `machine` was not composed in a pod.
+    """
+    bmc = machine.bmc
+    if bmc is None or bmc.bmc_type != BMC_TYPE.POD:
+        return None
+    pod = bmc.as_pod()
+    return ComposedMachine(
+        machine.id, pod.get_client_identifiers(), pod.power_type,
+        machine.power_parameters, pod.id, pod.name)
+
+
+@asynchronous(timeout=FOREVER)
+def decompose_machines(composed):
+    """Decompose the machines in `composed`, a list of `ComposedMachine`.
+
+    `composed` is emptied so that no machine is decomposed twice. Failures
+    are logged, not raised.
+    """
+    ds = []
+    while len(composed) > 0:
+        machine = composed.pop()
+        d = getClientFromIdentifiers(machine.client_idents)
+        d.addCallback(
+            decompose_machine, machine.pod_type, machine.context,
+            pod_id=machine.pod_id, name=machine.pod_name)
+        d.addErrback(
+            log.err, "Failed to decompose machine in pod '%s'." % (
+                machine.pod_name))
+        ds.append(d)
+    return DeferredList(ds)
+
+
+def decompose_machines_on_rollback(composed):
+    """Decompose the machines in `composed` if the transaction rolls back.
+
+    `composed` is a list of `ComposedMachine` that may grow until the
+    transaction ends. Post-commit hooks are cancelled when the transaction
+    is rolled back, including before it is retried, so the machines are
+    decomposed then. Hooks are also cancelled after an earlier hook fails,
+    so machines that are still in the database are left alone.
+    """
+    @transactional
+    def rolled_back(composed):
+        existing = set(Machine.objects.filter(
+            id__in=[machine.machine_id for machine in composed]
+        ).values_list("id", flat=True))
+        return [
+            machine for machine in composed
+            if machine.machine_id not in existing
+        ]
+
+    def decompose(failure):
+        failure.trap(CancelledError)
+        d = deferToDatabase(rolled_back, list(composed))
+        d.addCallback(decompose_machines)
+        d.addErrback(log.err, "Failed to decompose machines.")
+        return d
+
+    post_commit().addErrback(decompose)
@@ -405,6 +405,19 @@ CONFIG_ITEMS = {
                 "IPs or ACL names.")
         }
     },
+    'dns_dynamic_updates': {
+        'default': False,
+        'form': forms.BooleanField,
+        'form_kwargs': {
+            'label': "Publish DNS record changes as dynamic updates",
+            'required': False,
+            'help_text': (
+                "Only used when MAAS is running its own DNS server. If set, "
+                "changes to the addresses of hosts are sent to the DNS server "
+                "as dynamic updates (RFC 2136) rather than by rewriting and "
+                "reloading zone files.")
+        }
+    },
     'ntp_servers': {
         'default': None,
         'form': HostListFormField,
@@ -30,8 +30,11 @@ from maasserver.exceptions import (
 )
 from maasserver.forms import pods as pods_module
 from maasserver.forms.pods import (
+    ComposedMachine,
     ComposeMachineForm,
     ComposeMachineForPodsForm,
+    decompose_machines,
+    decompose_machines_on_rollback,
     get_known_host_interfaces,
     PodForm,
 )
@@ -45,7 +48,10 @@ from maasserver.testing.testcase import (
     MAASServerTestCase,
     MAASTransactionServerTestCase,
 )
-from maasserver.utils.orm import reload_object
+from maasserver.utils.orm import (
+    post_commit_hooks,
+    reload_object,
+)
 from maasserver.utils.threads import deferToDatabase
 from maastesting.matchers import (
     MockCalledOnce,
@@ -1921,3 +1927,48 @@ class TestGetKnownHostInterfaces(MAASServerTestCase):
                 )
             ]
         )
+
+
+class TestDecomposeMachines(MAASTransactionServerTestCase):
+
+    def make_ComposedMachine(self, machine_id=None):
+        if machine_id is None:
+            machine_id = random.randint(1000000, 2000000)
+        return ComposedMachine(
+            machine_id, [], factory.make_name("pod_type"),
+            {factory.make_name("key"): factory.make_name("value")},
+            random.randint(1, 1000), factory.make_name("pod"))
+
+    def test__decomposes_each_machine(self):
+        client = MagicMock()
+        self.patch(
+            pods_module, "getClientFromIdentifiers").return_value = (
+                succeed(client))
+        mock_decompose = self.patch(pods_module, "decompose_machine")
+        mock_decompose.return_value = succeed(None)
+        machines = [self.make_ComposedMachine() for _ in range(2)]
+        composed = list(machines)
+        decompose_machines(composed)
+        self.assertEqual([], composed)
+        self.assertThat(mock_decompose, MockCallsMatch(*(
+            call(
+                client, machine.pod_type, machine.context,
+                pod_id=machine.pod_id, name=machine.pod_name)
+            for machine in reversed(machines)
+        )))
+
+    def test__on_rollback_decomposes_machines_no_longer_in_database(self):
+        mock_decompose = self.patch(pods_module, "decompose_machines")
+        machine = factory.make_Machine()
+        missing = self.make_ComposedMachine()
+        composed = [self.make_ComposedMachine(machine.id), missing]
+        decompose_machines_on_rollback(composed)
+        post_commit_hooks.reset()
+        self.assertThat(mock_decompose, MockCalledOnceWith([missing]))
+
+    def test__on_commit_decomposes_nothing(self):
+        mock_decompose = self.patch(pods_module, "decompose_machines")
+        composed = [self.make_ComposedMachine()]
+        decompose_machines_on_rollback(composed)
+        post_commit_hooks.fire()
+        self.assertThat(mock_decompose, MockNotCalled())
@@ -0,0 +1,84 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Store the content of boot images in files on the region's disk."""
+
+__all__ = [
+    "get_image_store",
+    "ImageFileStore",
+]
+
+from functools import lru_cache
+import os
+from tempfile import NamedTemporaryFile
+
+from maasserver.config import RegionConfiguration
+
+
+class ImageFileStore:
+    """Boot image content kept in files, named by their SHA256.
+
+    This is an alternative to keeping the content in the large objects of
+    `LargeFile`; the `LargeFile` still holds the SHA256 and size. Content is
+    stored once however many resource sets refer to it, and new content is
+    written to a temporary file and renamed into place, so every file in
+    the store is complete.
+    """
+
+    def __init__(self, path):
+        super(ImageFileStore, self).__init__()
+        self.path = path
+
+    def get_path(self, sha256):
+        """Return the path of the file for `sha256`."""
+        return os.path.join(self.path, sha256[:2], sha256)
+
+    def exists(self, sha256):
+        """Return whether the store has the content for `sha256`."""
+        return os.path.isfile(self.get_path(sha256))
+
+    def open(self, sha256):
+        """Open the file for `sha256` for reading."""
+        return open(self.get_path(sha256), "rb")
+
+    def create_temporary(self):
+        """Return a new temporary file to write content into.
+
+        Pass its name to `add` once it has been written and checked, or
+        remove it.
+        """
+        os.makedirs(self.path, exist_ok=True)
+        return NamedTemporaryFile(
+            "wb", dir=self.path, prefix=".incoming-", delete=False)
+
+    def add(self, sha256, filename):
+        """Move the file at `filename` into the store as `sha256`."""
+        path = self.get_path(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.rename(filename, path)
+
+    def remove(self, sha256):
+        """Remove the content for `sha256`, if it's in the store."""
+        try:
+            os.unlink(self.get_path(sha256))
+        except FileNotFoundError:
+            pass
+
+
+@lru_cache(maxsize=1)
+def get_image_store():
+    """Return the `ImageFileStore` for this region.
+
+    The region's configuration is read once per process. Call
+    `get_image_store.cache_clear()` to read it again, as tests that change
+    the configuration must.
+
+    :return: An `ImageFileStore`, or `None` if boot image content is kept in
+        the database.
+    """
+    with RegionConfiguration.open() as config:
+        path = config.image_store_path
+    if path:
+        return ImageFileStore(path)
+    else:
+        return None
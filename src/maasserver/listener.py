@@ -4,16 +4,22 @@
 """Listens for NOTIFY events from the postgres database."""
 
 __all__ = [
+    "PostgresListenerNotifications",
     "PostgresListenerNotifyError",
     "PostgresListenerService",
     ]
 
-from collections import defaultdict
+from collections import (
+    Counter,
+    defaultdict,
+    OrderedDict,
+)
 from contextlib import closing
 from errno import ENOENT
 
 from django.db import connections
 from django.db.utils import load_backend
+from maasserver.prometheus.metrics import PROMETHEUS_METRICS
 from provisioningserver.utils.enum import map_enum
 from provisioningserver.utils.twisted import (
     callOut,
@@ -48,6 +54,21 @@ class ACTIONS:
     DELETE = "delete"
 
 
+# How a pending notification for an object is merged with a new notification
+# for the same object. `None` means that both notifications cancel out.
+COALESCED_ACTIONS = {
+    (ACTIONS.CREATE, ACTIONS.CREATE): ACTIONS.CREATE,
+    (ACTIONS.CREATE, ACTIONS.UPDATE): ACTIONS.CREATE,
+    (ACTIONS.CREATE, ACTIONS.DELETE): None,
+    (ACTIONS.UPDATE, ACTIONS.CREATE): ACTIONS.UPDATE,
+    (ACTIONS.UPDATE, ACTIONS.UPDATE): ACTIONS.UPDATE,
+    (ACTIONS.UPDATE, ACTIONS.DELETE): ACTIONS.DELETE,
+    (ACTIONS.DELETE, ACTIONS.CREATE): ACTIONS.UPDATE,
+    (ACTIONS.DELETE, ACTIONS.UPDATE): ACTIONS.UPDATE,
+    (ACTIONS.DELETE, ACTIONS.DELETE): ACTIONS.DELETE,
+}
+
+
 class PostgresListenerNotifyError(Exception):
     """Error raised when the listener gets a notify message that cannot be
     decoded or is not being handled."""
@@ -61,6 +82,74 @@ class PostgresListenerUnregistrationError(Exception):
     """Error raised when unregistering a handler fails."""
 
 
+class PostgresListenerNotifications:
+    """Notifications waiting to be handled, coalesced per object.
+
+    Notifications are keyed on their channel and payload. A notification for
+    an object that already has one pending is merged into it following
+    `COALESCED_ACTIONS`, so only the net change is handled: repeated updates
+    collapse into one, an update after a create is still a create, and a
+    create followed by a delete cancels out. Notifications are handled in the
+    order their objects were first notified.
+
+    :ivar dropped: A `Counter` of the notifications dropped by coalescing,
+        per channel.
+    """
+
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.dropped = Counter()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def __iter__(self):
+        for (channel, payload), action in self.pending.items():
+            yield self._makeNotification(channel, action, payload)
+
+    def _makeNotification(self, channel, action, payload):
+        if action is None:
+            return channel, payload
+        else:
+            return "%s_%s" % (channel, action), payload
+
+    def _drop(self, channel, count=1):
+        self.dropped[channel] += count
+        PROMETHEUS_METRICS.update(
+            'listener_notifications_dropped', 'inc', value=count,
+            labels={'channel': channel})
+
+    def add(self, notification):
+        """Add the `(channel, payload)` notification."""
+        channel, payload = notification
+        channel, _, action = channel.partition('_')
+        if action not in map_enum(ACTIONS).values():
+            # Not in the form "{channel}_{action}"; this is only ever
+            # de-duplicated and will be reported when handled.
+            channel, action = notification[0], None
+        key = channel, payload
+        if key not in self.pending:
+            self.pending[key] = action
+        elif action is None:
+            self._drop(channel)
+        else:
+            merged = COALESCED_ACTIONS[self.pending[key], action]
+            if merged is None:
+                del self.pending[key]
+                self._drop(channel, 2)
+            else:
+                self.pending[key] = merged
+                self._drop(channel)
+
+    def pop(self):
+        """Remove and return the oldest pending notification."""
+        (channel, payload), action = self.pending.popitem(last=False)
+        return self._makeNotification(channel, action, payload)
+
+    def clear(self):
+        self.pending.clear()
+
+
 @implementer(interfaces.IReadDescriptor)
 class PostgresListenerService(Service, object):
     """Listens for NOTIFY messages from postgres.
@@ -82,7 +171,8 @@ class PostgresListenerService(Service, object):
 
     # Seconds to wait to handle new notifications. When the notifications set
     # is empty it will wait this amount of time to check again for new
-    # notifications.
+    # notifications. This is also the window in which notifications for the
+    # same object are coalesced.
     HANDLE_NOTIFY_DELAY = 0.5
 
     def __init__(self, alias="default"):
@@ -91,7 +181,7 @@ class PostgresListenerService(Service, object):
         self.autoReconnect = False
         self.connection = None
         self.connectionFileno = None
-        self.notifications = set()
+        self.notifications = PostgresListenerNotifications()
         self.notifier = task.LoopingCall(self.handleNotifies)
         self.notifierDone = None
         self.connecting = None
@@ -150,11 +240,11 @@ class PostgresListenerService(Service, object):
             #
             self.loseConnection(Failure(error.ConnectionLost()))
         else:
-            # Add each notify to to the notifications set. This removes
-            # duplicate notifications when one entity in the database is
-            # updated multiple times in a short interval. Accumulating
-            # notifications and allowing the listener to pick them up in
-            # batches is imperfect but good enough, and simple.
+            # Add each notify to to the notifications. This coalesces the
+            # notifications when one entity in the database is changed
+            # multiple times in a short interval. Accumulating notifications
+            # and allowing the listener to pick them up in batches is
+            # imperfect but good enough, and simple.
             notifies = self.connection.connection.notifies
             if len(notifies) != 0:
                 for notify in notifies:
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import django.contrib.postgres.fields
+from django.db import (
+    migrations,
+    models,
+)
+
+# Index the storage of every existing node. This should match the query in
+# the sys_allocation_index_refresh procedure in maasserver.triggers.system,
+# which keeps the index up to date from now on.
+populate_index = """\
+INSERT INTO maasserver_storageallocationindex
+  (node_id, block_device_id, partition_id, size, tags, root, free)
+SELECT
+  bd.node_id, bd.id, NULL, bd.size, COALESCE(bd.tags, '{}'),
+  EXISTS (
+    SELECT 1 FROM maasserver_filesystem AS fs
+    WHERE fs.block_device_id = bd.id
+      AND fs.mount_point = '/' AND NOT fs.acquired)
+  OR EXISTS (
+    SELECT 1 FROM maasserver_partitiontable AS pt
+    JOIN maasserver_partition AS p ON p.partition_table_id = pt.id
+    JOIN maasserver_filesystem AS fs ON fs.partition_id = p.id
+    WHERE pt.block_device_id = bd.id
+      AND fs.mount_point = '/' AND NOT fs.acquired),
+  NOT EXISTS (
+    SELECT 1 FROM maasserver_filesystem AS fs
+    WHERE fs.block_device_id = bd.id)
+  AND NOT EXISTS (
+    SELECT 1 FROM maasserver_partitiontable AS pt
+    WHERE pt.block_device_id = bd.id)
+FROM maasserver_blockdevice AS bd
+UNION ALL
+SELECT
+  bd.node_id, NULL, p.id, p.size, COALESCE(p.tags, '{}'),
+  EXISTS (
+    SELECT 1 FROM maasserver_filesystem AS fs
+    WHERE fs.partition_id = p.id
+      AND fs.mount_point = '/' AND NOT fs.acquired),
+  NOT EXISTS (
+    SELECT 1 FROM maasserver_filesystem AS fs
+    WHERE fs.partition_id = p.id)
+FROM maasserver_partition AS p
+JOIN maasserver_partitiontable AS pt ON pt.id = p.partition_table_id
+JOIN maasserver_blockdevice AS bd ON bd.id = pt.block_device_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maasserver', '0182_node-uuid'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorageAllocationIndex',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('node_id', models.IntegerField(db_index=True, editable=False)),
+                ('block_device_id', models.IntegerField(editable=False, null=True)),
+                ('partition_id', models.IntegerField(editable=False, null=True)),
+                ('size', models.BigIntegerField(editable=False)),
+                ('tags', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), editable=False, size=None)),
+                ('root', models.BooleanField(editable=False)),
+                ('free', models.BooleanField(editable=False)),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='storageallocationindex',
+            index_together=set([('root', 'size'), ('free', 'size')]),
+        ),
+        migrations.RunSQL(populate_index, migrations.RunSQL.noop),
+    ]
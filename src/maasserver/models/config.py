@@ -5,6 +5,7 @@
 
 __all__ = [
     'Config',
+    'config_cache',
     ]
 
 from collections import (
@@ -23,6 +24,10 @@ from django.db.models import (
 from django.db.models.signals import post_save
 from maasserver import DefaultMeta
 from maasserver.fields import JSONObjectField
+from maasserver.utils.cache import (
+    ProcessCache,
+    ProcessCacheUnavailable,
+)
 from provisioningserver.drivers.osystem.ubuntu import UbuntuOS
 from provisioningserver.events import EVENT_TYPES
 
@@ -79,6 +84,7 @@ def get_default_config():
         'upstream_dns': None,
         'dnssec_validation': "auto",
         'dns_trusted_acl': None,
+        'dns_dynamic_updates': False,
         'maas_internal_domain': 'maas-internal',
         # NTP settings
         'ntp_servers': 'ntp.ubuntu.com',
@@ -143,6 +149,49 @@ NetworkDiscoveryConfig = namedtuple(
     'NetworkDiscoveryConfig', ('active', 'passive'))
 
 
+class ConfigCacheUnavailable(ProcessCacheUnavailable):
+    """The config cache cannot answer; the database must be asked instead."""
+
+
+class ConfigCache(ProcessCache):
+    """An in-process copy of all config values, for `ConfigManager`.
+
+    The cache is filled by `ConfigCacheService` in region worker processes,
+    and dropped whenever the database notifies that a config item has
+    changed, or a transaction in this process that changed one commits.
+    Until it has been refilled, and while the current transaction has
+    uncommitted changes to config items, lookups raise
+    `ConfigCacheUnavailable` so that callers can query the database; the
+    current transaction therefore always sees its own changes.
+    """
+
+    unavailable = ConfigCacheUnavailable
+    metrics = "config_cache"
+
+    def build(self):
+        """Return all config values by name."""
+        return dict(Config.objects.values_list("name", "value"))
+
+    def get_configs(self, names, defaults):
+        """Return the values of the config items `names`, as the database
+        would via `ConfigManager.get_configs`.
+
+        :raise ConfigCacheUnavailable: When the cache has not been built, is
+            out of date, or this thread's transaction has changed config
+            items.
+        """
+        values = self.get_data()
+        return {
+            name: copy.deepcopy(
+                values[name] if name in values
+                else DEFAULT_CONFIG.get(name, default))
+            for name, default in zip(names, defaults)
+        }
+
+
+config_cache = ConfigCache()
+
+
 class ConfigManager(Manager):
     """Manager for Config model class.
 
@@ -166,6 +215,10 @@ class ConfigManager(Manager):
         :return: A config value.
         :raises: Config.MultipleObjectsReturned
         """
+        try:
+            return config_cache.get_configs([name], [default])[name]
+        except ConfigCacheUnavailable:
+            pass  # Ask the database.
         try:
             return self.get(name=name).value
         except Config.DoesNotExist:
@@ -190,6 +243,10 @@ class ConfigManager(Manager):
                 None
                 for _ in range(len(names))
             ]
+        try:
+            return config_cache.get_configs(names, defaults)
+        except ConfigCacheUnavailable:
+            pass  # Ask the database.
         configs = {
             config.name: config
             for config in self.filter(name__in=names)
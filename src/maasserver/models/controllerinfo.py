@@ -82,11 +82,21 @@ class ControllerInfoManager(Manager):
     def set_version(self, controller, version):
         self.update_or_create(defaults=dict(version=version), node=controller)
 
-    def set_interface_update_info(self, controller, interfaces, hints):
+    def set_interface_update_info(
+            self, controller, interfaces, hints, fingerprint=''):
         self.update_or_create(
-            defaults=dict(interfaces=interfaces, interface_update_hints=hints),
+            defaults=dict(
+                interfaces=interfaces, interface_update_hints=hints,
+                interfaces_fingerprint=fingerprint),
             node=controller)
 
+    def get_interfaces_fingerprint(self, controller):
+        """Return the fingerprint of the interfaces last recorded for
+        `controller`, or the empty string if there are none."""
+        fingerprint = self.filter(node=controller).values_list(
+            'interfaces_fingerprint', flat=True).first()
+        return '' if fingerprint is None else fingerprint
+
     def get_controller_version_info(self):
         versions = list(self.select_related('node').filter(
             node__node_type__in=(
@@ -206,6 +216,9 @@ class ControllerInfo(CleanSave, TimestampedModel):
     :ivar interfaces: Interfaces JSON last sent by the controller.
     :ivar interface_udpate_hints: Topology hints last sent by the controller
         during a call to update_interfaces().
+    :ivar interfaces_fingerprint: A fingerprint of `interfaces` and of the
+        state of the interfaces they were recorded as in the database; see
+        `Controller.update_interfaces`.
     """
 
     class Meta(DefaultMeta):
@@ -223,5 +236,8 @@ class ControllerInfo(CleanSave, TimestampedModel):
     interface_update_hints = JSONObjectField(
         max_length=(2 ** 15), blank=True, default='')
 
+    interfaces_fingerprint = CharField(
+        max_length=64, blank=True, default='', editable=False)
+
     def __str__(self):
         return "%s (%s)" % (self.__class__.__name__, self.node.hostname)
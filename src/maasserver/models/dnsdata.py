@@ -135,10 +135,10 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
         else:
             raise PermissionDenied()
 
-    def get_hostname_dnsdata_mapping(
-            self, domain, raw_ttl=False, with_ids=True):
-        """Return hostname to RRset mapping for this domain."""
-        cursor = connection.cursor()
+    def _get_hostname_dnsdata_query(self, raw_ttl=False):
+        """Return the SQL for the hostname to RRset mappings, up to the point
+        where `get_hostname_dnsdata_mapping` limits it to a domain.
+        """
         default_ttl = "%d" % Config.objects.get_config('default_dns_ttl')
         if raw_ttl:
             ttl_clause = """dnsdata.ttl"""
@@ -148,7 +148,7 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
                     dnsdata.ttl,
                     domain.ttl,
                     %s)""" % default_ttl
-        sql_query = """
+        return """
             SELECT
                 dnsresource.id,
                 dnsresource.name,
@@ -159,7 +159,9 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
                 dnsdata.id,
                 """ + ttl_clause + """ AS ttl,
                 dnsdata.rrtype,
-                dnsdata.rrdata
+                dnsdata.rrdata,
+                dnsresource.domain_id,
+                node.domain_id
             FROM maasserver_dnsdata AS dnsdata
             JOIN maasserver_dnsresource AS dnsresource ON
                 dnsdata.dnsresource_id = dnsresource.id
@@ -205,14 +207,21 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
                     )
                 )
             WHERE
+                /* If there is a CNAME and a node, then the node wins, and we
+                 * drop the CNAME until the node no longer has the same name.
+                 */
+                (dnsdata.rrtype != 'CNAME' OR node.fqdn IS NULL) AND
+            """
+
+    def get_hostname_dnsdata_mapping(
+            self, domain, raw_ttl=False, with_ids=True):
+        """Return hostname to RRset mapping for this domain."""
+        cursor = connection.cursor()
+        sql_query = self._get_hostname_dnsdata_query(raw_ttl) + """
                 /* The entries must be in this domain (though node.domain_id
                  * may be out-of-domain and that's OK.
-                 * Additionally, if there is a CNAME and a node, then the node
-                 * wins, and we drop the CNAME until the node no longer has the
-                 * same name.
                  */
-                (dnsresource.domain_id = %s OR node.fqdn IS NOT NULL) AND
-                (dnsdata.rrtype != 'CNAME' OR node.fqdn IS NULL)
+                (dnsresource.domain_id = %s OR node.fqdn IS NOT NULL)
             ORDER BY
                 dnsresource.name,
                 dnsdata.rrtype,
@@ -223,8 +232,8 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
         # not spill CNAME and other data.
         mapping = defaultdict(HostnameRRsetMapping)
         cursor.execute(sql_query, (domain.id,))
-        for (dnsresource_id, name, d_name, system_id, node_type,
-             user_id, dnsdata_id, ttl, rrtype, rrdata) in cursor.fetchall():
+        for row in cursor:
+            name, d_name = row[1], row[2]
             if name == '@' and d_name != domain.name:
                 name, d_name = d_name.split('.', 1)
                 # Since we don't allow more than one label in dnsresource
@@ -232,18 +241,57 @@ class DNSDataManager(Manager, DNSDataQueriesMixin):
                 assert d_name == domain.name, (
                     "Invalid domain; expected '%s' == '%s'" % (
                         d_name, domain.name))
-            entry = mapping[name]
-            entry.node_type = node_type
-            entry.system_id = system_id
-            entry.user_id = user_id
-            if with_ids:
-                entry.dnsresource_id = dnsresource_id
-                rrtuple = (ttl, rrtype, rrdata, dnsdata_id)
-            else:
-                rrtuple = (ttl, rrtype, rrdata)
-            entry.rrset.add(rrtuple)
+            add_dnsdata_to_mapping(mapping[name], row, with_ids)
         return mapping
 
+    def get_hostname_dnsdata_mappings_by_domain(
+            self, raw_ttl=False, with_ids=True):
+        """Return hostname to RRset mappings for all domains.
+
+        This runs a single query, sorting the records into domains as they
+        are streamed from the database. Records at the top of a domain are
+        also included in the parent domain of a node with that name, as with
+        `get_hostname_dnsdata_mapping`.
+
+        :return: A dict of `{domain_id -> {hostname ->
+            HostnameRRsetMapping}}`.
+        """
+        cursor = connection.cursor()
+        sql_query = self._get_hostname_dnsdata_query(raw_ttl) + """
+                TRUE
+            ORDER BY
+                dnsresource.name,
+                dnsdata.rrtype,
+                dnsdata.rrdata
+            """
+        mappings = defaultdict(lambda: defaultdict(HostnameRRsetMapping))
+        cursor.execute(sql_query)
+        for row in cursor:
+            name, d_name, domain_id, node_domain_id = (
+                row[1], row[2], row[10], row[11])
+            add_dnsdata_to_mapping(mappings[domain_id][name], row, with_ids)
+            if name == '@' and node_domain_id is not None:
+                # The node at the top of this domain lives in the parent.
+                name, _ = d_name.split('.', 1)
+                add_dnsdata_to_mapping(
+                    mappings[node_domain_id][name], row, with_ids)
+        return mappings
+
+
+def add_dnsdata_to_mapping(entry, row, with_ids=True):
+    """Add a row from the hostname to RRset mapping query to `entry`."""
+    (dnsresource_id, _, _, system_id, node_type, user_id, dnsdata_id,
+     ttl, rrtype, rrdata) = row[:10]
+    entry.node_type = node_type
+    entry.system_id = system_id
+    entry.user_id = user_id
+    if with_ids:
+        entry.dnsresource_id = dnsresource_id
+        rrtuple = (ttl, rrtype, rrdata, dnsdata_id)
+    else:
+        rrtuple = (ttl, rrtype, rrdata)
+    entry.rrset.add(rrtuple)
+
 
 class DNSData(CleanSave, TimestampedModel):
     """A `DNSData`.
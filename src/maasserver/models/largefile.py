@@ -1,4 +1,4 @@
-# Copyright 2014-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2014-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Large file storage."""
@@ -19,6 +19,7 @@ from maasserver.fields import (
     LargeObjectField,
     LargeObjectFile,
 )
+from maasserver.imagestore import get_image_store
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.timestampedmodel import TimestampedModel
 from maasserver.utils.orm import (
@@ -80,6 +81,9 @@ class FileStorageManager(Manager):
 class LargeFile(CleanSave, TimestampedModel):
     """Files that are stored in the large object storage.
 
+    The content of boot images is kept in the region's `ImageFileStore`
+    instead when one is configured; see `get_image_store`.
+
     Only unique files are stored in the database, as only one sha256 value
     can exist per file. This provides data deduplication on the file level.
 
@@ -135,8 +139,13 @@ class LargeFile(CleanSave, TimestampedModel):
         if not self.complete:
             return False
         sha256 = hashlib.sha256()
-        with self.content.open('rb') as stream:
-            for data in stream:
+        image_store = get_image_store()
+        if image_store is not None and image_store.exists(self.sha256):
+            stream = image_store.open(self.sha256)
+        else:
+            stream = self.content.open('rb')
+        with stream:
+            for data in iter(lambda: stream.read(1 << 16), b''):
                 sha256.update(data)
         hexdigest = sha256.hexdigest()
         return hexdigest == self.sha256
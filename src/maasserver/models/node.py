@@ -19,7 +19,10 @@ from collections import (
 )
 from datetime import timedelta
 from functools import partial
-from itertools import count
+from itertools import (
+    count,
+    islice,
+)
 from operator import attrgetter
 import random
 import re
@@ -227,6 +230,7 @@ from provisioningserver.utils.fs import NamedLock
 from provisioningserver.utils.ipaddr import get_mac_addresses
 from provisioningserver.utils.network import (
     annotate_with_default_monitored_interfaces,
+    get_interfaces_fingerprint,
 )
 from provisioningserver.utils.twisted import (
     asynchronous,
@@ -636,6 +640,42 @@ class MachineManager(BaseNodeManager):
         available_machines = self.get_nodes(for_user, NodePermission.edit)
         return available_machines.filter(status=NODE_STATUS.READY)
 
+    def claim_for_acquisition(self, machines, count=1, batch_size=20):
+        """Lock up to `count` of `machines` for acquisition.
+
+        Candidates are locked using ``SELECT ... FOR UPDATE SKIP LOCKED``, so
+        a machine that is being acquired in a concurrent transaction is
+        passed over in favour of the next candidate rather than waited for.
+        Machines that are no longer ready are also passed over. The locks are
+        held until the current transaction ends.
+
+        :param machines: Candidate machines, in order of preference.
+        :param count: The number of machines wanted.
+        :param batch_size: The number of candidates to try to lock at once.
+        :return: A list of at most `count` machines, in order of preference.
+        """
+        if isinstance(machines, QuerySet):
+            machines = machines.iterator()
+        candidates = iter(machines)
+        claimed = []
+        while len(claimed) < count:
+            batch = list(islice(candidates, batch_size))
+            if len(batch) == 0:
+                break
+            ids = [machine.id for machine in batch]
+            with connection.cursor() as cursor:
+                cursor.execute("""\
+                    SELECT id FROM maasserver_node
+                    WHERE id = ANY(%s) AND status = %s
+                    ORDER BY array_position(%s, id)
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                    """, [ids, NODE_STATUS.READY, ids, count - len(claimed)])
+                locked = {row[0] for row in cursor.fetchall()}
+            claimed.extend(
+                machine for machine in batch if machine.id in locked)
+        return claimed
+
 
 class DeviceManager(BaseNodeManager):
     """Devices are all the non-deployable nodes."""
@@ -5135,12 +5175,16 @@ class Controller(Node):
 
     @synchronous
     @with_connection
-    @synchronised(locks.startup)
-    @transactional
     def update_interfaces(
-            self, interfaces, topology_hints=None, create_fabrics=True):
+            self, interfaces, topology_hints=None, create_fabrics=True,
+            fingerprint=None):
         """Update the interfaces attached to the controller.
 
+        When creating fabrics, nothing is done, and no lock is taken, when
+        the interfaces are the same as those last recorded for this
+        controller. Otherwise only the interfaces that have changed since
+        then, and their children, are updated.
+
         :param interfaces: Interfaces dictionary that was parsed from
             /etc/network/interfaces on the controller.
         :param topology_hints: List of dictionaries representing hints
@@ -5148,8 +5192,54 @@ class Controller(Node):
         :param create_fabrics: If True, creates fabrics associated with each
             VLAN. Otherwise, creates the interfaces but does not create any
             links or VLANs.
+        :param fingerprint: The fingerprint of `interfaces`, as calculated by
+            `get_interfaces_fingerprint`, if the controller sent one.
         """
+        if fingerprint is None:
+            fingerprint = get_interfaces_fingerprint(interfaces)
+        if create_fabrics and self._interfaces_unchanged(fingerprint):
+            return
+        self._update_interfaces(
+            interfaces, topology_hints, create_fabrics, fingerprint)
+
+    def _get_interfaces_state(self):
+        """Return the state of this controller's interfaces in the database.
+
+        This covers what updating the interfaces reconciles: each interface,
+        its VLAN, and its IP addresses and their subnets.
+        """
+        return list(self.interface_set.order_by(
+            'name', 'ip_addresses__id').values_list(
+                'name', 'type', 'enabled', 'vlan_id',
+                'ip_addresses__alloc_type', 'ip_addresses__ip',
+                'ip_addresses__subnet_id', 'ip_addresses__subnet__vlan_id'))
+
+    def _get_recorded_fingerprint(self, fingerprint, state=None):
+        """Combine `fingerprint` with the state of this controller's
+        interfaces in the database, so that interfaces, links, subnets or
+        VLANs changed by other means since they were recorded are noticed
+        and reconciled again."""
+        if state is None:
+            state = self._get_interfaces_state()
+        return get_interfaces_fingerprint(
+            {"interfaces": fingerprint, "state": state})
+
+    @transactional
+    def _interfaces_unchanged(self, fingerprint):
+        """Are the interfaces with `fingerprint` those last recorded?"""
+        # Avoid circular imports.
+        from maasserver.models import ControllerInfo
+        recorded = ControllerInfo.objects.get_interfaces_fingerprint(self)
+        return (
+            recorded != '' and
+            recorded == self._get_recorded_fingerprint(fingerprint))
+
+    @synchronised(locks.startup)
+    @transactional
+    def _update_interfaces(
+            self, interfaces, topology_hints, create_fabrics, fingerprint):
         # Avoid circular imports
+        from maasserver.models import ControllerInfo
         from metadataserver.builtin_scripts.hooks import parse_lshw_nic_info
 
         # Get all of the current interfaces on this controller.
@@ -5158,6 +5248,39 @@ class Controller(Node):
             for interface in self.interface_set.all().order_by('id')
         }
 
+        # Interfaces that are defined exactly as when they were last recorded
+        # need not be updated, as long as they still exist. Everything else,
+        # including the children of anything that changed, is updated.
+        # If the database has changed since then, everything is updated.
+        recorded, recorded_fingerprint = ControllerInfo.objects.filter(
+            node=self).values_list(
+                'interfaces', 'interfaces_fingerprint').first() or (None, '')
+        if not isinstance(recorded, dict) or not create_fabrics:
+            recorded = {}
+        elif recorded_fingerprint != self._get_recorded_fingerprint(
+                get_interfaces_fingerprint(recorded)):
+            recorded = {}
+        current_ids_by_name = {
+            interface.name: interface.id
+            for interface in current_interfaces.values()
+        }
+        changed = {
+            name
+            for name, settings in interfaces.items()
+            if name not in current_ids_by_name or
+            recorded.get(name) != settings
+        }
+        while True:
+            children = {
+                name
+                for name, settings in interfaces.items()
+                if name not in changed and
+                not changed.isdisjoint(settings["parents"])
+            }
+            if len(children) == 0:
+                break
+            changed |= children
+
         # Update the interfaces in dependency order. This make sure that the
         # parent is created or updated before the child. The order inside
         # of the sorttop result is ordered so that the modification locks that
@@ -5179,6 +5302,10 @@ class Controller(Node):
         discovery_mode = Config.objects.get_network_discovery_config()
         extended_nic_info = parse_lshw_nic_info(self)
         for name in flatten(process_order):
+            if name not in changed:
+                # Unchanged; keep it as it is.
+                current_interfaces.pop(current_ids_by_name[name], None)
+                continue
             settings = interfaces[name]
             # Note: the interface that comes back from this call may be None,
             # if we decided not to model an interface based on what the rack
@@ -5199,7 +5326,10 @@ class Controller(Node):
 
         if not create_fabrics:
             # This could be an existing rack controller re-registering,
-            # so don't delete interfaces during this phase.
+            # so don't delete interfaces during this phase. Forget what was
+            # recorded so that the next update applies everything.
+            ControllerInfo.objects.set_interface_update_info(
+                self, {}, topology_hints)
             return
 
         # Remove all the interfaces that no longer exist. We do this in reverse
@@ -5222,6 +5352,17 @@ class Controller(Node):
                 self.boot_interface = None
             current_interfaces[delete_id].delete()
         self.save()
+        # Remember what was recorded, to compare the next update against.
+        # Only when every interface was modelled can an identical update be
+        # skipped; otherwise the next update tries again.
+        state = self._get_interfaces_state()
+        names = {name for name, *_ in state}
+        if names.issuperset(interfaces):
+            fingerprint = self._get_recorded_fingerprint(fingerprint, state)
+        else:
+            fingerprint = ''
+        ControllerInfo.objects.set_interface_update_info(
+            self, interfaces, topology_hints, fingerprint)
 
     @transactional
     def _get_token_for_controller(self):
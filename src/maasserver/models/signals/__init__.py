@@ -6,9 +6,11 @@
 __all__ = [
     "blockdevices",
     "bmc",
+    "bootconfig",
     "bootresourcefiles",
     "bootsources",
     "config",
+    "configcache",
     "controllerinfo",
     "dhcpsnippet",
     "events",
@@ -21,14 +23,17 @@ __all__ = [
     "power",
     "services",
     "staticipaddress",
+    "subnets",
 ]
 
 from maasserver.models.signals import (
     blockdevices,
     bmc,
+    bootconfig,
     bootresourcefiles,
     bootsources,
     config,
+    configcache,
     controllerinfo,
     dhcpsnippet,
     events,
@@ -41,4 +46,5 @@ from maasserver.models.signals import (
     power,
     services,
     staticipaddress,
+    subnets,
 )
@@ -0,0 +1,156 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Invalidate rack controllers' cached boot configurations on changes."""
+
+__all__ = [
+    "signals",
+]
+
+from django.db.models.signals import m2m_changed
+from maasserver.clusterrpc.boot_config import invalidate_boot_configs
+from maasserver.models import (
+    Interface,
+    Machine,
+    Node,
+    PhysicalInterface,
+    Tag,
+    UnknownInterface,
+)
+from maasserver.utils.orm import post_commit_do
+from maasserver.utils.signals import SignalsManager
+
+
+signals = SignalsManager()
+
+# Node fields that feed into the boot configuration of a machine.
+NODE_FIELDS = [
+    "status",
+    "netboot",
+    "osystem",
+    "distro_series",
+    "architecture",
+    "min_hwe_kernel",
+    "hwe_kernel",
+    "hostname",
+    "domain_id",
+    "hardware_uuid",
+    "boot_interface_id",
+]
+
+# Configuration items that feed into the boot configuration of every machine.
+CONFIG_NAMES = [
+    "commissioning_osystem",
+    "commissioning_distro_series",
+    "enable_third_party_drivers",
+    "default_min_hwe_kernel",
+    "default_osystem",
+    "default_distro_series",
+    "kernel_opts",
+    "use_rack_proxy",
+    "maas_internal_domain",
+    "remote_syslog",
+    "maas_syslog_port",
+]
+
+
+def invalidate_boot_configs_for_node(node, old_values, deleted=False):
+    """Invalidate the boot configuration of `node` once committed."""
+    identifiers = {
+        str(mac)
+        for mac in node.interface_set.values_list("mac_address", flat=True)
+        if mac
+    }
+    old_hardware_uuid = old_values[NODE_FIELDS.index("hardware_uuid")]
+    for hardware_uuid in (old_hardware_uuid, node.hardware_uuid):
+        if hardware_uuid:
+            identifiers.add(hardware_uuid)
+    if len(identifiers) > 0:
+        post_commit_do(invalidate_boot_configs, identifiers)
+
+
+for klass in (Node, Machine):
+    signals.watch_fields(
+        invalidate_boot_configs_for_node, klass, NODE_FIELDS, delete=True)
+
+
+def invalidate_boot_configs_for_interface(
+        interface, old_values, deleted=False):
+    """Invalidate the boot configuration for the MAC of `interface`.
+
+    This lets a machine that was unknown when it last booted be recognised.
+    """
+    identifiers = {
+        str(mac)
+        for mac in (old_values[0], interface.mac_address)
+        if mac
+    }
+    if len(identifiers) > 0:
+        post_commit_do(invalidate_boot_configs, identifiers)
+
+
+for klass in (Interface, PhysicalInterface, UnknownInterface):
+    signals.watch_fields(
+        invalidate_boot_configs_for_interface, klass,
+        ["mac_address", "node_id"], delete=True)
+
+
+def invalidate_all_boot_configs(*args, **kwargs):
+    """Invalidate every boot configuration once committed."""
+    post_commit_do(invalidate_boot_configs)
+
+
+signals.watch_fields(invalidate_all_boot_configs, Tag, ["kernel_opts"])
+for name in CONFIG_NAMES:
+    signals.watch_config(invalidate_all_boot_configs, name)
+
+
+def invalidate_boot_configs_for_nodes(node_ids):
+    """Invalidate the boot configuration of each node once committed."""
+    macs = Interface.objects.filter(node_id__in=node_ids).values_list(
+        "mac_address", flat=True)
+    hardware_uuids = Node.objects.filter(id__in=node_ids).values_list(
+        "hardware_uuid", flat=True)
+    identifiers = {str(mac) for mac in macs if mac}
+    identifiers.update(
+        hardware_uuid for hardware_uuid in hardware_uuids if hardware_uuid)
+    if len(identifiers) > 0:
+        post_commit_do(invalidate_boot_configs, identifiers)
+
+
+def has_kernel_opts(tags):
+    """Do any of `tags` set kernel options?"""
+    return tags.filter(kernel_opts__isnull=False).exclude(
+        kernel_opts="").exists()
+
+
+def invalidate_boot_configs_for_tagged_nodes(
+        sender, instance, action, reverse, model, pk_set, **kwargs):
+    """Invalidate the boot configuration of nodes whose tags changed.
+
+    Only tags that set kernel options change the boot configuration.
+    """
+    if action in ("post_add", "post_remove"):
+        if reverse:
+            # Nodes were added to or removed from the tag `instance`.
+            if has_kernel_opts(Tag.objects.filter(id=instance.id)):
+                invalidate_boot_configs_for_nodes(pk_set)
+        elif has_kernel_opts(Tag.objects.filter(id__in=pk_set)):
+            # Tags were added to or removed from the node `instance`.
+            invalidate_boot_configs_for_nodes([instance.id])
+    elif action == "pre_clear":
+        # The nodes or tags are not known after they have been cleared.
+        if reverse:
+            if has_kernel_opts(Tag.objects.filter(id=instance.id)):
+                invalidate_boot_configs_for_nodes(
+                    list(instance.node_set.values_list("id", flat=True)))
+        elif has_kernel_opts(instance.tags.all()):
+            invalidate_boot_configs_for_nodes([instance.id])
+
+
+signals.watch(
+    m2m_changed, invalidate_boot_configs_for_tagged_nodes, Node.tags.through)
+
+
+# Enable all signals by default.
+signals.enable()
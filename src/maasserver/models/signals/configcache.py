@@ -0,0 +1,22 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Keep the in-process config cache away from uncommitted changes."""
+
+__all__ = [
+    "signals",
+]
+
+from maasserver.models import Config
+from maasserver.models.config import config_cache
+from maasserver.utils.signals import SignalsManager
+
+
+signals = SignalsManager()
+
+
+signals.watch_cache(config_cache, Config)
+
+
+# Enable all signals by default.
+signals.enable()
@@ -1,4 +1,4 @@
-# Copyright 2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2016-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Respond to large file changes."""
@@ -8,6 +8,7 @@ __all__ = [
 ]
 
 from django.db.models.signals import post_delete
+from maasserver.imagestore import get_image_store
 from maasserver.models.largefile import (
     delete_large_object_content_later,
     LargeFile,
@@ -29,7 +30,16 @@ def delete_large_object(sender, instance, **kwargs):
         post_commit_do(delete_large_object_content_later, instance.content)
 
 
+def delete_image_file(sender, instance, **kwargs):
+    """Delete the content from the image store when the `LargeFile` is
+    deleted, if the region keeps boot image content in one."""
+    image_store = get_image_store()
+    if image_store is not None:
+        post_commit_do(image_store.remove, instance.sha256)
+
+
 signals.watch(post_delete, delete_large_object, LargeFile)
+signals.watch(post_delete, delete_image_file, LargeFile)
 
 
 # Enable all signals by default.
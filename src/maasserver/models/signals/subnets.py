@@ -0,0 +1,26 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Keep the in-process subnet index away from uncommitted changes."""
+
+__all__ = [
+    "signals",
+]
+
+from maasserver.models import (
+    Subnet,
+    VLAN,
+)
+from maasserver.models.subnet import subnet_index
+from maasserver.utils.signals import SignalsManager
+
+
+signals = SignalsManager()
+
+
+signals.watch_cache(subnet_index, Subnet)
+signals.watch_cache(subnet_index, VLAN, ["dhcp_on"])
+
+
+# Enable all signals by default.
+signals.enable()
@@ -0,0 +1,122 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for invalidating rack controllers' cached boot configurations."""
+
+__all__ = []
+
+from maasserver.models import Config
+from maasserver.models.signals import bootconfig
+from maasserver.node_status import NODE_STATUS
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import post_commit_hooks
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockCalledWith,
+    MockNotCalled,
+)
+
+
+class TestInvalidateBootConfigsSignals(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestInvalidateBootConfigsSignals, self).setUp()
+        # These signals are disabled by default in tests.
+        bootconfig.signals.enable()
+        self.addCleanup(bootconfig.signals.disable)
+        self.invalidate = self.patch_autospec(
+            bootconfig, "invalidate_boot_configs")
+
+    def test_changing_status_invalidates_node_after_commit(self):
+        machine = factory.make_Machine_with_Interface_on_Subnet(
+            status=NODE_STATUS.READY)
+        machine.hardware_uuid = factory.make_UUID()
+        machine.save()
+        post_commit_hooks.reset()
+        interface = machine.get_boot_interface()
+        machine.status = NODE_STATUS.COMMISSIONING
+
+        with post_commit_hooks:
+            machine.save()
+            self.expectThat(self.invalidate, MockNotCalled())
+
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith({
+            str(interface.mac_address), machine.hardware_uuid}))
+
+    def test_unrelated_change_does_not_invalidate(self):
+        machine = factory.make_Machine()
+        post_commit_hooks.reset()
+        machine.cpu_count += 1
+        machine.save()
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockNotCalled())
+
+    def test_creating_interface_invalidates_mac(self):
+        machine = factory.make_Machine()
+        post_commit_hooks.reset()
+        interface = factory.make_Interface(node=machine)
+        post_commit_hooks.fire()
+        self.assertThat(
+            self.invalidate, MockCalledWith({str(interface.mac_address)}))
+
+    def test_changing_tag_kernel_opts_invalidates_everything(self):
+        tag = factory.make_Tag()
+        post_commit_hooks.reset()
+        tag.kernel_opts = factory.make_name("kernel_opts")
+        tag.save()
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith())
+
+    def test_changing_kernel_opts_config_invalidates_everything(self):
+        post_commit_hooks.reset()
+        Config.objects.set_config(
+            "kernel_opts", factory.make_name("kernel_opts"))
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith())
+
+    def make_tagged_machine(self, kernel_opts):
+        machine = factory.make_Machine_with_Interface_on_Subnet(
+            hardware_uuid=factory.make_UUID())
+        tag = factory.make_Tag(
+            definition='', kernel_opts=kernel_opts, populate=False)
+        identifiers = {
+            str(machine.get_boot_interface().mac_address),
+            machine.hardware_uuid,
+        }
+        return machine, tag, identifiers
+
+    def test_tagging_node_with_kernel_opts_invalidates_node(self):
+        machine, tag, identifiers = self.make_tagged_machine(
+            factory.make_name("kernel_opts"))
+        post_commit_hooks.reset()
+        machine.tags.add(tag)
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith(identifiers))
+
+    def test_untagging_node_from_tag_invalidates_node(self):
+        machine, tag, identifiers = self.make_tagged_machine(
+            factory.make_name("kernel_opts"))
+        machine.tags.add(tag)
+        post_commit_hooks.reset()
+        tag.node_set.remove(machine)
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith(identifiers))
+
+    def test_clearing_node_tags_invalidates_node(self):
+        machine, tag, identifiers = self.make_tagged_machine(
+            factory.make_name("kernel_opts"))
+        machine.tags.add(tag)
+        post_commit_hooks.reset()
+        machine.tags.clear()
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockCalledOnceWith(identifiers))
+
+    def test_tagging_node_without_kernel_opts_does_not_invalidate(self):
+        machine, tag, _ = self.make_tagged_machine("")
+        post_commit_hooks.reset()
+        machine.tags.add(tag)
+        tag.node_set.remove(machine)
+        post_commit_hooks.fire()
+        self.assertThat(self.invalidate, MockNotCalled())
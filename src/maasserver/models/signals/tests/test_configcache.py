@@ -0,0 +1,47 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for noting config changes for the config cache."""
+
+__all__ = []
+
+from maasserver.models import Config
+from maasserver.models.signals import configcache
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import post_commit_hooks
+from maastesting.matchers import MockCalledOnceWith
+
+
+class TestConfigCacheSignals(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestConfigCacheSignals, self).setUp()
+        # These signals are disabled by default in tests.
+        configcache.signals.enable()
+        self.addCleanup(configcache.signals.disable)
+        self.changed = self.patch(configcache.config_cache, "changed")
+
+    def test_setting_config_notes_change(self):
+        Config.objects.set_config("maas_name", "foo")
+        self.assertThat(self.changed, MockCalledOnceWith())
+
+    def test_deleting_config_notes_change(self):
+        Config.objects.set_config("maas_name", "foo")
+        self.changed.reset_mock()
+        Config.objects.filter(name="maas_name").get().delete()
+        self.assertThat(self.changed, MockCalledOnceWith())
+
+
+class TestConfigCacheSignalsTransactions(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestConfigCacheSignalsTransactions, self).setUp()
+        # These signals are disabled by default in tests.
+        configcache.signals.enable()
+        self.addCleanup(configcache.signals.disable)
+
+    def test_changes_are_noted_until_the_transaction_ends(self):
+        Config.objects.set_config("maas_name", "foo")
+        self.assertTrue(configcache.config_cache._has_local_changes())
+        post_commit_hooks.reset()
+        self.assertFalse(configcache.config_cache._has_local_changes())
@@ -0,0 +1,46 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Test the behaviour of largefile signals."""
+
+__all__ = []
+
+from maasserver.models import signals
+from maasserver.testing.config import RegionConfigurationFixture
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maastesting.matchers import (
+    MockCalledWith,
+    MockNotCalled,
+)
+
+
+class TestLargeFileSignals(MAASServerTestCase):
+    """Tests for the `LargeFile` model's signals."""
+
+    def test_deleting_removes_content_from_image_store(self):
+        image_store_path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture(
+            image_store_path=image_store_path))
+        post_commit_do = self.patch(signals.largefiles, "post_commit_do")
+        largefile = factory.make_LargeFile()
+        largefile.delete()
+        remove, sha256 = post_commit_do.call_args[0]
+        self.assertEqual(largefile.sha256, sha256)
+        self.assertEqual("remove", remove.__name__)
+        self.assertEqual(image_store_path, remove.__self__.path)
+
+    def test_deleting_without_image_store_only_removes_large_object(self):
+        self.useFixture(RegionConfigurationFixture(image_store_path=""))
+        post_commit_do = self.patch(signals.largefiles, "post_commit_do")
+        largefile = factory.make_LargeFile()
+        largefile.delete()
+        self.assertThat(post_commit_do, MockCalledWith(
+            signals.largefiles.delete_large_object_content_later,
+            largefile.content))
+        self.assertEqual(1, post_commit_do.call_count)
+
+    def test_creating_does_nothing(self):
+        post_commit_do = self.patch(signals.largefiles, "post_commit_do")
+        factory.make_LargeFile()
+        self.assertThat(post_commit_do, MockNotCalled())
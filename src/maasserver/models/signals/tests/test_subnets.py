@@ -0,0 +1,67 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for noting subnet changes for the subnet index."""
+
+__all__ = []
+
+from maasserver.models.signals import subnets
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import post_commit_hooks
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+
+
+class TestSubnetIndexSignals(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestSubnetIndexSignals, self).setUp()
+        # These signals are disabled by default in tests.
+        subnets.signals.enable()
+        self.addCleanup(subnets.signals.disable)
+        self.changed = self.patch(subnets.subnet_index, "changed")
+
+    def test_saving_subnet_notes_change(self):
+        subnet = factory.make_Subnet()
+        self.changed.reset_mock()
+        subnet.description = factory.make_string()
+        subnet.save()
+        self.assertThat(self.changed, MockCalledOnceWith())
+
+    def test_deleting_subnet_notes_change(self):
+        subnet = factory.make_Subnet()
+        self.changed.reset_mock()
+        subnet.delete()
+        self.assertThat(self.changed, MockCalledOnceWith())
+
+    def test_changing_vlan_dhcp_notes_change(self):
+        vlan = factory.make_VLAN()
+        self.changed.reset_mock()
+        vlan.dhcp_on = True
+        vlan.save()
+        self.assertThat(self.changed, MockCalledOnceWith())
+
+    def test_other_vlan_changes_are_ignored(self):
+        vlan = factory.make_VLAN()
+        self.changed.reset_mock()
+        vlan.name = factory.make_name("vlan")
+        vlan.save()
+        self.assertThat(self.changed, MockNotCalled())
+
+
+class TestSubnetIndexSignalsTransactions(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestSubnetIndexSignalsTransactions, self).setUp()
+        # These signals are disabled by default in tests.
+        subnets.signals.enable()
+        self.addCleanup(subnets.signals.disable)
+
+    def test_changes_are_noted_until_the_transaction_ends(self):
+        factory.make_Subnet()
+        self.assertTrue(subnets.subnet_index._has_local_changes())
+        post_commit_hooks.reset()
+        self.assertFalse(subnets.subnet_index._has_local_changes())
@@ -71,17 +71,25 @@ _mapping_base_fields = (
 
 _special_mapping_result = _mapping_base_fields + (
     'dnsresource_id',
+    'dnsresource_domain_id',
+    'dnsresource_domain2_id',
+    'node_domain_id',
+    'node_domain2_id',
 )
 
 _mapping_query_result = _mapping_base_fields + (
     'is_boot',
     'preference',
     'family',
+    'domain_id',
+    'domain2_id',
 )
 
 _interface_mapping_result = _mapping_base_fields + (
     'iface_name',
     'assigned',
+    'domain_id',
+    'domain2_id',
 )
 
 SpecialMappingQueryResult = namedtuple(
@@ -116,6 +124,85 @@ class HostnameIPMapping:
         return self.__dict__ == other.__dict__
 
 
+class HostnameIPMappingBuilder:
+    """Build a mapping `{hostnames -> HostnameIPMapping}` from query results.
+
+    See `StaticIPAddressManager.get_hostname_ip_mapping`.
+    """
+
+    def __init__(self, mapping, default_domain):
+        self.mapping = mapping
+        self.default_domain = default_domain
+        self.iface_is_boot = None
+        self.assigned_ips = defaultdict(bool)
+
+    def add_special_result(self, result):
+        """Add a `SpecialMappingQueryResult` to the mapping."""
+        if result.fqdn is None or result.fqdn == '':
+            fqdn = "%s.%s" % (
+                get_ip_based_hostname(result.ip), self.default_domain.name)
+        else:
+            fqdn = result.fqdn
+        # It is possible that there are both Node and DNSResource entries
+        # for this fqdn.  If we have any system_id, preserve it.  Ditto for
+        # TTL.  It is left as an exercise for the admin to make sure that
+        # the any non-default TTL applied to the Node and DNSResource are
+        # equal.
+        entry = self.mapping[fqdn]
+        if result.system_id is not None:
+            entry.node_type = result.node_type
+            entry.system_id = result.system_id
+        if result.ttl is not None:
+            entry.ttl = result.ttl
+        if result.user_id is not None:
+            entry.user_id = result.user_id
+        entry.ips.add(result.ip)
+        entry.dnsresource_id = result.dnsresource_id
+
+    def add_node_result(self, result):
+        """Add a `MappingQueryResult` to the mapping.
+
+        All special results must have been added first.
+        """
+        if self.iface_is_boot is None:
+            # All of the mappings that we got mean that we will only want to
+            # add addresses for the boot interface (is_boot == True).
+            self.iface_is_boot = defaultdict(bool, {
+                hostname: True for hostname in self.mapping.keys()
+            })
+        entry = self.mapping[result.fqdn]
+        entry.node_type = result.node_type
+        entry.system_id = result.system_id
+        if result.user_id is not None:
+            entry.user_id = result.user_id
+        entry.ttl = result.ttl
+        if result.is_boot:
+            self.iface_is_boot[result.fqdn] = True
+        # If we have an IP on the right interface type, save it.
+        if result.is_boot == self.iface_is_boot[result.fqdn]:
+            entry.ips.add(result.ip)
+
+    def add_interface_result(self, result):
+        """Add an `InterfaceMappingResult` to the mapping.
+
+        All node results must have been added first.
+        """
+        if result.assigned:
+            self.assigned_ips[result.fqdn] = True
+        # If this is an assigned IP, or there are NO assigned IPs on the
+        # node, then consider adding the IP.
+        if result.assigned or not self.assigned_ips[result.fqdn]:
+            if result.ip not in self.mapping[result.fqdn].ips:
+                entry = self.mapping[
+                    "%s.%s" % (result.iface_name, result.fqdn)]
+                entry.node_type = result.node_type
+                entry.system_id = result.system_id
+                if result.user_id is not None:
+                    entry.user_id = result.user_id
+                entry.ttl = result.ttl
+                entry.ips.add(result.ip)
+
+
 def convert_leases_to_dict(leases):
     """Convert a list of leases to a dictionary.
 
@@ -297,33 +384,9 @@ class StaticIPAddressManager(Manager):
             return self._attempt_allocation(
                 requested_address, alloc_type, user=user, subnet=subnet)
 
-    def _get_special_mappings(self, domain, raw_ttl=False):
-        """Get the special mappings, possibly limited to a single Domain.
-
-        This function is responsible for creating these mappings:
-        - any USER_RESERVED IP that has no name (dnsrr or node),
-        - any IP not associated with a Node,
-        - any IP associated with a DNSResource.
-
-        Addresses that are associated with both a Node and a DNSResource behave
-        thusly:
-        - Both forward mappings include the address
-        - The reverse mapping points only to the Node (and is the
-          responsibility of the caller.)
-
-        The caller is responsible for addresses otherwise derived from nodes.
-
-        Because of how the get hostname_ip_mapping code works, we actually need
-        to fetch ALL of the entries for subnets, but forward mappings are
-        domain-specific.
-
-        :param domain: limit return to just the given Domain.  If anything
-            other than a Domain is passed in (e.g., a Subnet or None), we
-            return all of the reverse mappings.
-        :param raw_ttl: Boolean, if True then just return the address_ttl,
-            otherwise, coalesce the address_ttl to be the correct answer for
-            zone generation.
-        :return: a (default) dict of hostname: HostnameIPMapping entries.
+    def _get_special_mappings_query(self, raw_ttl=False):
+        """Return the SQL for the special mappings, up to the point where
+        `_get_special_mappings` limits it to a Domain or a Subnet.
         """
         default_ttl = "%d" % Config.objects.get_config('default_dns_ttl')
         # raw_ttl says that we don't coalesce, but we need to pick one, so we
@@ -342,7 +405,7 @@ class StaticIPAddressManager(Manager):
         # view of a DNSResource (and Node) that we need, and finally use
         # domain2 to handle the case where an FQDN is also the name of a domain
         # that we know.
-        sql_query = """
+        return """
             SELECT
                 COALESCE(dnsrr.fqdn, node.fqdn) AS fqdn,
                 node.system_id,
@@ -350,7 +413,11 @@ class StaticIPAddressManager(Manager):
                 staticip.user_id,
                 """ + ttl_clause + """ AS ttl,
                 staticip.ip,
-                dnsrr.id AS dnsresource_id
+                dnsrr.id AS dnsresource_id,
+                dnsrr.domain_id,
+                dnsrr.dom2_id,
+                node.domain_id,
+                node.dom2_id
             FROM
                 maasserver_staticipaddress AS staticip
             LEFT JOIN (
@@ -408,6 +475,35 @@ class StaticIPAddressManager(Manager):
                 (staticip.ip IS NOT NULL AND host(staticip.ip) != '') AND
                 """
 
+    def _get_special_mappings(self, domain, raw_ttl=False):
+        """Get the special mappings, possibly limited to a single Domain.
+
+        This function is responsible for creating these mappings:
+        - any USER_RESERVED IP that has no name (dnsrr or node),
+        - any IP not associated with a Node,
+        - any IP associated with a DNSResource.
+
+        Addresses that are associated with both a Node and a DNSResource behave
+        thusly:
+        - Both forward mappings include the address
+        - The reverse mapping points only to the Node (and is the
+          responsibility of the caller.)
+
+        The caller is responsible for addresses otherwise derived from nodes.
+
+        Because of how the get hostname_ip_mapping code works, we actually need
+        to fetch ALL of the entries for subnets, but forward mappings are
+        domain-specific.
+
+        :param domain: limit return to just the given Domain.  If anything
+            other than a Domain is passed in (e.g., a Subnet or None), we
+            return all of the reverse mappings.
+        :param raw_ttl: Boolean, if True then just return the address_ttl,
+            otherwise, coalesce the address_ttl to be the correct answer for
+            zone generation.
+        :return: a (default) dict of hostname: HostnameIPMapping entries.
+        """
+        sql_query = self._get_special_mappings_query(raw_ttl)
         query_parms = []
         if isinstance(domain, Domain):
             if domain.is_default():
@@ -459,48 +555,21 @@ class StaticIPAddressManager(Manager):
                     node.fqdn IS NULL))"""
             query_parms += [IPADDRESS_TYPE.USER_RESERVED]
 
-        default_domain = Domain.objects.get_default_domain()
-        mapping = defaultdict(HostnameIPMapping)
+        builder = HostnameIPMappingBuilder(
+            defaultdict(HostnameIPMapping),
+            Domain.objects.get_default_domain())
         cursor = connection.cursor()
         cursor.execute(sql_query, query_parms)
-        for result in cursor.fetchall():
-            result = SpecialMappingQueryResult(*result)
-            if result.fqdn is None or result.fqdn == '':
-                fqdn = "%s.%s" % (
-                    get_ip_based_hostname(result.ip), default_domain.name)
-            else:
-                fqdn = result.fqdn
-            # It is possible that there are both Node and DNSResource entries
-            # for this fqdn.  If we have any system_id, preserve it.  Ditto for
-            # TTL.  It is left as an exercise for the admin to make sure that
-            # the any non-default TTL applied to the Node and DNSResource are
-            # equal.
-            entry = mapping[fqdn]
-            if result.system_id is not None:
-                entry.node_type = result.node_type
-                entry.system_id = result.system_id
-            if result.ttl is not None:
-                entry.ttl = result.ttl
-            if result.user_id is not None:
-                entry.user_id = result.user_id
-            entry.ips.add(result.ip)
-            entry.dnsresource_id = result.dnsresource_id
-        return mapping
-
-    def get_hostname_ip_mapping(self, domain_or_subnet, raw_ttl=False):
-        """Return hostname mappings for `StaticIPAddress` entries.
-
-        Returns a mapping `{hostnames -> (ttl, [ips])}` corresponding to
-        current `StaticIPAddress` objects for the nodes in `domain`, or
-        `subnet`.
+        for result in cursor:
+            builder.add_special_result(SpecialMappingQueryResult(*result))
+        return builder.mapping
 
-        At most one IPv4 address and one IPv6 address will be returned per
-        node, each the one for whichever `Interface` was created first.
+    def _get_mapping_queries(self, domain_or_subnet, raw_ttl=False):
+        """Return the SQL and parameters for `get_hostname_ip_mapping`.
 
-        The returned name is an FQDN (no trailing dot.)
+        :return: A tuple of the query for the addresses of nodes, the query
+            for the addresses of all interfaces, and the parameters for both.
         """
-        cursor = connection.cursor()
-
         # DISTINCT ON returns the first matching row for any given
         # hostname, using the query's ordering.  Here, we're trying to
         # return the IPs for the oldest Interface address.
@@ -546,7 +615,9 @@ class StaticIPAddressManager(Manager):
                     WHEN interface.type = 'unknown' THEN 9
                     ELSE 10
                 END AS preference,
-                family(staticip.ip) AS family
+                family(staticip.ip) AS family,
+                node.domain_id,
+                domain2.id
             FROM
                 maasserver_interface AS interface
             LEFT OUTER JOIN maasserver_interfacerelationship AS rel ON
@@ -565,6 +636,11 @@ class StaticIPAddressManager(Manager):
                 link.interface_id = interface.id
             JOIN maasserver_staticipaddress AS staticip ON
                 staticip.id = link.staticipaddress_id
+            LEFT JOIN maasserver_domain AS domain2 ON
+                /* Pick up another copy of domain looking for instances of
+                 * nodes a the top of a domain.
+                 */ domain2.name = CONCAT(node.hostname, '.', domain.name)
+            WHERE
             """
         if isinstance(domain_or_subnet, Domain):
             # The model has nodes in the parent domain, but they actually live
@@ -573,11 +649,6 @@ class StaticIPAddressManager(Manager):
             # domains. domain2.name will be non-null if this host's fqdn is the
             # name of a domain in MAAS.
             sql_query += """
-            LEFT JOIN maasserver_domain AS domain2 ON
-                /* Pick up another copy of domain looking for instances of
-                 * nodes a the top of a domain.
-                 */ domain2.name = CONCAT(node.hostname, '.', domain.name)
-            WHERE
                 (domain2.id = %s OR node.domain_id = %s) AND
             """
             query_parms = [domain_or_subnet.id, domain_or_subnet.id, ]
@@ -586,9 +657,6 @@ class StaticIPAddressManager(Manager):
             # identify which ones should have the FQDN.  dns/zonegenerator.py
             # optimizes based on this, and only calls once with a subnet,
             # expecting to get all the subnets back in one table.
-            sql_query += """
-            WHERE
-            """
             query_parms = []
         sql_query += """
                 staticip.ip IS NOT NULL AND
@@ -627,7 +695,9 @@ class StaticIPAddressManager(Manager):
                 """ + ttl_clause + """ AS ttl,
                 staticip.ip,
                 interface.name,
-                alloc_type != 6 /* DISCOVERED */ AS assigned
+                alloc_type != 6 /* DISCOVERED */ AS assigned,
+                node.domain_id,
+                domain2.id
             FROM
                 maasserver_interface AS interface
             JOIN maasserver_node AS node ON
@@ -638,10 +708,6 @@ class StaticIPAddressManager(Manager):
                 link.interface_id = interface.id
             JOIN maasserver_staticipaddress AS staticip ON
                 staticip.id = link.staticipaddress_id
-            """
-        if isinstance(domain_or_subnet, Domain):
-            # This logic is similar to the logic in sql_query above.
-            iface_sql_query += """
             LEFT JOIN maasserver_domain AS domain2 ON
                 /* Pick up another copy of domain looking for instances of
                  * the name as the top of a domain.
@@ -649,15 +715,11 @@ class StaticIPAddressManager(Manager):
                 domain2.name = CONCAT(
                     interface.name, '.', node.hostname, '.', domain.name)
             WHERE
-                (domain2.id = %s OR node.domain_id = %s) AND
             """
-        else:
-            # For subnets, we need ALL the names, so that we can correctly
-            # identify which ones should have the FQDN.  dns/zonegenerator.py
-            # optimizes based on this, and only calls once with a subnet,
-            # expecting to get all the subnets back in one table.
+        if isinstance(domain_or_subnet, Domain):
+            # This logic is similar to the logic in sql_query above.
             iface_sql_query += """
-            WHERE
+                (domain2.id = %s OR node.domain_id = %s) AND
             """
         iface_sql_query += """
                 staticip.ip IS NOT NULL AND
@@ -667,15 +729,28 @@ class StaticIPAddressManager(Manager):
                 assigned DESC, /* Return all assigned IPs for a node first. */
                 interface.id
             """
+        return sql_query, iface_sql_query, query_parms
+
+    def get_hostname_ip_mapping(self, domain_or_subnet, raw_ttl=False):
+        """Return hostname mappings for `StaticIPAddress` entries.
+
+        Returns a mapping `{hostnames -> (ttl, [ips])}` corresponding to
+        current `StaticIPAddress` objects for the nodes in `domain`, or
+        `subnet`.
+
+        At most one IPv4 address and one IPv6 address will be returned per
+        node, each the one for whichever `Interface` was created first.
+
+        The returned name is an FQDN (no trailing dot.)
+        """
+        cursor = connection.cursor()
+        sql_query, iface_sql_query, query_parms = self._get_mapping_queries(
+            domain_or_subnet, raw_ttl)
         # We get user reserved et al mappings first, so that we can overwrite
         # TTL as we process the return from the SQL horror above.
-        mapping = self._get_special_mappings(domain_or_subnet, raw_ttl)
-        # All of the mappings that we got mean that we will only want to add
-        # addresses for the boot interface (is_boot == True).
-        iface_is_boot = defaultdict(bool, {
-            hostname: True for hostname in mapping.keys()
-        })
-        assigned_ips = defaultdict(bool)
+        builder = HostnameIPMappingBuilder(
+            self._get_special_mappings(domain_or_subnet, raw_ttl),
+            Domain.objects.get_default_domain())
         cursor.execute(sql_query, query_parms)
         # The records from the query provide, for each hostname (after
         # stripping domain), the boot and non-boot interface ip address in ipv4
@@ -683,40 +758,70 @@ class StaticIPAddressManager(Manager):
         # there are none, then whatever we got wins.  The ORDER BY means that
         # we will see all of the boot interfaces before we see any non-boot
         # interface IPs.  See Bug#1584850
-        for result in cursor.fetchall():
-            result = MappingQueryResult(*result)
-            entry = mapping[result.fqdn]
-            entry.node_type = result.node_type
-            entry.system_id = result.system_id
-            if result.user_id is not None:
-                entry.user_id = result.user_id
-            entry.ttl = result.ttl
-            if result.is_boot:
-                iface_is_boot[result.fqdn] = True
-            # If we have an IP on the right interface type, save it.
-            if result.is_boot == iface_is_boot[result.fqdn]:
-                entry.ips.add(result.ip)
+        for result in cursor:
+            builder.add_node_result(MappingQueryResult(*result))
         # Next, get all the addresses, on all the interfaces, and add the ones
         # that are not already present on the FQDN as $IFACE.$FQDN.  Exclude
         # any discovered addresses once there are any non-discovered addresses.
         cursor.execute(iface_sql_query, query_parms)
-        for result in cursor.fetchall():
+        for result in cursor:
+            builder.add_interface_result(InterfaceMappingResult(*result))
+        return builder.mapping
+
+    def get_hostname_ip_mappings_by_domain(self):
+        """Return hostname mappings for `StaticIPAddress` entries by domain.
+
+        This returns the same as calling `get_hostname_ip_mapping` for each
+        domain, but runs each query just once, sorting the results into
+        domains as they are streamed from the database.
+
+        :return: A dict of `{domain_id -> {hostnames -> HostnameIPMapping}}`.
+        """
+        default_domain = Domain.objects.get_default_domain()
+        builders = defaultdict(lambda: HostnameIPMappingBuilder(
+            defaultdict(HostnameIPMapping), default_domain))
+
+        def domain_ids(*ids):
+            return {domain_id for domain_id in ids if domain_id is not None}
+
+        cursor = connection.cursor()
+        sql_query = self._get_special_mappings_query()
+        # See _get_special_mappings: addresses with a DNSResource go to the
+        # domains of the resource and of any node sharing the address, and
+        # unnamed USER_RESERVED addresses go to the default domain.
+        sql_query += """ (
+                dnsrr.fqdn IS NOT NULL OR (
+                    staticip.alloc_type = %s AND
+                    node.fqdn IS NULL))"""
+        cursor.execute(sql_query, [IPADDRESS_TYPE.USER_RESERVED])
+        for result in cursor:
+            result = SpecialMappingQueryResult(*result)
+            if result.dnsresource_id is None:
+                ids = {default_domain.id}
+            else:
+                ids = domain_ids(
+                    result.dnsresource_domain_id,
+                    result.dnsresource_domain2_id,
+                    result.node_domain_id, result.node_domain2_id)
+            for domain_id in ids:
+                builders[domain_id].add_special_result(result)
+
+        sql_query, iface_sql_query, query_parms = self._get_mapping_queries(
+            None)
+        cursor.execute(sql_query, query_parms)
+        for result in cursor:
+            result = MappingQueryResult(*result)
+            for domain_id in domain_ids(result.domain_id, result.domain2_id):
+                builders[domain_id].add_node_result(result)
+        cursor.execute(iface_sql_query, query_parms)
+        for result in cursor:
             result = InterfaceMappingResult(*result)
-            if result.assigned:
-                assigned_ips[result.fqdn] = True
-            # If this is an assigned IP, or there are NO assigned IPs on the
-            # node, then consider adding the IP.
-            if result.assigned or not assigned_ips[result.fqdn]:
-                if result.ip not in mapping[result.fqdn].ips:
-                    entry = mapping[
-                        "%s.%s" % (result.iface_name, result.fqdn)]
-                    entry.node_type = result.node_type
-                    entry.system_id = result.system_id
-                    if result.user_id is not None:
-                        entry.user_id = result.user_id
-                    entry.ttl = result.ttl
-                    entry.ips.add(result.ip)
-        return mapping
+            for domain_id in domain_ids(result.domain_id, result.domain2_id):
+                builders[domain_id].add_interface_result(result)
+        return {
+            domain_id: builder.mapping
+            for domain_id, builder in builders.items()
+        }
 
     def filter_by_ip_family(self, family):
         possible_families = map_enum_reverse(IPADDRESS_FAMILY)
@@ -0,0 +1,55 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""StorageAllocationIndex objects."""
+
+__all__ = [
+    "StorageAllocationIndex",
+]
+
+from django.contrib.postgres.fields import ArrayField
+from django.db.models import (
+    BigIntegerField,
+    BooleanField,
+    IntegerField,
+    Model,
+    TextField,
+)
+from maasserver import DefaultMeta
+
+
+class StorageAllocationIndex(Model):
+    """A block device or partition, as seen when allocating machines.
+
+    Each row holds what the storage constraints of an allocation request
+    are matched against, so that they can be evaluated without joining
+    block devices, partition tables, partitions and filesystems.
+
+    This is populated and kept up to date by triggers within the database;
+    see `maasserver.triggers.system`. It should not be modified directly.
+    """
+
+    class Meta(DefaultMeta):
+        """Default meta."""
+        index_together = (
+            ("root", "size"),
+            ("free", "size"),
+        )
+
+    node_id = IntegerField(editable=False, db_index=True)
+
+    # Exactly one of these is set.
+    block_device_id = IntegerField(editable=False, null=True)
+    partition_id = IntegerField(editable=False, null=True)
+
+    size = BigIntegerField(editable=False)
+
+    tags = ArrayField(TextField(), editable=False)
+
+    # True if the device holds the (unacquired) root filesystem, either
+    # directly or, for a block device, on one of its partitions.
+    root = BooleanField(editable=False)
+
+    # True if nothing is using the device: there is no filesystem on it and,
+    # for a block device, no partition table either.
+    free = BooleanField(editable=False)
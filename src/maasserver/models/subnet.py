@@ -6,8 +6,10 @@
 __all__ = [
     'create_cidr',
     'Subnet',
+    'subnet_index',
 ]
 
+from collections import defaultdict
 from operator import attrgetter
 from typing import (
     Iterable,
@@ -20,6 +22,7 @@ from django.core.exceptions import (
     ValidationError,
 )
 from django.core.validators import RegexValidator
+from django.db import DEFAULT_DB_ALIAS
 from django.db.models import (
     BooleanField,
     CharField,
@@ -50,6 +53,10 @@ from maasserver.fields import (
 from maasserver.models.cleansave import CleanSave
 from maasserver.models.staticroute import StaticRoute
 from maasserver.models.timestampedmodel import TimestampedModel
+from maasserver.utils.cache import (
+    ProcessCache,
+    ProcessCacheUnavailable,
+)
 from maasserver.utils.orm import MAASQueriesMixin
 from netaddr import (
     AddrFormatError,
@@ -114,6 +121,89 @@ def create_cidr(network, subnet_mask=None):
     return str(cidr)
 
 
+class SubnetIndexUnavailable(ProcessCacheUnavailable):
+    """The subnet index cannot answer; the database must be asked instead."""
+
+
+class SubnetIndex(ProcessCache):
+    """An in-process index of subnets, for `get_best_subnet_for_ip`.
+
+    Subnets are kept in a dict per IP version and prefix length, keyed by
+    network address, so finding the best subnet for an address costs one
+    dict probe per distinct prefix length rather than a query.
+
+    The index is built by `SubnetIndexService` in region worker processes,
+    and dropped whenever the database notifies that a subnet or VLAN has
+    changed, or a transaction in this process that changed them commits.
+    Until it has been rebuilt, and while the current transaction has
+    uncommitted changes to subnets or VLANs, lookups raise
+    `SubnetIndexUnavailable` so that callers can query the database.
+    """
+
+    unavailable = SubnetIndexUnavailable
+
+    def build(self):
+        """Index all subnets, most specific networks first.
+
+        :return: A tuple of the names of the `Subnet` fields indexed, and a
+            dict of networks by IP version.
+        """
+        fields = [field.attname for field in Subnet._meta.concrete_fields]
+        cidr_index = fields.index("cidr")
+        networks = {4: defaultdict(dict), 6: defaultdict(dict)}
+        rows = Subnet.objects.values_list("vlan__dhcp_on", *fields)
+        for row in rows.iterator():
+            network = IPNetwork(row[cidr_index + 1])
+            networks[network.version][network.prefixlen][network.first] = (
+                row[0], row[1:])
+        # Search the most specific networks first. Networks with no host
+        # bits contain no address other than themselves, and the database
+        # does not match them either (see `find_best_subnet_for_ip_query`).
+        for version, bits in ((4, 32), (6, 128)):
+            networks[version] = [
+                (bits - prefixlen, subnets)
+                for prefixlen, subnets in sorted(
+                    networks[version].items(), reverse=True)
+                if prefixlen < bits
+            ]
+        return fields, networks
+
+    def get_best_subnet_for_ip(self, ip):
+        """Find the best `Subnet` for `ip`, as the database would.
+
+        :param ip: An `IPAddress`, already converted to IPv4 if it was an
+            IPv4-mapped address.
+        :return: A new `Subnet` instance, or `None` if no subnet contains the
+            address.
+        :raise SubnetIndexUnavailable: When the index has not been built, is
+            out of date, or this thread's transaction has changed subnets or
+            VLANs.
+        """
+        fields, networks = self.get_data()
+        address = int(ip)
+        best = None
+        for hostbits, subnets in networks[ip.version]:
+            found = subnets.get(address >> hostbits << hostbits)
+            if found is not None:
+                if found[0]:
+                    # Subnets on VLANs with DHCP enabled come first.
+                    best = found
+                    break
+                elif best is None:
+                    best = found
+        if best is None:
+            return None
+        else:
+            values = [
+                list(value) if isinstance(value, list) else value
+                for value in best[1]
+            ]
+            return Subnet.from_db(DEFAULT_DB_ALIAS, fields, values)
+
+
+subnet_index = SubnetIndex()
+
+
 class SubnetQueriesMixin(MAASQueriesMixin):
 
     find_subnets_with_ip_query = """
@@ -159,10 +249,18 @@ class SubnetQueriesMixin(MAASQueriesMixin):
 
     def get_best_subnet_for_ip(self, ip):
         """Find the most-specific managed Subnet the specified IP address
-        belongs to."""
+        belongs to.
+
+        This uses `subnet_index` when it is available, and the database
+        otherwise.
+        """
         ip = IPAddress(ip)
         if ip.is_ipv4_mapped():
             ip = ip.ipv4()
+        try:
+            return subnet_index.get_best_subnet_for_ip(ip)
+        except SubnetIndexUnavailable:
+            pass  # Ask the database.
         subnets = self.raw(
             self.find_best_subnet_for_ip_query,
             params=[str(ip)])
@@ -172,6 +270,40 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         else:
             return None
 
+    # As above, for many IP addresses at once. DISTINCT ON picks the first
+    # row for each address, as ordered.
+    find_best_subnets_for_ips_query = """
+        SELECT DISTINCT ON (ip)
+            subnet.*,
+            host(ip) "best_for_ip"
+        FROM unnest(%s::inet[]) AS ip
+        INNER JOIN maasserver_subnet AS subnet
+            ON ip << subnet.cidr
+        INNER JOIN maasserver_vlan AS vlan
+            ON subnet.vlan_id = vlan.id
+        ORDER BY
+            ip,
+            vlan.dhcp_on DESC,
+            masklen(subnet.cidr) DESC
+        """
+
+    def get_best_subnets_for_ips(self, ips):
+        """Find the most-specific managed Subnet for each IP address.
+
+        This is `get_best_subnet_for_ip` for many addresses in one query.
+
+        :return: A dict mapping each `IPAddress` that belongs to a subnet to
+            that `Subnet`. IPv4-mapped addresses are converted to IPv4.
+        """
+        ips = {IPAddress(ip) for ip in ips}
+        ips = {ip.ipv4() if ip.is_ipv4_mapped() else ip for ip in ips}
+        if len(ips) == 0:
+            return {}
+        subnets = self.raw(
+            self.find_best_subnets_for_ips_query,
+            params=[[str(ip) for ip in ips]])
+        return {IPAddress(subnet.best_for_ip): subnet for subnet in subnets}
+
     def validate_filter_specifiers(self, specifiers):
         """Validate the given filter string."""
         try:
@@ -17,11 +17,20 @@ from maasserver.models import (
     signals,
 )
 import maasserver.models.config
-from maasserver.models.config import get_default_config
+from maasserver.models.config import (
+    ConfigCache,
+    ConfigCacheUnavailable,
+    get_default_config,
+)
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
+from maasserver.utils.orm import post_commit_hooks
+from maastesting.djangotestcase import count_queries
 from provisioningserver.events import AUDIT
-from testtools.matchers import Is
+from testtools.matchers import (
+    Is,
+    MatchesStructure,
+)
 
 
 class ConfigDefaultTest(MAASServerTestCase, TestWithFixtures):
@@ -248,3 +257,113 @@ class SettingConfigTest(MAASServerTestCase):
         something = [factory.make_name("value")]
         Config.objects.set_config(self.name, something)
         self.assertEqual(something, Config.objects.get_config(self.name))
+
+
+class TestConfigCache(MAASServerTestCase):
+    """Tests for `ConfigCache`."""
+
+    def make_cache(self):
+        cache = ConfigCache()
+        self.assertTrue(cache.rebuild())
+        return cache
+
+    def test__unavailable_until_built(self):
+        cache = ConfigCache()
+        self.assertRaises(
+            ConfigCacheUnavailable, cache.get_configs, ["maas_name"], [None])
+        self.assertThat(cache, MatchesStructure.byEquality(
+            hits=0, misses=1))
+
+    def test__agrees_with_database(self):
+        Config.objects.set_config("maas_name", factory.make_name("maas"))
+        Config.objects.set_config("upstream_dns", None)
+        names = ["maas_name", "upstream_dns", "ntp_servers", "no_such_thing"]
+        defaults = [None, "8.8.8.8", None, "default"]
+        cache = self.make_cache()
+        self.assertEqual(
+            Config.objects.get_configs(names, defaults),
+            cache.get_configs(names, defaults))
+        self.assertThat(cache, MatchesStructure.byEquality(
+            hits=1, misses=0))
+
+    def test__returns_copies(self):
+        Config.objects.set_config("upstream_dns", ["8.8.8.8"])
+        cache = self.make_cache()
+        value = cache.get_configs(["upstream_dns"], [None])["upstream_dns"]
+        value.append("8.8.4.4")
+        self.assertEqual(
+            {"upstream_dns": ["8.8.8.8"]},
+            cache.get_configs(["upstream_dns"], [None]))
+
+    def test__unavailable_after_invalidate(self):
+        cache = self.make_cache()
+        cache.invalidate()
+        self.assertRaises(
+            ConfigCacheUnavailable, cache.get_configs, ["maas_name"], [None])
+        self.assertThat(cache, MatchesStructure.byEquality(
+            hits=0, misses=1, invalidations=1))
+
+    def test__unavailable_when_too_old(self):
+        now = [0.0]
+        cache = ConfigCache(clock=lambda: now[0])
+        self.assertTrue(cache.rebuild())
+        now[0] += cache.max_age + 1
+        self.assertRaises(
+            ConfigCacheUnavailable, cache.get_configs, ["maas_name"], [None])
+
+    def test__unavailable_while_transaction_has_changes(self):
+        cache = self.make_cache()
+        cache.changed()
+        self.assertRaises(
+            ConfigCacheUnavailable, cache.get_configs, ["maas_name"], [None])
+        self.assertFalse(cache.rebuild())
+        # Once the transaction commits, the cache is dropped.
+        post_commit_hooks.fire()
+        self.assertThat(cache, MatchesStructure.byEquality(
+            invalidations=1))
+        self.assertTrue(cache.rebuild())
+        cache.get_configs(["maas_name"], [None])
+
+    def test__rebuild_fails_if_invalidated_while_rebuilding(self):
+        cache = ConfigCache()
+        values_list = Config.objects.values_list
+
+        def values_list_and_invalidate(*args, **kwargs):
+            cache.invalidate()
+            return values_list(*args, **kwargs)
+
+        self.patch(Config.objects, "values_list", values_list_and_invalidate)
+        self.assertFalse(cache.rebuild())
+        self.assertRaises(
+            ConfigCacheUnavailable, cache.get_configs, ["maas_name"], [None])
+
+
+class TestConfigManagerUsesCache(MAASServerTestCase):
+
+    def setUp(self):
+        super(TestConfigManagerUsesCache, self).setUp()
+        self.cache = ConfigCache()
+        self.patch(maasserver.models.config, "config_cache", self.cache)
+
+    def test_get_config_uses_cache_when_built(self):
+        Config.objects.set_config("maas_name", "cached")
+        self.assertTrue(self.cache.rebuild())
+        count, value = count_queries(Config.objects.get_config, "maas_name")
+        self.assertEqual(("cached", 0), (value, count))
+
+    def test_get_configs_uses_cache_when_built(self):
+        Config.objects.set_config("maas_name", "cached")
+        self.assertTrue(self.cache.rebuild())
+        count, values = count_queries(
+            Config.objects.get_configs, ["maas_name", "ntp_servers"])
+        self.assertEqual(0, count)
+        self.assertEqual({
+            "maas_name": "cached",
+            "ntp_servers": get_default_config()["ntp_servers"],
+        }, values)
+
+    def test_uses_database_when_cache_unavailable(self):
+        Config.objects.set_config("maas_name", "stored")
+        count, value = count_queries(Config.objects.get_config, "maas_name")
+        self.assertEqual(("stored", 1), (value, count))
+        self.assertEqual(1, self.cache.misses)
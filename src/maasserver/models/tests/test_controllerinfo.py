@@ -51,6 +51,21 @@ class TestControllerInfo(MAASServerTestCase):
         self.assertThat(controller.interfaces, Equals(interfaces))
         self.assertThat(controller.interface_update_hints, Equals(hints))
 
+    def test_set_interface_update_info_records_fingerprint(self):
+        controller = factory.make_RackController()
+        fingerprint = factory.make_string(64)
+        ControllerInfo.objects.set_interface_update_info(
+            controller, {'eth0': {}}, None, fingerprint)
+        self.assertThat(
+            ControllerInfo.objects.get_interfaces_fingerprint(controller),
+            Equals(fingerprint))
+
+    def test_get_interfaces_fingerprint_empty_without_info(self):
+        controller = factory.make_RackController()
+        self.assertThat(
+            ControllerInfo.objects.get_interfaces_fingerprint(controller),
+            Equals(''))
+
 
 class TestGetControllerVersionInfo(MAASServerTestCase):
 
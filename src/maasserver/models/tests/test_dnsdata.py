@@ -365,3 +365,34 @@ class TestDNSDataMapping(MAASServerTestCase):
             actual = DNSData.objects.get_hostname_dnsdata_mapping(
                 dom, raw_ttl=True)
             self.assertEqual(expected_mapping, actual)
+
+    def test_get_hostname_dnsdata_mappings_by_domain_returns_mappings(self):
+        domains = [
+            factory.make_Domain(),
+            factory.make_Domain(ttl=random.randint(100, 199))]
+        for dom in domains:
+            factory.make_DNSData(domain=dom)
+            factory.make_DNSData(domain=dom, ttl=random.randint(200, 299))
+        mappings = DNSData.objects.get_hostname_dnsdata_mappings_by_domain()
+        for dom in domains:
+            expected_mapping = {}
+            for dnsrr in dom.dnsresource_set.all():
+                expected_mapping.update(self.make_mapping(dnsrr))
+            self.assertEqual(expected_mapping, mappings[dom.id])
+
+    def test_get_hostname_dnsdata_mappings_by_domain_includes_domain_top(self):
+        parent = Domain.objects.get_default_domain()
+        name = factory.make_name("node")
+        domain = factory.make_Domain(name="%s.%s" % (name, parent.name))
+        dnsrr = factory.make_DNSResource(
+            name='@', domain=domain, no_ip_addresses=True)
+        factory.make_DNSData(dnsresource=dnsrr, ip_addresses=True)
+        factory.make_Node_with_Interface_on_Subnet(
+            hostname=name, domain=parent)
+        mappings = DNSData.objects.get_hostname_dnsdata_mappings_by_domain()
+        self.assertEqual(
+            DNSData.objects.get_hostname_dnsdata_mapping(domain),
+            mappings[domain.id])
+        self.assertEqual(
+            DNSData.objects.get_hostname_dnsdata_mapping(parent),
+            mappings[parent.id])
@@ -13,10 +13,7 @@ from django.core.exceptions import (
     ValidationError,
 )
 from django.db.models import ProtectedError
-from maasserver.dns.zonegenerator import (
-    get_hostname_dnsdata_mapping,
-    lazydict,
-)
+from maasserver.dns.zonegenerator import get_hostname_dnsdata_mapping
 from maasserver.models.config import Config
 from maasserver.models.dnsdata import (
     DNSData,
@@ -209,8 +206,7 @@ class DomainTest(MAASServerTestCase):
         name = factory.make_name()
         default_name = Domain.objects.get_default_domain().name
         factory.make_Domain(name="%s.%s" % (name, parent.name))
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         parent.add_delegations(mapping, default_name, [IPAddress("::1")], 30)
         expected_map = HostnameRRsetMapping(
             rrset={(30, 'NS', default_name)})
@@ -232,8 +228,7 @@ class DomainTest(MAASServerTestCase):
         factory.make_DNSData(
             dnsresource=dnsrr, rrtype='NS',
             rrdata="%s.%s." % (other_name, parent.name))
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         parent.add_delegations(mapping, default_name, [IPAddress("::1")], 30)
         expected_map = {
             name: HostnameRRsetMapping(
@@ -271,8 +266,7 @@ class DomainTest(MAASServerTestCase):
         factory.make_DNSData(
             dnsresource=dnsrr, rrtype='NS',
             rrdata="%s.%s." % (other_name, parent.name))
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         expected_map = {
             name: HostnameRRsetMapping(
                 rrset={
@@ -298,8 +292,7 @@ class DomainTest(MAASServerTestCase):
         name = "%s.%s" % (factory.make_name(), factory.make_name())
         factory.make_Domain(name="%s.%s" % (name, parent.name))
         default_name = Domain.objects.get_default_domain().name
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         parent.add_delegations(mapping, default_name, [IPAddress("::1")], 30)
         expected_map = HostnameRRsetMapping(
             rrset={(30, 'NS', default_name)})
@@ -311,8 +304,7 @@ class DomainTest(MAASServerTestCase):
         child = factory.make_Domain(name="%s.%s" % (name, parent.name))
         default_name = Domain.objects.get_default_domain().name
         factory.make_Domain(name="%s.%s" % (factory.make_name(), child.name))
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         parent.add_delegations(mapping, default_name, [IPAddress("::1")], 30)
         expected_map = HostnameRRsetMapping(
             rrset={(30, 'NS', default_name)})
@@ -327,8 +319,7 @@ class DomainTest(MAASServerTestCase):
         ns_name = "%s.%s." % (factory.make_name('h'), factory.make_name('d'))
         factory.make_DNSData(
             name='@', domain=child, rrtype='NS', rrdata=ns_name)
-        mappings = lazydict(get_hostname_dnsdata_mapping)
-        mapping = mappings[parent]
+        mapping = get_hostname_dnsdata_mapping(parent)
         parent.add_delegations(mapping, default_name, [IPAddress("::1")], 30)
         expected_map = HostnameRRsetMapping(
             rrset={(30, 'NS', ns_name)})
@@ -15,6 +15,7 @@ import os
 import random
 import re
 from textwrap import dedent
+import threading
 from unittest.mock import (
     ANY,
     call,
@@ -485,6 +486,60 @@ class TestMachineManager(MAASServerTestCase):
             [],
             list(Machine.objects.get_available_machines_for_acquisition(user)))
 
+    def test_claim_for_acquisition_returns_machines_in_order(self):
+        machines = [self.make_machine() for _ in range(5)]
+        random.shuffle(machines)
+        self.assertEqual(
+            machines[:3],
+            Machine.objects.claim_for_acquisition(
+                machines, 3, batch_size=2))
+
+    def test_claim_for_acquisition_accepts_queryset(self):
+        machines = [self.make_machine() for _ in range(3)]
+        self.assertEqual(
+            machines[:2],
+            Machine.objects.claim_for_acquisition(
+                Machine.objects.all().order_by('id'), 2))
+
+    def test_claim_for_acquisition_passes_over_unavailable_machines(self):
+        machines = [self.make_machine() for _ in range(3)]
+        machines[0].status = NODE_STATUS.ALLOCATED
+        machines[0].save()
+        self.assertEqual(
+            machines[1:2],
+            Machine.objects.claim_for_acquisition(machines, 1, batch_size=1))
+
+    def test_claim_for_acquisition_returns_fewer_when_exhausted(self):
+        machines = [self.make_machine() for _ in range(2)]
+        self.assertEqual(
+            machines, Machine.objects.claim_for_acquisition(machines, 3))
+
+
+class TestMachineManagerTransactional(MAASTransactionServerTestCase):
+
+    def test_claim_for_acquisition_passes_over_locked_machines(self):
+        machines = transactional(lambda: [
+            factory.make_Node(status=NODE_STATUS.READY)
+            for _ in range(2)
+        ])()
+        locked, release = threading.Event(), threading.Event()
+
+        @transactional
+        def hold_lock():
+            Machine.objects.claim_for_acquisition(machines[:1])
+            locked.set()
+            release.wait(10)
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+        self.assertTrue(locked.wait(10))
+
+        claimed = transactional(Machine.objects.claim_for_acquisition)(
+            machines, 1)
+        self.assertEqual(machines[1:], claimed)
+
 
 class TestControllerManager(MAASServerTestCase):
 
@@ -10288,6 +10343,142 @@ class TestUpdateInterfaces(MAASServerTestCase, UpdateInterfacesMixin):
         self.assertThat(alice_eth0.vlan, Equals(bob_eth0.vlan))
 
 
+class TestUpdateInterfacesFingerprint(MAASServerTestCase):
+    """Updates of a controller's interfaces that have not changed are
+    skipped, and only interfaces that have changed are updated."""
+
+    def make_controller(self):
+        return factory.make_Node(
+            node_type=NODE_TYPE.RACK_CONTROLLER).as_self()
+
+    def make_interfaces(self):
+        return {
+            "eth0": {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [],
+                "enabled": True,
+            },
+            "eth1": {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [],
+                "enabled": True,
+            },
+        }
+
+    def test__skips_update_when_interfaces_are_unchanged(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        update_interfaces = self.patch(controller, "_update_interfaces")
+        controller.update_interfaces(interfaces)
+        self.assertThat(update_interfaces, MockNotCalled())
+
+    def test__skips_update_when_fingerprint_matches(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        fingerprint = factory.make_string(64)
+        controller.update_interfaces(interfaces, fingerprint=fingerprint)
+        update_interfaces = self.patch(controller, "_update_interfaces")
+        controller.update_interfaces(interfaces, fingerprint=fingerprint)
+        self.assertThat(update_interfaces, MockNotCalled())
+
+    def test__updates_only_changed_interfaces(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        interfaces["eth1"]["enabled"] = False
+        update_interface = self.patch(
+            controller, "_update_interface",
+            Mock(wraps=controller._update_interface))
+        controller.update_interfaces(interfaces)
+        self.assertThat(
+            update_interface, MockCalledOnceWith(
+                "eth1", interfaces["eth1"], create_fabrics=True, hints=None))
+        self.assertThat(
+            sorted(controller.interface_set.values_list('name', 'enabled')),
+            Equals([("eth0", True), ("eth1", False)]))
+
+    def test__updates_children_of_changed_interfaces(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        interfaces["eth0.10"] = {
+            "type": "vlan",
+            "vid": 10,
+            "parents": ["eth0"],
+            "links": [],
+            "enabled": True,
+        }
+        controller.update_interfaces(interfaces)
+        interfaces["eth0"]["enabled"] = False
+        update_interface = self.patch(
+            controller, "_update_interface",
+            Mock(wraps=controller._update_interface))
+        controller.update_interfaces(interfaces)
+        self.assertThat(update_interface, MockCallsMatch(
+            call("eth0", interfaces["eth0"], create_fabrics=True, hints=None),
+            call(
+                "eth0.10", interfaces["eth0.10"], create_fabrics=True,
+                hints=None)))
+
+    def test__recreates_interfaces_deleted_since_last_update(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        controller.interface_set.get(name="eth0").delete()
+        controller.update_interfaces(interfaces)
+        self.assertThat(
+            sorted(controller.interface_set.values_list('name', flat=True)),
+            Equals(["eth0", "eth1"]))
+
+    def test__recreates_subnet_deleted_since_last_update(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        network = factory.make_ipv4_network(slash=24)
+        ip = factory.pick_ip_in_network(network)
+        interfaces["eth0"]["links"] = [{
+            "mode": "static",
+            "address": "%s/%d" % (ip, network.prefixlen),
+        }]
+        controller.update_interfaces(interfaces)
+        Subnet.objects.get(cidr=str(network.cidr)).delete()
+        controller.update_interfaces(interfaces)
+        subnet = Subnet.objects.get(cidr=str(network.cidr))
+        self.assertThat(
+            list(controller.interface_set.get(
+                name="eth0").ip_addresses.values_list('ip', 'subnet')),
+            Equals([(str(ip), subnet.id)]))
+
+    def test__updates_interfaces_changed_since_last_update(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        eth1 = controller.interface_set.get(name="eth1")
+        eth1.enabled = False
+        eth1.save()
+        interfaces["eth0"]["enabled"] = False
+        controller.update_interfaces(interfaces)
+        self.assertThat(
+            sorted(controller.interface_set.values_list('name', 'enabled')),
+            Equals([("eth0", False), ("eth1", True)]))
+
+    def test__updates_everything_after_update_without_fabrics(self):
+        controller = self.make_controller()
+        interfaces = self.make_interfaces()
+        controller.update_interfaces(interfaces)
+        controller.update_interfaces(interfaces, create_fabrics=False)
+        update_interface = self.patch(
+            controller, "_update_interface",
+            Mock(wraps=controller._update_interface))
+        controller.update_interfaces(interfaces)
+        self.assertThat(update_interface, MockCallsMatch(
+            call("eth0", interfaces["eth0"], create_fabrics=True, hints=None),
+            call("eth1", interfaces["eth1"], create_fabrics=True, hints=None)))
+
+
 class TestUpdateInterfacesWithHints(
         MAASTransactionServerTestCase, UpdateInterfacesMixin):
 
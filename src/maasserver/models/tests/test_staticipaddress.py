@@ -1099,6 +1099,30 @@ class TestStaticIPAddressManagerMapping(MAASServerTestCase):
                 HostnameIPMapping(None, 30, {sip3.ip}, None),
         }
 
+    def test_get_hostname_ip_mappings_by_domain_matches_each_domain(self):
+        subnet = factory.make_Subnet()
+        domains = [Domain.objects.get_default_domain()] + [
+            factory.make_Domain() for _ in range(2)]
+        for domain in domains:
+            node = factory.make_Node_with_Interface_on_Subnet(
+                subnet=subnet, domain=domain, interface_count=2)
+            for interface in node.interface_set.all():
+                factory.make_StaticIPAddress(
+                    alloc_type=IPADDRESS_TYPE.STICKY,
+                    ip=factory.pick_ip_in_Subnet(subnet),
+                    subnet=subnet, interface=interface)
+            factory.make_DNSResource(domain=domain, subnet=subnet)
+        factory.make_StaticIPAddress(
+            alloc_type=IPADDRESS_TYPE.USER_RESERVED,
+            ip=factory.pick_ip_in_Subnet(subnet), subnet=subnet)
+        mappings = StaticIPAddress.objects.get_hostname_ip_mappings_by_domain()
+        self.assertItemsEqual(
+            [domain.id for domain in domains], mappings.keys())
+        for domain in domains:
+            self.assertEqual(
+                StaticIPAddress.objects.get_hostname_ip_mapping(domain),
+                mappings[domain.id])
+
 
 class TestStaticIPAddress(MAASServerTestCase):
 
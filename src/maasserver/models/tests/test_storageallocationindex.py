@@ -0,0 +1,141 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `StorageAllocationIndex`."""
+
+__all__ = []
+
+from maasserver.models.storageallocationindex import StorageAllocationIndex
+from maasserver.testing.factory import factory
+from maasserver.testing.testcase import MAASServerTestCase
+
+
+class TestStorageAllocationIndex(MAASServerTestCase):
+    """The index is maintained by triggers in the database."""
+
+    def get_index(self, node):
+        return {
+            (row.block_device_id, row.partition_id): (
+                row.size, sorted(row.tags), row.root, row.free)
+            for row in StorageAllocationIndex.objects.filter(
+                node_id=node.id)
+        }
+
+    def test_indexes_new_block_device(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(
+            node=node, tags=["ssd", "fast"])
+        self.assertEqual(
+            {(device.id, None): (device.size, ["fast", "ssd"], False, True)},
+            self.get_index(node))
+
+    def test_updates_block_device_size_and_tags(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=["ssd"])
+        device.size += 1024 ** 3
+        device.tags = ["rotary"]
+        device.save()
+        self.assertEqual(
+            {(device.id, None): (device.size, ["rotary"], False, True)},
+            self.get_index(node))
+
+    def test_block_device_with_partition_table_is_not_free(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        factory.make_PartitionTable(block_device=device)
+        self.assertEqual(
+            {(device.id, None): (device.size, [], False, False)},
+            self.get_index(node))
+
+    def test_indexes_partitions(self):
+        node = factory.make_Node(with_boot_disk=False)
+        partition = factory.make_Partition(node=node, tags=["boot"])
+        device = partition.partition_table.block_device
+        self.assertEqual({
+            (device.id, None): (
+                device.size, sorted(device.tags), False, False),
+            (None, partition.id): (partition.size, ["boot"], False, True),
+        }, self.get_index(node))
+
+    def test_root_filesystem_on_block_device(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        factory.make_Filesystem(block_device=device, mount_point="/")
+        self.assertEqual(
+            {(device.id, None): (device.size, [], True, False)},
+            self.get_index(node))
+
+    def test_root_filesystem_on_partition_marks_block_device_as_root(self):
+        node = factory.make_Node(with_boot_disk=False)
+        partition = factory.make_Partition(node=node, tags=[])
+        device = partition.partition_table.block_device
+        factory.make_Filesystem(partition=partition, mount_point="/")
+        self.assertEqual({
+            (device.id, None): (device.size, sorted(device.tags), True, False),
+            (None, partition.id): (partition.size, [], True, False),
+        }, self.get_index(node))
+
+    def test_acquired_root_filesystem_is_not_root(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        factory.make_Filesystem(
+            block_device=device, mount_point="/", acquired=True)
+        self.assertEqual(
+            {(device.id, None): (device.size, [], False, False)},
+            self.get_index(node))
+
+    def test_deleting_filesystem_frees_device(self):
+        node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        filesystem = factory.make_Filesystem(
+            block_device=device, mount_point="/")
+        filesystem.delete()
+        self.assertEqual(
+            {(device.id, None): (device.size, [], False, True)},
+            self.get_index(node))
+
+    def test_moving_block_device_reindexes_both_nodes(self):
+        node = factory.make_Node(with_boot_disk=False)
+        other_node = factory.make_Node(with_boot_disk=False)
+        partition = factory.make_Partition(node=node, tags=[])
+        device = partition.partition_table.block_device
+        device.node = other_node
+        device.save()
+        self.assertEqual({}, self.get_index(node))
+        self.assertEqual({
+            (device.id, None): (
+                device.size, sorted(device.tags), False, False),
+            (None, partition.id): (partition.size, [], False, True),
+        }, self.get_index(other_node))
+
+    def test_moving_filesystem_reindexes_both_nodes(self):
+        node = factory.make_Node(with_boot_disk=False)
+        other_node = factory.make_Node(with_boot_disk=False)
+        device = factory.make_PhysicalBlockDevice(node=node, tags=[])
+        other_device = factory.make_PhysicalBlockDevice(
+            node=other_node, tags=[])
+        filesystem = factory.make_Filesystem(
+            block_device=device, mount_point="/")
+        filesystem.block_device = other_device
+        filesystem.save()
+        self.assertEqual(
+            {(device.id, None): (device.size, [], False, True)},
+            self.get_index(node))
+        self.assertEqual(
+            {(other_device.id, None): (other_device.size, [], True, False)},
+            self.get_index(other_node))
+
+    def test_deleting_block_device_removes_it(self):
+        node = factory.make_Node(with_boot_disk=False)
+        partition = factory.make_Partition(node=node, tags=[])
+        partition.partition_table.block_device.delete()
+        self.assertEqual({}, self.get_index(node))
+
+    def test_deleting_node_removes_its_devices(self):
+        node = factory.make_Node(with_boot_disk=False)
+        factory.make_Partition(node=node, tags=[])
+        factory.make_PhysicalBlockDevice(node=node, tags=[])
+        node_id = node.id
+        node.delete()
+        self.assertFalse(
+            StorageAllocationIndex.objects.filter(node_id=node_id).exists())
@@ -32,9 +32,12 @@ from maasserver.models import (
     Notification,
     Space,
 )
+from maasserver.models import subnet as subnet_module
 from maasserver.models.subnet import (
     create_cidr,
     Subnet,
+    SubnetIndex,
+    SubnetIndexUnavailable,
 )
 from maasserver.models.timestampedmodel import now
 from maasserver.permissions import NodePermission
@@ -47,8 +50,10 @@ from maasserver.testing.orm import rollback
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.orm import (
     get_one,
+    post_commit_hooks,
     reload_object,
 )
+from maastesting.djangotestcase import count_queries
 from maastesting.matchers import DocTestMatches
 from netaddr import (
     AddrFormatError,
@@ -713,6 +718,153 @@ class TestGetBestSubnetForIP(MAASServerTestCase):
         subnet = Subnet.objects.get_best_subnet_for_ip("::")
         self.expectThat(subnet, Is(None))
 
+    def test__uses_subnet_index_when_built(self):
+        subnet = factory.make_Subnet(cidr="10.1.1.0/24")
+        index = SubnetIndex()
+        self.assertTrue(index.rebuild())
+        self.patch(subnet_module, "subnet_index", index)
+        count, best = count_queries(
+            Subnet.objects.get_best_subnet_for_ip, "::ffff:10.1.1.1")
+        self.assertEqual(subnet, best)
+        self.assertEqual(0, count)
+
+
+class TestGetBestSubnetsForIPs(MAASServerTestCase):
+
+    def test__returns_most_specific_subnet_for_each_ip(self):
+        factory.make_Subnet(cidr="10.0.0.0/8")
+        subnet24 = factory.make_Subnet(cidr="10.1.1.0/24")
+        subnet16 = factory.make_Subnet(cidr="10.1.0.0/16")
+        subnet64 = factory.make_Subnet(cidr="2001:db8:1:2::/64")
+        subnets = Subnet.objects.get_best_subnets_for_ips(
+            ["10.1.1.1", "10.1.2.1", "::ffff:10.1.1.2", "2001:db8:1:2::1",
+             "192.168.0.1"])
+        self.assertEqual({
+            IPAddress("10.1.1.1"): subnet24,
+            IPAddress("10.1.2.1"): subnet16,
+            IPAddress("10.1.1.2"): subnet24,
+            IPAddress("2001:db8:1:2::1"): subnet64,
+        }, subnets)
+
+    def test__agrees_with_get_best_subnet_for_ip(self):
+        ips = []
+        for _ in range(3):
+            subnet = factory.make_Subnet()
+            ips.append(factory.pick_ip_in_Subnet(subnet))
+        subnets = Subnet.objects.get_best_subnets_for_ips(ips)
+        for ip in ips:
+            self.assertEqual(
+                Subnet.objects.get_best_subnet_for_ip(ip),
+                subnets[IPAddress(ip)])
+
+    def test__returns_empty_for_no_ips(self):
+        self.assertEqual({}, Subnet.objects.get_best_subnets_for_ips([]))
+
+
+class TestSubnetIndex(MAASServerTestCase):
+    """Tests for `SubnetIndex`."""
+
+    def make_index(self):
+        index = SubnetIndex()
+        self.assertTrue(index.rebuild())
+        return index
+
+    def test__unavailable_until_built(self):
+        self.assertRaises(
+            SubnetIndexUnavailable, SubnetIndex().get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+
+    def test__agrees_with_database(self):
+        factory.make_Subnet(cidr="10.0.0.0/8")
+        factory.make_Subnet(cidr="10.1.0.0/16")
+        factory.make_Subnet(cidr="10.1.1.0/24", dhcp_on=True)
+        factory.make_Subnet(cidr="10.1.1.0/25")
+        factory.make_Subnet(cidr="10.2.2.2/32", gateway_ip="")
+        factory.make_Subnet(cidr="2001:db8::/32")
+        factory.make_Subnet(cidr="2001:db8:1:2::/64")
+        index = self.make_index()
+        ips = [
+            "10.1.1.1", "10.1.1.200", "10.1.2.1", "10.2.2.2", "10.3.3.3",
+            "192.168.0.1", "2001:db8:1:2::1", "2001:db8:1:3::1", "::",
+        ]
+        for ip in ips:
+            self.expectThat(
+                index.get_best_subnet_for_ip(IPAddress(ip)),
+                Equals(Subnet.objects.get_best_subnet_for_ip(ip)), ip)
+
+    def test__prefers_subnets_on_vlans_with_dhcp(self):
+        expected_subnet = factory.make_Subnet(
+            cidr="10.1.0.0/16", dhcp_on=True)
+        factory.make_Subnet(cidr="10.1.1.0/24")
+        index = self.make_index()
+        self.assertEqual(
+            expected_subnet,
+            index.get_best_subnet_for_ip(IPAddress("10.1.1.1")))
+
+    def test__returns_new_instances(self):
+        factory.make_Subnet(cidr="10.1.1.0/24", dns_servers=["10.1.1.2"])
+        index = self.make_index()
+        subnet1 = index.get_best_subnet_for_ip(IPAddress("10.1.1.1"))
+        subnet2 = index.get_best_subnet_for_ip(IPAddress("10.1.1.1"))
+        self.assertIsNot(subnet1, subnet2)
+        self.assertIsNot(subnet1.dns_servers, subnet2.dns_servers)
+        self.assertEqual(
+            Subnet.objects.get(id=subnet1.id).dns_servers,
+            subnet1.dns_servers)
+        self.assertFalse(subnet1._state.adding)
+
+    def test__unavailable_after_invalidate(self):
+        index = self.make_index()
+        index.invalidate()
+        self.assertRaises(
+            SubnetIndexUnavailable, index.get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+
+    def test__unavailable_when_too_old(self):
+        now = [1000.0]
+        index = SubnetIndex(clock=lambda: now[0])
+        index.rebuild()
+        now[0] += index.max_age
+        self.assertIsNone(index.get_best_subnet_for_ip(IPAddress("10.0.0.1")))
+        now[0] += 1
+        self.assertRaises(
+            SubnetIndexUnavailable, index.get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+
+    def test__unavailable_after_local_changes_until_rolled_back(self):
+        index = self.make_index()
+        index.changed()
+        self.assertRaises(
+            SubnetIndexUnavailable, index.get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+        self.assertFalse(index.rebuild())
+        post_commit_hooks.reset()
+        self.assertIsNone(index.get_best_subnet_for_ip(IPAddress("10.0.0.1")))
+
+    def test__invalidated_when_local_changes_are_committed(self):
+        index = self.make_index()
+        index.changed()
+        post_commit_hooks.fire()
+        self.assertRaises(
+            SubnetIndexUnavailable, index.get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+        self.assertTrue(index.rebuild())
+        self.assertIsNone(index.get_best_subnet_for_ip(IPAddress("10.0.0.1")))
+
+    def test__rebuild_is_discarded_if_invalidated_meanwhile(self):
+        index = SubnetIndex()
+        values_list = Subnet.objects.values_list
+
+        def invalidate_then_query(*args):
+            index.invalidate()
+            return values_list(*args)
+
+        self.patch(Subnet.objects, "values_list", invalidate_then_query)
+        self.assertFalse(index.rebuild())
+        self.assertRaises(
+            SubnetIndexUnavailable, index.get_best_subnet_for_ip,
+            IPAddress("10.0.0.1"))
+
 
 class SubnetLabelTest(MAASServerTestCase):
 
@@ -30,12 +30,10 @@ from maasserver.forms import (
 )
 import maasserver.forms as maasserver_forms
 from maasserver.models import (
-    BlockDevice,
-    Filesystem,
     Interface,
-    Partition,
     Pod,
     ResourcePool,
+    StorageAllocationIndex,
     Subnet,
     Tag,
     VLAN,
@@ -132,6 +130,7 @@ IGNORED_FIELDS = {
     'verbose',
     'op',
     'agent_name',
+    'count',
 }
 
 
@@ -363,127 +362,59 @@ def nodes_by_storage(storage, node_ids=None):
     # Return early if no constraints were given
     if constraints is None:
         return None
+    # Devices are matched against the storage allocation index, which is
+    # kept up to date by triggers in the database, rather than joining block
+    # devices, partitions and filesystems here.
+    index = StorageAllocationIndex.objects.all()
+    if node_ids is not None:
+        index = index.filter(node_id__in=node_ids)
     matches = defaultdict(dict)
     root_device = True  # The 1st constraint refers to the node's 1st device
     for constraint_name, size, tags in constraints:
+        part_match = tags is not None and 'partition' in tags
+        if part_match:
+            tags = list(tags)
+            tags.remove('partition')
         if root_device:
             # This branch of the if is only used on first iteration.
             root_device = False
-            part_match = False
-
             # Use only block devices that are mounted as '/'. Either the
             # block device has root sitting on it or its on a partition on
-            # that block device.
-            filesystems = Filesystem.objects.filter(
-                mount_point='/', acquired=False)
-            if tags is not None and 'partition' in tags:
-                part_match = True
-                part_tags = list(tags)
-                part_tags.remove('partition')
-                filesystems = filesystems.filter(partition__size__gte=size)
-                if part_tags:
-                    filesystems = filesystems.filter(
-                        partition__tags__contains=part_tags)
-                if node_ids is not None:
-                    filesystems = filesystems.filter(
-                        Q(**{
-                            'partition__partition_table__block_device'
-                            '__node_id__in': node_ids
-                        }))
-            else:
-                filesystems = filesystems.filter(
-                    Q(block_device__size__gte=size) |
-                    Q(**{
-                        'partition__partition_table__block_device'
-                        '__size__gte': size
-                    }))
-                if tags:
-                    filesystems = filesystems.filter(
-                        Q(block_device__tags__contains=tags) |
-                        Q(**{
-                            'partition__partition_table__block_device'
-                            '__tags__contains': tags
-                        }))
-                if node_ids is not None:
-                    filesystems = filesystems.filter(
-                        Q(block_device__node_id__in=node_ids) |
-                        Q(**{
-                            'partition__partition_table__block_device'
-                            '__node_id__in': node_ids
-                        }))
-            filesystems = filesystems.prefetch_related(
-                'block_device', 'partition__partition_table__block_device')
-
-            # Only keep the first device for every node. This is done to make
-            # sure filtering out the size and tags is not done to all the
-            # block devices. This should only be done to the first block
-            # device.
-            found_nodes = set()
-            matched_devices = []
-            for filesystem in filesystems:
-                if part_match:
-                    device = filesystem.partition
-                    node_id = device.partition_table.block_device.node_id
-                elif filesystem.block_device is not None:
-                    device = filesystem.block_device
-                    node_id = device.node_id
-                else:
-                    device = (
-                        filesystem.partition.partition_table.block_device)
-                    node_id = device.node_id
-                if node_id in found_nodes:
-                    continue
-                matched_devices.append(device)
-                found_nodes.add(node_id)
-        elif tags is not None and 'partition' in tags:
-            # Query for any partition the closest size and the given tags.
-            # The partition must also be unused in the storage model.
-            part_tags = list(tags)
-            part_tags.remove('partition')
-            matched_devices = Partition.objects.filter(size__gte=size)
-            matched_devices = matched_devices.filter(filesystem__isnull=True)
-            if part_tags:
-                matched_devices = matched_devices.filter(
-                    tags__contains=part_tags)
-            if node_ids is not None:
-                matched_devices = matched_devices.filter(
-                    partition_table__block_device__node_id__in=node_ids)
-            matched_devices = list(matched_devices.order_by('size'))
+            # that block device. With a "partition" tag, use that partition
+            # instead.
+            devices = index.filter(root=True, size__gte=size)
+            if not tags:
+                tags = None
         else:
-            # Query for any block device the closest size and, if specified,
-            # the given tags. # The block device must also be unused in the
-            # storage model.
-            matched_devices = BlockDevice.objects.filter(size__gte=size)
-            matched_devices = matched_devices.filter(
-                filesystem__isnull=True, partitiontable__isnull=True)
-            if tags is not None:
-                matched_devices = matched_devices.filter(tags__contains=tags)
-            if node_ids is not None:
-                matched_devices = matched_devices.filter(
-                    node_id__in=node_ids)
-            matched_devices = list(matched_devices.order_by('size'))
+            # Query for any device the closest size and, if specified, the
+            # given tags. The device must also be unused in the storage
+            # model.
+            devices = index.filter(free=True, size__gte=size)
+            if part_match and not tags:
+                tags = None
+        if part_match:
+            devices = devices.filter(partition_id__isnull=False)
+        else:
+            devices = devices.filter(block_device_id__isnull=False)
+        if tags is not None:
+            devices = devices.filter(tags__contains=tags)
+        matched_devices = devices.order_by('size', 'id').values_list(
+            'node_id', 'block_device_id', 'partition_id')
 
         # Loop through all the returned devices. Insert only the first
         # device from each node into `matches`.
-        matched_in_loop = []
-        for device in matched_devices:
-            device_id = device.id
-            if isinstance(device, Partition):
-                device_type = 'partition'
-                device_node_id = device.partition_table.block_device.node_id
-            elif isinstance(device, BlockDevice):
-                device_type = 'blockdev'
-                device_node_id = device.node_id
+        matched_in_loop = set()
+        for device_node_id, block_device_id, partition_id in matched_devices:
+            if block_device_id is None:
+                device_info = ('partition', partition_id)
             else:
-                raise TypeError(
-                    "Unknown device type: %s" % type(device).__name__)
-
+                device_info = ('blockdev', block_device_id)
             if device_node_id in matched_in_loop:
                 continue
-            if (device_type, device_id) in matches[device_node_id]:
+            if device_info in matches[device_node_id]:
                 continue
-            matches[device_node_id][(device_type, device_id)] = constraint_name
-            matched_in_loop.append(device_node_id)
+            matches[device_node_id][device_info] = constraint_name
+            matched_in_loop.add(device_node_id)
 
     # Return only the nodes that have the correct number of disks.
     nodes = {
@@ -946,7 +877,12 @@ class AcquireNodeForm(RenamableFieldsForm):
         interfaces_label_map = self.cleaned_data.get(
             self.get_field_name('interfaces'))
         if interfaces_label_map is not None:
-            result = nodes_by_interface(interfaces_label_map)
+            # Only look at the interfaces of nodes that are still candidates.
+            result = nodes_by_interface(
+                interfaces_label_map, include_filter={
+                    'node_id__in': filtered_nodes.values_list(
+                        'id', flat=True),
+                })
             if result.node_ids is not None:
                 filtered_nodes = filtered_nodes.filter(id__in=result.node_ids)
                 compatible_interfaces = result.label_map
@@ -957,7 +893,9 @@ class AcquireNodeForm(RenamableFieldsForm):
         storage = self.cleaned_data.get(
             self.get_field_name('storage'))
         if storage:
-            compatible_nodes = nodes_by_storage(storage)
+            # Only look at the storage of nodes that are still candidates.
+            compatible_nodes = nodes_by_storage(
+                storage, node_ids=filtered_nodes.values_list('id', flat=True))
             node_ids = list(compatible_nodes)
             if node_ids is not None:
                 filtered_nodes = filtered_nodes.filter(id__in=node_ids)
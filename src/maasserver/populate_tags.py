@@ -43,7 +43,7 @@ from provisioningserver.rpc.cluster import EvaluateTag
 from provisioningserver.tags import (
     DEFAULT_BATCH_SIZE,
     gen_batches,
-    merge_details,
+    merged_details_cache,
 )
 from provisioningserver.utils import classify
 from provisioningserver.utils.twisted import (
@@ -213,7 +213,7 @@ def populate_tags_for_single_node(tags, node):
     connected.
     """
     probed_details = get_single_probed_details(node)
-    probed_details_doc = merge_details(probed_details)
+    probed_details_doc = merged_details_cache.get(probed_details)
     # Same document, many queries: use XPathEvaluator.
     evaluator = etree.XPathEvaluator(probed_details_doc, namespaces=tag_nsmap)
     evaluator = partial(try_match_xpath, doc=evaluator, logger=logger)
@@ -238,7 +238,7 @@ def populate_tag_for_multiple_nodes(tag, nodes, batch_size=DEFAULT_BATCH_SIZE):
     for batch in gen_batches(nodes, batch_size):
         probed_details = get_probed_details(batch)
         probed_details_docs_by_node = {
-            node: merge_details(probed_details[node.system_id])
+            node: merged_details_cache.get(probed_details[node.system_id])
             for node in batch
         }
         nodes_matching, nodes_nonmatching = classify(
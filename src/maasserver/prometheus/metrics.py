@@ -23,6 +23,30 @@ METRICS_DEFINITIONS = [
     MetricDefinition(
         'Histogram', 'http_request_latency', 'HTTP request latency',
         ['method', 'path', 'status']),
+    MetricDefinition(
+        'Counter', 'config_cache_hits',
+        'Config lookups answered from the in-process cache', []),
+    MetricDefinition(
+        'Counter', 'config_cache_misses',
+        'Config lookups that could not be answered from the in-process '
+        'cache', []),
+    MetricDefinition(
+        'Counter', 'config_cache_invalidations',
+        'Times the in-process config cache was dropped', []),
+    MetricDefinition(
+        'Counter', 'listener_notifications_dropped',
+        'Database notifications dropped by coalescing', ['channel']),
+    MetricDefinition(
+        'Gauge', 'power_query_lag',
+        'Seconds since the longest-waiting node handed to a rack controller '
+        'for power querying was last queried', ['rack']),
+    MetricDefinition(
+        'Gauge', 'status_message_queue_depth',
+        'Status messages from nodes waiting to be processed', []),
+    MetricDefinition(
+        'Histogram', 'status_message_processing_lag',
+        'Seconds between a node sending a queued status message and it '
+        'being processed', []),
 ]
 
 
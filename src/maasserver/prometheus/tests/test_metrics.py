@@ -38,7 +38,11 @@ class TestCreateMetrics(MAASTestCase):
         prometheus_metrics = metrics.create_metrics()
         self.assertIsInstance(prometheus_metrics, metrics.PrometheusMetrics)
         self.assertEqual(
-            prometheus_metrics.available_metrics, ['http_request_latency'])
+            prometheus_metrics.available_metrics,
+            ['http_request_latency', 'config_cache_hits',
+             'config_cache_misses', 'config_cache_invalidations',
+             'listener_notifications_dropped', 'power_query_lag',
+             'status_message_queue_depth', 'status_message_processing_lag'])
 
     def test_metrics_prometheus_not_availble(self):
         self.patch(metrics, 'PROMETHEUS_SUPPORTED', False)
@@ -0,0 +1,19 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Service that keeps this process's config cache up to date."""
+
+__all__ = [
+    "ConfigCacheService"
+]
+
+from maasserver.models.config import config_cache
+from maasserver.regiondservices.process_cache import ProcessCacheService
+
+
+class ConfigCacheService(ProcessCacheService):
+    """Rebuild the config cache when config items change."""
+
+    cache = config_cache
+    channels = ("config",)
+    description = "config cache"
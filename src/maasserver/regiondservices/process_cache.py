@@ -0,0 +1,89 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Base service that keeps an in-process cache up to date."""
+
+__all__ = [
+    "ProcessCacheService"
+]
+
+from maasserver.utils.orm import transactional
+from maasserver.utils.threads import deferToDatabase
+from provisioningserver.logger import LegacyLogger
+from twisted.application.internet import TimerService
+from twisted.internet import reactor
+from twisted.internet.defer import inlineCallbacks
+
+
+log = LegacyLogger()
+
+
+class ProcessCacheService(TimerService):
+    """Rebuild a `ProcessCache` when the state it holds changes.
+
+    The cache is dropped as soon as the database notifies on one of
+    `channels`; until it has been rebuilt, lookups use the database.
+    Notifications that arrive while rebuilding cause one more rebuild. The
+    cache is also rebuilt periodically, well before it is considered to be
+    out of date, in case a notification from the database was missed.
+
+    Subclasses set `cache`, `channels`, and `description`.
+    """
+
+    cache = None
+    channels = ()
+    description = None
+
+    def __init__(self, clock=reactor, postgresListener=None):
+        super().__init__(self.cache.max_age / 2, self.rebuild)
+        self.clock = clock
+        self.listener = postgresListener
+        self.pending = False
+        self.rebuilding = None
+
+    def startService(self):
+        super().startService()
+        if self.listener is not None:
+            for channel in self.channels:
+                self.listener.register(channel, self.cacheChanged)
+
+    def stopService(self):
+        if self.listener is not None:
+            for channel in self.channels:
+                self.listener.unregister(channel, self.cacheChanged)
+        return super().stopService()
+
+    def cacheChanged(self, action=None, obj_id=None):
+        """Called when the postgresListener reports a change."""
+        self.cache.invalidate()
+        self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the cache in a new transaction.
+
+        If a rebuild is already in progress, another follows it.
+        """
+        self.pending = True
+        if self.rebuilding is None:
+            d = self._rebuildWhilePending()
+            d.addErrback(
+                log.err, "Failed to rebuild the %s." % self.description)
+            if not d.called:
+                self.rebuilding = d
+
+    @inlineCallbacks
+    def _rebuildWhilePending(self):
+        try:
+            while self.pending:
+                self.pending = False
+                rebuilt = yield deferToDatabase(self._rebuildCache)
+                if not rebuilt:
+                    # Invalidated while rebuilding; a notification will have
+                    # set pending again, but don't count on it.
+                    self.pending = True
+        finally:
+            self.rebuilding = None
+
+    @transactional
+    def _rebuildCache(self):
+        return self.cache.rebuild()
@@ -0,0 +1,19 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Service that keeps this process's subnet index up to date."""
+
+__all__ = [
+    "SubnetIndexService"
+]
+
+from maasserver.models.subnet import subnet_index
+from maasserver.regiondservices.process_cache import ProcessCacheService
+
+
+class SubnetIndexService(ProcessCacheService):
+    """Rebuild the subnet index when subnets or VLANs change."""
+
+    cache = subnet_index
+    channels = ("subnet", "vlan")
+    description = "subnet index"
@@ -0,0 +1,97 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the config cache service."""
+
+__all__ = []
+
+from unittest.mock import Mock
+
+from maasserver.regiondservices import process_cache
+from maasserver.regiondservices.config_cache import ConfigCacheService
+from maastesting.matchers import (
+    DocTestMatches,
+    MockCalledOnceWith,
+    MockNotCalled,
+)
+from maastesting.testcase import MAASTestCase
+from maastesting.twisted import TwistedLoggerFixture
+from testtools.matchers import MatchesStructure
+from twisted.internet.defer import (
+    Deferred,
+    fail,
+    succeed,
+)
+from twisted.internet.task import Clock
+
+
+class TestConfigCacheService(MAASTestCase):
+
+    def make_service(self, listener=None):
+        service = ConfigCacheService(Clock(), listener)
+        service.cache = Mock()
+        return service
+
+    def patch_deferToDatabase(self, *results):
+        return self.patch(
+            process_cache, "deferToDatabase", Mock(side_effect=results))
+
+    def test_registers_and_unregisters_listener(self):
+        listener = Mock()
+        service = self.make_service(listener)
+        self.patch_deferToDatabase(succeed(True))
+        service.startService()
+        self.assertThat(service, MatchesStructure.byEquality(
+            call=(service.rebuild, (), {}),
+            step=ConfigCacheService.cache.max_age / 2))
+        self.assertThat(listener.register, MockCalledOnceWith(
+            "config", service.cacheChanged))
+        self.assertThat(listener.unregister, MockNotCalled())
+        service.stopService()
+        self.assertThat(listener.unregister, MockCalledOnceWith(
+            "config", service.cacheChanged))
+
+    def test_rebuilds_cache_in_database_thread(self):
+        service = self.make_service()
+        deferToDatabase = self.patch_deferToDatabase(succeed(True))
+        service.rebuild()
+        self.assertThat(
+            deferToDatabase, MockCalledOnceWith(service._rebuildCache))
+        self.assertIsNone(service.rebuilding)
+
+    def test_cacheChanged_invalidates_and_rebuilds(self):
+        service = self.make_service()
+        rebuild = self.patch(service, "rebuild")
+        service.cacheChanged("update", "1")
+        self.assertThat(service.cache.invalidate, MockCalledOnceWith())
+        self.assertThat(rebuild, MockCalledOnceWith())
+
+    def test_rebuilds_again_after_changes_during_rebuild(self):
+        service = self.make_service()
+        first = Deferred()
+        deferToDatabase = self.patch_deferToDatabase(first, succeed(True))
+        service.rebuild()
+        service.rebuild()
+        service.rebuild()
+        self.assertThat(deferToDatabase, MockCalledOnceWith(
+            service._rebuildCache))
+        first.callback(True)
+        self.assertEqual(2, deferToDatabase.call_count)
+        self.assertIsNone(service.rebuilding)
+
+    def test_rebuilds_again_if_invalidated_while_rebuilding(self):
+        service = self.make_service()
+        deferToDatabase = self.patch_deferToDatabase(
+            succeed(False), succeed(True))
+        service.rebuild()
+        self.assertEqual(2, deferToDatabase.call_count)
+
+    def test_logs_failures(self):
+        service = self.make_service()
+        self.patch_deferToDatabase(fail(ZeroDivisionError()))
+        with TwistedLoggerFixture() as logger:
+            service.rebuild()
+        self.assertThat(logger.output, DocTestMatches(
+            "Failed to rebuild the config cache.\n"
+            "Traceback (most recent call last):\n..."))
+        self.assertIsNone(service.rebuilding)
@@ -7,14 +7,22 @@ __all__ = [
     "get_config",
 ]
 
+from collections import defaultdict
 import re
 import shlex
+import threading
 
 from django.core.exceptions import (
     ObjectDoesNotExist,
     ValidationError,
 )
-from django.db.models import Q
+from django.db.models import (
+    Case,
+    F,
+    Q,
+    Value,
+    When,
+)
 from maasserver.compose_preseed import RSYSLOG_PORT
 from maasserver.dns.config import get_resource_name_for_subnet
 from maasserver.enum import (
@@ -25,6 +33,7 @@ from maasserver.models import (
     BootResource,
     Config,
     Event,
+    Interface,
     Node,
     RackController,
     Subnet,
@@ -38,15 +47,22 @@ from maasserver.preseed import (
 from maasserver.third_party_drivers import get_third_party_driver
 from maasserver.utils.orm import transactional
 from maasserver.utils.osystems import validate_hwe_kernel
+from maasserver.utils.threads import deferToDatabase
 from provisioningserver.events import EVENT_TYPES
+from provisioningserver.logger import LegacyLogger
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.utils.network import get_source_address
 from provisioningserver.utils.twisted import (
+    asynchronous,
+    FOREVER,
     synchronous,
     undefined,
 )
 from provisioningserver.utils.url import splithost
+from twisted.internet import reactor
+
 
+log = LegacyLogger()
 
 DEFAULT_ARCH = 'i386'
 
@@ -270,6 +286,209 @@ def get_base_url_for_local_ip(local_ip, internal_domain):
         return 'http://%s:5248/' % local_ip
 
 
+class BootBookkeeper:
+    """Write the bookkeeping done for booting machines in batches.
+
+    `get_config` records the rack controller, BIOS boot method, boot
+    interface and status expiry of each machine that asks for its boot
+    configuration. Rather than have the booting machine wait for those
+    writes, they are recorded here, coalesced per machine, and written
+    shortly afterwards with a single UPDATE per field.
+    """
+
+    # Seconds to wait for more updates before writing them out.
+    delay = 1.0
+
+    def __init__(self, clock=reactor):
+        super(BootBookkeeper, self).__init__()
+        self.clock = clock
+        self.lock = threading.Lock()
+        # Maps node IDs to (status, {field: value}).
+        self.nodes = {}
+        # Maps interface IDs to VLAN IDs.
+        self.interfaces = {}
+        self.scheduled = False
+
+    def update_node(self, node, fields):
+        """Record that `fields` of `node` need to be written.
+
+        Later updates to the same field of the same node replace earlier
+        ones. The node's status is recorded so that `status_expires` is only
+        written if the node is still in that status.
+        """
+        with self.lock:
+            _, pending = self.nodes.get(node.id, (None, {}))
+            pending.update(fields)
+            self.nodes[node.id] = node.status, pending
+            self._schedule()
+
+    def update_interface_vlan(self, interface, vlan):
+        """Record that `interface` needs to be moved onto `vlan`."""
+        with self.lock:
+            self.interfaces[interface.id] = vlan.id
+            self._schedule()
+
+    def _schedule(self):
+        """Arrange for pending updates to be written, if not already."""
+        if not self.scheduled:
+            self.scheduled = True
+            self._writeLater()
+
+    @asynchronous(timeout=FOREVER)  # This will return very quickly.
+    def _writeLater(self):
+        self.clock.callLater(self.delay, self._write)
+
+    def _write(self):
+        d = deferToDatabase(self.write_pending)
+        d.addErrback(log.err, "Failed to write boot bookkeeping.")
+        return d
+
+    def write_pending(self):
+        """Write all pending updates to the database.
+
+        The pending updates are taken before the transaction begins so that
+        a retried transaction writes them again. If writing fails for good,
+        they are merged back into the pending updates and written later.
+        """
+        with self.lock:
+            nodes, self.nodes = self.nodes, {}
+            interfaces, self.interfaces = self.interfaces, {}
+            self.scheduled = False
+        try:
+            self._write_updates(nodes, interfaces)
+        except Exception:
+            self._restore(nodes, interfaces)
+            raise
+
+    def _restore(self, nodes, interfaces):
+        """Merge updates that could not be written back into those pending.
+
+        Updates recorded since take precedence over those being restored.
+        """
+        with self.lock:
+            for node_id, (status, fields) in nodes.items():
+                if node_id in self.nodes:
+                    status, newer = self.nodes[node_id]
+                    fields.update(newer)
+                self.nodes[node_id] = status, fields
+            for interface_id, vlan_id in interfaces.items():
+                self.interfaces.setdefault(interface_id, vlan_id)
+            self._schedule()
+
+    @transactional
+    def _write_updates(self, nodes, interfaces):
+        self._update_nodes(nodes)
+        self._update_interfaces(interfaces)
+
+    def _update_nodes(self, nodes):
+        # Build one CASE expression per field across all nodes. Changing the
+        # boot interface changes the boot configuration, which is
+        # invalidated by signals, so those nodes are saved individually
+        # instead. They are rare.
+        cases = defaultdict(list)
+        boot_interfaces = {}
+        for node_id, (status, fields) in nodes.items():
+            for name, value in fields.items():
+                if name == "boot_interface_id":
+                    boot_interfaces[node_id] = value
+                    continue
+                elif name == "status_expires":
+                    when = When(
+                        id=node_id, status=status,
+                        status_expires__isnull=False, then=Value(value))
+                else:
+                    when = When(id=node_id, then=Value(value))
+                cases[name].append(when)
+        for name, whens in cases.items():
+            Node.objects.filter(id__in=nodes.keys()).update(**{
+                name: Case(
+                    *whens, default=F(name),
+                    output_field=Node._meta.get_field(name)),
+            })
+        for node in Node.objects.filter(id__in=boot_interfaces.keys()):
+            node.boot_interface_id = boot_interfaces[node.id]
+            # Only the changed field is written.
+            node.save()
+
+    def _update_interfaces(self, interfaces):
+        # Moving an interface to another VLAN has consequences for its
+        # links, so these are saved individually. They are rare.
+        for interface in Interface.objects.filter(id__in=interfaces.keys()):
+            vlan_id = interfaces[interface.id]
+            if interface.vlan_id != vlan_id:
+                interface.vlan_id = vlan_id
+                interface.save()
+
+
+boot_bookkeeper = BootBookkeeper()
+
+
+def update_boot_bookkeeping(
+        machine, rack_controller, local_ip, mac, bios_boot_method):
+    """Update the boot interface, cluster IP and BIOS boot method of `machine`.
+
+    The changes are made to `machine` for the rest of the request, but
+    written to the database later by `boot_bookkeeper` so that the booting
+    machine does not wait.
+    """
+    updates = {}
+    if machine.boot_cluster_ip != local_ip:
+        machine.boot_cluster_ip = local_ip
+        updates["boot_cluster_ip"] = local_ip
+
+    if machine.bios_boot_method != bios_boot_method:
+        machine.bios_boot_method = bios_boot_method
+        updates["bios_boot_method"] = bios_boot_method
+
+    try:
+        boot_interface = machine.interface_set.get(mac_address=mac)
+    except ObjectDoesNotExist:
+        # MAC is unknown or wasn't sent. Determine the boot_interface using
+        # the boot_cluster_ip.
+        subnet = Subnet.objects.get_best_subnet_for_ip(local_ip)
+        if subnet:
+            boot_interface = machine.interface_set.filter(
+                vlan=subnet.vlan).first()
+        else:
+            boot_interface = machine.boot_interface
+    else:
+        # Update the VLAN of the boot interface to be the same VLAN for the
+        # interface on the rack controller that the machine communicated
+        # with, unless the VLAN is being relayed.
+        rack_interface = rack_controller.interface_set.filter(
+            ip_addresses__ip=local_ip).select_related('vlan').first()
+        if (rack_interface is not None and
+                boot_interface.vlan_id != rack_interface.vlan_id):
+            # Rack controller and machine is not on the same VLAN, with
+            # DHCP relay this is possible. Lets ensure that the VLAN on the
+            # interface is setup to relay through the identified VLAN.
+            if not VLAN.objects.filter(
+                    id=boot_interface.vlan_id,
+                    relay_vlan=rack_interface.vlan_id).exists():
+                # DHCP relay is not being performed for that VLAN. Set the
+                # VLAN to the VLAN of the rack controller.
+                boot_interface.vlan = rack_interface.vlan
+                boot_bookkeeper.update_interface_vlan(
+                    boot_interface, rack_interface.vlan)
+
+    boot_interface_id = machine.boot_interface_id
+    machine.boot_interface = boot_interface
+    if machine.boot_interface_id != boot_interface_id:
+        updates["boot_interface_id"] = machine.boot_interface_id
+
+    # Reset the machine's status_expires whenever the boot_config is called
+    # on a known machine. This allows a machine to take up to the maximum
+    # timeout status to POST.
+    status_expires = machine.status_expires
+    machine.reset_status_expires()
+    if machine.status_expires != status_expires:
+        updates["status_expires"] = machine.status_expires
+
+    # Does nothing if the machine hasn't changed.
+    if len(updates) > 0:
+        boot_bookkeeper.update_node(machine, updates)
+
+
 @synchronous
 @transactional
 def get_config(
@@ -324,49 +543,8 @@ def get_config(
             log_port = 514  # Fallback to default UDP syslog port.
 
     if machine is not None:
-        # Update the last interface, last access cluster IP address, and
-        # the last used BIOS boot method.
-        if machine.boot_cluster_ip != local_ip:
-            machine.boot_cluster_ip = local_ip
-
-        if machine.bios_boot_method != bios_boot_method:
-            machine.bios_boot_method = bios_boot_method
-
-        try:
-            machine.boot_interface = machine.interface_set.get(mac_address=mac)
-        except ObjectDoesNotExist:
-            # MAC is unknown or wasn't sent. Determine the boot_interface using
-            # the boot_cluster_ip.
-            subnet = Subnet.objects.get_best_subnet_for_ip(local_ip)
-            if subnet:
-                machine.boot_interface = machine.interface_set.filter(
-                    vlan=subnet.vlan).first()
-        else:
-            # Update the VLAN of the boot interface to be the same VLAN for the
-            # interface on the rack controller that the machine communicated
-            # with, unless the VLAN is being relayed.
-            rack_interface = rack_controller.interface_set.filter(
-                ip_addresses__ip=local_ip).select_related('vlan').first()
-            if (rack_interface is not None and
-                    machine.boot_interface.vlan_id != rack_interface.vlan_id):
-                # Rack controller and machine is not on the same VLAN, with
-                # DHCP relay this is possible. Lets ensure that the VLAN on the
-                # interface is setup to relay through the identified VLAN.
-                if not VLAN.objects.filter(
-                        id=machine.boot_interface.vlan_id,
-                        relay_vlan=rack_interface.vlan_id).exists():
-                    # DHCP relay is not being performed for that VLAN. Set the
-                    # VLAN to the VLAN of the rack controller.
-                    machine.boot_interface.vlan = rack_interface.vlan
-                    machine.boot_interface.save()
-
-        # Reset the machine's status_expires whenever the boot_config is called
-        # on a known machine. This allows a machine to take up to the maximum
-        # timeout status to POST.
-        machine.reset_status_expires()
-
-        # Does nothing if the machine hasn't changed.
-        machine.save()
+        update_boot_bookkeeping(
+            machine, rack_controller, local_ip, mac, bios_boot_method)
 
         arch, subarch = machine.split_arch()
         if configs['use_rack_proxy']:
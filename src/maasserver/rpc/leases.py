@@ -5,24 +5,36 @@
 
 __all__ = [
     "update_lease",
+    "update_leases",
 ]
 
+from collections import defaultdict
 from datetime import datetime
 
 from maasserver.enum import (
     IPADDRESS_FAMILY,
     IPADDRESS_TYPE,
+    IPRANGE_TYPE,
 )
 from maasserver.models import (
     DNSResource,
     Interface,
+    IPRange,
     Node,
     StaticIPAddress,
     Subnet,
     UnknownInterface,
 )
-from maasserver.utils.orm import transactional
-from netaddr import IPAddress
+from maasserver.utils.orm import (
+    savepoint,
+    transactional,
+)
+from netaddr import (
+    AddrFormatError,
+    EUI,
+    IPAddress,
+    mac_unix_expanded,
+)
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils.network import coerce_to_valid_hostname
 from provisioningserver.utils.twisted import synchronous
@@ -44,48 +56,17 @@ def _is_valid_hostname(hostname):
     )
 
 
-@synchronous
-@transactional
-def update_lease(
-        action, mac, ip_family, ip, timestamp,
-        lease_time=None, hostname=None):
-    """Update one DHCP leases from a cluster.
-
-    :param action: DHCP action taken on the cluster as found in
-        :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param mac: MAC address for the action taken on the cluster as found in
-        :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param ip_family: IP address family for the action taken on the cluster as
-        found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param ip: IP address for the action taken on the cluster as found in
-        :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param timestamp: Epoch time for the action taken on the cluster as found
-        in :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param lease_time: Number of seconds the lease is active on the cluster
-        as found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
-    :param hostname: Hostname of the machine for the lease on the cluster as
-        found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
-
-    Based on the action a DISCOVERED StaticIPAddress will be either created or
-    updated for a Interface that matches `mac`.
-
-    Actions:
-        commit -  When a new lease is given to a client. `lease_time` is
-                  required for this action. `hostname` is optional.
-        expiry -  When a lease has expired. Occurs when a client fails to renew
-                  their lease before the end of the `lease_time`.
-        release - When a client explicitly releases the lease.
+def _check_lease(action, ip_family, ip, subnet):
+    """Check that a lease update can be applied to `subnet`.
 
-    :raises NoSuchCluster: If the cluster identified by `cluster_uuid` does not
-        exist.
+    :raises LeaseUpdateError: If it cannot.
     """
     # Check for a valid action.
     if action not in ["commit", "expiry", "release"]:
         raise LeaseUpdateError("Unknown lease action: %s" % action)
 
-    # Get the subnet for this IP address. If no subnet exists then something
-    # is wrong as we should not be recieving message about unknown subnets.
-    subnet = Subnet.objects.get_best_subnet_for_ip(ip)
+    # If no subnet exists then something is wrong as we should not be
+    # recieving message about unknown subnets.
     if subnet is None:
         raise LeaseUpdateError("No subnet exists for: %s" % ip)
 
@@ -98,37 +79,28 @@ def update_lease(
         raise LeaseUpdateError(
             "Family for the subnet does not match. Expected: %s" % ip_family)
 
-    created = datetime.fromtimestamp(timestamp)
+
+def _log_lease(action, mac, ip, created, lease_time, hostname):
     log.msg("Lease update: %s for %s on %s at %s%s%s" % (
         action, ip, mac, created,
         ' (lease time: %ss)' % lease_time if lease_time is not None else '',
         ' (hostname: %s)' % hostname if _is_valid_hostname(hostname) else ''
     ))
 
-    # We will recieve actions on all addresses in the subnet. We only want
-    # to update the addresses in the dynamic range.
-    dynamic_range = subnet.get_dynamic_range_for_ip(IPAddress(ip))
-    if dynamic_range is None:
-        # Do nothing.
-        return {}
 
-    interfaces = list(Interface.objects.filter(mac_address=mac))
-    if len(interfaces) == 0 and action == "commit":
-        # A MAC address that is unknown to MAAS was given an IP address. Create
-        # an unknown interface for this lease.
-        unknown_interface = UnknownInterface(
-            name="eth0", mac_address=mac, vlan_id=subnet.vlan_id)
-        unknown_interface.save()
-        interfaces = [unknown_interface]
-    elif len(interfaces) == 0:
-        # No interfaces and not commit action so nothing needs to be done.
-        return {}
+def _apply_lease(
+        action, ip, subnet, interfaces, created, lease_time, hostname,
+        hostname_belongs_to_a_node):
+    """Record the lease action in DISCOVERED addresses for `interfaces`.
 
+    :param hostname_belongs_to_a_node: A callable that returns whether the
+        given hostname is that of a node.
+    """
     sip = None
     # Delete all discovered IP addresses attached to all interfaces of the same
     # IP address family.
     old_family_addresses = StaticIPAddress.objects.filter_by_ip_family(
-        subnet_family)
+        subnet.get_ipnetwork().version)
     old_family_addresses = old_family_addresses.filter(
         alloc_type=IPADDRESS_TYPE.DISCOVERED,
         interface__in=interfaces)
@@ -166,11 +138,8 @@ def update_lease(
         if sip_hostname is not None:
             # MAAS automatically manages DNS for node hostnames, so we cannot
             # allow a DHCP client to override that.
-            hostname_belongs_to_a_node = (
-                Node.objects.filter(
-                    hostname=coerce_to_valid_hostname(sip_hostname)).exists()
-            )
-            if hostname_belongs_to_a_node:
+            if hostname_belongs_to_a_node(
+                    coerce_to_valid_hostname(sip_hostname)):
                 # Ensure we don't allow a DHCP hostname to override a node
                 # hostname.
                 DNSResource.objects.release_dynamic_hostname(sip)
@@ -187,4 +156,161 @@ def update_lease(
             sip.save()
         for interface in interfaces:
             interface.ip_addresses.add(sip)
+
+
+def _create_unknown_interface(mac, subnet):
+    """Create an interface for a MAC address unknown to MAAS that was given
+    an IP address."""
+    unknown_interface = UnknownInterface(
+        name="eth0", mac_address=mac, vlan_id=subnet.vlan_id)
+    unknown_interface.save()
+    return unknown_interface
+
+
+@synchronous
+@transactional
+def update_lease(
+        action, mac, ip_family, ip, timestamp,
+        lease_time=None, hostname=None):
+    """Update one DHCP leases from a cluster.
+
+    :param action: DHCP action taken on the cluster as found in
+        :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param mac: MAC address for the action taken on the cluster as found in
+        :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param ip_family: IP address family for the action taken on the cluster as
+        found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param ip: IP address for the action taken on the cluster as found in
+        :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param timestamp: Epoch time for the action taken on the cluster as found
+        in :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param lease_time: Number of seconds the lease is active on the cluster
+        as found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
+    :param hostname: Hostname of the machine for the lease on the cluster as
+        found in :py:class`~provisioningserver.rpc.region.UpdateLease`.
+
+    Based on the action a DISCOVERED StaticIPAddress will be either created or
+    updated for a Interface that matches `mac`.
+
+    Actions:
+        commit -  When a new lease is given to a client. `lease_time` is
+                  required for this action. `hostname` is optional.
+        expiry -  When a lease has expired. Occurs when a client fails to renew
+                  their lease before the end of the `lease_time`.
+        release - When a client explicitly releases the lease.
+
+    :raises NoSuchCluster: If the cluster identified by `cluster_uuid` does not
+        exist.
+    """
+    # Get the subnet for this IP address.
+    subnet = Subnet.objects.get_best_subnet_for_ip(ip)
+    _check_lease(action, ip_family, ip, subnet)
+
+    created = datetime.fromtimestamp(timestamp)
+    _log_lease(action, mac, ip, created, lease_time, hostname)
+
+    # We will recieve actions on all addresses in the subnet. We only want
+    # to update the addresses in the dynamic range.
+    dynamic_range = subnet.get_dynamic_range_for_ip(IPAddress(ip))
+    if dynamic_range is None:
+        # Do nothing.
+        return {}
+
+    interfaces = list(Interface.objects.filter(mac_address=mac))
+    if len(interfaces) == 0 and action == "commit":
+        # A MAC address that is unknown to MAAS was given an IP address. Create
+        # an unknown interface for this lease.
+        interfaces = [_create_unknown_interface(mac, subnet)]
+    elif len(interfaces) == 0:
+        # No interfaces and not commit action so nothing needs to be done.
+        return {}
+
+    def hostname_belongs_to_a_node(hostname):
+        return Node.objects.filter(hostname=hostname).exists()
+
+    _apply_lease(
+        action, ip, subnet, interfaces, created, lease_time, hostname,
+        hostname_belongs_to_a_node)
+    return {}
+
+
+def _normalise_mac(mac):
+    """Return `mac` in the form PostgreSQL gives MAC addresses."""
+    return str(EUI(str(mac), dialect=mac_unix_expanded))
+
+
+@synchronous
+@transactional
+def update_leases(updates):
+    """Update many DHCP leases from a cluster in one transaction.
+
+    The subnets, dynamic ranges, interfaces, and node hostnames that the
+    updates refer to are fetched up front, a query for each, then each
+    update is applied as `update_lease` would, in the order given, each in
+    its own savepoint. Updates that cannot be applied, or that fail, are
+    logged and skipped without losing the rest of the batch.
+
+    :param updates: A list of dicts with the arguments of `update_lease`,
+        as found in :py:class`~provisioningserver.rpc.region.UpdateLeases`.
+    """
+    checked = []
+    for update in updates:
+        try:
+            ip = IPAddress(update["ip"])
+            mac = _normalise_mac(update["mac"])
+        except (AddrFormatError, TypeError, ValueError) as error:
+            log.msg("Ignoring lease update: %s" % error)
+        else:
+            checked.append((update, ip, mac))
+
+    subnets = Subnet.objects.get_best_subnets_for_ips(
+        ip for _, ip, _ in checked)
+    dynamic_ranges = defaultdict(list)
+    for ip_range in IPRange.objects.filter(
+            subnet__in=subnets.values(), type=IPRANGE_TYPE.DYNAMIC):
+        dynamic_ranges[ip_range.subnet_id].append(
+            ip_range.netaddr_iprange)
+    interfaces = defaultdict(list)
+    for interface in Interface.objects.filter(
+            mac_address__in={mac for _, _, mac in checked}):
+        interfaces[_normalise_mac(interface.mac_address)].append(interface)
+    node_hostnames = set(Node.objects.filter(hostname__in={
+        coerce_to_valid_hostname(update["hostname"])
+        for update, _, _ in checked
+        if _is_valid_hostname(update.get("hostname"))
+    }).values_list("hostname", flat=True))
+
+    for update, ip, mac in checked:
+        action, ip_family = update["action"], update["ip_family"]
+        lease_time, hostname = update.get("lease_time"), update.get("hostname")
+        subnet = subnets.get(ip.ipv4() if ip.is_ipv4_mapped() else ip)
+        try:
+            _check_lease(action, ip_family, ip, subnet)
+        except LeaseUpdateError as error:
+            log.msg("Ignoring lease update: %s" % error)
+            continue
+
+        created = datetime.fromtimestamp(update["timestamp"])
+        _log_lease(action, mac, ip, created, lease_time, hostname)
+
+        # We will recieve actions on all addresses in the subnet. We only
+        # want to update the addresses in the dynamic range.
+        if not any(ip in ip_range for ip_range in dynamic_ranges[subnet.id]):
+            continue
+
+        known_interfaces = interfaces[mac]
+        if len(known_interfaces) == 0 and action != "commit":
+            continue
+        try:
+            with savepoint():
+                if len(interfaces[mac]) == 0:
+                    interfaces[mac] = [_create_unknown_interface(mac, subnet)]
+                _apply_lease(
+                    action, str(ip), subnet, interfaces[mac], created,
+                    lease_time, hostname,
+                    lambda hostname: hostname in node_hostnames)
+        except Exception:
+            log.err(None, "Failed to update lease for %s (%s)." % (ip, mac))
+            # Forget an interface created in the rolled back savepoint.
+            interfaces[mac] = known_interfaces
     return {}
@@ -19,6 +19,7 @@ import json
 
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.db.models import Min
 from maasserver import (
     exceptions,
     ntp,
@@ -32,6 +33,7 @@ from maasserver.models import (
     RackController,
 )
 from maasserver.models.timestampedmodel import now
+from maasserver.prometheus.metrics import PROMETHEUS_METRICS
 from maasserver.utils.orm import transactional
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
 from provisioningserver.rpc.exceptions import (
@@ -167,8 +169,18 @@ def list_cluster_nodes_power_parameters(system_id, limit=10):
         detail["system_id"]
         for detail in details
     ]
-    Node.objects.filter(
-        system_id__in=system_ids).update(power_state_queried=now())
+    nodes = Node.objects.filter(system_id__in=system_ids)
+    queried = nodes.exclude(power_state_queried=None).aggregate(
+        oldest=Min("power_state_queried"))["oldest"]
+    current_time = now()
+    if queried is not None:
+        # Record how far behind power querying is for this rack. Nodes are
+        # due again five minutes after they were last queried.
+        PROMETHEUS_METRICS.update(
+            "power_query_lag", "set",
+            value=(current_time - queried).total_seconds(),
+            labels={"rack": system_id})
+    nodes.update(power_state_queried=current_time)
 
     return details
 
@@ -217,10 +217,12 @@ def update_foreign_dhcp(system_id, interface_name, dhcp_ip=None):
 
 @synchronous
 @transactional
-def update_interfaces(system_id, interfaces, topology_hints=None):
+def update_interfaces(
+        system_id, interfaces, topology_hints=None, fingerprint=None):
     """Update the interface definition on the rack controller."""
     rack_controller = RackController.objects.get(system_id=system_id)
-    rack_controller.update_interfaces(interfaces, topology_hints)
+    rack_controller.update_interfaces(
+        interfaces, topology_hints, fingerprint=fingerprint)
 
 
 @synchronous
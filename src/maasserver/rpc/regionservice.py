@@ -160,6 +160,22 @@ class Region(RPCProtocol):
         # region recieves the message.
         return d
 
+    @region.UpdateLeases.responder
+    def update_leases(self, cluster_uuid, updates):
+        """update_leases(cluster_uuid, updates)
+
+        Implementation of
+        :py:class`~provisioningserver.rpc.region.UpdateLeases`.
+        """
+        dbtasks = eventloop.services.getServiceNamed("database-tasks")
+        d = dbtasks.deferTask(leases.update_leases, updates)
+        d.addErrback(log.err, "Unhandled failure in updating leases.")
+        d.addCallback(lambda _: {})
+
+        # Wait for the batch to be handled, as for `update_lease`, so that
+        # the cluster sends one batch at a time.
+        return d
+
     @amp.StartTLS.responder
     def get_tls_parameters(self):
         """get_tls_parameters()
@@ -380,7 +396,9 @@ class Region(RPCProtocol):
         return d
 
     @region.UpdateInterfaces.responder
-    def update_interfaces(self, system_id, interfaces, topology_hints=None):
+    def update_interfaces(
+            self, system_id, interfaces, topology_hints=None,
+            fingerprint=None):
         """update_interfaces()
 
         Implementation of
@@ -388,7 +406,7 @@ class Region(RPCProtocol):
         """
         d = deferToDatabase(
             rackcontrollers.update_interfaces, system_id, interfaces,
-            topology_hints=topology_hints)
+            topology_hints=topology_hints, fingerprint=fingerprint)
         d.addCallback(lambda args: {})
         return d
 
@@ -17,9 +17,11 @@ from maasserver.enum import (
 from maasserver.models import DNSResource
 from maasserver.models.interface import UnknownInterface
 from maasserver.models.staticipaddress import StaticIPAddress
+from maasserver.rpc import leases as leases_module
 from maasserver.rpc.leases import (
     LeaseUpdateError,
     update_lease,
+    update_leases,
 )
 from maasserver.testing.factory import factory
 from maasserver.testing.testcase import MAASServerTestCase
@@ -381,3 +383,100 @@ class TestUpdateLease(MAASServerTestCase):
         self.assertItemsEqual(
             [boot_interface.id],
             sip.interface_set.values_list("id", flat=True))
+
+
+class TestUpdateLeases(MAASServerTestCase):
+
+    make_kwargs = TestUpdateLease.make_kwargs
+
+    def make_managed_subnet(self):
+        return factory.make_ipv4_Subnet_with_IPRanges(
+            with_static_range=False, dhcp_on=True)
+
+    def test_creates_leases_for_each_interface(self):
+        subnet = self.make_managed_subnet()
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        interfaces = [
+            factory.make_Interface(INTERFACE_TYPE.PHYSICAL)
+            for _ in range(3)
+        ]
+        updates = [
+            self.make_kwargs(
+                action="commit", mac=str(interface.mac_address),
+                ip=factory.pick_ip_in_IPRange(dynamic_range))
+            for interface in interfaces
+        ]
+        update_leases(updates)
+        for interface, update in zip(interfaces, updates):
+            sip = interface.ip_addresses.get(
+                alloc_type=IPADDRESS_TYPE.DISCOVERED)
+            self.assertThat(sip, MatchesStructure.byEquality(
+                ip=update["ip"], subnet=subnet,
+                lease_time=update["lease_time"]))
+
+    def test_applies_updates_for_the_same_mac_in_order(self):
+        subnet = self.make_managed_subnet()
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        mac = factory.make_mac_address()
+        ip1 = factory.pick_ip_in_IPRange(dynamic_range)
+        ip2 = factory.pick_ip_in_IPRange(dynamic_range, but_not=[ip1])
+        update_leases([
+            self.make_kwargs(action="commit", mac=mac, ip=ip1),
+            self.make_kwargs(action="commit", mac=mac, ip=ip2),
+            self.make_kwargs(action="release", mac=mac, ip=ip2),
+        ])
+        [interface] = UnknownInterface.objects.filter(mac_address=mac)
+        self.assertItemsEqual(
+            [None], interface.ip_addresses.filter(
+                alloc_type=IPADDRESS_TYPE.DISCOVERED).values_list(
+                "ip", flat=True))
+        self.assertFalse(StaticIPAddress.objects.filter(ip=ip1).exists())
+
+    def test_skips_updates_that_cannot_be_applied(self):
+        subnet = self.make_managed_subnet()
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        ip = factory.pick_ip_in_IPRange(dynamic_range)
+        update_leases([
+            self.make_kwargs(action=factory.make_name("action")),
+            self.make_kwargs(action="commit"),
+            self.make_kwargs(action="commit", ip=ip),
+        ])
+        sip = StaticIPAddress.objects.get(ip=ip)
+        self.assertEqual(IPADDRESS_TYPE.DISCOVERED, sip.alloc_type)
+
+    def test_skips_updates_that_fail(self):
+        subnet = self.make_managed_subnet()
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        mac1 = factory.make_mac_address()
+        mac2 = factory.make_mac_address()
+        ip1 = factory.pick_ip_in_IPRange(dynamic_range)
+        ip2 = factory.pick_ip_in_IPRange(dynamic_range, but_not=[ip1])
+        apply_lease = leases_module._apply_lease
+
+        def fail_for_ip1(action, ip, *args):
+            apply_lease(action, ip, *args)
+            if ip == ip1:
+                raise factory.make_exception()
+
+        self.patch(leases_module, "_apply_lease").side_effect = fail_for_ip1
+        update_leases([
+            self.make_kwargs(action="commit", mac=mac1, ip=ip1),
+            self.make_kwargs(action="commit", mac=mac2, ip=ip2),
+        ])
+        self.assertFalse(
+            UnknownInterface.objects.filter(mac_address=mac1).exists())
+        self.assertFalse(StaticIPAddress.objects.filter(ip=ip1).exists())
+        sip = StaticIPAddress.objects.get(ip=ip2)
+        self.assertEqual(IPADDRESS_TYPE.DISCOVERED, sip.alloc_type)
+
+    def test_skips_dns_record_for_hostname_from_existing_node(self):
+        subnet = self.make_managed_subnet()
+        dynamic_range = subnet.get_dynamic_ranges()[0]
+        hostname = factory.make_name().lower()
+        factory.make_Node(hostname=hostname)
+        update_leases([
+            self.make_kwargs(
+                action="commit", hostname=hostname,
+                ip=factory.pick_ip_in_IPRange(dynamic_range)),
+        ])
+        self.assertFalse(DNSResource.objects.filter(name=hostname).exists())
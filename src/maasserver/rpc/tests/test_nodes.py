@@ -22,6 +22,7 @@ from maasserver.enum import (
 )
 from maasserver.models.node import Node
 from maasserver.models.timestampedmodel import now
+from maasserver.rpc import nodes as nodes_module
 from maasserver.rpc.nodes import (
     commission_node,
     create_node,
@@ -502,6 +503,25 @@ class TestListClusterNodesPowerParameters(MAASServerTestCase):
         expected_minimum = 50 * (2 ** 10)  # 50kiB
         self.expectThat(nodes_json_length, GreaterThan(expected_minimum - 1))
 
+    def test__records_lag_of_longest_waiting_node(self):
+        rack = factory.make_RackController(power_type='')
+        self.make_Node(
+            bmc_connected_to=rack,
+            power_state_queried=now() - timedelta(minutes=20))
+        self.make_Node(
+            bmc_connected_to=rack,
+            power_state_queried=now() - timedelta(minutes=10))
+        update = self.patch(nodes_module.PROMETHEUS_METRICS, "update")
+
+        list_cluster_nodes_power_parameters(rack.system_id)
+
+        [call] = update.call_args_list
+        self.assertEqual(("power_query_lag", "set"), call[0])
+        self.assertEqual({"rack": rack.system_id}, call[1]["labels"])
+        lag = call[1]["value"]
+        self.assertThat(lag, GreaterThan(20 * 60 - 1))
+        self.assertThat(lag, LessThan(21 * 60))
+
     def test__limited_to_10_nodes_at_a_time_by_default(self):
         # Configure the rack controller subnet to be large enough.
         rack = factory.make_RackController(power_type='')
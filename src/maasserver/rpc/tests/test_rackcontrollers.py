@@ -483,7 +483,20 @@ class TestUpdateInterfaces(MAASServerTestCase):
         update_interfaces(rack_controller.system_id, sentinel.interfaces)
         self.assertThat(
             patched_update_interfaces,
-            MockCalledOnceWith(sentinel.interfaces, None))
+            MockCalledOnceWith(sentinel.interfaces, None, fingerprint=None))
+
+    def test__passes_fingerprint_to_rack_controller(self):
+        rack_controller = factory.make_RackController()
+        patched_update_interfaces = self.patch(
+            RackController, "update_interfaces")
+        update_interfaces(
+            rack_controller.system_id, sentinel.interfaces,
+            sentinel.topology_hints, sentinel.fingerprint)
+        self.assertThat(
+            patched_update_interfaces,
+            MockCalledOnceWith(
+                sentinel.interfaces, sentinel.topology_hints,
+                fingerprint=sentinel.fingerprint))
 
 
 class TestReportNeighbours(MAASServerTestCase):
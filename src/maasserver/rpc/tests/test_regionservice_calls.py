@@ -99,6 +99,7 @@ from provisioningserver.rpc.region import (
     SendEventMACAddress,
     UpdateInterfaces,
     UpdateLease,
+    UpdateLeases,
     UpdateNodePowerState,
     UpdateServices,
 )
@@ -302,6 +303,64 @@ class TestRegionProtocol_UpdateLease(MAASTransactionServerTestCase):
         # works as expected.
 
 
+class TestRegionProtocol_UpdateLeases(MAASTransactionServerTestCase):
+
+    def setUp(self):
+        super(TestRegionProtocol_UpdateLeases, self).setUp()
+        self.useFixture(RegionEventLoopFixture("database-tasks"))
+
+    def test_update_leases_is_registered(self):
+        protocol = Region()
+        responder = protocol.locateResponder(UpdateLeases.commandName)
+        self.assertIsNotNone(responder)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__passes_updates_to_update_leases(self):
+        update_leases = self.patch(leases_module, "update_leases")
+        update_leases.return_value = {}
+        update = {
+            "action": "commit",
+            "mac": factory.make_mac_address(),
+            "ip_family": "ipv4",
+            "ip": factory.make_ipv4_address(),
+            "timestamp": int(time.time()),
+            "lease_time": 30,
+            "hostname": factory.make_name("host"),
+        }
+
+        yield eventloop.start()
+        try:
+            yield call_responder(
+                Region(), UpdateLeases, {
+                    "cluster_uuid": factory.make_name("uuid"),
+                    "updates": [dict(update)],
+                })
+        finally:
+            yield eventloop.reset()
+
+        self.assertThat(update_leases, MockCalledOnceWith([update]))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__doesnt_raises_other_errors(self):
+        self.patch(leases_module, "update_leases").side_effect = (
+            factory.make_exception())
+
+        yield eventloop.start()
+        try:
+            yield call_responder(
+                Region(), UpdateLeases, {
+                    "cluster_uuid": factory.make_name("uuid"),
+                    "updates": [],
+                })
+        finally:
+            yield eventloop.reset()
+
+        # Test is that no exceptions are raised. If this test passes then all
+        # works as expected.
+
+
 class TestRegionProtocol_GetBootConfig(MAASTransactionServerTestCase):
 
     def test_get_boot_config_is_registered(self):
@@ -1189,7 +1248,33 @@ class TestRegionProtocol_UpdateInterfaces(MAASTransactionServerTestCase):
             update_interfaces,
             MockCalledOnceWith(
                 params['system_id'], params['interfaces'],
-                topology_hints=None))
+                topology_hints=None, fingerprint=None))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_passes_fingerprint_to_update_interfaces_function(self):
+        update_interfaces = self.patch(
+            regionservice.rackcontrollers, 'update_interfaces')
+
+        params = {
+            'system_id': factory.make_name('system_id'),
+            'interfaces': {
+                'eth0': {
+                    'type': 'physical',
+                },
+            },
+            'fingerprint': factory.make_name('fingerprint'),
+        }
+
+        response = yield call_responder(
+            Region(), UpdateInterfaces, params)
+        self.assertIsNotNone(response)
+
+        self.assertThat(
+            update_interfaces,
+            MockCalledOnceWith(
+                params['system_id'], params['interfaces'],
+                topology_hints=None, fingerprint=params['fingerprint']))
 
 
 class TestRegionProtocol_ReportNeighbours(MAASTestCase):
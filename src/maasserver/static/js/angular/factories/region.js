@@ -13,7 +13,8 @@ const MSG_TYPE = {
     RESPONSE: 1,
     NOTIFY: 2,
     PING: 3,
-    PING_REPLY: 4
+    PING_REPLY: 4,
+    PARTIAL_RESPONSE: 5
 };
 
 // Response types
@@ -367,6 +368,19 @@ angular.module('MAAS').factory(
             // Reply to connectivity check
             } else if(msg.type === MSG_TYPE.PING_REPLY) {
                 this.onPingReply(msg);
+            // Part of a streamed response
+            } else if(msg.type === MSG_TYPE.PARTIAL_RESPONSE) {
+                this.onPartialResponse(msg);
+            }
+        }
+
+        // Called when part of a streamed response is recieved.
+        onPartialResponse(msg) {
+            // The defer stays registered until the final response arrives;
+            // each part is passed to the promise's notify callbacks.
+            let defer = this.callbacks[msg.request_id];
+            if(angular.isDefined(defer)) {
+                this.$rootScope.$apply(defer.notify(msg.result));
             }
         }
 
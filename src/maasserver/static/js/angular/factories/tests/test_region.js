@@ -516,6 +516,40 @@ describe("RegionConnection", function() {
             RegionConnection.onMessage(msg);
             expect(RegionConnection.onNotify).toHaveBeenCalledWith(msg);
         });
+
+        it("calls onPartialResponse for a partial response message",
+            function() {
+                spyOn(RegionConnection, "onPartialResponse");
+                var msg = { type: 5 };
+                RegionConnection.onMessage(msg);
+                expect(
+                    RegionConnection.onPartialResponse).toHaveBeenCalledWith(
+                        msg);
+            });
+    });
+
+    describe("onPartialResponse", function() {
+
+        it("notifies defer inside of rootScope", function(done) {
+            var result = [];
+            var requestId = RegionConnection.newRequestId();
+            var defer = $q.defer();
+            defer.promise.then(null, null, function(msg_result) {
+                expect(msg_result).toBe(result);
+                done();
+            });
+
+            spyOn($rootScope, "$apply").and.callThrough();
+
+            RegionConnection.callbacks[requestId] = defer;
+            RegionConnection.onPartialResponse({
+                type: 5,
+                request_id: requestId,
+                result: result
+            });
+            expect($rootScope.$apply).toHaveBeenCalled();
+            expect(RegionConnection.callbacks[requestId]).toBe(defer);
+        });
     });
 
     describe("onResponse", function() {
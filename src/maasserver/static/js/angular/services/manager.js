@@ -354,6 +354,18 @@ angular.module('MAAS').service(
             this._replaceItemInArray(this._items, item);
         };
 
+        // Apply the fields that changed in the patch to the item in the
+        // items list. Patches are only sent for items already loaded.
+        Manager.prototype._patchItem = function(patch) {
+            var idx = this._getIndexOfItem(this._items, patch[this._pk]);
+            if(idx >= 0) {
+                var item = angular.copy(this._items[idx]);
+                angular.extend(item, patch);
+                this._replaceItem(item);
+                this._processItem(item);
+            }
+        };
+
         // Remove item in the items and selectedItems list.
         Manager.prototype._removeItem = function(pk_value) {
             var idx = this._getIndexOfItem(this._items, pk_value);
@@ -513,6 +525,8 @@ angular.module('MAAS').service(
                 } else if(action.action === "update") {
                     this._replaceItem(action.data);
                     this._processItem(action.data);
+                } else if(action.action === "patch") {
+                    this._patchItem(action.data);
                 } else if(action.action === "delete") {
                     this._removeItem(action.data);
                 }
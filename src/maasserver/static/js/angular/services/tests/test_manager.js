@@ -887,6 +887,41 @@ describe("Manager", function() {
             expect(NodesManager._activeItem).toBe(fakeNode);
         });
 
+        it("patches node in items list on patch action", function() {
+            var fakeNode = makeNode(true);
+            var patch = {
+                system_id: fakeNode.system_id,
+                name: makeName("name")
+            };
+            var updatedNode = angular.copy(fakeNode);
+            updatedNode.name = patch.name;
+            NodesManager._items.push(fakeNode);
+            NodesManager._activeItem = fakeNode;
+            NodesManager._actionQueue.push({
+                action: "patch",
+                data: patch
+            });
+            NodesManager.processActions();
+            expect(NodesManager._items).toEqual([updatedNode]);
+
+            // The _activeItem object should still be the same object.
+            expect(NodesManager._activeItem).toBe(fakeNode);
+        });
+
+        it("ignores patch action for unknown node", function() {
+            var fakeNode = makeNode(false);
+            NodesManager._items.push(fakeNode);
+            NodesManager._actionQueue.push({
+                action: "patch",
+                data: {
+                    system_id: makeName("system_id"),
+                    name: makeName("name")
+                }
+            });
+            NodesManager.processActions();
+            expect(NodesManager._items).toEqual([fakeNode]);
+        });
+
         it("deletes node in items list on delete action", function() {
             var fakeNode = makeNode();
             NodesManager._items.push(fakeNode);
@@ -8,6 +8,7 @@ __all__ = [
     ]
 
 from maasserver.config import RegionConfiguration
+from maasserver.imagestore import get_image_store
 from provisioningserver.testing.config import ConfigurationFixtureBase
 
 
@@ -15,3 +16,10 @@ class RegionConfigurationFixture(ConfigurationFixtureBase):
     """Fixture to configure local region settings in tests."""
 
     configuration = RegionConfiguration
+
+    def setUp(self):
+        super(RegionConfigurationFixture, self).setUp()
+        # Settings read once per process must be read again, from this
+        # configuration now and from the previous one afterwards.
+        get_image_store.cache_clear()
+        self.addCleanup(get_image_store.cache_clear)
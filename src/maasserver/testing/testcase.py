@@ -86,6 +86,7 @@ class MAASRegionTestCaseBase(PostCommitHooksTestMixin):
         """This should be called by a subclass once other set-up is done."""
         # Avoid circular imports.
         from maasserver.models import signals
+        from maasserver.models.signals.testing import SignalsDisabled
 
         # Always clear the RBAC thread-local between tests.
         self.useFixture(RBACClearFixture())
@@ -97,6 +98,13 @@ class MAASRegionTestCaseBase(PostCommitHooksTestMixin):
         # Disconnect the status transition event to speed up tests.
         self.patch(signals.events, 'STATE_TRANSITION_EVENT_CONNECT', False)
 
+        # Invalidating boot configurations, the subnet index, and the config
+        # cache leaves post-commit hooks behind whenever a node, interface,
+        # subnet, VLAN, or config item changes; tests that care about them
+        # enable these signals themselves.
+        self.useFixture(
+            SignalsDisabled("bootconfig", "configcache", "subnets"))
+
     def assertNotInTransaction(self):
         self.assertFalse(connection.in_atomic_block, (
             "Default connection is engaged in a transaction."))
@@ -7,6 +7,7 @@ __all__ = []
 
 from datetime import datetime
 from email.utils import format_datetime
+import hashlib
 import http.client
 from io import BytesIO
 import json
@@ -32,7 +33,10 @@ from django.db import (
     connections,
     transaction,
 )
-from django.http import StreamingHttpResponse
+from django.http import (
+    FileResponse,
+    StreamingHttpResponse,
+)
 from fixtures import (
     FakeLogger,
     Fixture,
@@ -47,6 +51,7 @@ from maasserver.bootresources import (
     download_all_boot_resources,
     download_boot_resources,
     get_simplestream_endpoint,
+    parse_byte_range,
     set_global_default_releases,
     SimpleStreamsHandler,
 )
@@ -61,6 +66,7 @@ from maasserver.enum import (
     BOOT_RESOURCE_TYPE,
     COMPONENT,
 )
+from maasserver.imagestore import ImageFileStore
 from maasserver.listener import PostgresListenerService
 from maasserver.models import (
     BootResource,
@@ -119,6 +125,7 @@ from provisioningserver.utils.twisted import (
     asynchronous,
     DeferredValue,
 )
+from simplestreams import util as sutil
 from testtools.matchers import (
     Contains,
     ContainsAll,
@@ -506,6 +513,49 @@ class TestSimpleStreamsHandler(MAASServerTestCase):
             os, arch, subarch, series, version, filename)
         self.assertIsInstance(response, StreamingHttpResponse)
 
+    def test_download_serves_file_from_image_store(self):
+        image_store_path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture(
+            image_store_path=image_store_path))
+        product, resource = self.make_usable_product_boot_resource()
+        _, _, os, arch, subarch, series = product.split(':')
+        resource_set = resource.get_latest_complete_set()
+        version = resource_set.version
+        resource_file = resource_set.files.order_by('?')[0]
+        largefile = resource_file.largefile
+        content = factory.make_bytes(size=largefile.total_size)
+        image_store = ImageFileStore(image_store_path)
+        with image_store.create_temporary() as stream:
+            stream.write(content)
+        image_store.add(largefile.sha256, stream.name)
+        response = self.get_file_client(
+            os, arch, subarch, series, version, resource_file.filename)
+        self.assertIsInstance(response, FileResponse)
+        self.assertEqual(content, b''.join(response.streaming_content))
+
+    def test_download_serves_range_from_image_store(self):
+        image_store_path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture(
+            image_store_path=image_store_path))
+        product, resource = self.make_usable_product_boot_resource()
+        _, _, os, arch, subarch, series = product.split(':')
+        resource_set = resource.get_latest_complete_set()
+        resource_file = resource_set.files.order_by('?')[0]
+        largefile = resource_file.largefile
+        content = factory.make_bytes(size=largefile.total_size)
+        image_store = ImageFileStore(image_store_path)
+        with image_store.create_temporary() as stream:
+            stream.write(content)
+        image_store.add(largefile.sha256, stream.name)
+        response = self.client.get(reverse(
+            'simplestreams_file_handler', kwargs={
+                'os': os, 'arch': arch, 'subarch': subarch,
+                'series': series, 'version': resource_set.version,
+                'filename': resource_file.filename,
+            }), HTTP_RANGE="bytes=1-")
+        self.assertEqual(http.client.PARTIAL_CONTENT, response.status_code)
+        self.assertEqual(content[1:], b''.join(response.streaming_content))
+
 
 class TestConnectionWrapper(MAASTransactionServerTestCase):
     """Tests the use of StreamingHttpResponse(ConnectionWrapper(stream)).
@@ -600,9 +650,7 @@ class TestConnectionWrapper(MAASTransactionServerTestCase):
         # AssertConnectionWrapper.close method.
         def close():
             conn = AssertConnectionWrapper.connection
-            conn.in_atomic_block = False
             conn.commit()
-            conn.set_autocommit(True)
             conn.close()
         self.addCleanup(close)
 
@@ -611,13 +659,76 @@ class TestConnectionWrapper(MAASTransactionServerTestCase):
         # seperate the transactional middleware will fail to initialize,
         # because the the connection will already be in a transaction.
         #
-        # Note: cannot test if DatabaseWrapper != DatabaseWrapper, as it will
-        # report true, because the __eq__ operator only checks if the aliases
-        # are the same. This is checking the underlying connection is
-        # different, which is the important part.
-        self.assertNotEqual(
+        self.assertIsNot(
             connections["default"].connection,
-            AssertConnectionWrapper.connection.connection)
+            AssertConnectionWrapper.connection)
+
+    def test_download_returns_whole_content_accepting_ranges(self):
+        content, url = self.make_file_for_client()
+        client = MAASSensibleClient()
+        response = client.get(url)
+        self.assertEqual(http.client.OK, response.status_code)
+        self.assertEqual("bytes", response['Accept-Ranges'])
+        self.assertEqual(content, self.read_response(response))
+
+    def test_download_returns_range(self):
+        content, url = self.make_file_for_client()
+        client = MAASSensibleClient()
+        response = client.get(url, HTTP_RANGE="bytes=100-599")
+        self.assertEqual(http.client.PARTIAL_CONTENT, response.status_code)
+        self.assertEqual(
+            "bytes 100-599/%d" % len(content), response['Content-Range'])
+        self.assertEqual("500", response['Content-Length'])
+        self.assertEqual(content[100:600], self.read_response(response))
+
+    def test_download_returns_open_ended_range(self):
+        content, url = self.make_file_for_client()
+        client = MAASSensibleClient()
+        response = client.get(url, HTTP_RANGE="bytes=1000-")
+        self.assertEqual(http.client.PARTIAL_CONTENT, response.status_code)
+        self.assertEqual(content[1000:], self.read_response(response))
+
+    def test_download_rejects_unsatisfiable_range(self):
+        content, url = self.make_file_for_client()
+        client = MAASSensibleClient()
+        response = client.get(url, HTTP_RANGE="bytes=%d-" % len(content))
+        self.assertEqual(
+            http.client.REQUESTED_RANGE_NOT_SATISFIABLE, response.status_code)
+        self.assertEqual(
+            "bytes */%d" % len(content), response['Content-Range'])
+
+
+class TestParseByteRange(MAASTestCase):
+    """Tests for `parse_byte_range`."""
+
+    def test_returns_none_without_header(self):
+        self.assertIsNone(parse_byte_range(None, 1000))
+
+    def test_returns_range(self):
+        self.assertEqual((10, 21), parse_byte_range("bytes=10-20", 1000))
+
+    def test_returns_range_to_end(self):
+        self.assertEqual((10, 1000), parse_byte_range("bytes=10-", 1000))
+
+    def test_clamps_range_to_size(self):
+        self.assertEqual((10, 1000), parse_byte_range("bytes=10-5000", 1000))
+
+    def test_returns_suffix_range(self):
+        self.assertEqual((900, 1000), parse_byte_range("bytes=-100", 1000))
+        self.assertEqual((0, 1000), parse_byte_range("bytes=-5000", 1000))
+
+    def test_ignores_other_units_and_multiple_ranges(self):
+        self.assertIsNone(parse_byte_range("items=10-20", 1000))
+        self.assertIsNone(parse_byte_range("bytes=10-20,30-40", 1000))
+
+    def test_ignores_malformed_ranges(self):
+        self.assertIsNone(parse_byte_range("bytes=-", 1000))
+        self.assertIsNone(parse_byte_range("bytes=a-b", 1000))
+        self.assertIsNone(parse_byte_range("bytes=20-10", 1000))
+
+    def test_raises_for_unsatisfiable_ranges(self):
+        self.assertRaises(ValueError, parse_byte_range, "bytes=1000-", 1000)
+        self.assertRaises(ValueError, parse_byte_range, "bytes=-0", 1000)
 
 
 def make_product(ftype=None, kflavor=None, subarch=None):
@@ -953,45 +1064,29 @@ class TestBootResourceStore(MAASServerTestCase):
             store.get_resource_file_log_identifier(
                 rfile, resource_set, resource))
 
-    def test_write_content_thread_saves_data(self):
+    def test_write_content_to_image_store_discards_bad_content(self):
+        image_store = ImageFileStore(self.make_dir())
         store = BootResourceStore()
-        # Make size bigger than the read size so multiple loops are performed
-        # and the content is written correctly.
-        size = int(2.5 * store.read_size)
-        rfile, reader, content = make_boot_resource_file_with_stream(size=size)
-        store.write_content_thread(rfile.id, reader)
-        self.assertTrue(BootResourceFile.objects.filter(id=rfile.id).exists())
-        with rfile.largefile.content.open('rb') as stream:
-            written_data = stream.read()
-        self.assertEqual(content, written_data)
-        rfile.largefile = reload_object(rfile.largefile)
-        self.assertEqual(rfile.largefile.size, len(written_data))
-        self.assertEqual(rfile.largefile.size, rfile.largefile.total_size)
+        content = factory.make_bytes()
+        largefile = Mock(
+            sha256=hashlib.sha256(b"other").hexdigest(),
+            total_size=len(content))
+        cksummer = sutil.checksummer({'sha256': largefile.sha256})
+        self.assertEqual(
+            (len(content), False), store.write_content_to_image_store(
+                image_store, largefile, BytesIO(content), cksummer))
+        self.assertEqual([], os.listdir(image_store.path))
 
-    def test_write_content_doesnt_write_if_cancel(self):
+    def test_write_content_to_image_store_discards_cancelled_content(self):
+        image_store = ImageFileStore(self.make_dir())
         store = BootResourceStore()
-        size = int(2.5 * store.read_size)
-        rfile, reader, content = make_boot_resource_file_with_stream(size=size)
         store._cancel_finalize = True
-        store.write_content_thread(rfile.id, reader)
-        self.assertTrue(BootResourceFile.objects.filter(id=rfile.id).exists())
-        with rfile.largefile.content.open('rb') as stream:
-            written_data = stream.read()
-        self.assertEqual(b'', written_data)
-        rfile.largefile = reload_object(rfile.largefile)
-        self.assertEqual(rfile.largefile.size, 0)
-
-    @skip(
-        "XXX blake_r: Skipped because it causes the test that runs after this "
-        "to fail. Because this test is not isolated and places a task in the "
-        "reactor.")
-    def test_write_content_thread_deletes_file_on_bad_checksum(self):
-        rfile, _, _ = make_boot_resource_file_with_stream()
-        reader = BytesIO(factory.make_bytes())
-        store = BootResourceStore()
-        with post_commit_hooks:
-            store.write_content_thread(rfile.id, reader)
-        self.assertFalse(BootResourceFile.objects.filter(id=rfile.id).exists())
+        largefile = Mock(sha256=hashlib.sha256(b"").hexdigest())
+        cksummer = sutil.checksummer({'sha256': largefile.sha256})
+        self.assertEqual(
+            (None, False), store.write_content_to_image_store(
+                image_store, largefile, BytesIO(b""), cksummer))
+        self.assertEqual([], os.listdir(image_store.path))
 
     def test_delete_content_to_finalize_deletes_items(self):
         self.useFixture(SignalsDisabled("largefiles"))
@@ -1408,6 +1503,122 @@ class TestBootResourceTransactional(MAASTransactionServerTestCase):
         self.assertFalse(
             BootResource.objects.filter(id=resource.id).exists())
 
+    def test_write_content_thread_saves_data(self):
+        store = BootResourceStore()
+        # Make size bigger than the read size so multiple loops are performed
+        # and the content is written correctly.
+        size = int(2.5 * store.read_size)
+        with transaction.atomic():
+            rfile, reader, content = make_boot_resource_file_with_stream(
+                size=size)
+        store.write_content_thread(rfile.id, reader)
+        with transaction.atomic():
+            self.assertTrue(
+                BootResourceFile.objects.filter(id=rfile.id).exists())
+            with rfile.largefile.content.open('rb') as stream:
+                written_data = stream.read()
+            self.assertEqual(content, written_data)
+            rfile.largefile = reload_object(rfile.largefile)
+            self.assertEqual(rfile.largefile.size, len(written_data))
+            self.assertEqual(rfile.largefile.size, rfile.largefile.total_size)
+
+    def test_write_content_thread_reports_progress(self):
+        store = BootResourceStore()
+        store.progress_interval = 0
+        size = int(2.5 * store.read_size)
+        with transaction.atomic():
+            rfile, reader, content = make_boot_resource_file_with_stream(
+                size=size)
+        largefile_id = rfile.largefile.id
+        progress = []
+
+        def read(size):
+            # The size saved so far is visible while the content is still
+            # being written in another transaction.
+            with transaction.atomic():
+                progress.append(
+                    LargeFile.objects.get(id=largefile_id).size)
+            return content_reader.read(size)
+
+        content_reader = reader
+        store.write_content_thread(rfile.id, Mock(read=read))
+        self.assertEqual(
+            [0, store.read_size, 2 * store.read_size], progress)
+
+    def test_write_content_doesnt_write_if_cancel(self):
+        store = BootResourceStore()
+        size = int(2.5 * store.read_size)
+        with transaction.atomic():
+            rfile, reader, content = make_boot_resource_file_with_stream(
+                size=size)
+        store._cancel_finalize = True
+        store.write_content_thread(rfile.id, reader)
+        with transaction.atomic():
+            self.assertTrue(
+                BootResourceFile.objects.filter(id=rfile.id).exists())
+            with rfile.largefile.content.open('rb') as stream:
+                written_data = stream.read()
+            self.assertEqual(b'', written_data)
+            rfile.largefile = reload_object(rfile.largefile)
+            self.assertEqual(rfile.largefile.size, 0)
+
+    @skip(
+        "XXX blake_r: Skipped because it causes the test that runs after this "
+        "to fail. Because this test is not isolated and places a task in the "
+        "reactor.")
+    def test_write_content_thread_deletes_file_on_bad_checksum(self):
+        with transaction.atomic():
+            rfile, _, _ = make_boot_resource_file_with_stream()
+        reader = BytesIO(factory.make_bytes())
+        store = BootResourceStore()
+        with post_commit_hooks:
+            store.write_content_thread(rfile.id, reader)
+        with transaction.atomic():
+            self.assertFalse(
+                BootResourceFile.objects.filter(id=rfile.id).exists())
+
+    def test_write_content_thread_saves_data_to_image_store(self):
+        image_store_path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture(
+            image_store_path=image_store_path))
+        store = BootResourceStore()
+        size = int(2.5 * store.read_size)
+        with transaction.atomic():
+            rfile, reader, content = make_boot_resource_file_with_stream(
+                size=size)
+        store.write_content_thread(rfile.id, reader)
+        image_store = ImageFileStore(image_store_path)
+        with image_store.open(rfile.largefile.sha256) as stream:
+            self.assertEqual(content, stream.read())
+        with transaction.atomic():
+            # The large object is left empty.
+            with rfile.largefile.content.open('rb') as stream:
+                self.assertEqual(b'', stream.read())
+            rfile.largefile = reload_object(rfile.largefile)
+            self.assertEqual(rfile.largefile.size, rfile.largefile.total_size)
+
+    def test_perform_write_carries_on_after_a_failure(self):
+        store = BootResourceStore()
+        store._content_to_finalize = {
+            rid: sentinel.reader for rid in range(5)}
+        mock_write = self.patch(store, 'write_content_thread')
+        mock_write.side_effect = [ZeroDivisionError()] + [None] * 4
+        store.perform_write()
+        self.assertItemsEqual(
+            [call(rid, sentinel.reader) for rid in range(5)],
+            mock_write.call_args_list)
+        self.assertEqual({}, store._content_to_finalize)
+
+    def test_perform_write_leaves_content_if_cancelled(self):
+        store = BootResourceStore()
+        store._content_to_finalize = {
+            rid: sentinel.reader for rid in range(5)}
+        store._cancel_finalize = True
+        mock_write = self.patch(store, 'write_content_thread')
+        store.perform_write()
+        self.assertThat(mock_write, MockNotCalled())
+        self.assertEqual(5, len(store._content_to_finalize))
+
     def test_perform_writes_writes_all_content(self):
         with transaction.atomic():
             files = [make_boot_resource_file_with_stream() for _ in range(3)]
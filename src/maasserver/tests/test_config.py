@@ -115,6 +115,22 @@ class TestRegionConfigurationWorkerOptions(MAASTestCase):
         self.assertEqual({'num_workers': workers}, config.store)
 
 
+class TestRegionConfigurationImageStoreOptions(MAASTestCase):
+    """Tests for the boot image options in `RegionConfiguration`."""
+
+    def test__default(self):
+        config = RegionConfiguration({})
+        self.assertEqual("", config.image_store_path)
+
+    def test__set_and_get(self):
+        config = RegionConfiguration({})
+        path = factory.make_name("/images")
+        config.image_store_path = path
+        self.assertEqual(path, config.image_store_path)
+        # It's also stored in the configuration database.
+        self.assertEqual({'image_store_path': path}, config.store)
+
+
 class TestRegionConfigurationDebugOptions(MAASTestCase):
     """Tests for the debug options in `RegionConfiguration`."""
 
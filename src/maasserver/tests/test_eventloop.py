@@ -31,8 +31,10 @@ from maasserver.eventloop import (
 )
 from maasserver.prometheus.stats import PrometheusService
 from maasserver.regiondservices import (
+    config_cache,
     ntp,
     service_monitor_service,
+    subnet_index,
     syslog,
 )
 from maasserver.rpc import regionservice
@@ -478,6 +480,38 @@ class TestFactories(MAASTestCase):
         self.assertFalse(
             eventloop.loop.factories["status-worker"]["only_on_master"])
 
+    def test_make_SubnetIndexService(self):
+        service = eventloop.make_SubnetIndexService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            subnet_index.SubnetIndexService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_SubnetIndexService,
+            eventloop.loop.factories["subnet-index"]["factory"])
+        # Has a dependency of postgres-listener.
+        self.assertEquals(
+            ["postgres-listener-worker"],
+            eventloop.loop.factories["subnet-index"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["subnet-index"]["only_on_master"])
+
+    def test_make_ConfigCacheService(self):
+        service = eventloop.make_ConfigCacheService(
+            FakePostgresListenerService())
+        self.assertThat(service, IsInstance(
+            config_cache.ConfigCacheService))
+        # It is registered as a factory in RegionEventLoop.
+        self.assertIs(
+            eventloop.make_ConfigCacheService,
+            eventloop.loop.factories["config-cache"]["factory"])
+        # Has a dependency of postgres-listener.
+        self.assertEquals(
+            ["postgres-listener-worker"],
+            eventloop.loop.factories["config-cache"]["requires"])
+        self.assertFalse(
+            eventloop.loop.factories["config-cache"]["only_on_master"])
+
     def test_make_NetworkTimeProtocolService(self):
         service = eventloop.make_NetworkTimeProtocolService()
         self.assertThat(service, IsInstance(
@@ -0,0 +1,95 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for `maasserver.imagestore`."""
+
+__all__ = []
+
+import hashlib
+import os
+
+from maasserver.config import RegionConfiguration
+from maasserver.imagestore import (
+    get_image_store,
+    ImageFileStore,
+)
+from maasserver.testing.config import RegionConfigurationFixture
+from maastesting.factory import factory
+from maastesting.matchers import MockCalledOnceWith
+from maastesting.testcase import MAASTestCase
+from testtools.matchers import (
+    FileContains,
+    FileExists,
+    Not,
+)
+
+
+class TestImageFileStore(MAASTestCase):
+    """Tests for `ImageFileStore`."""
+
+    def make_sha256(self):
+        return hashlib.sha256(factory.make_bytes()).hexdigest()
+
+    def test_get_path_fans_out_by_prefix(self):
+        path = self.make_dir()
+        sha256 = self.make_sha256()
+        self.assertEqual(
+            os.path.join(path, sha256[:2], sha256),
+            ImageFileStore(path).get_path(sha256))
+
+    def test_add_moves_file_into_store(self):
+        store = ImageFileStore(self.make_dir())
+        sha256 = self.make_sha256()
+        content = factory.make_bytes()
+        with store.create_temporary() as stream:
+            stream.write(content)
+        self.assertFalse(store.exists(sha256))
+        store.add(sha256, stream.name)
+        self.assertTrue(store.exists(sha256))
+        self.assertThat(stream.name, Not(FileExists()))
+        with store.open(sha256) as stream:
+            self.assertEqual(content, stream.read())
+
+    def test_create_temporary_creates_hidden_file_in_store(self):
+        path = os.path.join(self.make_dir(), "images")
+        store = ImageFileStore(path)
+        with store.create_temporary() as stream:
+            pass
+        self.assertEqual(path, os.path.dirname(stream.name))
+        self.assertTrue(os.path.basename(stream.name).startswith("."))
+
+    def test_remove_removes_file(self):
+        store = ImageFileStore(self.make_dir())
+        sha256 = self.make_sha256()
+        os.makedirs(os.path.dirname(store.get_path(sha256)))
+        factory.make_file(
+            os.path.dirname(store.get_path(sha256)), sha256, b"content")
+        self.assertThat(store.get_path(sha256), FileContains("content"))
+        store.remove(sha256)
+        self.assertFalse(store.exists(sha256))
+
+    def test_remove_ignores_missing_file(self):
+        store = ImageFileStore(self.make_dir())
+        store.remove(self.make_sha256())
+
+
+class TestGetImageStore(MAASTestCase):
+    """Tests for `get_image_store`."""
+
+    def test_returns_none_by_default(self):
+        self.useFixture(RegionConfigurationFixture())
+        self.assertIsNone(get_image_store())
+
+    def test_returns_store_for_configured_path(self):
+        path = self.make_dir()
+        self.useFixture(RegionConfigurationFixture(image_store_path=path))
+        image_store = get_image_store()
+        self.assertIsInstance(image_store, ImageFileStore)
+        self.assertEqual(path, image_store.path)
+
+    def test_reads_configuration_once(self):
+        self.useFixture(RegionConfigurationFixture())
+        open_config = self.patch(RegionConfiguration, "open")
+        get_image_store.cache_clear()
+        self.assertIs(get_image_store(), get_image_store())
+        self.assertThat(open_config, MockCalledOnceWith())
@@ -18,6 +18,7 @@ from crochet import wait_for
 from django.db import connection
 from maasserver import listener as listener_module
 from maasserver.listener import (
+    PostgresListenerNotifications,
     PostgresListenerNotifyError,
     PostgresListenerRegistrationError,
     PostgresListenerService,
@@ -34,6 +35,7 @@ from maastesting.matchers import (
     MockCallsMatch,
     MockNotCalled,
 )
+from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
 from provisioningserver.utils.twisted import DeferredValue
 from psycopg2 import OperationalError
@@ -597,3 +599,68 @@ class TestPostgresListenerService(MAASServerTestCase):
                 call("UNLISTEN %s_create;" % channel),
                 call("UNLISTEN %s_delete;" % channel),
                 call("UNLISTEN %s_update;" % channel)))
+
+
+class TestPostgresListenerNotifications(MAASTestCase):
+
+    def test_keeps_distinct_notifications_in_order(self):
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_update", "abc"))
+        notifications.add(("machine_update", "def"))
+        notifications.add(("device_create", "abc"))
+        self.assertEqual([
+            ("machine_update", "abc"),
+            ("machine_update", "def"),
+            ("device_create", "abc"),
+        ], [notifications.pop() for _ in range(len(notifications))])
+
+    def test_collapses_updates(self):
+        notifications = PostgresListenerNotifications()
+        for _ in range(5):
+            notifications.add(("machine_update", "abc"))
+        self.assertItemsEqual([("machine_update", "abc")], notifications)
+        self.assertEqual({"machine": 4}, notifications.dropped)
+
+    def test_update_after_create_is_create(self):
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_create", "abc"))
+        notifications.add(("machine_update", "abc"))
+        self.assertItemsEqual([("machine_create", "abc")], notifications)
+
+    def test_delete_after_update_is_delete(self):
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_update", "abc"))
+        notifications.add(("machine_delete", "abc"))
+        self.assertItemsEqual([("machine_delete", "abc")], notifications)
+
+    def test_create_after_delete_is_update(self):
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_delete", "abc"))
+        notifications.add(("machine_create", "abc"))
+        self.assertItemsEqual([("machine_update", "abc")], notifications)
+
+    def test_delete_after_create_cancels_out(self):
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_create", "abc"))
+        notifications.add(("machine_update", "abc"))
+        notifications.add(("machine_delete", "abc"))
+        self.assertEqual(0, len(notifications))
+        self.assertEqual({"machine": 3}, notifications.dropped)
+
+    def test_deduplicates_unknown_channels(self):
+        notifications = PostgresListenerNotifications()
+        channel = factory.make_name("channel")
+        notifications.add((channel, "abc"))
+        notifications.add((channel, "abc"))
+        self.assertItemsEqual([(channel, "abc")], notifications)
+        self.assertEqual({channel: 1}, notifications.dropped)
+
+    def test_updates_prometheus_metric(self):
+        mock_update = self.patch(listener_module.PROMETHEUS_METRICS, "update")
+        notifications = PostgresListenerNotifications()
+        notifications.add(("machine_update", "abc"))
+        notifications.add(("machine_update", "abc"))
+        self.assertThat(
+            mock_update, MockCalledOnceWith(
+                "listener_notifications_dropped", "inc", value=1,
+                labels={"channel": "machine"}))
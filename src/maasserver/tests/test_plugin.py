@@ -116,11 +116,13 @@ class TestRegionWorkerServiceMaker(TestServiceMaker):
         service = service_maker.makeService(options)
         self.assertIsInstance(service, MultiService)
         expected_services = [
+            "config-cache",
             "database-tasks",
             "postgres-listener-worker",
             "rack-controller",
             "rpc",
             "status-worker",
+            "subnet-index",
             "web",
             "ipc-worker",
         ]
@@ -146,11 +148,13 @@ class TestRegionWorkerServiceMaker(TestServiceMaker):
         service = service_maker.makeService(options)
         self.assertIsInstance(service, MultiService)
         expected_services = [
+            "config-cache",
             "database-tasks",
             "postgres-listener-worker",
             "rack-controller",
             "rpc",
             "status-worker",
+            "subnet-index",
             "web",
             "ipc-worker",
             "import-resources",
@@ -309,12 +313,14 @@ class TestRegionAllInOneServiceMaker(TestServiceMaker):
         self.assertIsInstance(service, MultiService)
         expected_services = [
             # Worker services.
+            "config-cache",
             "database-tasks",
             "postgres-listener-worker",
             "rack-controller",
             "rpc",
             "service-monitor",
             "status-worker",
+            "subnet-index",
             "web",
             "ipc-worker",
             # Master services.
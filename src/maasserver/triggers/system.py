@@ -1342,7 +1342,7 @@ DNS_INTERFACE_UPDATE = dedent("""\
 # Triggered when a config is inserted. Increments the zone serial and notifies
 # that DNS needs to be updated. Only watches for inserts on config
 # upstream_dns, dnssec_validation, default_dns_ttl, windows_kms_host,
-# dns_trusted_acls and maas_internal_domain.
+# dns_trusted_acls, dns_dynamic_updates and maas_internal_domain.
 DNS_CONFIG_INSERT = dedent("""\
     CREATE OR REPLACE FUNCTION sys_dns_config_insert()
     RETURNS trigger as $$
@@ -1351,6 +1351,7 @@ DNS_CONFIG_INSERT = dedent("""\
       IF (NEW.name = 'upstream_dns' OR
           NEW.name = 'dnssec_validation' OR
           NEW.name = 'dns_trusted_acl' OR
+          NEW.name = 'dns_dynamic_updates' OR
           NEW.name = 'default_dns_ttl' OR
           NEW.name = 'windows_kms_host' OR
           NEW.name = 'maas_internal_domain')
@@ -1366,8 +1367,8 @@ DNS_CONFIG_INSERT = dedent("""\
 
 # Triggered when a config is updated. Increments the zone serial and notifies
 # that DNS needs to be updated. Only watches for updates on config
-# upstream_dns, dnssec_validation, dns_trusted_acl, default_dns_ttl,
-# and windows_kms_host.
+# upstream_dns, dnssec_validation, dns_trusted_acl, dns_dynamic_updates,
+# default_dns_ttl, and windows_kms_host.
 DNS_CONFIG_UPDATE = dedent("""\
     CREATE OR REPLACE FUNCTION sys_dns_config_update()
     RETURNS trigger as $$
@@ -1378,6 +1379,7 @@ DNS_CONFIG_UPDATE = dedent("""\
           NEW.name = 'upstream_dns' OR
           NEW.name = 'dnssec_validation' OR
           NEW.name = 'dns_trusted_acl' OR
+          NEW.name = 'dns_dynamic_updates' OR
           NEW.name = 'default_dns_ttl' OR
           NEW.name = 'windows_kms_host' OR
           NEW.name = 'maas_internal_domain'))
@@ -1778,6 +1780,125 @@ RBAC_CONFIG_UPDATE = dedent("""\
     """)
 
 
+# Helper that rebuilds the storage allocation index for a node. The index
+# holds one row for each block device and partition of the node, recording
+# whether it holds the root filesystem and whether it is free for use; see
+# `StorageAllocationIndex`.
+ALLOCATION_INDEX_REFRESH = dedent("""\
+    CREATE OR REPLACE FUNCTION sys_allocation_index_refresh(
+      refresh_node_id integer)
+    RETURNS void as $$
+    BEGIN
+      DELETE FROM maasserver_storageallocationindex
+        WHERE node_id = refresh_node_id;
+      INSERT INTO maasserver_storageallocationindex
+        (node_id, block_device_id, partition_id, size, tags, root, free)
+      SELECT
+        bd.node_id, bd.id, NULL, bd.size, COALESCE(bd.tags, '{}'),
+        EXISTS (
+          SELECT 1 FROM maasserver_filesystem AS fs
+          WHERE fs.block_device_id = bd.id
+            AND fs.mount_point = '/' AND NOT fs.acquired)
+        OR EXISTS (
+          SELECT 1 FROM maasserver_partitiontable AS pt
+          JOIN maasserver_partition AS p ON p.partition_table_id = pt.id
+          JOIN maasserver_filesystem AS fs ON fs.partition_id = p.id
+          WHERE pt.block_device_id = bd.id
+            AND fs.mount_point = '/' AND NOT fs.acquired),
+        NOT EXISTS (
+          SELECT 1 FROM maasserver_filesystem AS fs
+          WHERE fs.block_device_id = bd.id)
+        AND NOT EXISTS (
+          SELECT 1 FROM maasserver_partitiontable AS pt
+          WHERE pt.block_device_id = bd.id)
+      FROM maasserver_blockdevice AS bd
+      WHERE bd.node_id = refresh_node_id
+      UNION ALL
+      SELECT
+        bd.node_id, NULL, p.id, p.size, COALESCE(p.tags, '{}'),
+        EXISTS (
+          SELECT 1 FROM maasserver_filesystem AS fs
+          WHERE fs.partition_id = p.id
+            AND fs.mount_point = '/' AND NOT fs.acquired),
+        NOT EXISTS (
+          SELECT 1 FROM maasserver_filesystem AS fs
+          WHERE fs.partition_id = p.id)
+      FROM maasserver_partition AS p
+      JOIN maasserver_partitiontable AS pt ON pt.id = p.partition_table_id
+      JOIN maasserver_blockdevice AS bd ON bd.id = pt.block_device_id
+      WHERE bd.node_id = refresh_node_id;
+    END;
+    $$ LANGUAGE plpgsql;
+    """)
+
+
+# SQL expressions giving the ID of the node that a row in each table
+# belongs to, for use with render_sys_allocation_index_procedure.
+ALLOCATION_INDEX_NODE_ID = {
+    "blockdevice": "{row}.node_id",
+    "partitiontable": (
+        "(SELECT node_id FROM maasserver_blockdevice "
+        "WHERE id = {row}.block_device_id)"),
+    "partition": (
+        "(SELECT bd.node_id FROM maasserver_partitiontable AS pt "
+        "JOIN maasserver_blockdevice AS bd ON bd.id = pt.block_device_id "
+        "WHERE pt.id = {row}.partition_table_id)"),
+    "filesystem": (
+        "COALESCE("
+        "(SELECT node_id FROM maasserver_blockdevice "
+        "WHERE id = {row}.block_device_id), "
+        "(SELECT bd.node_id FROM maasserver_partition AS p "
+        "JOIN maasserver_partitiontable AS pt "
+        "ON pt.id = p.partition_table_id "
+        "JOIN maasserver_blockdevice AS bd ON bd.id = pt.block_device_id "
+        "WHERE p.id = {row}.partition_id))"),
+    "node": "{row}.id",
+}
+
+
+def render_sys_allocation_index_procedure(table, event):
+    """Render a database procedure that refreshes the storage allocation
+    index for the node that a changed row in `table` belongs to.
+
+    :param table: Name of the table, without the "maasserver_" prefix.
+    :param event: One of "insert", "update" or "delete".
+    :return: The name of the procedure and the SQL to create it.
+    """
+    proc_name = "sys_allocation_index_%s_%s" % (table, event)
+    if event == 'update':
+        # The row may have moved to another node, whose index must then be
+        # refreshed as well as the new one.
+        return proc_name, dedent("""\
+            CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+            DECLARE
+              old_node_id integer;
+              new_node_id integer;
+            BEGIN
+              old_node_id := %s;
+              new_node_id := %s;
+              PERFORM sys_allocation_index_refresh(new_node_id);
+              IF old_node_id IS DISTINCT FROM new_node_id THEN
+                PERFORM sys_allocation_index_refresh(old_node_id);
+              END IF;
+              RETURN NEW;
+            END;
+            $$ LANGUAGE plpgsql;
+            """ % (
+            proc_name,
+            ALLOCATION_INDEX_NODE_ID[table].format(row='OLD'),
+            ALLOCATION_INDEX_NODE_ID[table].format(row='NEW')))
+    row = 'OLD' if event == 'delete' else 'NEW'
+    node_id = ALLOCATION_INDEX_NODE_ID[table].format(row=row)
+    return proc_name, dedent("""\
+        CREATE OR REPLACE FUNCTION %s() RETURNS trigger AS $$
+        BEGIN
+          PERFORM sys_allocation_index_refresh(%s);
+          RETURN %s;
+        END;
+        $$ LANGUAGE plpgsql;
+        """ % (proc_name, node_id, row))
+
+
 def render_sys_proxy_procedure(proc_name, on_delete=False):
     """Render a database procedure with name `proc_name` that notifies that a
     proxy update is needed.
@@ -2066,3 +2187,29 @@ def register_system_triggers():
     register_trigger(
         "maasserver_config", "sys_rbac_config_update",
         "update")
+
+    # Storage allocation index
+    register_procedure(ALLOCATION_INDEX_REFRESH)
+    allocation_index_triggers = [
+        ("blockdevice", "insert", None),
+        ("blockdevice", "update", ["node_id", "size", "tags"]),
+        ("blockdevice", "delete", None),
+        ("partitiontable", "insert", None),
+        ("partitiontable", "update", ["block_device_id"]),
+        ("partitiontable", "delete", None),
+        ("partition", "insert", None),
+        ("partition", "update", ["partition_table_id", "size", "tags"]),
+        ("partition", "delete", None),
+        ("filesystem", "insert", None),
+        ("filesystem", "update", [
+            "block_device_id", "partition_id", "mount_point", "acquired"]),
+        ("filesystem", "delete", None),
+        # The node's devices are gone by now; this removes what's left.
+        ("node", "delete", None),
+    ]
+    for table, event, fields in allocation_index_triggers:
+        proc_name, procedure = render_sys_allocation_index_procedure(
+            table, event)
+        register_procedure(procedure)
+        register_trigger(
+            "maasserver_" + table, proc_name, event, fields=fields)
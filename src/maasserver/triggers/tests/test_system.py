@@ -66,6 +66,19 @@ class TestTriggers(MAASServerTestCase):
             "resourcepool_sys_rbac_rpool_delete",
             "config_sys_rbac_config_insert",
             "config_sys_rbac_config_update",
+            "blockdevice_sys_allocation_index_blockdevice_insert",
+            "blockdevice_sys_allocation_index_blockdevice_update",
+            "blockdevice_sys_allocation_index_blockdevice_delete",
+            "partitiontable_sys_allocation_index_partitiontable_insert",
+            "partitiontable_sys_allocation_index_partitiontable_update",
+            "partitiontable_sys_allocation_index_partitiontable_delete",
+            "partition_sys_allocation_index_partition_insert",
+            "partition_sys_allocation_index_partition_update",
+            "partition_sys_allocation_index_partition_delete",
+            "filesystem_sys_allocation_index_filesystem_insert",
+            "filesystem_sys_allocation_index_filesystem_update",
+            "filesystem_sys_allocation_index_filesystem_delete",
+            "node_sys_allocation_index_node_delete",
             ]
         sql, args = psql_array(triggers, sql_type="text")
         with closing(connection.cursor()) as cursor:
@@ -4169,6 +4169,29 @@ class TestDNSConfigListener(
                 "configuration dnssec_validation set to %s"
                 % json.dumps("no")))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_sends_message_for_config_dns_dynamic_updates_insert(self):
+        yield deferToDatabase(register_system_triggers)
+        yield self.capturePublication()
+        dv = DeferredValue()
+        listener = self.make_listener_without_delay()
+        listener.register(
+            "sys_dns", lambda *args: dv.set(args))
+        yield listener.startService()
+        try:
+            yield deferToDatabase(
+                Config.objects.set_config,
+                "dns_dynamic_updates", True)
+            yield dv.get(timeout=2)
+            yield self.assertPublicationUpdated()
+        finally:
+            yield listener.stopService()
+        self.assertThat(
+            self.getCapturedPublication().source, Equals(
+                "configuration dns_dynamic_updates set to %s"
+                % json.dumps(True)))
+
     @wait_for_reactor
     @inlineCallbacks
     def test_sends_message_for_config_default_dns_ttl_insert(self):
@@ -0,0 +1,136 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""In-process caches of database state."""
+
+__all__ = [
+    "ProcessCache",
+    "ProcessCacheUnavailable",
+]
+
+from datetime import timedelta
+import threading
+import time
+
+from maasserver.prometheus.metrics import PROMETHEUS_METRICS
+from maasserver.utils.orm import post_commit_do
+
+
+class ProcessCacheUnavailable(Exception):
+    """The cache cannot answer; the database must be asked instead."""
+
+
+class ProcessCache:
+    """An in-process copy of some database state, built by `build`.
+
+    The cache is rebuilt by a `ProcessCacheService` in region worker
+    processes, and dropped whenever the database notifies that the state
+    has changed, or a transaction in this process that changed it commits.
+    Until it has been rebuilt, and while the current transaction has
+    uncommitted changes to the state, `get_data` raises `unavailable` so
+    that callers can query the database; the current transaction therefore
+    always sees its own changes.
+
+    Lookups answered by the cache count as hits, and those left for the
+    database as misses. If `metrics` is set, these and invalidations are
+    also counted by the Prometheus metrics with that prefix.
+    """
+
+    # The cache is not trusted once it is this old, in case a notification
+    # from the database was missed.
+    max_age = timedelta(minutes=2).total_seconds()
+
+    # The exception raised when the cache cannot answer.
+    unavailable = ProcessCacheUnavailable
+
+    # The prefix of the Prometheus metrics for this cache, if any.
+    metrics = None
+
+    def __init__(self, clock=time.monotonic):
+        super(ProcessCache, self).__init__()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
+        self._data = None
+        self._built = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _update_metric(self, name):
+        if self.metrics is not None:
+            PROMETHEUS_METRICS.update(
+                "%s_%s" % (self.metrics, name), "inc")
+
+    def invalidate(self):
+        """Drop the cache until it is next rebuilt."""
+        with self._lock:
+            self._generation += 1
+            self._data = None
+            self._built = None
+            self.invalidations += 1
+        self._update_metric("invalidations")
+
+    def changed(self):
+        """Note that this thread's transaction has changed the cached state.
+
+        Lookups in this thread fall back to the database until the
+        transaction ends. If it commits, the cache is invalidated.
+        """
+        self._local.pending = post_commit_do(self.invalidate)
+
+    def _has_local_changes(self):
+        pending = getattr(self._local, "pending", None)
+        return pending is not None and not pending.called
+
+    def build(self):
+        """Return the data to cache, read from the database."""
+        raise NotImplementedError()
+
+    def rebuild(self):
+        """Rebuild the cache from the database.
+
+        This must be called in a transaction that began after the cache was
+        last invalidated, otherwise it may hold an outdated snapshot.
+
+        :return: True if the cache was rebuilt, or False if it was
+            invalidated while rebuilding, or this transaction has changed
+            the cached state.
+        """
+        if self._has_local_changes():
+            return False
+        with self._lock:
+            generation = self._generation
+        data = self.build()
+        with self._lock:
+            if generation == self._generation:
+                self._data = data
+                self._built = self.clock()
+                return True
+            else:
+                return False
+
+    def get_data(self):
+        """Return the data last built by `build`.
+
+        :raise ProcessCacheUnavailable: As `unavailable`, when the cache has
+            not been built, is out of date, or this thread's transaction has
+            changed the cached state.
+        """
+        with self._lock:
+            data, built = self._data, self._built
+            if data is None or self.clock() - built > self.max_age:
+                data = None
+            elif self._has_local_changes():
+                data = None
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if data is None:
+            self._update_metric("misses")
+            raise self.unavailable()
+        else:
+            self._update_metric("hits")
+            return data
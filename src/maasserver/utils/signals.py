@@ -176,6 +176,29 @@ class SignalsManager:
             )
         )
 
+    def watch_cache(self, cache, model, fields=None):
+        """Note changes to a model in an in-process cache.
+
+        Saving or deleting an instance of `model`, or, if `fields` are
+        given, changing one of those fields, calls `cache.changed()`.
+
+        :param cache: The cache holding instances of `model`.
+        :type cache: `maasserver.utils.cache.ProcessCache`
+        :param model: The Django model object whose changes are of interest.
+        :type model: Model class
+        :param fields: Names of the fields to monitor, or None to monitor
+            every save.
+        :type fields: Iterable of attribute names.
+        """
+        def changed(*args, **kwargs):
+            cache.changed()
+
+        if fields is None:
+            self.watch(post_save, changed, sender=model)
+            self.watch(post_delete, changed, sender=model)
+        else:
+            self.watch_fields(changed, model, fields, delete=True)
+
     def watch(self, sig, cb, sender=None, weak=True, dispatch_uid=None):
         """Watch the given model for changes.
 
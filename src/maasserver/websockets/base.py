@@ -10,6 +10,7 @@ __all__ = [
     "Handler",
     ]
 
+import json
 from operator import attrgetter
 
 from django.contrib.postgres.fields import ArrayField
@@ -92,6 +93,7 @@ class HandlerOptions(object):
     form = None
     form_requires_request = True
     listen_channels = []
+    notify_admins_shared = False
     batch_key = 'id'
     create_permission = None
     view_permission = None
@@ -170,6 +172,16 @@ class Handler(metaclass=HandlerMetaclass):
         # correct notifications based on what items the client has.
         if "loaded_pks" not in self.cache:
             self.cache["loaded_pks"] = set()
+        # Holds the results shared between the handlers of every client in
+        # the same notify group while a single notification is processed.
+        # This is set by the `WebSocketFactory` and is `None` otherwise.
+        self.notify_shared = None
+        # Called from the database thread with each chunk of a streamed
+        # result. This is set by the `WebSocketProtocol` for each request.
+        self.send_partial = None
+        # The fields the client asked for in the current call, or `None` when
+        # all fields are wanted.
+        self.requested_fields = None
 
     def full_dehydrate(self, obj, for_list=False):
         """Convert the given object into a dictionary.
@@ -194,6 +206,10 @@ class Handler(metaclass=HandlerMetaclass):
                 continue
             if exclude_fields is not None and field_name in exclude_fields:
                 continue
+            # Skip fields that the client did not ask for.
+            if (field_name != self._meta.pk and
+                    not self.is_requested(field_name)):
+                continue
 
             # Get the value from the field and set it in data. The value
             # will pass through the dehydrate method if present.
@@ -212,10 +228,30 @@ class Handler(metaclass=HandlerMetaclass):
                     data[field_name] = field.value_to_string(obj)
 
         # Add permissions that can be performed on this object.
-        data = self._add_permissions(obj, data)
+        if self.is_requested('permissions'):
+            data = self._add_permissions(obj, data)
 
         # Return the data after the final dehydrate.
-        return self.dehydrate(obj, data, for_list=for_list)
+        data = self.dehydrate(obj, data, for_list=for_list)
+        if self.requested_fields is not None:
+            # Drop anything extra the final dehydrate added.
+            data = {
+                key: value
+                for key, value in data.items()
+                if key == self._meta.pk or key in self.requested_fields
+            }
+        return data
+
+    def is_requested(self, *fields):
+        """Return True if the client asked for any of `fields`.
+
+        This is always True when the client did not restrict the fields, and
+        should be used to skip computing expensive values that would not be
+        sent anyway.
+        """
+        return (
+            self.requested_fields is None or
+            not self.requested_fields.isdisjoint(fields))
 
     def dehydrate(self, obj, data, for_list=False):
         """Add any extra info to the `data` before finalizing the final object.
@@ -395,7 +431,25 @@ class Handler(metaclass=HandlerMetaclass):
     def _cache_pks(self, objs):
         """Cache all loaded object pks."""
         getpk = attrgetter(self._meta.pk)
-        self.cache["loaded_pks"].update(getpk(obj) for obj in objs)
+        pks = [getpk(obj) for obj in objs]
+        self.cache["loaded_pks"].update(pks)
+        self._forget_snapshots(pks)
+
+    def _forget_snapshots(self, pks):
+        """Forget the snapshots for `pks`.
+
+        The client has been sent these objects in full, or has unloaded
+        them, so the next notification for each of them is sent in full.
+        """
+        snapshots = self.cache.get("snapshots")
+        if snapshots:
+            for pk in pks:
+                snapshots.pop(pk, None)
+
+    def _unload_pk(self, pk):
+        """Remove `pk` from the objects the client has loaded."""
+        self.cache['loaded_pks'].remove(pk)
+        self._forget_snapshots([pk])
 
     def list(self, params):
         """List objects.
@@ -405,22 +459,68 @@ class Handler(metaclass=HandlerMetaclass):
             also understands this distinction.
         :param offset: Offset into the queryset to return.
         :param limit: Maximum number of objects to return.
+        :param fields: Only include these fields, and the `pk`, in each of
+            the objects. Fields that are not requested are not computed.
+        :param chunk_size: Stream the objects as they are dehydrated, sending
+            each chunk of this many objects as a partial result. The result
+            of the call is then only the last chunk.
         """
+        if "fields" in params:
+            self.requested_fields = frozenset(params["fields"])
         queryset = self.get_queryset(for_list=True)
         queryset = queryset.order_by(self._meta.batch_key)
-        if "start" in params:
-            queryset = queryset.filter(**{
-                "%s__gt" % self._meta.batch_key: params["start"]
-                })
-        if "limit" in params:
-            queryset = queryset[:params["limit"]]
-        objs = list(queryset)
+        chunk_size = params.get("chunk_size")
+        if chunk_size is not None and (
+                not isinstance(chunk_size, int) or chunk_size <= 0):
+            raise HandlerValidationError({
+                "chunk_size": ["Must be a positive integer"]
+            })
+        if chunk_size is None or self.send_partial is None:
+            if "start" in params:
+                queryset = queryset.filter(**{
+                    "%s__gt" % self._meta.batch_key: params["start"]
+                    })
+            if "limit" in params:
+                queryset = queryset[:params["limit"]]
+            return self._dehydrate_list(list(queryset))
+        else:
+            return self._stream_list(
+                queryset, chunk_size, params.get("start"),
+                params.get("limit"))
+
+    def _dehydrate_list(self, objs):
+        """Cache the pks of `objs` and return them dehydrated for a list."""
         self._cache_pks(objs)
         return [
             self.full_dehydrate(obj, for_list=True)
             for obj in objs
             ]
 
+    def _stream_list(self, queryset, chunk_size, start=None, limit=None):
+        """Send `queryset` through `send_partial` in chunks.
+
+        Each chunk is fetched with its own query, keyed on `batch_key`, so
+        only one chunk of objects is held in memory at any time.
+
+        :return: The last chunk.
+        """
+        getkey = attrgetter(self._meta.batch_key)
+        while True:
+            size = chunk_size if limit is None else min(chunk_size, limit)
+            chunk = queryset
+            if start is not None:
+                chunk = chunk.filter(**{
+                    "%s__gt" % self._meta.batch_key: start
+                    })
+            objs = list(chunk[:size])
+            data = self._dehydrate_list(objs)
+            if limit is not None:
+                limit -= len(objs)
+            if len(objs) < size or limit == 0:
+                return data
+            self.send_partial(data)
+            start = getkey(objs[-1])
+
     def get(self, params):
         """Get object.
 
@@ -541,16 +641,16 @@ class Handler(metaclass=HandlerMetaclass):
         pk = self._meta.pk_type(pk)
         if action == "delete":
             if pk in self.cache['loaded_pks']:
-                self.cache['loaded_pks'].remove(pk)
+                self._unload_pk(pk)
                 return (self._meta.handler_name, action, pk)
             else:
                 return None
 
-        self.user.refresh_from_db()
-        try:
-            obj = self.listen(channel, action, pk)
-        except HandlerDoesNotExistError:
-            obj = None
+        if self.notify_shared is None:
+            # The factory refreshes the users once for all the clients when
+            # the notification is shared.
+            self.user.refresh_from_db()
+        obj = self.listen_for_notify(channel, action, pk)
         if action == "create" and obj is not None:
             if pk in self.cache['loaded_pks']:
                 # The user already knows about this node, so its not a create
@@ -564,7 +664,7 @@ class Handler(metaclass=HandlerMetaclass):
                 if obj is None:
                     # The user no longer has access to this object. To the
                     # client this is a delete action.
-                    self.cache['loaded_pks'].remove(pk)
+                    self._unload_pk(pk)
                     return (self._meta.handler_name, "delete", pk)
                 else:
                     # Just a normal update to the client.
@@ -585,22 +685,123 @@ class Handler(metaclass=HandlerMetaclass):
 
     def on_listen_for_active_pk(self, action, pk, obj):
         """Return the correct data for `obj` depending on if its the
-        active primary key."""
+        active primary key.
+
+        An update for an object that has already been sent to the client in
+        a notification is sent as a "patch" that only holds the fields that
+        changed, and is not sent at all when nothing changed.
+        """
         if 'active_pk' in self.cache and pk == self.cache['active_pk']:
             # Active so send all the data for the object.
-            return (
-                self._meta.handler_name,
-                action,
-                self.full_dehydrate(obj, for_list=False),
-                )
+            for_list = False
         else:
             # Not active so only send the data like it was comming from
             # the list call.
-            return (
-                self._meta.handler_name,
-                action,
-                self.full_dehydrate(obj, for_list=True),
-                )
+            for_list = True
+        data = self.dehydrate_for_notify(obj, for_list=for_list)
+        # Keep a snapshot of the data last sent to the client for each pk, so
+        # that later updates only need to send the fields that changed.
+        snapshots = self.cache.setdefault("snapshots", {})
+        snapshot = self.snapshot_for_notify(data, for_list=for_list)
+        previous = snapshots.get(pk)
+        snapshots[pk] = snapshot
+        if action == "update" and previous is not None:
+            patch = self._make_patch(pk, data, previous, snapshot)
+            if patch is not None:
+                if len(patch) == 1:
+                    # Only the pk; nothing changed for the client.
+                    return None
+                return (self._meta.handler_name, "patch", patch)
+        return (self._meta.handler_name, action, data)
+
+    def snapshot_for_notify(self, data, for_list=False):
+        """Return a compact snapshot of the dehydrated `data`.
+
+        The snapshot maps each field to a hash of its JSON encoding. It is
+        shared between all the handlers in the same notify group.
+        """
+        shared = self.notify_shared
+        key = ("snapshot", for_list)
+        if shared is not None and key in shared:
+            return shared[key]
+        snapshot = for_list, {
+            field: hash(json.dumps(value, sort_keys=True, default=str))
+            for field, value in data.items()
+        }
+        if shared is not None:
+            shared[key] = snapshot
+        return snapshot
+
+    def _make_patch(self, pk, data, previous, snapshot):
+        """Return the fields of `data` that changed since `previous`.
+
+        Returns `None` when the object has to be sent in full: when it was
+        previously sent with a different set of fields.
+        """
+        previous_for_list, previous_hashes = previous
+        for_list, hashes = snapshot
+        if for_list != previous_for_list:
+            return None
+        if not previous_hashes.keys() <= hashes.keys():
+            return None
+        patch = {
+            field: data[field]
+            for field, value_hash in hashes.items()
+            if previous_hashes.get(field) != value_hash
+        }
+        patch[self._meta.pk] = pk
+        return patch
+
+    def get_notify_group(self):
+        """Return the key of the notify group for this handler.
+
+        Handlers in the same notify group see exactly the same data for an
+        object, so the object is only fetched and dehydrated once for all of
+        them. Each user has its own group, except that administrators share
+        a single group when `notify_admins_shared` is turned on for the
+        handler and RBAC is not enabled. Only turn it on for handlers that
+        give every administrator the same data for an object.
+        """
+        if (self._meta.notify_admins_shared and
+                self.user.is_superuser and not rbac.is_enabled()):
+            return "admin"
+        else:
+            return self.user.id
+
+    def listen_for_notify(self, channel, action, pk):
+        """Return the object for `pk` or `None` if it cannot be seen.
+
+        Calls `listen` only once for all the handlers in the same notify
+        group.
+        """
+        shared = self.notify_shared
+        if shared is not None and "obj" in shared:
+            return shared["obj"]
+        try:
+            obj = self.listen(channel, action, pk)
+        except HandlerDoesNotExistError:
+            obj = None
+        if shared is not None:
+            shared["obj"] = obj
+        return obj
+
+    def dehydrate_for_notify(self, obj, for_list=False):
+        """Return `obj` dehydrated for a notification.
+
+        The dehydrated data is shared between all the handlers in the same
+        notify group, so it must not be modified by the caller.
+        """
+        shared = self.notify_shared
+        if shared is None:
+            return self._dehydrate_for_notify(obj, for_list)
+        key = ("dehydrated", for_list)
+        if key not in shared:
+            shared[key] = self._dehydrate_for_notify(obj, for_list)
+        return shared[key]
+
+    def _dehydrate_for_notify(self, obj, for_list):
+        """Dehydrate `obj` for a notification, without sharing."""
+        return self.full_dehydrate(obj, for_list=for_list)
 
     def listen(self, channel, action, pk):
         """Called when the handler listens for events on channels with
@@ -153,7 +153,9 @@ class DeviceHandler(NodeHandler):
         """Cache all loaded object pks."""
         # Copy from base.py as devices don't have ScriptResults
         getpk = attrgetter(self._meta.pk)
-        self.cache["loaded_pks"].update(getpk(obj) for obj in objs)
+        pks = [getpk(obj) for obj in objs]
+        self.cache["loaded_pks"].update(pks)
+        self._forget_snapshots(pks)
 
     def get_queryset(self, for_list=False):
         """Return `QuerySet` for devices only viewable by `user`."""
@@ -56,6 +56,7 @@ class DomainHandler(TimestampedModelHandler, AdminOnlyMixin):
         listen_channels = [
             "domain",
         ]
+        notify_admins_shared = True
 
     def dehydrate(self, domain, data, for_list=False):
         rrsets = domain.render_json_for_related_rrdata(
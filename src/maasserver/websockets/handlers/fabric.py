@@ -35,6 +35,7 @@ class FabricHandler(TimestampedModelHandler):
         listen_channels = [
             "fabric",
             ]
+        notify_admins_shared = True
 
     def dehydrate(self, obj, data, for_list=False):
         data["name"] = obj.get_name()
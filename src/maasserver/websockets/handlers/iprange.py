@@ -34,6 +34,7 @@ class IPRangeHandler(TimestampedModelHandler):
         listen_channels = [
             "iprange",
         ]
+        notify_admins_shared = True
 
     def dehydrate(self, obj, data, for_list=False):
         """Add extra fields to `data`."""
@@ -199,6 +199,27 @@ class MachineHandler(NodeHandler):
         edit_permission = NodePermission.admin
         delete_permission = NodePermission.admin
 
+    script_result_fields = NodeHandler.script_result_fields | {
+        "cpu_test_status",
+        "cpu_test_status_tooltip",
+        "memory_test_status",
+        "memory_test_status_tooltip",
+        "storage_test_status",
+        "storage_test_status_tooltip",
+        "other_test_status",
+        "other_test_status_tooltip",
+        "status_tooltip",
+    }
+
+    # Fields computed from the boot interface.
+    boot_interface_fields = frozenset({
+        "pxe_mac",
+        "pxe_mac_vendor",
+        "power_type",
+        "vlan",
+        "ip_addresses",
+    })
+
     def get_queryset(self, for_list=False):
         """Return `QuerySet` for devices only viewable by `user`."""
         return Machine.objects.get_nodes(
@@ -214,7 +235,8 @@ class MachineHandler(NodeHandler):
             "pool": self.dehydrate_pool(obj.pool),
         })
 
-        if obj.is_machine or not for_list:
+        if (obj.is_machine or not for_list) and self.is_requested(
+                *self.boot_interface_fields):
             boot_interface = obj.get_boot_interface()
             if boot_interface is not None:
                 data["pxe_mac"] = "%s" % boot_interface.mac_address
@@ -230,6 +252,23 @@ class MachineHandler(NodeHandler):
         if obj.bmc is not None and obj.bmc.bmc_type == BMC_TYPE.POD:
             data['pod'] = self.dehydrate_pod(obj.bmc)
 
+        if self.is_requested(*self.script_result_fields):
+            self.dehydrate_test_statuses(obj, data)
+
+        if not for_list:
+            # Add info specific to a machine.
+            data["show_os_info"] = self.dehydrate_show_os_info(obj)
+            devices = [
+                self.dehydrate_device(device)
+                for device in obj.children.all()
+            ]
+            data["devices"] = sorted(
+                devices, key=itemgetter("fqdn"))
+
+        return data
+
+    def dehydrate_test_statuses(self, obj, data):
+        """Add the hardware test statuses of `obj` to `data`."""
         cpu_script_results = [
             script_result for script_result in
             self._script_results.get(obj.id, {}).get(HARDWARE_TYPE.CPU, [])
@@ -283,18 +322,6 @@ class MachineHandler(NodeHandler):
         else:
             data["status_tooltip"] = ""
 
-        if not for_list:
-            # Add info specific to a machine.
-            data["show_os_info"] = self.dehydrate_show_os_info(obj)
-            devices = [
-                self.dehydrate_device(device)
-                for device in obj.children.all()
-            ]
-            data["devices"] = sorted(
-                devices, key=itemgetter("fqdn"))
-
-        return data
-
     def dehydrate_show_os_info(self, obj):
         """Return True if OS information should show in the UI."""
         return (
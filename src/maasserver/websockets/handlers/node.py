@@ -92,6 +92,34 @@ class NodeHandler(TimestampedModelHandler):
         abstract = True
         pk = 'system_id'
         pk_type = str
+        notify_admins_shared = True
+
+    # Fields computed from the cached script results.
+    script_result_fields = frozenset({
+        "commissioning_script_count",
+        "commissioning_status",
+        "commissioning_status_tooltip",
+        "testing_script_count",
+        "testing_status",
+        "testing_status_tooltip",
+        "has_logs",
+    })
+
+    # Fields computed from the block devices and script results.
+    storage_fields = script_result_fields | {
+        "physical_disk_count",
+        "storage",
+        "storage_tags",
+    }
+
+    # Fields computed from the interfaces and tags, used for filtering.
+    filter_fields = frozenset({
+        "subnets",
+        "fabrics",
+        "spaces",
+        "tags",
+        "extra_macs",
+    })
 
     def __init__(self, user, cache, request):
         super().__init__(user, cache, request)
@@ -183,12 +211,15 @@ class NodeHandler(TimestampedModelHandler):
     def dehydrate(self, obj, data, for_list=False):
         """Add extra fields to `data`."""
         data["fqdn"] = obj.fqdn
-        data["actions"] = list(compile_node_actions(obj, self.user).keys())
+        if self.is_requested("actions"):
+            data["actions"] = list(
+                compile_node_actions(obj, self.user).keys())
         data["node_type_display"] = obj.get_node_type_display()
         data["link_type"] = NODE_TYPE_TO_LINK_TYPE[obj.node_type]
 
-        if obj.node_type == NODE_TYPE.MACHINE or (
-                obj.is_controller and not for_list):
+        if self.is_requested(*self.storage_fields) and (
+                obj.node_type == NODE_TYPE.MACHINE or (
+                    obj.is_controller and not for_list)):
             # Disk count and storage amount is shown on the machine listing
             # page and the machine and controllers details page.
             blockdevices = self.get_blockdevices_for(obj)
@@ -255,7 +286,7 @@ class NodeHandler(TimestampedModelHandler):
             data["status_code"] = obj.status
 
         # Filters are only available on machines and devices.
-        if not obj.is_controller:
+        if not obj.is_controller and self.is_requested(*self.filter_fields):
             # For filters
             subnets = self.get_all_subnets(obj)
             data["subnets"] = [subnet.cidr for subnet in subnets]
@@ -399,11 +430,14 @@ class NodeHandler(TimestampedModelHandler):
 
     def _cache_pks(self, nodes):
         super()._cache_pks(nodes)
-        self._cache_script_results(nodes)
+        if self.is_requested(*self.script_result_fields):
+            self._cache_script_results(nodes)
 
-    def on_listen_for_active_pk(self, action, pk, obj):
+    def _dehydrate_for_notify(self, obj, for_list):
+        # Only refresh the script results when this handler is the one
+        # dehydrating `obj` for its notify group.
         self._cache_script_results([obj])
-        return super().on_listen_for_active_pk(action, pk, obj)
+        return super()._dehydrate_for_notify(obj, for_list)
 
     def dehydrate_blockdevice(self, blockdevice, obj):
         """Return `BlockDevice` formatted for JSON encoding."""
@@ -72,6 +72,7 @@ class PodHandler(TimestampedModelHandler):
         listen_channels = [
             "pod",
         ]
+        notify_admins_shared = True
         create_permission = PodPermission.create
         view_permission = PodPermission.view
         edit_permission = PodPermission.edit
@@ -35,6 +35,7 @@ class SpaceHandler(TimestampedModelHandler):
         listen_channels = [
             "space",
         ]
+        notify_admins_shared = True
 
     def dehydrate(self, obj, data, for_list=False):
         data["name"] = obj.get_name()
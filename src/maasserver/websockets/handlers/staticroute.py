@@ -32,6 +32,7 @@ class StaticRouteHandler(TimestampedModelHandler):
         listen_channels = [
             "staticroute",
         ]
+        notify_admins_shared = True
 
     def create(self, params):
         """Create a static route."""
@@ -54,6 +54,7 @@ class SubnetHandler(TimestampedModelHandler):
         listen_channels = [
             "subnet",
         ]
+        notify_admins_shared = True
 
     def dehydrate_dns_servers(self, dns_servers):
         if dns_servers is None:
@@ -22,3 +22,4 @@ class TagHandler(TimestampedModelHandler):
         listen_channels = [
             "tag",
             ]
+        notify_admins_shared = True
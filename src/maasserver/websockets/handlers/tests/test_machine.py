@@ -1687,6 +1687,10 @@ class TestMachineHandler(MAASServerTestCase):
         self.assertItemsEqual(
             space_names, handler.get_all_space_names(node_subnets))
 
+    def test_admins_share_notify_group(self):
+        handler = MachineHandler(factory.make_admin(), {}, None)
+        self.assertEqual("admin", handler.get_notify_group())
+
     def test_get(self):
         user = factory.make_User()
         handler = MachineHandler(user, {}, None)
@@ -62,6 +62,11 @@ class TestSSHKeyHandler(MAASServerTestCase):
         self.assertRaises(
             HandlerDoesNotExistError, handler.get, {"id": not_owned_sshkey.id})
 
+    def test_admins_have_their_own_notify_group(self):
+        admin = factory.make_admin()
+        handler = SSHKeyHandler(admin, {}, None)
+        self.assertEqual(admin.id, handler.get_notify_group())
+
     def test_list(self):
         user = factory.make_User()
         handler = SSHKeyHandler(user, {}, None)
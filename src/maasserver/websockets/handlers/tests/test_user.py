@@ -68,6 +68,11 @@ class TestUserHandler(MAASServerTestCase):
         self.assertRaises(
             HandlerDoesNotExistError, handler.get, {"id": other_user.id})
 
+    def test_admins_have_their_own_notify_group(self):
+        admin = factory.make_admin()
+        handler = UserHandler(admin, {}, None)
+        self.assertEqual(admin.id, handler.get_notify_group())
+
     def test_list_for_admin(self):
         admin = factory.make_admin()
         handler = UserHandler(admin, {}, None)
@@ -55,6 +55,7 @@ class VLANHandler(TimestampedModelHandler):
         listen_channels = [
             "vlan",
         ]
+        notify_admins_shared = True
 
     def dehydrate_primary_rack(self, rack):
         if rack is None:
@@ -38,6 +38,7 @@ class ZoneHandler(TimestampedModelHandler):
         listen_channels = [
             "zone",
             ]
+        notify_admins_shared = True
 
     def delete(self, parameters):
         """Delete this Zone."""
@@ -27,13 +27,18 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.http import HttpRequest
 from maasserver.eventloop import services
-from maasserver.utils.orm import transactional
+from maasserver.utils.orm import (
+    is_retryable_failure,
+    savepoint,
+    transactional,
+)
 from maasserver.utils.threads import deferToDatabase
 from maasserver.websockets import handlers
 from maasserver.websockets.websockets import STATUSES
 from provisioningserver.logger import LegacyLogger
 from provisioningserver.utils import typed
 from provisioningserver.utils.twisted import (
+    asynchronous,
     deferred,
     synchronous,
 )
@@ -68,6 +73,9 @@ class MSG_TYPE:
     PING = 3
     PING_REPLY = 4
 
+    #: Part of a streamed response from server.
+    PARTIAL_RESPONSE = 5
+
 
 class RESPONSE_TYPE:
     #:
@@ -330,6 +338,7 @@ class WebSocketProtocol(Protocol):
             return None
 
         handler = self.buildHandler(handler_class)
+        handler.send_partial = partial(self.sendPartialResult, request_id)
         d = handler.execute(method, message.get("params", {}))
         d.addCallbacks(
             partial(self.sendResult, request_id),
@@ -357,6 +366,16 @@ class WebSocketProtocol(Protocol):
             result_msg, default=self._json_encode).encode("ascii"))
         return result
 
+    @asynchronous
+    def sendPartialResult(self, request_id, result):
+        """Send part of a streamed result to client.
+
+        This can be called from the database thread while the request is
+        still being handled; the message is always sent from the reactor.
+        """
+        return self.sendResult(
+            request_id, result, msg_type=MSG_TYPE.PARTIAL_RESPONSE)
+
     def sendError(self, request_id, handler, method, failure):
         """Log and send error to client."""
         if isinstance(failure.value, ValidationError):
@@ -462,17 +481,61 @@ class WebSocketFactory(Factory):
 
     @inlineCallbacks
     def onNotify(self, handler_class, channel, action, obj_id):
-        for client in self.clients:
-            handler = client.buildHandler(handler_class)
-            data = yield deferToDatabase(
-                self.processNotify, handler, channel, action, obj_id)
+        # Build the handlers for all the clients up front so that the
+        # notification is processed for all of them in one transaction.
+        clients = list(self.clients)
+        if len(clients) == 0:
+            return
+        handlers = [
+            client.buildHandler(handler_class)
+            for client in clients
+        ]
+        results = yield deferToDatabase(
+            self.processNotify, handlers, channel, action, obj_id)
+        for client, data in zip(clients, results):
             if data is not None:
                 (name, client_action, data) = data
                 client.sendNotify(name, client_action, data)
 
     @transactional
-    def processNotify(self, handler, channel, action, obj_id):
-        return handler.on_listen(channel, action, obj_id)
+    def processNotify(self, handlers, channel, action, obj_id):
+        """Process the notification with each of `handlers`.
+
+        Each user is refreshed only once, and handlers in the same notify
+        group share the fetched and dehydrated object, so the cost of a
+        notification grows with the number of distinct users rather than the
+        number of connected clients.
+
+        A handler that fails is logged and its client is not notified; the
+        other clients are still notified.
+
+        :return: A list with the result of `on_listen` for each handler.
+        """
+        users = {}
+        groups = {}
+        results = []
+        for handler in handlers:
+            user = users.get(handler.user.id)
+            if user is None:
+                user = users[handler.user.id] = handler.user
+                user.refresh_from_db()
+            handler.user = user
+            handler.notify_shared = groups.setdefault(
+                handler.get_notify_group(), {})
+            try:
+                with savepoint():
+                    result = handler.on_listen(channel, action, obj_id)
+            except Exception as error:
+                if is_retryable_failure(error):
+                    # Retry the whole transaction.
+                    raise
+                log.err(
+                    None, "Failed to process '%s' notification for %s "
+                    "(%s) with %s." % (
+                        action, channel, obj_id, handler._meta.handler_name))
+                result = None
+            results.append(result)
+        return results
 
     def registerRPCEvents(self):
         """Register for connected and disconnected events from the RPC
@@ -457,6 +457,74 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
         handler.list({"start": nodes[0].id})
         self.assertItemsEqual(pks, handler.cache['loaded_pks'])
 
+    def test_list_only_includes_requested_fields(self):
+        nodes = [factory.make_Node() for _ in range(3)]
+        output = [
+            {"hostname": node.hostname}
+            for node in nodes
+            ]
+        handler = self.make_nodes_handler(fields=['hostname', 'architecture'])
+        self.assertItemsEqual(
+            output, handler.list({"fields": ["hostname"]}))
+
+    def test_list_skips_permissions_unless_requested(self):
+        factory.make_Node()
+        handler = self.make_nodes_handler(
+            fields=['hostname'], edit_permission=NodePermission.edit)
+        mock_add_permissions = self.patch(handler, "_add_permissions")
+        handler.list({"fields": ["hostname"]})
+        self.assertThat(mock_add_permissions, MockNotCalled())
+
+    def test_list_chunk_size_sends_partial_results(self):
+        nodes = [factory.make_Node() for _ in range(5)]
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.send_partial = MagicMock()
+        result = handler.list({"chunk_size": 2})
+        self.assertEqual(
+            [
+                [[{"hostname": node.hostname} for node in nodes[0:2]]],
+                [[{"hostname": node.hostname} for node in nodes[2:4]]],
+            ],
+            [
+                list(call[0])
+                for call in handler.send_partial.call_args_list
+            ])
+        self.assertEqual([{"hostname": nodes[4].hostname}], result)
+        self.assertItemsEqual(
+            [node.system_id for node in nodes], handler.cache['loaded_pks'])
+
+    def test_list_chunk_size_respects_start_and_limit(self):
+        nodes = [factory.make_Node() for _ in range(9)]
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.send_partial = MagicMock()
+        result = handler.list(
+            {"chunk_size": 2, "start": nodes[2].id, "limit": 3})
+        self.assertThat(
+            handler.send_partial, MockCalledOnceWith(
+                [{"hostname": node.hostname} for node in nodes[3:5]]))
+        self.assertEqual([{"hostname": nodes[5].hostname}], result)
+
+    def test_list_chunk_size_returns_all_without_send_partial(self):
+        nodes = [factory.make_Node() for _ in range(3)]
+        handler = self.make_nodes_handler(fields=['hostname'])
+        self.assertItemsEqual(
+            [{"hostname": node.hostname} for node in nodes],
+            handler.list({"chunk_size": 2}))
+
+    def test_list_rejects_zero_chunk_size(self):
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.send_partial = MagicMock()
+        self.assertRaises(
+            HandlerValidationError, handler.list, {"chunk_size": 0})
+        self.assertThat(handler.send_partial, MockNotCalled())
+
+    def test_list_rejects_negative_chunk_size(self):
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.send_partial = MagicMock()
+        self.assertRaises(
+            HandlerValidationError, handler.list, {"chunk_size": -1})
+        self.assertThat(handler.send_partial, MockNotCalled())
+
     def test_get(self):
         node = factory.make_Node()
         handler = self.make_nodes_handler(fields=['hostname'])
@@ -791,11 +859,12 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
         handler = self.make_nodes_handler()
         handler.cache["loaded_pks"].add(node.system_id)
         mock_dehydrate = self.patch(handler, "full_dehydrate")
-        mock_dehydrate.return_value = sentinel.data
+        data = {"hostname": node.hostname}
+        mock_dehydrate.return_value = data
         self.expectThat(
             handler.on_listen(
                 sentinel.channel, "update", node.system_id),
-            Equals((handler._meta.handler_name, "update", sentinel.data)))
+            Equals((handler._meta.handler_name, "update", data)))
         self.expectThat(
             mock_dehydrate,
             MockCalledOnceWith(node, for_list=True))
@@ -806,15 +875,76 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
         handler.cache["loaded_pks"].add(node.system_id)
         handler.cache["active_pk"] = node.system_id
         mock_dehydrate = self.patch(handler, "full_dehydrate")
-        mock_dehydrate.return_value = sentinel.data
+        data = {"hostname": node.hostname}
+        mock_dehydrate.return_value = data
         self.expectThat(
             handler.on_listen(
                 sentinel.channel, "update", node.system_id),
-            Equals((handler._meta.handler_name, "update", sentinel.data)))
+            Equals((handler._meta.handler_name, "update", data)))
         self.expectThat(
             mock_dehydrate,
             MockCalledOnceWith(node, for_list=False))
 
+    def test_on_listen_update_sends_patch_of_changed_fields(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=['hostname', 'cpu_count'])
+        handler.cache["loaded_pks"].add(node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        node.cpu_count += 1
+        node.save()
+        self.assertEqual(
+            (
+                handler._meta.handler_name,
+                "patch",
+                {"system_id": node.system_id, "cpu_count": node.cpu_count},
+            ),
+            handler.on_listen(sentinel.channel, "update", node.system_id))
+
+    def test_on_listen_update_returns_None_if_nothing_changed(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=['hostname', 'cpu_count'])
+        handler.cache["loaded_pks"].add(node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        self.assertIsNone(
+            handler.on_listen(sentinel.channel, "update", node.system_id))
+
+    def test_on_listen_update_sends_update_if_active_changed(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(
+            list_fields=['hostname'], fields=['hostname', 'cpu_count'])
+        handler.cache["loaded_pks"].add(node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        handler.cache["active_pk"] = node.system_id
+        self.assertEqual(
+            (
+                handler._meta.handler_name,
+                "update",
+                {"hostname": node.hostname, "cpu_count": node.cpu_count},
+            ),
+            handler.on_listen(sentinel.channel, "update", node.system_id))
+
+    def test_on_listen_delete_forgets_snapshot(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.cache["loaded_pks"].add(node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        handler.on_listen(sentinel.channel, "delete", node.system_id)
+        self.assertEqual({}, handler.cache["snapshots"])
+
+    def test_list_forgets_snapshots(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler(fields=['hostname'])
+        handler.cache["loaded_pks"].add(node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        handler.list({})
+        self.assertEqual(
+            (
+                handler._meta.handler_name,
+                "update",
+                {"hostname": node.hostname},
+            ),
+            handler.on_listen(sentinel.channel, "update", node.system_id))
+
     def test_listen_calls_get_object_with_pk_on_other_actions(self):
         handler = self.make_nodes_handler()
         mock_get_object = self.patch(handler, "get_object")
@@ -826,6 +956,93 @@ class TestHandler(MAASServerTestCase, FakeNodesHandlerMixin):
             mock_get_object,
             MockCalledOnceWith({handler._meta.pk: sentinel.pk}))
 
+    def test_get_notify_group_returns_user_id(self):
+        handler = self.make_nodes_handler()
+        self.assertEqual(handler.user.id, handler.get_notify_group())
+
+    def test_get_notify_group_returns_admin_for_superuser_if_shared(self):
+        handler = self.make_nodes_handler(notify_admins_shared=True)
+        handler.user = factory.make_admin()
+        self.assertEqual("admin", handler.get_notify_group())
+
+    def test_get_notify_group_returns_user_id_for_superuser_by_default(
+            self):
+        handler = self.make_nodes_handler()
+        handler.user = factory.make_admin()
+        self.assertEqual(handler.user.id, handler.get_notify_group())
+
+    def test_get_notify_group_returns_user_id_for_superuser_with_rbac(self):
+        self.patch(base.rbac, "is_enabled").return_value = True
+        handler = self.make_nodes_handler(notify_admins_shared=True)
+        handler.user = factory.make_admin()
+        self.assertEqual(handler.user.id, handler.get_notify_group())
+
+    def test_on_listen_shares_listen_in_notify_group(self):
+        node = factory.make_Node()
+        shared = {}
+        handlers = [
+            self.make_nodes_handler(fields=['hostname'])
+            for _ in range(3)
+        ]
+        mock_listens = []
+        for handler in handlers:
+            handler.notify_shared = shared
+            mock_listen = self.patch(handler, "listen")
+            mock_listen.return_value = node
+            mock_listens.append(mock_listen)
+        for handler in handlers:
+            self.assertEqual(
+                (
+                    handler._meta.handler_name,
+                    "create",
+                    {"hostname": node.hostname},
+                ),
+                handler.on_listen(
+                    sentinel.channel, "update", node.system_id))
+        self.assertThat(
+            mock_listens[0], MockCalledOnceWith(
+                sentinel.channel, "update", node.system_id))
+        self.assertThat(mock_listens[1], MockNotCalled())
+        self.assertThat(mock_listens[2], MockNotCalled())
+
+    def test_on_listen_shares_dehydrate_in_notify_group(self):
+        node = factory.make_Node()
+        shared = {}
+        handler = self.make_nodes_handler()
+        handler.notify_shared = shared
+        other_handler = self.make_nodes_handler()
+        other_handler.notify_shared = shared
+        other_handler.cache["active_pk"] = node.system_id
+        mock_dehydrate = self.patch(handler, "full_dehydrate")
+        data = {"hostname": node.hostname}
+        mock_dehydrate.return_value = data
+        active_data = {"hostname": node.hostname, "memory": 1024}
+        mock_other_dehydrate = self.patch(other_handler, "full_dehydrate")
+        mock_other_dehydrate.return_value = active_data
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        self.assertEqual(
+            (handler._meta.handler_name, "update", data),
+            other_handler.on_listen_for_active_pk(
+                "update", factory.make_name("system_id"), node))
+        self.assertEqual(
+            (handler._meta.handler_name, "update", active_data),
+            other_handler.on_listen_for_active_pk(
+                "update", node.system_id, node))
+        self.assertThat(
+            mock_dehydrate, MockCalledOnceWith(node, for_list=True))
+        self.assertThat(
+            mock_other_dehydrate, MockCalledOnceWith(node, for_list=False))
+
+    def test_on_listen_does_not_refresh_user_in_notify_group(self):
+        node = factory.make_Node()
+        handler = self.make_nodes_handler()
+        handler.notify_shared = {}
+        handler.user = MagicMock()
+        self.patch(handler, "listen").return_value = None
+        handler.on_listen(sentinel.channel, "update", node.system_id)
+        self.assertThat(handler.user.refresh_from_db, MockNotCalled())
+
 
 class TestHandlerTransaction(
         MAASTransactionServerTestCase, FakeNodesHandlerMixin):
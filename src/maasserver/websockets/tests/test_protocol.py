@@ -8,6 +8,7 @@ from collections import deque
 import json
 import random
 from unittest.mock import (
+    ANY,
     MagicMock,
     sentinel,
 )
@@ -40,6 +41,7 @@ from maastesting.matchers import (
     IsFiredDeferred,
     MockCalledOnceWith,
     MockCalledWith,
+    MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from maastesting.twisted import TwistedLoggerFixture
@@ -717,6 +719,56 @@ class TestWebSocketProtocol(MAASTransactionServerTestCase):
         self.expectThat(sent_obj["request_id"], Equals(request_id))
         self.expectThat(sent_obj["result"], Equals(seq + 1))
 
+    @wait_for_reactor
+    def test_sendPartialResult_sends_correct_json(self):
+        protocol, factory = self.make_protocol()
+        request_id = random.randint(1, 1000)
+        result = [maas_factory.make_name("data")]
+        message = {
+            "type": MSG_TYPE.PARTIAL_RESPONSE,
+            "request_id": request_id,
+            "rtype": RESPONSE_TYPE.SUCCESS,
+            "result": result,
+            }
+        protocol.sendPartialResult(request_id, result)
+        self.assertEquals(
+            message, self.get_written_transport_message(protocol))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_handleRequest_streams_list_in_chunks(self):
+        nodes = yield deferToDatabase(
+            lambda: [self.make_node() for _ in range(3)])
+        for node in nodes:
+            self.addCleanup(self.clean_node, node)
+
+        protocol, factory = self.make_protocol()
+        protocol.user = MagicMock()
+        message = {
+            "type": MSG_TYPE.REQUEST,
+            "request_id": 1,
+            "method": "machine.list",
+            "params": {
+                "chunk_size": 2,
+                "fields": ["hostname"],
+                }
+            }
+
+        yield protocol.handleRequest(message)
+        sent_objs = [
+            json.loads(call[0][0].decode("ascii"))
+            for call in protocol.transport.write.call_args_list
+        ]
+        self.assertEqual(
+            [MSG_TYPE.PARTIAL_RESPONSE, MSG_TYPE.RESPONSE],
+            [sent_obj["type"] for sent_obj in sent_objs])
+        self.assertItemsEqual(
+            [
+                {"system_id": node.system_id, "hostname": node.hostname}
+                for node in nodes
+            ],
+            sent_objs[0]["result"] + sent_objs[1]["result"])
+
     def test_sendNotify_sends_correct_json(self):
         protocol, factory = self.make_protocol()
         name = maas_factory.make_name("name")
@@ -959,6 +1011,71 @@ class TestWebSocketFactoryTransactional(
         self.assertThat(
             mock_sendNotify, MockCalledWith(name, action, data))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_onNotify_dehydrates_once_for_clients_of_the_same_user(self):
+        user = yield deferToDatabase(self.make_user)
+        device = yield deferToDatabase(
+            transactional(maas_factory.make_Device), owner=user)
+        protocol, factory = self.make_protocol_with_factory(user=user)
+        other_protocol = factory.buildProtocol(None)
+        other_protocol.transport = MagicMock()
+        other_protocol.user = user
+        other_protocol.request = protocol.request
+        factory.clients.append(other_protocol)
+        mock_dehydrate = self.patch(DeviceHandler, "full_dehydrate")
+        mock_dehydrate.return_value = {"system_id": device.system_id}
+        mock_sendNotify = self.patch(protocol, "sendNotify")
+        mock_other_sendNotify = self.patch(other_protocol, "sendNotify")
+        yield factory.onNotify(
+            DeviceHandler, "device", "create", device.system_id)
+        self.assertThat(mock_dehydrate, MockCalledOnceWith(ANY, for_list=True))
+        self.assertThat(
+            mock_sendNotify, MockCalledOnceWith(
+                "device", "create", {"system_id": device.system_id}))
+        self.assertThat(
+            mock_other_sendNotify, MockCalledOnceWith(
+                "device", "create", {"system_id": device.system_id}))
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_onNotify_notifies_other_clients_when_one_fails(self):
+        user = yield deferToDatabase(self.make_user)
+        device = yield deferToDatabase(
+            transactional(maas_factory.make_Device), owner=user)
+        protocol, factory = self.make_protocol_with_factory(user=user)
+        other_protocol = factory.buildProtocol(None)
+        other_protocol.transport = MagicMock()
+        other_protocol.user = user
+        other_protocol.request = protocol.request
+        factory.clients.append(other_protocol)
+        mock_dehydrate = self.patch(DeviceHandler, "full_dehydrate")
+        mock_dehydrate.side_effect = [
+            ZeroDivisionError(), {"system_id": device.system_id}]
+        mock_sendNotify = self.patch(protocol, "sendNotify")
+        mock_other_sendNotify = self.patch(other_protocol, "sendNotify")
+        # Each client has its own notify group, so that each dehydrates.
+        self.patch(DeviceHandler, "get_notify_group").side_effect = [1, 2]
+        with TwistedLoggerFixture() as logger:
+            yield factory.onNotify(
+                DeviceHandler, "device", "create", device.system_id)
+        self.assertThat(mock_sendNotify, MockNotCalled())
+        self.assertThat(
+            mock_other_sendNotify, MockCalledOnceWith(
+                "device", "create", {"system_id": device.system_id}))
+        self.assertIn(
+            "Failed to process 'create' notification for device",
+            logger.output)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_onNotify_does_nothing_without_clients(self):
+        factory = self.make_factory()
+        mock_deferToDatabase = self.patch(protocol_module, "deferToDatabase")
+        yield factory.onNotify(
+            MagicMock(), sentinel.channel, sentinel.action, sentinel.obj_id)
+        self.assertThat(mock_deferToDatabase, MockNotCalled())
+
     @wait_for_reactor
     @inlineCallbacks
     def test_updateRackController_calls_onNotify_for_controller_update(self):
@@ -6,6 +6,7 @@
 import base64
 import bz2
 from collections import defaultdict
+from copy import copy
 from datetime import datetime
 import json
 
@@ -16,12 +17,16 @@ from maasserver.enum import (
 )
 from maasserver.forms.pods import PodForm
 from maasserver.models import (
+    Event,
+    EventType,
     Node,
     NodeMetadata,
 )
 from maasserver.preseed import CURTIN_INSTALL_LOG
+from maasserver.prometheus.metrics import PROMETHEUS_METRICS
 from maasserver.utils.orm import (
     in_transaction,
+    savepoint,
     transactional,
     TransactionManagementError,
 )
@@ -29,14 +34,20 @@ from maasserver.utils.threads import deferToDatabase
 from metadataserver import logger
 from metadataserver.api import (
     add_event_to_node_event_log,
+    get_node_event_type_name,
     process_file,
 )
 from metadataserver.enum import SCRIPT_STATUS
 from metadataserver.models import NodeKey
+from provisioningserver.events import EVENT_DETAILS
 from provisioningserver.logger import LegacyLogger
-from provisioningserver.utils.twisted import deferred
+from provisioningserver.utils.twisted import (
+    callOut,
+    deferred,
+)
 from twisted.application.internet import TimerService
 from twisted.internet import reactor
+from twisted.internet.defer import DeferredList
 from twisted.web.resource import Resource
 from twisted.web.server import NOT_DONE_YET
 
@@ -44,6 +55,10 @@ from twisted.web.server import NOT_DONE_YET
 log = LegacyLogger()
 
 
+class StatusQueueFull(Exception):
+    """There is no room to queue a status message; try again later."""
+
+
 class StatusHandlerResource(Resource):
 
     # Has no children, so getChild will not be called.
@@ -175,7 +190,18 @@ class StatusHandlerResource(Resource):
             request.setResponseCode(204)
             request.finish()
 
-        d.addCallback(_finish, request)
+        # Ask the node to send the message again later when the status
+        # worker has too many messages queued already.
+        def _queueFull(failure, request):
+            failure.trap(StatusQueueFull)
+            request.setResponseCode(503)
+            request.setHeader(
+                b'Retry-After', b'%d' % self.worker.retry_after)
+            request.finish()
+
+        d.addCallbacks(
+            _finish, _queueFull, callbackArgs=(request,),
+            errbackArgs=(request,))
         return NOT_DONE_YET
 
 
@@ -225,6 +251,19 @@ class StatusWorkerService(TimerService, object):
 
     check_interval = 60  # Every second.
 
+    # The most messages to hold, across all nodes, including those handed
+    # to the database tasks service, or being processed right away, and not
+    # yet processed.
+    max_queued_messages = 10000
+
+    # The most messages to hold for a single node until the next time the
+    # queue is processed.
+    max_queued_messages_per_node = 100
+
+    # Seconds that a node is asked to wait before sending a message again
+    # when the queue is full.
+    retry_after = 30
+
     def __init__(self, dbtasks, clock=reactor):
         # Call self._tryUpdateNodes() every self.check_interval.
         super(StatusWorkerService, self).__init__(
@@ -232,13 +271,21 @@ class StatusWorkerService(TimerService, object):
         self.dbtasks = dbtasks
         self.clock = clock
         self.queue = defaultdict(list)
+        self.queued = 0
+
+    def _updateQueued(self, change):
+        self.queued += change
+        PROMETHEUS_METRICS.update(
+            "status_message_queue_depth", "set", value=self.queued)
 
     def _tryUpdateNodes(self):
         if len(self.queue) != 0:
             queue, self.queue = self.queue, defaultdict(list)
+            count = sum(len(messages) for messages in queue.values())
             d = deferToDatabase(self._preProcessQueue, queue)
             d.addCallback(self._processMessagesLater)
             d.addErrback(log.err, "Failed to process node status messages.")
+            d.addBoth(callOut, self._updateQueued, -count)
             return d
 
     @transactional
@@ -256,12 +303,16 @@ class StatusWorkerService(TimerService, object):
         ]
 
     def _processMessagesLater(self, tasks):
-        # Move all messages on the queue off onto the database tasks queue.
-        # We're not going to wait for them to be processed because we can't /
-        # don't apply back-pressure to those systems that are producing these
-        # messages anyway.
-        for node, messages in tasks:
-            self.dbtasks.addTask(self._processMessages, node, messages)
+        # Move all messages on the queue off onto the database tasks queue,
+        # then wait for them to be processed. Meanwhile new messages build up
+        # in self.queue, and nodes are asked to retry once it's full; see
+        # queueMessage.
+        return DeferredList([
+            self.dbtasks.deferTask(
+                self._processMessages, node, messages).addErrback(
+                    log.err, "Unhandled failure in database task.")
+            for node, messages in tasks
+        ])
 
     def _processMessages(self, node, messages):
         # Push the messages into the database, recording them for this node.
@@ -273,18 +324,80 @@ class StatusWorkerService(TimerService, object):
                 "outside of a transaction.")
         else:
             # Here we're in a database thread, with a database connection.
-            for idx, message in enumerate(messages):
-                try:
-                    exists = self._processMessage(node, message)
-                    if not exists:
-                        # Node has been deleted no reason to continue saving
-                        # the events for this node.
-                        break
-                except:
-                    log.err(
-                        None,
-                        "Failed to process message "
-                        "for node: %s" % node.hostname)
+            try:
+                self._processMessageBatch(node, messages)
+            except:
+                log.err(
+                    None,
+                    "Failed to process messages "
+                    "for node: %s" % node.hostname)
+
+    @transactional
+    def _processMessageBatch(self, node, messages):
+        """Process all of `messages` from `node` in a single transaction.
+
+        The events for the messages are inserted together at the end, and
+        the node is saved at most once, rather than once per message.
+
+        :return: False if the node has been deleted, True otherwise.
+        """
+        # Validate that the node still exists since this is a new transaction.
+        try:
+            node = Node.objects.get(id=node.id)
+        except Node.DoesNotExist:
+            return False
+
+        events, event_types, save_node = [], {}, False
+        for message in messages:
+            # The event type depends on the status of the node before this
+            # message has been applied, just as in _processMessage.
+            event = self._makeEvent(node, message, event_types)
+            # The savepoint undoes the message's changes to the database, but
+            # not to `node`; keep a copy to go back to if the message fails.
+            unchanged_node = copy(node)
+            try:
+                with savepoint():
+                    save_node |= self._updateNode(node, message)
+            except Exception:
+                log.err(
+                    None,
+                    "Failed to process message "
+                    "for node: %s" % node.hostname)
+                node = unchanged_node
+            else:
+                events.append(event)
+                PROMETHEUS_METRICS.update(
+                    "status_message_processing_lag", "observe",
+                    value=(
+                        datetime.utcnow() - message['timestamp']
+                    ).total_seconds())
+
+        Event.objects.bulk_create(events)
+        if save_node:
+            node.save()
+        return True
+
+    def _makeEvent(self, node, message, event_types):
+        """Return an unsaved `Event` for `message` from `node`.
+
+        :param event_types: A dict of `EventType`s by name, used to avoid
+            registering the same type more than once in a batch.
+        """
+        type_name = get_node_event_type_name(node, message.get('result'))
+        if type_name not in event_types:
+            event_details = EVENT_DETAILS[type_name]
+            event_types[type_name] = EventType.objects.register(
+                type_name, event_details.description, event_details.level)
+        # Events are inserted in bulk, so TimestampedModel.save() will not
+        # be called to set these.
+        created = message['timestamp']
+        return Event(
+            type=event_types[type_name], node=node,
+            node_system_id=node.system_id, node_hostname=node.hostname,
+            action=message['name'],
+            description="'%s' %s" % (
+                message['origin'], message['description']),
+            created=created, updated=created)
 
     @transactional
     def _processMessage(self, node, message):
@@ -294,6 +407,20 @@ class StatusWorkerService(TimerService, object):
         except Node.DoesNotExist:
             return False
 
+        # Add this event to the node event log.
+        add_event_to_node_event_log(
+            node, message['origin'], message['name'], message['description'],
+            message.get('result', None), message['timestamp'])
+
+        if self._updateNode(node, message):
+            node.save()
+        return True
+
+    def _updateNode(self, node, message):
+        """Apply `message` to `node`, storing any files it carries.
+
+        :return: True if `node` has been modified and needs to be saved.
+        """
         event_type = message['event_type']
         origin = message['origin']
         activity_name = message['name']
@@ -305,11 +432,6 @@ class StatusWorkerService(TimerService, object):
         failed = result in ['FAIL', 'FAILURE']
         default_exit_status = 1 if failed else 0
 
-        # Add this event to the node event log.
-        add_event_to_node_event_log(
-            node, origin, activity_name, description, result,
-            message['timestamp'])
-
         # Group files together with the ScriptResult they belong.
         results = {}
         for sent_file in message.get('files', []):
@@ -419,9 +541,7 @@ class StatusWorkerService(TimerService, object):
             node.reset_status_expires()
             save_node = True
 
-        if save_node:
-            node.save()
-        return True
+        return save_node
 
     def _retrieve_content(self, compression, encoding, content):
         """Extract the content of the sent file."""
@@ -445,6 +565,20 @@ class StatusWorkerService(TimerService, object):
         """Top-level events do not have slashes in their names."""
         return '/' not in activity_name
 
+    def _is_redundant(self, messages, message):
+        """Does `message` supersede the last of the queued `messages`?
+
+        This is so when both report progress of the same activity, in which
+        case the earlier of the two can be discarded.
+        """
+        if len(messages) == 0:
+            return False
+        last = messages[-1]
+        return (
+            message['event_type'] == last['event_type'] == 'progress' and
+            message['origin'] == last['origin'] and
+            message['name'] == last['name'])
+
     def _processMessageNow(self, authorization, message):
         # This should be called in a non-reactor thread with a pre-existing
         # connection (e.g. via deferToDatabase).
@@ -496,10 +630,29 @@ class StatusWorkerService(TimerService, object):
             message['origin'] == 'curtin')
         if (is_starting_event or is_final_event or has_files or
                 is_curtin_early_late):
+            # These are processed right away, but until then they are held
+            # like any other message, files and all, so they count too.
+            if self.queued >= self.max_queued_messages:
+                raise StatusQueueFull(
+                    "Too many status messages are queued; try again in "
+                    "%d seconds." % self.retry_after)
+            self._updateQueued(1)
             d = deferToDatabase(
                 self._processMessageNow, authorization, message)
             d.addErrback(
                 log.err, "Failed to process status message instantly.")
+            d.addBoth(callOut, self._updateQueued, -1)
             return d
         else:
-            self.queue[authorization].append(message)
+            messages = self.queue[authorization]
+            if (len(messages) < self.max_queued_messages_per_node and
+                    self.queued < self.max_queued_messages):
+                messages.append(message)
+                self._updateQueued(1)
+            elif self._is_redundant(messages, message):
+                # Replacing the last message takes no more room.
+                messages[-1] = message
+            else:
+                raise StatusQueueFull(
+                    "Too many status messages are queued; try again in "
+                    "%d seconds." % self.retry_after)
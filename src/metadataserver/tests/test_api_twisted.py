@@ -57,6 +57,7 @@ from metadataserver.api_twisted import (
     _create_pod_for_deployment,
     POD_CREATION_ERROR,
     StatusHandlerResource,
+    StatusQueueFull,
     StatusWorkerService,
 )
 from metadataserver.enum import (
@@ -64,6 +65,8 @@ from metadataserver.enum import (
     SCRIPT_STATUS,
 )
 from metadataserver.models import NodeKey
+from provisioningserver.events import EVENT_TYPES
+from provisioningserver.utils.twisted import pause
 from testtools import ExpectedException
 from testtools.matchers import (
     Equals,
@@ -72,6 +75,8 @@ from testtools.matchers import (
     MatchesSetwise,
 )
 from twisted.internet.defer import (
+    Deferred,
+    fail,
     inlineCallbacks,
     succeed,
 )
@@ -177,6 +182,27 @@ class TestStatusHandlerResource(MAASTestCase):
         self.assertThat(
             status_worker.queueMessage, MockCalledOnceWith(token, message))
 
+    def test__render_POST_queue_full(self):
+        status_worker = Mock()
+        status_worker.retry_after = random.randint(1, 100)
+        status_worker.queueMessage = Mock()
+        status_worker.queueMessage.return_value = fail(StatusQueueFull())
+        resource = StatusHandlerResource(status_worker)
+        message = {
+            'event_type': 'progress',
+            'origin': factory.make_name('origin'),
+            'name': factory.make_name('name'),
+            'description': factory.make_name('description'),
+        }
+        request = self.make_request(
+            content=json.dumps(message).encode('ascii'))
+        output = resource.render_POST(request)
+        self.assertEquals(NOT_DONE_YET, output)
+        self.assertEquals(503, request.responseCode)
+        self.assertEquals(
+            [b'%d' % status_worker.retry_after],
+            request.responseHeaders.getRawHeaders(b'retry-after'))
+
 
 class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
 
@@ -223,7 +249,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             for node, _ in nodes_with_tokens
         }
         dbtasks = Mock()
-        dbtasks.addTask = Mock()
+        dbtasks.deferTask = Mock(return_value=succeed(None))
         worker = StatusWorkerService(dbtasks)
         for node, token in nodes_with_tokens:
             for message in node_messages[node]:
@@ -231,7 +257,7 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
         yield worker._tryUpdateNodes()
         call_args = [
             (call_arg[0][1], call_arg[0][2])
-            for call_arg in dbtasks.addTask.call_args_list
+            for call_arg in dbtasks.deferTask.call_args_list
         ]
         self.assertThat(call_args, MatchesSetwise(*[
             MatchesListwise([Equals(node), Equals(messages)])
@@ -258,30 +284,53 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
 
     @wait_for_reactor
     @inlineCallbacks
-    def test__processMessages_doesnt_call_when_node_deleted(self):
+    def test__processMessages_calls_processMessageBatch(self):
         worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
-        mock_processMessage.return_value = False
+        mock_processMessageBatch = self.patch(worker, "_processMessageBatch")
         yield deferToDatabase(
             worker._processMessages, sentinel.node,
             [sentinel.message1, sentinel.message2])
         self.assertThat(
-            mock_processMessage,
-            MockCalledOnceWith(sentinel.node, sentinel.message1))
+            mock_processMessageBatch,
+            MockCalledOnceWith(
+                sentinel.node, [sentinel.message1, sentinel.message2]))
 
     @wait_for_reactor
     @inlineCallbacks
-    def test__processMessages_calls_processMessage(self):
-        worker = StatusWorkerService(sentinel.dbtasks)
-        mock_processMessage = self.patch(worker, "_processMessage")
-        yield deferToDatabase(
-            worker._processMessages, sentinel.node,
-            [sentinel.message1, sentinel.message2])
+    def test__tryUpdateNodes_waits_for_messages_to_be_processed(self):
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        processed = Deferred()
+        dbtasks = Mock()
+        dbtasks.deferTask = Mock(return_value=processed)
+        worker = StatusWorkerService(dbtasks)
+        node, token = nodes_with_tokens[0]
+        worker.queueMessage(token.key, self.make_message())
+        d = worker._tryUpdateNodes()
+        while not dbtasks.deferTask.called:
+            yield pause(0.1)
+        self.assertFalse(d.called)
+        self.assertEqual(1, worker.queued)
+        processed.callback(None)
+        yield d
+        self.assertEqual(0, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test__tryUpdateNodes_updates_queue_depth(self):
+        update = self.patch(api_twisted_module.PROMETHEUS_METRICS, "update")
+        worker = StatusWorkerService(Mock())
+        for _ in range(3):
+            worker.queueMessage(factory.make_name("key"), self.make_message())
+        self.assertEqual(3, worker.queued)
+        # Messages from unknown nodes are discarded.
+        yield worker._tryUpdateNodes()
+        self.assertEqual(0, worker.queued)
         self.assertThat(
-            mock_processMessage,
-            MockCallsMatch(
-                call(sentinel.node, sentinel.message1),
-                call(sentinel.node, sentinel.message2)))
+            update, MockCallsMatch(
+                call("status_message_queue_depth", "set", value=1),
+                call("status_message_queue_depth", "set", value=2),
+                call("status_message_queue_depth", "set", value=3),
+                call("status_message_queue_depth", "set", value=0)))
 
     @wait_for_reactor
     @inlineCallbacks
@@ -320,6 +369,84 @@ class TestStatusWorkerServiceTransactional(MAASTransactionServerTestCase):
             mock_processMessage,
             MockCalledOnceWith(node, message))
 
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_refuses_messages_beyond_node_limit(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.max_queued_messages_per_node = 2
+        yield worker.queueMessage(sentinel.key, self.make_message())
+        yield worker.queueMessage(sentinel.key, self.make_message())
+        with ExpectedException(StatusQueueFull):
+            yield worker.queueMessage(sentinel.key, self.make_message())
+        yield worker.queueMessage(sentinel.other_key, self.make_message())
+        self.assertEqual(3, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_refuses_messages_beyond_total_limit(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.max_queued_messages = 2
+        yield worker.queueMessage(sentinel.key, self.make_message())
+        yield worker.queueMessage(sentinel.other_key, self.make_message())
+        with ExpectedException(StatusQueueFull):
+            yield worker.queueMessage(sentinel.key, self.make_message())
+        self.assertEqual(2, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_counts_instant_messages_until_processed(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        queued = []
+        self.patch(worker, "_processMessage").side_effect = (
+            lambda node, message: queued.append(worker.queued))
+        message = self.make_message()
+        message['event_type'] = 'finish'
+        nodes_with_tokens = yield deferToDatabase(self.make_nodes_with_tokens)
+        node, token = nodes_with_tokens[0]
+        yield worker.queueMessage(token.key, message)
+        self.assertEqual([1], queued)
+        self.assertEqual(0, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_refuses_instant_messages_beyond_total_limit(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.max_queued_messages = 1
+        mock_processMessage = self.patch(worker, "_processMessage")
+        yield worker.queueMessage(sentinel.key, self.make_message())
+        message = self.make_message()
+        message['event_type'] = 'finish'
+        with ExpectedException(StatusQueueFull):
+            yield worker.queueMessage(sentinel.other_key, message)
+        self.assertThat(mock_processMessage, MockNotCalled())
+        self.assertEqual(1, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_merges_redundant_progress_when_full(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.max_queued_messages_per_node = 1
+        message1 = self.make_message()
+        message1['event_type'] = 'progress'
+        message2 = dict(message1, description=factory.make_name('desc'))
+        yield worker.queueMessage(sentinel.key, message1)
+        yield worker.queueMessage(sentinel.key, message2)
+        self.assertEqual([message2], worker.queue[sentinel.key])
+        self.assertEqual(1, worker.queued)
+
+    @wait_for_reactor
+    @inlineCallbacks
+    def test_queueMessages_does_not_merge_other_activities(self):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        worker.max_queued_messages_per_node = 1
+        message1 = self.make_message()
+        message1['event_type'] = 'progress'
+        message2 = dict(message1, name=factory.make_name('name'))
+        yield worker.queueMessage(sentinel.key, message1)
+        with ExpectedException(StatusQueueFull):
+            yield worker.queueMessage(sentinel.key, message2)
+        self.assertEqual([message1], worker.queue[sentinel.key])
+
     @wait_for_reactor
     @inlineCallbacks
     def test_queueMessages_handled_invalid_nodekey_with_instant_msg(self):
@@ -1014,6 +1141,128 @@ class TestStatusWorkerService(MAASServerTestCase):
             node.status_expires, expected_time + timedelta(minutes=1))
 
 
+class TestStatusWorkerServiceBatch(MAASServerTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.useFixture(SignalsDisabled("power"))
+
+    def make_message(self, **kwargs):
+        message = {
+            'event_type': 'progress',
+            'origin': 'cloudinit',
+            'name': factory.make_name('name'),
+            'description': factory.make_name('description'),
+            'timestamp': datetime.utcnow(),
+        }
+        message.update(kwargs)
+        return message
+
+    def processMessageBatch(self, node, messages):
+        worker = StatusWorkerService(sentinel.dbtasks)
+        return worker._processMessageBatch(node, messages)
+
+    def test_returns_false_when_node_deleted(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        node.delete()
+        self.assertFalse(
+            self.processMessageBatch(node, [self.make_message()]))
+
+    def test_creates_an_event_for_each_message(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        messages = [self.make_message() for _ in range(3)]
+        self.assertTrue(self.processMessageBatch(node, messages))
+        events = Event.objects.filter(node=node).order_by('id')
+        self.assertEqual(
+            [
+                (message['name'], "'cloudinit' %s" % message['description'],
+                 message['timestamp'], message['timestamp'])
+                for message in messages
+            ],
+            [
+                (event.action, event.description, event.created,
+                 event.updated)
+                for event in events
+            ])
+
+    def test_events_take_type_from_node_status(self):
+        node = factory.make_Node(status=NODE_STATUS.COMMISSIONING)
+        self.processMessageBatch(node, [
+            self.make_message(),
+            self.make_message(result='FAIL'),
+        ])
+        self.assertEqual(
+            [
+                EVENT_TYPES.NODE_COMMISSIONING_EVENT,
+                EVENT_TYPES.NODE_COMMISSIONING_EVENT_FAILED,
+            ],
+            [
+                event.type.name
+                for event in Event.objects.filter(node=node).order_by('id')
+            ])
+
+    def test_saves_node_once(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.DEPLOYING, status_expires=factory.make_date(),
+            with_empty_script_sets=True)
+        save = self.patch(api_twisted_module.Node, "save")
+        self.processMessageBatch(node, [
+            self.make_message(
+                origin='curtin', event_type=event_type,
+                name='cmd-install/stage-early')
+            for event_type in ('start', 'finish')
+        ])
+        self.assertThat(save, MockCalledOnceWith())
+
+    def test_does_not_save_unchanged_node(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        save = self.patch(api_twisted_module.Node, "save")
+        self.processMessageBatch(node, [self.make_message()])
+        self.assertThat(save, MockNotCalled())
+
+    def test_skips_failed_messages(self):
+        node = factory.make_Node(status=NODE_STATUS.NEW)
+        bad_message = self.make_message(files=[{
+            "path": "sample.txt",
+            "encoding": "base64",
+            "content": encode_as_base64(b'content'),
+        }])
+        good_message = self.make_message()
+        self.processMessageBatch(node, [bad_message, good_message])
+        self.assertEqual(
+            [good_message['name']],
+            [event.action for event in Event.objects.filter(node=node)])
+
+    def test_discards_changes_to_node_from_failed_messages(self):
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        good_message, bad_message = self.make_message(), self.make_message()
+
+        def update_node(node, message):
+            if message is bad_message:
+                node.error_description = factory.make_name("error")
+                raise ValueError()
+            node.license_key = "good"
+            return True
+
+        worker = StatusWorkerService(sentinel.dbtasks)
+        self.patch(worker, "_updateNode", update_node)
+        worker._processMessageBatch(node, [good_message, bad_message])
+        node = reload_object(node)
+        self.assertEqual(
+            ("good", ""), (node.license_key, node.error_description))
+
+    def test_records_processing_lag(self):
+        update = self.patch(api_twisted_module.PROMETHEUS_METRICS, "update")
+        node = factory.make_Node(status=NODE_STATUS.DEPLOYING)
+        message = self.make_message(
+            timestamp=datetime.utcnow() - timedelta(minutes=1))
+        self.processMessageBatch(node, [message])
+        [(args, kwargs)] = update.call_args_list
+        self.assertEqual(
+            ("status_message_processing_lag", "observe"), args)
+        self.assertGreaterEqual(kwargs["value"], 60)
+
+
 class TestCreatePodForDeployment(MAASServerTestCase):
 
     def setUp(self):
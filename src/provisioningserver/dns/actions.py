@@ -4,21 +4,28 @@
 """Low-level actions to manage the DNS service, like reloading zones."""
 
 __all__ = [
+    "bind_freeze_zones",
     "bind_reconfigure",
     "bind_reload",
     "bind_reload_zones",
+    "bind_thaw_zones",
+    "bind_update_zones",
     "bind_write_configuration",
     "bind_write_options",
     "bind_write_zones",
 ]
 
 import collections
+import os.path
 from subprocess import CalledProcessError
 from time import sleep
 
 from provisioningserver.dns.config import (
     DNSConfig,
+    execute_nsupdate_command,
     execute_rndc_command,
+    get_nsupdate_key_path,
+    set_up_nsupdate_key,
     set_up_options_conf,
 )
 from provisioningserver.logger import get_maas_logger
@@ -100,7 +107,82 @@ def bind_reload_zones(zone_list):
     return ret
 
 
-def bind_write_configuration(zones, trusted_networks):
+def bind_freeze_zones(zone_list=None):
+    """Ask BIND to suspend dynamic updates to the given zones.
+
+    BIND writes out pending dynamic updates to the zone files, after which
+    they can be rewritten. This operation is 'best effort' (with logging) as
+    the server may not be running, and the zones may not be loaded yet.
+
+    :param zone_list: A list of zone names to freeze, or `None` to freeze
+        all zones.
+    :return: True if success, False otherwise.
+    """
+    return _bind_zones_command("freeze", zone_list)
+
+
+def bind_thaw_zones(zone_list=None):
+    """Ask BIND to reload the given frozen zones and resume dynamic updates.
+
+    :param zone_list: A list of zone names to thaw, or `None` to thaw all
+        zones.
+    :return: True if success, False otherwise.
+    """
+    return _bind_zones_command("thaw", zone_list)
+
+
+def _bind_zones_command(command, zone_list):
+    if zone_list is None:
+        commands = [(command,)]
+    else:
+        commands = [(command, name) for name in zone_list]
+    ret = True
+    for arguments in commands:
+        try:
+            execute_rndc_command(arguments)
+        except CalledProcessError as exc:
+            maaslog.error(
+                "Running 'rndc %s' failed (is BIND running?): %s",
+                " ".join(arguments), exc)
+            ret = False
+    return ret
+
+
+def bind_update_zones(updates):
+    """Send dynamic updates (RFC 2136) for records to BIND.
+
+    The updates are authenticated with MAAS's TSIG key; the zones must have
+    been configured to accept them, see `bind_write_configuration`.
+
+    :param updates: A sequence of ``(zone_name, deletions, additions)``
+        tuples, where `deletions` and `additions` are sequences of
+        ``(name, ttl, type, data)`` records with fully qualified names.
+        Including an SOA record in `additions` sets the zone's serial.
+    :return: True if success, False otherwise.
+    """
+    commands = []
+    for zone_name, deletions, additions in updates:
+        commands.append("zone %s." % zone_name)
+        commands.extend(
+            "update delete %s %s %s" % (name, rrtype, data)
+            for name, _, rrtype, data in sorted(deletions))
+        commands.extend(
+            "update add %s %d %s %s" % (name, ttl, rrtype, data)
+            for name, ttl, rrtype, data in sorted(additions))
+        commands.append("send")
+    if len(commands) == 0:
+        return True
+    try:
+        execute_nsupdate_command(commands)
+    except CalledProcessError as exc:
+        maaslog.error("Sending dynamic updates to BIND failed: %s", exc)
+        return False
+    else:
+        return True
+
+
+def bind_write_configuration(
+        zones, trusted_networks, dynamic_updates=False):
     """Write BIND's configuration.
 
     :param zones: Those zones to include in main config.
@@ -108,6 +190,9 @@ def bind_write_configuration(zones, trusted_networks):
 
     :param trusted_networks: A sequence of CIDR network specifications that
         are permitted to use the DNS server as a forwarder.
+
+    :param dynamic_updates: Whether the zones accept dynamic updates signed
+        with MAAS's TSIG key. The key is created if it does not exist.
     """
     # trusted_networks was formerly specified as a single IP address with
     # netmask. These assertions are here to prevent code that assumes that
@@ -115,8 +200,12 @@ def bind_write_configuration(zones, trusted_networks):
     assert not isinstance(trusted_networks, (bytes, str))
     assert isinstance(trusted_networks, collections.Sequence)
 
+    if dynamic_updates and not os.path.exists(get_nsupdate_key_path()):
+        set_up_nsupdate_key()
+
     dns_config = DNSConfig(zones=zones)
-    dns_config.write_config(trusted_networks=trusted_networks)
+    dns_config.write_config(
+        trusted_networks=trusted_networks, dynamic_updates=dynamic_updates)
 
 
 def bind_write_options(upstream_dns, dnssec_validation):
@@ -134,11 +223,12 @@ def bind_write_options(upstream_dns, dnssec_validation):
         upstream_dns=upstream_dns, dnssec_validation=dnssec_validation)
 
 
-def bind_write_zones(zones):
+def bind_write_zones(zones, zone_names=None):
     """Write out DNS zones.
 
     :param zones: Those zones to write.
     :type zones: Sequence of :py:class:`DomainData`.
+    :param zone_names: If given, only write the zones with these names.
     """
     for zone in zones:
-        zone.write_config()
+        zone.write_config(zone_names)
@@ -20,6 +20,7 @@ from textwrap import dedent
 
 from provisioningserver.dns.config import (
     DNSConfig,
+    set_up_nsupdate_key,
     set_up_options_conf,
     set_up_rndc,
 )
@@ -31,9 +32,10 @@ def add_arguments(parser):
     Specified by the `ActionScript` interface.
     """
     parser.description = dedent("""\
-        Setup MAAS DNS configuration: a blank configuration and
+        Setup MAAS DNS configuration: a blank configuration,
         all the RNDC configuration options allowing MAAS to reload
-        BIND once zones configuration files will be written.
+        BIND once zones configuration files will be written, and the
+        key MAAS uses to send dynamic updates to BIND.
         """)
     parser.add_argument(
         '--no-clobber', dest='no_clobber', action='store_true',
@@ -51,6 +53,7 @@ def run(args, stdout=sys.stdout, stderr=sys.stderr):
     :param stderr: Standard error stream to write to.
     """
     set_up_rndc()
+    set_up_nsupdate_key()
     set_up_options_conf(
         overwrite=not args.no_clobber)
     config = DNSConfig()
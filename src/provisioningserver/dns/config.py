@@ -6,11 +6,13 @@
 __all__ = [
     'DNSConfig',
     'MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME',
+    'set_up_nsupdate_key',
     'set_up_rndc',
     'set_up_options_conf',
     ]
 
 
+from base64 import b64encode
 from collections import namedtuple
 from contextlib import contextmanager
 from datetime import datetime
@@ -18,7 +20,12 @@ import errno
 import os
 import os.path
 import re
+from subprocess import (
+    PIPE,
+    Popen,
+)
 import sys
+from textwrap import dedent
 
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils import (
@@ -27,7 +34,10 @@ from provisioningserver.utils import (
 )
 from provisioningserver.utils.fs import atomic_write
 from provisioningserver.utils.isc import read_isc_file
-from provisioningserver.utils.shell import call_and_check
+from provisioningserver.utils.shell import (
+    call_and_check,
+    ExternalProcessError,
+)
 
 
 maaslog = get_maas_logger("dns")
@@ -36,6 +46,8 @@ MAAS_NAMED_CONF_NAME = 'named.conf.maas'
 MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME = 'named.conf.options.inside.maas'
 MAAS_NAMED_RNDC_CONF_NAME = 'named.conf.rndc.maas'
 MAAS_RNDC_CONF_NAME = 'rndc.conf.maas'
+MAAS_NSUPDATE_KEY_NAME = 'named.conf.nsupdate.maas'
+NSUPDATE_KEY_NAME = 'maas-nsupdate-key'
 
 
 def get_dns_config_dir():
@@ -68,6 +80,12 @@ def get_dns_rndc_port():
     return int(setting)
 
 
+def get_dns_port():
+    """Port on which BIND accepts dynamic updates from MAAS."""
+    setting = os.getenv("MAAS_DNS_PORT", "53")
+    return int(setting)
+
+
 def get_dns_default_controls():
     """Include the default RNDC controls (default RNDC key on port 953)?"""
     setting = os.getenv("MAAS_DNS_DEFAULT_CONTROLS", "1")
@@ -180,6 +198,51 @@ def execute_rndc_command(arguments):
     call_and_check(rndc_cmd)
 
 
+def generate_nsupdate_key(key_name=NSUPDATE_KEY_NAME):
+    """Generate a TSIG key for sending dynamic updates (RFC 2136) to BIND.
+
+    The key is returned as a 'key' statement, which can be included into the
+    'named' configuration and passed to `nsupdate -k` as-is.
+    """
+    # 256 bits matches the size of the rndc key.
+    secret = b64encode(os.urandom(32)).decode("ascii")
+    return dedent("""\
+        key "%s" {
+            algorithm hmac-sha256;
+            secret "%s";
+        };
+        """) % (key_name, secret)
+
+
+def get_nsupdate_key_path():
+    return compose_config_path(MAAS_NSUPDATE_KEY_NAME)
+
+
+def set_up_nsupdate_key():
+    """Write out the TSIG key MAAS uses to send dynamic updates to BIND."""
+    target_file = get_nsupdate_key_path()
+    atomic_write(
+        generate_nsupdate_key().encode("ascii"), target_file, mode=0o644)
+
+
+def execute_nsupdate_command(commands):
+    """Execute `nsupdate` commands, authenticated with MAAS's TSIG key.
+
+    :param commands: A sequence of `nsupdate` commands, without the leading
+        'server' command.
+    :raise ExternalProcessError: If `nsupdate` returns nonzero.
+    """
+    nsupdate_cmd = ['nsupdate', '-k', get_nsupdate_key_path()]
+    script = "server 127.0.0.1 %d\n" % get_dns_port()
+    script += "".join("%s\n" % command for command in commands)
+    process = Popen(nsupdate_cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    stdout, stderr = process.communicate(script.encode("ascii"))
+    if process.returncode != 0:
+        raise ExternalProcessError(
+            process.returncode, nsupdate_cmd, output=stderr.strip())
+    return stdout
+
+
 def set_up_options_conf(overwrite=True, **kwargs):
     """Write out the named.conf.options.inside.maas file.
 
@@ -298,10 +361,14 @@ class DNSConfig:
             does not exist.
         """
         trusted_networks = kwargs.pop("trusted_networks", "")
+        dynamic_updates = kwargs.pop("dynamic_updates", False)
         context = {
             'zones': self.zones,
             'DNS_CONFIG_DIR': get_dns_config_dir(),
             'named_rndc_conf_path': get_named_rndc_conf_path(),
+            'named_nsupdate_key_path': get_nsupdate_key_path(),
+            'nsupdate_key_name': NSUPDATE_KEY_NAME,
+            'dynamic_updates': dynamic_updates,
             'trusted_networks': trusted_networks,
             'modified': str(datetime.today()),
         }
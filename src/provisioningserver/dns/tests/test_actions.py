@@ -21,6 +21,7 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockCallsMatch,
+    MockNotCalled,
 )
 from maastesting.testcase import MAASTestCase
 from netaddr import IPNetwork
@@ -28,6 +29,8 @@ from provisioningserver.dns import actions
 from provisioningserver.dns.config import (
     MAAS_NAMED_CONF_NAME,
     MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME,
+    MAAS_NSUPDATE_KEY_NAME,
+    NSUPDATE_KEY_NAME,
 )
 from provisioningserver.dns.testing import patch_dns_config_path
 from provisioningserver.dns.tests.test_zoneconfig import HostnameIPMapping
@@ -39,8 +42,10 @@ from provisioningserver.utils.shell import ExternalProcessError
 from testtools.matchers import (
     AllMatch,
     Contains,
+    ContainsAll,
     FileContains,
     FileExists,
+    Not,
 )
 
 
@@ -160,6 +165,78 @@ class TestReloadZone(MAASTestCase):
         self.assertFalse(actions.bind_reload_zones(sentinel.zone))
 
 
+class TestFreezeAndThawZones(MAASTestCase):
+    """Tests for `actions.bind_freeze_zones` and `actions.bind_thaw_zones`."""
+
+    scenarios = (
+        ("freeze", {"command": "freeze", "func": "bind_freeze_zones"}),
+        ("thaw", {"command": "thaw", "func": "bind_thaw_zones"}),
+    )
+
+    def test__executes_rndc_command_for_all_zones(self):
+        self.patch_autospec(actions, "execute_rndc_command")
+        self.assertTrue(getattr(actions, self.func)())
+        self.assertThat(
+            actions.execute_rndc_command,
+            MockCalledOnceWith((self.command,)))
+
+    def test__executes_rndc_command_for_each_zone(self):
+        self.patch_autospec(actions, "execute_rndc_command")
+        zones = [factory.make_name("zone") for _ in range(3)]
+        self.assertTrue(getattr(actions, self.func)(zones))
+        self.assertThat(
+            actions.execute_rndc_command, MockCallsMatch(*(
+                call((self.command, zone)) for zone in zones)))
+
+    def test__logs_subprocess_error(self):
+        erc = self.patch_autospec(actions, "execute_rndc_command")
+        erc.side_effect = factory.make_CalledProcessError()
+        with FakeLogger("maas") as logger:
+            self.assertFalse(getattr(actions, self.func)())
+        self.assertDocTestMatches(
+            "Running 'rndc %s' failed (is BIND running?): "
+            "Command ... returned non-zero exit status ..." % self.command,
+            logger.output)
+
+
+class TestUpdateZones(MAASTestCase):
+    """Tests for :py:func:`actions.bind_update_zones`."""
+
+    def test__executes_nsupdate_command(self):
+        self.patch_autospec(actions, "execute_nsupdate_command")
+        zone = factory.make_name("zone")
+        old_ip = factory.make_ipv4_address()
+        new_ip = factory.make_ipv4_address()
+        name = "host.%s." % zone
+        self.assertTrue(actions.bind_update_zones([
+            (zone, [(name, 30, "A", old_ip)], [(name, 60, "A", new_ip)]),
+        ]))
+        self.assertThat(
+            actions.execute_nsupdate_command, MockCalledOnceWith([
+                "zone %s." % zone,
+                "update delete %s A %s" % (name, old_ip),
+                "update add %s 60 A %s" % (name, new_ip),
+                "send",
+            ]))
+
+    def test__does_nothing_without_updates(self):
+        self.patch_autospec(actions, "execute_nsupdate_command")
+        self.assertTrue(actions.bind_update_zones([]))
+        self.assertThat(actions.execute_nsupdate_command, MockNotCalled())
+
+    def test__logs_subprocess_error(self):
+        enc = self.patch_autospec(actions, "execute_nsupdate_command")
+        enc.side_effect = factory.make_CalledProcessError()
+        with FakeLogger("maas") as logger:
+            self.assertFalse(actions.bind_update_zones([
+                (factory.make_name("zone"), [], []),
+            ]))
+        self.assertDocTestMatches(
+            "Sending dynamic updates to BIND failed: "
+            "Command ... returned non-zero exit status ...",
+            logger.output)
+
+
 class TestConfiguration(MAASTestCase):
     """Tests for the `bind_write_*` functions."""
 
@@ -208,6 +285,33 @@ class TestConfiguration(MAASTestCase):
         self.assertThat(expected_file, FileContains(
             matcher=Contains(expected_content)))
 
+    def test_bind_write_configuration_allows_dynamic_updates(self):
+        zones = [
+            DNSForwardZoneConfig(
+                factory.make_string(), serial=random.randint(1, 100)),
+        ]
+        actions.bind_write_configuration(
+            zones=zones, trusted_networks=[], dynamic_updates=True)
+        self.assertThat(
+            join(self.dns_conf_dir, MAAS_NSUPDATE_KEY_NAME), FileExists())
+        self.assertThat(
+            join(self.dns_conf_dir, MAAS_NAMED_CONF_NAME),
+            FileContains(matcher=ContainsAll([
+                'include "%s";' % join(
+                    self.dns_conf_dir, MAAS_NSUPDATE_KEY_NAME),
+                'allow-update { key "%s"; };' % NSUPDATE_KEY_NAME,
+            ])))
+
+    def test_bind_write_configuration_disallows_dynamic_updates(self):
+        zones = [
+            DNSForwardZoneConfig(
+                factory.make_string(), serial=random.randint(1, 100)),
+        ]
+        actions.bind_write_configuration(zones=zones, trusted_networks=[])
+        self.assertThat(
+            join(self.dns_conf_dir, MAAS_NAMED_CONF_NAME),
+            FileContains(matcher=Not(Contains("allow-update"))))
+
     def test_bind_write_zones_writes_file(self):
         domain = factory.make_string()
         network = IPNetwork('192.168.0.3/24')
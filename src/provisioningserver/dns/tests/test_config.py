@@ -8,12 +8,14 @@ __all__ = []
 import errno
 import os.path
 import random
+from subprocess import PIPE
 from textwrap import dedent
 from unittest.mock import Mock
 
 from fixtures import EnvironmentVariable
 from maastesting.factory import factory
 from maastesting.fakemethod import FakeMethod
+from maastesting.matchers import MockCalledOnceWith
 from maastesting.testcase import MAASTestCase
 from netaddr import IPNetwork
 from provisioningserver.dns import config
@@ -23,16 +25,21 @@ from provisioningserver.dns.config import (
     DNSConfig,
     DNSConfigDirectoryMissing,
     DNSConfigFail,
+    execute_nsupdate_command,
     execute_rndc_command,
     extract_suggested_named_conf,
+    generate_nsupdate_key,
     generate_rndc,
     MAAS_NAMED_CONF_NAME,
     MAAS_NAMED_CONF_OPTIONS_INSIDE_NAME,
     MAAS_NAMED_RNDC_CONF_NAME,
+    MAAS_NSUPDATE_KEY_NAME,
     MAAS_RNDC_CONF_NAME,
     NAMED_CONF_OPTIONS,
+    NSUPDATE_KEY_NAME,
     render_dns_template,
     report_missing_config_dir,
+    set_up_nsupdate_key,
     set_up_options_conf,
     set_up_rndc,
     uncomment_named_conf,
@@ -40,17 +47,23 @@ from provisioningserver.dns.config import (
 from provisioningserver.dns.testing import (
     patch_dns_config_path,
     patch_dns_default_controls,
+    patch_dns_port,
 )
 from provisioningserver.dns.zoneconfig import (
     DNSForwardZoneConfig,
     DNSReverseZoneConfig,
 )
 from provisioningserver.utils import locate_config
-from provisioningserver.utils.isc import read_isc_file
+from provisioningserver.utils.isc import (
+    parse_isc_string,
+    read_isc_file,
+)
+from provisioningserver.utils.shell import ExternalProcessError
 from testtools.matchers import (
     AllMatch,
     Contains,
     ContainsAll,
+    ContainsDict,
     EndsWith,
     Equals,
     FileContains,
@@ -58,6 +71,7 @@ from testtools.matchers import (
     Is,
     IsInstance,
     MatchesAll,
+    MatchesRegex,
     Not,
     SamePath,
     StartsWith,
@@ -278,6 +292,47 @@ class TestRNDCUtilities(MAASTestCase):
         expected_command = ['rndc', '-c', rndc_conf_path, command]
         self.assertEqual((expected_command,), recorder.calls[0][0])
 
+    def test_generate_nsupdate_key_returns_key_statement(self):
+        key_name = factory.make_name("key")
+        key = parse_isc_string(generate_nsupdate_key(key_name))
+        self.assertThat(
+            key['key "%s"' % key_name], ContainsDict({
+                "algorithm": Equals("hmac-sha256"),
+                "secret": MatchesRegex('"[A-Za-z0-9+/]{43}="'),
+            }))
+
+    def test_set_up_nsupdate_key_writes_key(self):
+        dns_conf_dir = patch_dns_config_path(self)
+        set_up_nsupdate_key()
+        self.assertThat(
+            os.path.join(dns_conf_dir, MAAS_NSUPDATE_KEY_NAME),
+            FileContains(matcher=Contains(
+                'key "%s" {' % NSUPDATE_KEY_NAME)))
+
+    def test_execute_nsupdate_command_executes_command(self):
+        fake_dir = patch_dns_config_path(self)
+        patch_dns_port(self, 5353)
+        popen = self.patch(config, "Popen")
+        popen.return_value.communicate.return_value = (b"", b"")
+        popen.return_value.returncode = 0
+        execute_nsupdate_command(["zone example.com.", "send"])
+        nsupdate_key_path = os.path.join(fake_dir, MAAS_NSUPDATE_KEY_NAME)
+        self.assertThat(popen, MockCalledOnceWith(
+            ['nsupdate', '-k', nsupdate_key_path],
+            stdin=PIPE, stdout=PIPE, stderr=PIPE))
+        self.assertThat(
+            popen.return_value.communicate, MockCalledOnceWith(
+                b"server 127.0.0.1 5353\nzone example.com.\nsend\n"))
+
+    def test_execute_nsupdate_command_raises_on_failure(self):
+        patch_dns_config_path(self)
+        popen = self.patch(config, "Popen")
+        popen.return_value.communicate.return_value = (b"", b"refused")
+        popen.return_value.returncode = 2
+        error = self.assertRaises(
+            ExternalProcessError, execute_nsupdate_command, ["send"])
+        self.assertThat(error.output, Equals(b"refused"))
+
     def test_extract_suggested_named_conf_extracts_section(self):
         named_part = factory.make_string()
         # Actual rndc-confgen output, mildly mangled for testing purposes.
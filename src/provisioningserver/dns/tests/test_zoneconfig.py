@@ -289,6 +289,93 @@ class TestDNSForwardZoneConfig(MAASTestCase):
         filepath = FilePath(dns_zone_config.zone_info[0].target_path)
         self.assertTrue(filepath.getPermissions().other.read)
 
+    def test_fingerprint_ignores_serial(self):
+        domain = factory.make_string()
+        mapping = {
+            factory.make_name('host'): HostnameIPMapping(
+                None, 30, {factory.make_ipv4_address()}),
+        }
+        zone_configs = [
+            DNSForwardZoneConfig(domain, serial=serial, mapping=mapping)
+            for serial in (1, 2)
+        ]
+        self.assertThat(
+            zone_configs[0].get_fingerprint(zone_configs[0].zone_info[0]),
+            Equals(zone_configs[1].get_fingerprint(
+                zone_configs[1].zone_info[0])))
+
+    def test_fingerprint_changes_with_records(self):
+        domain = factory.make_string()
+        hostname = factory.make_name('host')
+        fingerprints = set()
+        for _ in range(2):
+            mapping = {
+                hostname: HostnameIPMapping(
+                    None, 30, {factory.make_ipv4_address()}),
+            }
+            dns_zone_config = DNSForwardZoneConfig(
+                domain, serial=1, mapping=mapping)
+            fingerprints.add(dns_zone_config.get_fingerprint(
+                dns_zone_config.zone_info[0]))
+        self.assertThat(fingerprints, HasLength(2))
+
+    def test_fingerprint_without_host_records_ignores_addresses(self):
+        domain = factory.make_string()
+        hostname = factory.make_name('host')
+        fingerprints = set()
+        for _ in range(2):
+            mapping = {
+                hostname: HostnameIPMapping(
+                    None, 30, {factory.make_ipv4_address()}),
+            }
+            dns_zone_config = DNSForwardZoneConfig(
+                domain, serial=1, mapping=mapping)
+            fingerprints.add(dns_zone_config.get_fingerprint(
+                dns_zone_config.zone_info[0], include_host_records=False))
+        self.assertThat(fingerprints, HasLength(1))
+
+    def test_get_host_records_returns_qualified_address_records(self):
+        domain = factory.make_string()
+        hostname = factory.make_name('host')
+        ipv4_ip = factory.make_ipv4_address()
+        ipv6_ip = factory.make_ipv6_address()
+        mapping = {
+            hostname: HostnameIPMapping(None, 30, {ipv4_ip, ipv6_ip}),
+            '@': HostnameIPMapping(None, 60, {ipv4_ip}),
+        }
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=1, mapping=mapping)
+        self.assertThat(
+            dns_zone_config.get_host_records(dns_zone_config.zone_info[0]),
+            Equals({
+                ("%s.%s." % (hostname, domain), 30, 'A', ipv4_ip),
+                ("%s.%s." % (hostname, domain), 30, 'AAAA', ipv6_ip),
+                ("%s." % domain, 60, 'A', ipv4_ip),
+            }))
+
+    def test_get_soa_record_returns_record_with_serial(self):
+        domain = factory.make_string()
+        serial = random.randint(1, 100)
+        dns_zone_config = DNSForwardZoneConfig(
+            domain, serial=serial, default_ttl=30)
+        self.assertThat(
+            dns_zone_config.get_soa_record(dns_zone_config.zone_info[0]),
+            Equals((
+                "%s." % domain, 30, 'SOA',
+                "%s. nobody.example.com. %d 600 1800 604800 30" % (
+                    domain, serial))))
+
+    def test_write_config_writes_only_named_zones(self):
+        target_dir = patch_dns_config_path(self)
+        dns_zone_config = DNSForwardZoneConfig(
+            factory.make_string(), serial=random.randint(1, 100))
+        dns_zone_config.write_config([factory.make_name('zone')])
+        self.assertThat(os.listdir(target_dir), Equals([]))
+        dns_zone_config.write_config([dns_zone_config.domain])
+        self.assertThat(
+            os.listdir(target_dir),
+            Equals(['zone.%s' % dns_zone_config.domain]))
+
 
 class TestDNSReverseZoneConfig(MAASTestCase):
     """Tests for DNSReverseZoneConfig."""
@@ -10,6 +10,7 @@ __all__ = [
     ]
 
 from datetime import datetime
+from hashlib import sha256
 from itertools import chain
 
 from netaddr import (
@@ -110,6 +111,35 @@ def get_details_for_ip_range(ip_range):
     return intersecting_subnets, prefix, rdns_suffix
 
 
+def normalise_parameters(value):
+    """Put template parameters in a canonical form for comparison.
+
+    Records can come out of the database in any order, so lists are sorted;
+    tuples are records themselves and keep their order.
+    """
+    if isinstance(value, dict):
+        return sorted(
+            (key, normalise_parameters(item))
+            for key, item in value.items())
+    elif isinstance(value, list):
+        return sorted(
+            (normalise_parameters(item) for item in value), key=repr)
+    elif isinstance(value, tuple):
+        return tuple(normalise_parameters(item) for item in value)
+    else:
+        return value
+
+
+def qualify_name(name, zone_name):
+    """Return the fully qualified form of `name` in the zone `zone_name`."""
+    if name == '@':
+        return "%s." % zone_name
+    elif name.endswith('.'):
+        return name
+    else:
+        return "%s.%s." % (name, zone_name)
+
+
 class DomainInfo:
     """Information about a DNS zone"""
 
@@ -163,6 +193,69 @@ class DomainConfigBase:
             'ns_host_name': self.ns_host_name,
         }
 
+    def get_zone_parameters(self, zone_info):
+        """Return the template parameters for the zone in `zone_info`."""
+        raise NotImplementedError()
+
+    def get_fingerprint(self, zone_info, include_host_records=True):
+        """Return a digest of the zone in `zone_info`.
+
+        The serial and modification time are left out, so the fingerprint
+        changes only when the zone's records change.
+
+        :param include_host_records: Whether to include the records returned
+            by `get_host_records`. Without them, the fingerprint changes
+            only when the zone needs to be rewritten in full.
+        """
+        parameters = self.make_parameters()
+        del parameters['serial'], parameters['modified']
+        parameters.update(self.get_zone_parameters(zone_info))
+        if not include_host_records:
+            del parameters['mappings']
+        content = repr(normalise_parameters(parameters))
+        return sha256(content.encode("utf-8")).hexdigest()
+
+    def get_host_records(self, zone_info):
+        """Return the host records of the zone in `zone_info`.
+
+        These are the A, AAAA, and PTR records of individual hosts, which
+        can be changed with dynamic updates.
+
+        :return: A set of ``(name, ttl, type, data)`` tuples, with fully
+            qualified names.
+        """
+        mappings = self.get_zone_parameters(zone_info)['mappings']
+        return {
+            (qualify_name(name, zone_info.zone_name), ttl, rrtype, data)
+            for rrtype, mapping in mappings.items()
+            for name, ttl, data in mapping
+        }
+
+    def get_soa_record(self, zone_info):
+        """Return the SOA record of the zone in `zone_info`.
+
+        This matches the SOA record in the zone file template.
+
+        :return: A ``(name, ttl, type, data)`` tuple.
+        """
+        parameters = self.make_parameters()
+        return (
+            "%s." % zone_info.zone_name, parameters['ttl'], 'SOA',
+            "%s. nobody.example.com. %s 600 1800 604800 %s" % (
+                parameters['domain'], parameters['serial'],
+                parameters['ttl']))
+
+    def write_config(self, zone_names=None):
+        """Write the zone files.
+
+        :param zone_names: If given, only write the zones with these names.
+        """
+        for zi in self.zone_info:
+            if zone_names is None or zi.zone_name in zone_names:
+                self.write_zone_file(
+                    zi.target_path, self.make_parameters(),
+                    self.get_zone_parameters(zi))
+
     @classmethod
     def write_zone_file(cls, output_file, *parameters):
         """Write a zone file based on the zone file template.
@@ -292,31 +385,28 @@ class DNSForwardZoneConfig(DomainConfigBase):
         return sorted(
             generate_directives, key=lambda directive: directive[2])
 
-    def write_config(self):
-        """Write the zone file."""
+    def get_zone_parameters(self, zone_info):
+        """See `DomainConfigBase.get_zone_parameters`."""
         # Create GENERATE directives for IPv4 ranges.
-        for zi in self.zone_info:
-            generate_directives = list(
-                chain.from_iterable(
-                    self.get_GENERATE_directives(dynamic_range)
-                    for dynamic_range in self._dynamic_ranges
-                    if dynamic_range.version == 4
-                ))
-            self.write_zone_file(
-                zi.target_path, self.make_parameters(),
-                {
-                    'mappings': {
-                        'A': self.get_A_mapping(
-                            self._mapping, self._ipv4_ttl),
-                        'AAAA': self.get_AAAA_mapping(
-                            self._mapping, self._ipv6_ttl),
-                    },
-                    'other_mapping': enumerate_rrset_mapping(
-                        self._other_mapping),
-                    'generate_directives': {
-                        'A': generate_directives,
-                    }
-                })
+        generate_directives = list(
+            chain.from_iterable(
+                self.get_GENERATE_directives(dynamic_range)
+                for dynamic_range in self._dynamic_ranges
+                if dynamic_range.version == 4
+            ))
+        return {
+            'mappings': {
+                'A': list(self.get_A_mapping(
+                    self._mapping, self._ipv4_ttl)),
+                'AAAA': list(self.get_AAAA_mapping(
+                    self._mapping, self._ipv6_ttl)),
+            },
+            'other_mapping': list(enumerate_rrset_mapping(
+                self._other_mapping)),
+            'generate_directives': {
+                'A': generate_directives,
+            }
+        }
 
 
 class DNSReverseZoneConfig(DomainConfigBase):
@@ -530,33 +620,29 @@ class DNSReverseZoneConfig(DomainConfigBase):
                 generate_directives.add((iterator, '${0,1,x}', hostname))
         return sorted(generate_directives)
 
-    def write_config(self):
-        """Write the zone file."""
+    def get_zone_parameters(self, zone_info):
+        """See `DomainConfigBase.get_zone_parameters`."""
         # Create GENERATE directives for IPv4 ranges.
-        for zi in self.zone_info:
-            generate_directives = list(
-                chain.from_iterable(
-                    self.get_GENERATE_directives(
-                        dynamic_range,
-                        self.domain,
-                        zi)
-                    for dynamic_range in self._dynamic_ranges
-                    if dynamic_range.version == 4
-                ))
-            self.write_zone_file(
-                zi.target_path, self.make_parameters(),
-                {
-                    'mappings': {
-                        'PTR': self.get_PTR_mapping(
-                            self._mapping, zi.subnetwork),
-                    },
-                    'other_mapping': [],
-                    'generate_directives': {
-                        'PTR': generate_directives,
-                        'CNAME': self.get_rfc2317_GENERATE_directives(
-                            zi.subnetwork,
-                            self._rfc2317_ranges,
-                            self.domain),
-                    }
-                }
-            )
+        generate_directives = list(
+            chain.from_iterable(
+                self.get_GENERATE_directives(
+                    dynamic_range,
+                    self.domain,
+                    zone_info)
+                for dynamic_range in self._dynamic_ranges
+                if dynamic_range.version == 4
+            ))
+        return {
+            'mappings': {
+                'PTR': list(self.get_PTR_mapping(
+                    self._mapping, zone_info.subnetwork)),
+            },
+            'other_mapping': [],
+            'generate_directives': {
+                'PTR': generate_directives,
+                'CNAME': self.get_rfc2317_GENERATE_directives(
+                    zone_info.subnetwork,
+                    self._rfc2317_ranges,
+                    self.domain),
+            }
+        }
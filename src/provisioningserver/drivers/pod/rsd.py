@@ -30,8 +30,8 @@ from provisioningserver.drivers.pod import (
     PodFatalError,
 )
 from provisioningserver.drivers.power.redfish import (
+    bmc_connection_pool,
     RedfishPowerDriverBase,
-    WebClientContextFactory,
 )
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.rpc.exceptions import PodInvalidResources
@@ -39,10 +39,8 @@ from provisioningserver.utils.twisted import (
     asynchronous,
     pause,
 )
-from twisted.internet import reactor
 from twisted.internet.defer import inlineCallbacks
 from twisted.web.client import (
-    Agent,
     FileBodyProducer,
     PartialDownloadError,
     readBody,
@@ -103,8 +101,7 @@ class RSDPodDriver(RedfishPowerDriverBase, PodDriverBase):
     @asynchronous
     def redfish_request(self, method, uri, headers=None, bodyProducer=None):
         """Send the redfish request and return the response."""
-        agent = Agent(reactor, contextFactory=WebClientContextFactory())
-        d = agent.request(
+        d = bmc_connection_pool.request(
             method, uri, headers=headers, bodyProducer=bodyProducer)
 
         def render_response(response):
@@ -1,4 +1,4 @@
-# Copyright 2015-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2015-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """IPMI Power Driver."""
@@ -29,6 +29,10 @@ from provisioningserver.drivers.power import (
 from provisioningserver.logger import get_maas_logger
 from provisioningserver.utils import shell
 from provisioningserver.utils.network import find_ip_via_arp
+from provisioningserver.utils.twisted import asynchronous
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred
+from twisted.internet.threads import deferToThread
 
 
 IPMI_CONFIG = """\
@@ -187,6 +191,112 @@ IPMI_BOOT_TYPE_MAPPING = {
     }
 
 
+def get_ipmi_error(output):
+    """Return the exception for the first IPMI error found in `output`.
+
+    :return: A `PowerError` instance, or `None` if there's no known error.
+    """
+    for error, error_info in IPMI_ERRORS.items():
+        if error in output:
+            return error_info['exception'](error_info['message'])
+    return None
+
+
+class IPMIQueryBatcher:
+    """Query the power state of many BMCs with one ``ipmipower`` process.
+
+    ``ipmipower`` accepts many hosts at once, opens sessions to them in
+    parallel, and reports one ``host: result`` line for each. It takes one
+    set of credentials though, so queries that arrive within `delay` seconds
+    of each other are grouped by driver type and credentials, and each
+    group is queried in one invocation of at most `max_hosts` hosts.
+    """
+
+    delay = 0.25
+    max_hosts = 64
+
+    def __init__(self, clock=reactor):
+        super(IPMIQueryBatcher, self).__init__()
+        self.clock = clock
+        self.waiting = {}
+        self.calls = {}
+
+    def query(self, power_address, power_driver, power_user, power_pass):
+        """Query the power state of the BMC at `power_address`.
+
+        :return: A `Deferred` that fires with "on" or "off", or fails with a
+            `PowerError`.
+        """
+        key = power_driver, power_user, power_pass
+        d = Deferred()
+        waiting = self.waiting.setdefault(key, [])
+        waiting.append((power_address, d))
+        if len(waiting) >= self.max_hosts:
+            self.flush(key)
+        elif key not in self.calls:
+            self.calls[key] = self.clock.callLater(
+                self.delay, self.flush, key)
+        return d
+
+    def flush(self, key):
+        """Query the BMCs waiting in the group for `key` now."""
+        call = self.calls.pop(key, None)
+        if call is not None and call.active():
+            call.cancel()
+        waiting = self.waiting.pop(key, [])
+        hosts = sorted({power_address for power_address, _ in waiting})
+        d = deferToThread(self._issue_ipmipower_query, hosts, *key)
+
+        def deliver(results):
+            for power_address, waiter in waiting:
+                result = results[power_address]
+                if isinstance(result, Exception):
+                    waiter.errback(result)
+                else:
+                    waiter.callback(result)
+
+        def fail(failure):
+            for _, waiter in waiting:
+                waiter.errback(failure)
+
+        d.addCallbacks(deliver, fail)
+        return d
+
+    @staticmethod
+    def _issue_ipmipower_query(hosts, power_driver, power_user, power_pass):
+        """Query `hosts` with one ``ipmipower --stat``.
+
+        :return: A dict mapping each host to "on", "off", or the
+            `PowerError` to raise for it.
+        """
+        command = ['ipmipower', '-W', 'opensesspriv']
+        if is_power_parameter_set(power_driver):
+            command.extend(("--driver-type", power_driver))
+        command.extend(('-h', ",".join(hosts)))
+        if is_power_parameter_set(power_user):
+            command.extend(("-u", power_user))
+        command.extend(('-p', power_pass, '--stat'))
+        env = shell.get_env_with_locale()
+        process = Popen(command, stdout=PIPE, stderr=PIPE, env=env)
+        stdout, _ = process.communicate()
+        stdout = stdout.decode("utf-8").strip()
+        results = {}
+        for line in stdout.splitlines():
+            host, _, output = line.partition(": ")
+            if host in hosts:
+                output = output.strip()
+                if output in ("on", "off"):
+                    results[host] = output
+                else:
+                    results[host] = get_ipmi_error(output) or PowerError(
+                        "Failed to power query %s: %s" % (host, output))
+        for host in hosts:
+            if host not in results:
+                results[host] = get_ipmi_error(stdout) or PowerError(
+                    "Failed to power query %s: %s" % (host, stdout))
+        return results
+
+
 class IPMIPowerDriver(PowerDriver):
 
     name = 'ipmi'
@@ -212,6 +322,10 @@ class IPMIPowerDriver(PowerDriver):
     ip_extractor = make_ip_extractor('power_address')
     wait_time = (4, 8, 16, 32)
 
+    def __init__(self, clock=reactor):
+        super(IPMIPowerDriver, self).__init__(clock)
+        self.batcher = IPMIQueryBatcher(clock)
+
     def detect_missing_packages(self):
         if not shell.has_command_available('ipmipower'):
             return ['freeipmi-tools']
@@ -260,10 +374,10 @@ class IPMIPowerDriver(PowerDriver):
         process = Popen(command, stdout=PIPE, stderr=PIPE, env=env)
         stdout, _ = process.communicate()
         stdout = stdout.decode("utf-8").strip()
-        for error, error_info in IPMI_ERRORS.items():
-            # ipmipower dumps errors to stdout
-            if error in stdout:
-                raise error_info.get('exception')(error_info.get('message'))
+        # ipmipower dumps errors to stdout
+        error = get_ipmi_error(stdout)
+        if error is not None:
+            raise error
         if process.returncode != 0:
             raise PowerError(
                 "Failed to power %s %s: %s" % (
@@ -336,5 +450,16 @@ class IPMIPowerDriver(PowerDriver):
     def power_off(self, system_id, context):
         self._issue_ipmi_command('off', **context)
 
+    @asynchronous
     def power_query(self, system_id, context):
-        return self._issue_ipmi_command('query', **context)
+        power_address = context.get('power_address')
+        if is_power_parameter_set(power_address) and all(
+                char not in power_address for char in ",[]:"):
+            # Several BMCs can be queried by one ipmipower process, but
+            # not those found by MAC address, nor those whose address it
+            # would mistake for a host list or a port.
+            return self.batcher.query(
+                power_address, context.get('power_driver'),
+                context.get('power_user'), context.get('power_pass'))
+        else:
+            return deferToThread(self._issue_ipmi_command, 'query', **context)
@@ -4,6 +4,7 @@
 """Redfish Power Driver."""
 
 __all__ = [
+    'bmc_connection_pool',
     'RedfishPowerDriver',
     ]
 
@@ -13,6 +14,7 @@ from io import BytesIO
 import json
 from os.path import join
 
+from OpenSSL import SSL
 from provisioningserver.drivers import (
     make_ip_extractor,
     make_setting_field,
@@ -28,13 +30,18 @@ from twisted.internet._sslverify import (
     ClientTLSOptions,
     OpenSSLCertificateOptions,
 )
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet.defer import (
+    DeferredSemaphore,
+    inlineCallbacks,
+)
 from twisted.web.client import (
     Agent,
     BrowserLikePolicyForHTTPS,
     FileBodyProducer,
+    HTTPConnectionPool,
     PartialDownloadError,
     readBody,
+    URI,
 )
 from twisted.web.http_headers import Headers
 
@@ -45,17 +52,95 @@ REDFISH_POWER_CONTROL_ENDPOINT = (
 REDFISH_SYSTEMS_ENDPOINT = b"redfish/v1/Systems/%s/"
 
 
+class ResumingClientTLSOptions(ClientTLSOptions):
+    """TLS options that resume the last session made with the same server.
+
+    This also stops Twisted from validating the hostname of the
+    certificate; BMCs almost never have a certificate for their address.
+    """
+
+    def __init__(self, hostname, ctx):
+        super(ResumingClientTLSOptions, self).__init__(hostname, ctx)
+        self.session = None
+        ctx.set_info_callback(self._saveSession)
+
+    def _saveSession(self, connection, where, ret):
+        if where & SSL.SSL_CB_HANDSHAKE_DONE:
+            self.session = connection.get_session()
+
+    def clientConnectionForTLS(self, tlsProtocol):
+        connection = super(
+            ResumingClientTLSOptions, self).clientConnectionForTLS(
+                tlsProtocol)
+        if self.session is not None:
+            connection.set_session(self.session)
+        return connection
+
+
 class WebClientContextFactory(BrowserLikePolicyForHTTPS):
 
+    def __init__(self):
+        super(WebClientContextFactory, self).__init__()
+        self.creators = {}
+
     def creatorForNetloc(self, hostname, port):
-        opts = ClientTLSOptions(
-            hostname.decode("ascii"),
-            OpenSSLCertificateOptions(verify=False).getContext())
-        # This forces Twisted to not validate the hostname of the certificate.
-        opts._ctx.set_info_callback(lambda *args: None)
+        # Keep one set of options per server, so that a new connection can
+        # resume the TLS session of the last instead of a full handshake.
+        opts = self.creators.get((hostname, port))
+        if opts is None:
+            opts = self.creators[hostname, port] = ResumingClientTLSOptions(
+                hostname.decode("ascii"),
+                OpenSSLCertificateOptions(verify=False).getContext())
         return opts
 
 
+class BMCConnectionPool(HTTPConnectionPool):
+    """HTTP(S) connections to BMCs, kept open between requests.
+
+    Power drivers that talk HTTP to their BMCs should make requests through
+    `bmc_connection_pool` rather than their own `Agent`, so that a power
+    query does not pay for new TCP and TLS handshakes on every request.
+
+    :ivar maxConcurrentPerHost: The most requests to have outstanding with
+        any one BMC at a time; BMCs handle few connections well.
+    :ivar maxPersistentPerHost: The most idle connections to keep open to
+        each BMC.
+    :ivar cachedConnectionTimeout: How long, in seconds, to keep an idle
+        connection open before closing it.
+    """
+
+    maxConcurrentPerHost = 4
+    maxPersistentPerHost = 4
+    cachedConnectionTimeout = 60
+
+    def __init__(self, reactor):
+        super(BMCConnectionPool, self).__init__(reactor, persistent=True)
+        self.contextFactory = WebClientContextFactory()
+        self.limits = {}
+
+    def request(self, method, uri, headers=None, bodyProducer=None):
+        """Make a request using a pooled connection.
+
+        This takes the same arguments as `Agent.request`. The request waits
+        while `maxConcurrentPerHost` others to the same BMC are waiting for
+        their responses.
+        """
+        parsed = URI.fromBytes(uri)
+        key = parsed.scheme, parsed.host, parsed.port
+        limit = self.limits.get(key)
+        if limit is None:
+            limit = self.limits[key] = DeferredSemaphore(
+                self.maxConcurrentPerHost)
+        agent = Agent(
+            self._reactor, contextFactory=self.contextFactory, pool=self)
+        return limit.run(
+            agent.request, method, uri, headers=headers,
+            bodyProducer=bodyProducer)
+
+
+bmc_connection_pool = BMCConnectionPool(reactor)
+
+
 class RedfishPowerDriverBase(PowerDriver):
 
     def get_url(self, context):
@@ -88,8 +173,7 @@ class RedfishPowerDriverBase(PowerDriver):
     @asynchronous
     def redfish_request(self, method, uri, headers=None, bodyProducer=None):
         """Send the redfish request and return the response."""
-        agent = Agent(reactor, contextFactory=WebClientContextFactory())
-        d = agent.request(
+        d = bmc_connection_pool.request(
             method, uri, headers=headers, bodyProducer=bodyProducer)
 
         def render_response(response):
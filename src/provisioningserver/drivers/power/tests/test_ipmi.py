@@ -1,4 +1,4 @@
-# Copyright 2015-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2015-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Tests for `provisioningserver.drivers.power.ipmi`."""
@@ -17,11 +17,17 @@ from maastesting.factory import factory
 from maastesting.matchers import (
     MockCalledOnceWith,
     MockCallsMatch,
+    MockNotCalled,
 )
-from maastesting.testcase import MAASTestCase
+from maastesting.testcase import (
+    MAASTestCase,
+    MAASTwistedRunTest,
+)
+from maastesting.twisted import extract_result
 from provisioningserver.drivers.power import (
     ipmi as ipmi_module,
     PowerAuthError,
+    PowerConnError,
     PowerError,
 )
 from provisioningserver.drivers.power.ipmi import (
@@ -31,6 +37,7 @@ from provisioningserver.drivers.power.ipmi import (
     IPMI_CONFIG_WITH_BOOT_TYPE,
     IPMI_ERRORS,
     IPMIPowerDriver,
+    IPMIQueryBatcher,
 )
 from provisioningserver.utils.shell import (
     get_env_with_locale,
@@ -40,6 +47,11 @@ from testtools.matchers import (
     Contains,
     Equals,
 )
+from twisted.internet.defer import (
+    inlineCallbacks,
+    maybeDeferred,
+)
+from twisted.internet.task import Clock
 
 
 def make_context():
@@ -299,17 +311,6 @@ class TestIPMIPowerDriver(MAASTestCase):
         self.assertThat(
             _issue_ipmi_command_mock, MockCalledOnceWith('off', **context))
 
-    def test_power_query_calls__issue_ipmi_command(self):
-        context = make_context()
-        ipmi_power_driver = IPMIPowerDriver()
-        _issue_ipmi_command_mock = self.patch(
-            ipmi_power_driver, '_issue_ipmi_command')
-        system_id = factory.make_name('system_id')
-        ipmi_power_driver.power_query(system_id, context)
-
-        self.assertThat(
-            _issue_ipmi_command_mock, MockCalledOnceWith('query', **context))
-
     def test__issue_ipmi_chassis_config_with_power_boot_type(self):
         context = make_context()
         driver = IPMIPowerDriver()
@@ -364,3 +365,150 @@ class TestIPMIPowerDriver(MAASTestCase):
                     IPMI_BOOT_TYPE.EFI]))
         self.assertThat(tmpfile.flush, MockCalledOnceWith())
         self.assertThat(tmpfile.__exit__, MockCalledOnceWith(None, None, None))
+
+
+class TestIPMIPowerDriverQuery(MAASTestCase):
+    """Tests for `IPMIPowerDriver.power_query`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestIPMIPowerDriverQuery, self).setUp()
+        self.patch(ipmi_module, "deferToThread", maybeDeferred)
+
+    @inlineCallbacks
+    def test_power_query_uses_batcher(self):
+        context = make_context()
+        driver = IPMIPowerDriver()
+        query = self.patch(driver.batcher, "query")
+        query.return_value = "on"
+        power_state = yield driver.power_query(
+            factory.make_name('system_id'), context)
+        self.assertEqual("on", power_state)
+        self.assertThat(query, MockCalledOnceWith(
+            context['power_address'], context['power_driver'],
+            context['power_user'], context['power_pass']))
+
+    @inlineCallbacks
+    def test_power_query_calls__issue_ipmi_command_without_address(self):
+        context = make_context()
+        context['power_address'] = ''
+        context['mac_address'] = factory.make_mac_address()
+        driver = IPMIPowerDriver()
+        _issue_ipmi_command_mock = self.patch(driver, '_issue_ipmi_command')
+        _issue_ipmi_command_mock.return_value = "off"
+        power_state = yield driver.power_query(
+            factory.make_name('system_id'), context)
+        self.assertEqual("off", power_state)
+        self.assertThat(
+            _issue_ipmi_command_mock, MockCalledOnceWith('query', **context))
+
+    @inlineCallbacks
+    def test_power_query_does_not_batch_host_lists_or_ports(self):
+        context = make_context()
+        context['power_address'] = "%s:623" % factory.make_ipv4_address()
+        driver = IPMIPowerDriver()
+        query = self.patch(driver.batcher, "query")
+        self.patch(driver, '_issue_ipmi_command').return_value = "on"
+        yield driver.power_query(factory.make_name('system_id'), context)
+        self.assertThat(query, MockNotCalled())
+
+
+class TestIPMIQueryBatcher(MAASTestCase):
+    """Tests for `IPMIQueryBatcher`."""
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def setUp(self):
+        super(TestIPMIQueryBatcher, self).setUp()
+        self.patch(ipmi_module, "deferToThread", maybeDeferred)
+
+    def patch_Popen(self, stdout, returncode=0):
+        popen_mock = self.patch(ipmi_module, 'Popen')
+        process = popen_mock.return_value
+        process.communicate.return_value = (stdout.encode("utf-8"), b'')
+        process.returncode = returncode
+        return popen_mock
+
+    def test_queries_hosts_with_the_same_credentials_together(self):
+        clock = Clock()
+        batcher = IPMIQueryBatcher(clock)
+        issue = self.patch(batcher, "_issue_ipmipower_query")
+        issue.return_value = {"host1": "on", "host2": "off"}
+        d1 = batcher.query("host1", "LAN_2_0", "user", "pass")
+        d2 = batcher.query("host2", "LAN_2_0", "user", "pass")
+        self.assertThat(issue, MockNotCalled())
+        clock.advance(batcher.delay)
+        self.assertThat(issue, MockCalledOnceWith(
+            ["host1", "host2"], "LAN_2_0", "user", "pass"))
+        self.assertEqual("on", extract_result(d1))
+        self.assertEqual("off", extract_result(d2))
+
+    def test_queries_hosts_with_different_credentials_separately(self):
+        clock = Clock()
+        batcher = IPMIQueryBatcher(clock)
+        issue = self.patch(batcher, "_issue_ipmipower_query")
+        issue.side_effect = [{"host1": "on"}, {"host2": "off"}]
+        batcher.query("host1", "LAN_2_0", "user", "pass1")
+        batcher.query("host2", "LAN_2_0", "user", "pass2")
+        clock.advance(batcher.delay)
+        self.assertThat(issue, MockCallsMatch(
+            call(["host1"], "LAN_2_0", "user", "pass1"),
+            call(["host2"], "LAN_2_0", "user", "pass2")))
+
+    def test_queries_immediately_once_batch_is_full(self):
+        clock = Clock()
+        batcher = IPMIQueryBatcher(clock)
+        batcher.max_hosts = 2
+        issue = self.patch(batcher, "_issue_ipmipower_query")
+        issue.return_value = {"host1": "on", "host2": "on"}
+        batcher.query("host1", "LAN_2_0", "user", "pass")
+        batcher.query("host2", "LAN_2_0", "user", "pass")
+        self.assertThat(issue, MockCalledOnceWith(
+            ["host1", "host2"], "LAN_2_0", "user", "pass"))
+        self.assertEqual([], clock.getDelayedCalls())
+
+    def test_delivers_errors_to_their_hosts(self):
+        clock = Clock()
+        batcher = IPMIQueryBatcher(clock)
+        error = PowerConnError("connection timeout")
+        self.patch(batcher, "_issue_ipmipower_query").return_value = {
+            "host1": "on", "host2": error}
+        d1 = batcher.query("host1", "LAN_2_0", "user", "pass")
+        d2 = batcher.query("host2", "LAN_2_0", "user", "pass")
+        clock.advance(batcher.delay)
+        self.assertEqual("on", extract_result(d1))
+        self.assertRaises(PowerConnError, extract_result, d2)
+
+    def test_delivers_failure_to_everyone(self):
+        clock = Clock()
+        batcher = IPMIQueryBatcher(clock)
+        self.patch(batcher, "_issue_ipmipower_query").side_effect = (
+            ZeroDivisionError())
+        d1 = batcher.query("host1", "LAN_2_0", "user", "pass")
+        d2 = batcher.query("host2", "LAN_2_0", "user", "pass")
+        clock.advance(batcher.delay)
+        self.assertRaises(ZeroDivisionError, extract_result, d1)
+        self.assertRaises(ZeroDivisionError, extract_result, d2)
+
+    def test__issue_ipmipower_query_runs_one_ipmipower(self):
+        popen_mock = self.patch_Popen("host1: on\nhost2: off\n")
+        results = IPMIQueryBatcher._issue_ipmipower_query(
+            ["host1", "host2"], "LAN_2_0", "user", "pass")
+        self.assertEqual({"host1": "on", "host2": "off"}, results)
+        self.assertThat(popen_mock, MockCalledOnceWith(
+            ['ipmipower', '-W', 'opensesspriv', "--driver-type", "LAN_2_0",
+             '-h', "host1,host2", '-u', "user", '-p', "pass", '--stat'],
+            stdout=PIPE, stderr=PIPE, env=get_env_with_locale()))
+
+    def test__issue_ipmipower_query_demultiplexes_errors(self):
+        self.patch_Popen(
+            "host1: password invalid\nhost2: on\nhost3: gremlins\n",
+            returncode=1)
+        results = IPMIQueryBatcher._issue_ipmipower_query(
+            ["host1", "host2", "host3", "host4"], "LAN_2_0", "user", "pass")
+        self.assertIsInstance(results["host1"], PowerAuthError)
+        self.assertEqual("on", results["host2"])
+        self.assertIsInstance(results["host3"], PowerError)
+        self.assertIn("gremlins", str(results["host3"]))
+        self.assertIsInstance(results["host4"], PowerError)
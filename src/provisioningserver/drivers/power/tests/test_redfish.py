@@ -16,6 +16,7 @@ import random
 from unittest.mock import (
     call,
     Mock,
+    sentinel,
 )
 
 from maastesting.factory import factory
@@ -28,20 +29,26 @@ from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
 )
+from maastesting.twisted import extract_result
 from provisioningserver.drivers.power import PowerActionError
 from provisioningserver.drivers.power.redfish import (
+    BMCConnectionPool,
     REDFISH_POWER_CONTROL_ENDPOINT,
     RedfishPowerDriver,
+    ResumingClientTLSOptions,
     WebClientContextFactory,
 )
 import provisioningserver.drivers.power.redfish as redfish_module
+from OpenSSL import SSL
 from testtools import ExpectedException
 from twisted.internet._sslverify import ClientTLSOptions
 from twisted.internet.defer import (
+    Deferred,
     fail,
     inlineCallbacks,
     succeed,
 )
+from twisted.internet.task import Clock
 from twisted.web.client import (
     FileBodyProducer,
     PartialDownloadError,
@@ -181,6 +188,97 @@ class TestWebClientContextFactory(MAASTestCase):
         opts = contextFactory.creatorForNetloc(hostname, port)
         self.assertIsInstance(opts, ClientTLSOptions)
 
+    def test_creatorForNetloc_reuses_tls_options_for_same_netloc(self):
+        hostname = factory.make_name('hostname').encode('utf-8')
+        port = random.randint(1000, 2000)
+        contextFactory = WebClientContextFactory()
+        opts = contextFactory.creatorForNetloc(hostname, port)
+        self.assertIs(opts, contextFactory.creatorForNetloc(hostname, port))
+        self.assertIsNot(
+            opts, contextFactory.creatorForNetloc(hostname, port + 1))
+
+
+class TestResumingClientTLSOptions(MAASTestCase):
+
+    def make_options(self):
+        hostname = factory.make_name('hostname').encode('utf-8')
+        contextFactory = WebClientContextFactory()
+        return contextFactory.creatorForNetloc(hostname, 443)
+
+    def test_saves_session_when_handshake_is_done(self):
+        opts = self.make_options()
+        self.assertIsInstance(opts, ResumingClientTLSOptions)
+        connection = Mock()
+        opts._saveSession(connection, SSL.SSL_CB_HANDSHAKE_START, 1)
+        self.assertIsNone(opts.session)
+        opts._saveSession(connection, SSL.SSL_CB_HANDSHAKE_DONE, 1)
+        self.assertIs(connection.get_session.return_value, opts.session)
+
+    def test_resumes_saved_session(self):
+        opts = self.make_options()
+        opts.session = sentinel.session
+        connection = Mock()
+        self.patch(
+            ClientTLSOptions, "clientConnectionForTLS").return_value = (
+                connection)
+        self.assertIs(connection, opts.clientConnectionForTLS(Mock()))
+        self.assertThat(
+            connection.set_session, MockCalledOnceWith(sentinel.session))
+
+    def test_does_not_resume_without_saved_session(self):
+        opts = self.make_options()
+        connection = Mock()
+        self.patch(
+            ClientTLSOptions, "clientConnectionForTLS").return_value = (
+                connection)
+        opts.clientConnectionForTLS(Mock())
+        self.assertThat(connection.set_session, MockNotCalled())
+
+
+class TestBMCConnectionPool(MAASTestCase):
+
+    def test_is_persistent(self):
+        pool = BMCConnectionPool(Clock())
+        self.assertTrue(pool.persistent)
+        self.assertIsInstance(pool.contextFactory, WebClientContextFactory)
+
+    def test_request_uses_pool(self):
+        pool = BMCConnectionPool(Clock())
+        mock_agent = self.patch(redfish_module, 'Agent')
+        mock_agent.return_value.request.return_value = succeed(
+            sentinel.response)
+        uri = b"https://%s/redfish/v1/" % factory.make_name(
+            'host').encode('ascii')
+        d = pool.request(b"GET", uri, sentinel.headers)
+        self.assertIs(sentinel.response, extract_result(d))
+        self.assertThat(mock_agent, MockCalledOnceWith(
+            pool._reactor, contextFactory=pool.contextFactory, pool=pool))
+        self.assertThat(
+            mock_agent.return_value.request, MockCalledOnceWith(
+                b"GET", uri, headers=sentinel.headers, bodyProducer=None))
+
+    def test_request_limits_concurrent_requests_per_host(self):
+        pool = BMCConnectionPool(Clock())
+        pool.maxConcurrentPerHost = 2
+        mock_agent = self.patch(redfish_module, 'Agent')
+        responses = []
+
+        def request(*args, **kwargs):
+            responses.append(Deferred())
+            return responses[-1]
+
+        mock_agent.return_value.request.side_effect = request
+        uri = b"https://bmc1/redfish/v1/"
+        other_uri = b"https://bmc2/redfish/v1/"
+        for _ in range(3):
+            pool.request(b"GET", uri)
+        self.assertEqual(2, len(responses))
+        # Requests to another BMC are not held up.
+        pool.request(b"GET", other_uri)
+        self.assertEqual(3, len(responses))
+        responses[0].callback(sentinel.response)
+        self.assertEqual(4, len(responses))
+
 
 class TestRedfishPowerDriver(MAASTestCase):
 
@@ -7,9 +7,13 @@ __all__ = [
     'download_all_boot_resources',
     ]
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from http import HTTPStatus
 import os.path
+import shutil
 import tarfile
+import urllib.request
 
 from provisioningserver.import_images.helpers import (
     get_os_from_product,
@@ -23,6 +27,7 @@ from simplestreams.mirrors import (
 )
 from simplestreams.objectstores import FileStore
 from simplestreams.util import (
+    checksummer,
     item_checksums,
     path_from_mirror_url,
     products_exdata,
@@ -35,6 +40,146 @@ log = LegacyLogger()
 DEFAULT_KEYRING_PATH = "/usr/share/keyrings"
 
 
+# Files are fetched over HTTP in segments of this size, each of which is
+# kept on disk as it arrives, so that an interrupted download can be resumed.
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+# How many segments of one file to fetch at once.
+SEGMENTS_AT_ONCE = 4
+
+# Read and write at 1MiB per chunk.
+READ_SIZE = 1024 * 1024
+
+
+class RangeNotSupported(Exception):
+    """The server does not support HTTP Range requests."""
+
+
+def get_content_url(content_source):
+    """Return the HTTP(S) URL `content_source` reads from, or `None`."""
+    # Simplestreams wraps the source for a URL in a checksumming source.
+    content_source = getattr(content_source, "cs", content_source)
+    url = getattr(content_source, "url", None)
+    if isinstance(url, str) and url.startswith(("http://", "https://")):
+        return url
+    else:
+        return None
+
+
+def get_segments(size):
+    """Return ``(start, end)`` byte offsets of the segments of a file.
+
+    The end of each segment is exclusive. Boundaries depend only on `size`,
+    so segments left behind by an interrupted download are found again.
+    """
+    return [
+        (start, min(start + SEGMENT_SIZE, size))
+        for start in range(0, size, SEGMENT_SIZE)
+    ] or [(0, 0)]
+
+
+def download_segment(url, path, start, end, size):
+    """Download bytes `start` to `end` of `url`, of `size`, into `path`.
+
+    Whatever `path` already holds is kept, and only the rest is requested.
+    When the server ignores the range and returns the whole file, that is
+    only used if the segment is the whole file.
+
+    :raise RangeNotSupported: If the server returned the whole file for a
+        segment that isn't.
+    """
+    length = end - start
+    try:
+        have = os.path.getsize(path)
+    except FileNotFoundError:
+        have = 0
+    if have > length:
+        # Left behind by a download with a different segment layout; the
+        # start of it is still good.
+        os.truncate(path, length)
+        have = length
+    if have == length:
+        return
+    request = urllib.request.Request(url, headers={
+        "Range": "bytes=%d-%d" % (start + have, end - 1)})
+    with urllib.request.urlopen(request) as response:
+        if response.status == HTTPStatus.PARTIAL_CONTENT:
+            mode = "ab"
+        elif start == 0 and end == size:
+            mode = "wb"
+        else:
+            raise RangeNotSupported(url)
+        with open(path, mode) as stream:
+            shutil.copyfileobj(response, stream, READ_SIZE)
+    if os.path.getsize(path) != length:
+        raise IOError(
+            "Download of %s stopped short at byte %d of %d." % (
+                url, start + os.path.getsize(path), end))
+
+
+def download_file(url, path, checksums, size):
+    """Download `url` to `path`, resuming an earlier attempt.
+
+    The file is fetched in segments, `SEGMENTS_AT_ONCE` at a time, into
+    partial files beside `path`. These are kept if the download fails, and
+    only the parts still missing are fetched the next time. Once all of it
+    has arrived it's checked against `checksums` before being moved to
+    `path`; if it doesn't match, the partial files are removed.
+    """
+    directory, filename = os.path.split(path)
+    partial = os.path.join(directory, ".%s.part" % filename)
+    os.makedirs(directory, exist_ok=True)
+    segments = get_segments(size)
+    partials = [partial] + [
+        "%s.%d" % (partial, start) for start, _ in segments[1:]]
+    try:
+        with ThreadPoolExecutor(SEGMENTS_AT_ONCE) as executor:
+            # Consume the results to raise the first error, if any.
+            list(executor.map(
+                lambda args: download_segment(url, *args, size=size),
+                ((segment_path, start, end)
+                 for segment_path, (start, end) in zip(partials, segments))))
+    except RangeNotSupported:
+        for segment_path in partials[1:]:
+            if os.path.exists(segment_path):
+                os.unlink(segment_path)
+        download_segment(url, partial, 0, size, size)
+    else:
+        with open(partial, "ab") as stream:
+            for segment_path in partials[1:]:
+                with open(segment_path, "rb") as segment:
+                    shutil.copyfileobj(segment, stream, READ_SIZE)
+                os.unlink(segment_path)
+
+    cksummer = checksummer(checksums)
+    with open(partial, "rb") as stream:
+        for data in iter(lambda: stream.read(READ_SIZE), b""):
+            cksummer.update(data)
+    if not cksummer.check():
+        os.unlink(partial)
+        raise ValueError(
+            "Invalid %s checksum for %s: got %s, expected %s." % (
+                cksummer.algorithm, url, cksummer.hexdigest(),
+                cksummer.expected))
+    os.rename(partial, path)
+
+
+def insert_content(store, tag, checksums, size, content_source):
+    """Insert content into `store` under `tag`.
+
+    Content from an HTTP server is downloaded with `download_file`, so that
+    an interrupted download is resumed rather than restarted. Anything else
+    is left to `store`.
+    """
+    url = get_content_url(content_source)
+    if url is None or size is None:
+        store.insert(tag, content_source, checksums, mutable=False, size=size)
+    else:
+        path = store._fullpath(tag)
+        if not os.path.isfile(path):
+            download_file(url, path, checksums, int(size))
+
+
 def insert_file(store, name, tag, checksums, size, content_source):
     """Insert a file into `store`.
 
@@ -58,7 +203,7 @@ def insert_file(store, name, tag, checksums, size, content_source):
     log.debug(
         "Inserting file {name} (tag={tag}, size={size}).",
         name=name, tag=tag, size=size)
-    store.insert(tag, content_source, checksums, mutable=False, size=size)
+    insert_content(store, tag, checksums, size, content_source)
     # XXX jtv 2014-04-24 bug=1313580: Isn't _fullpath meant to be private?
     return [(store._fullpath(tag), name)]
 
@@ -109,7 +254,7 @@ def extract_archive_tar(store, name, tag, checksums, size, content_source):
             "Extracting archive {name} (tag={tag}, size={size}).",
             name=name, tag=tag, size=size)
         archive_path = store._fullpath(tag)
-        store.insert(tag, content_source, checksums, mutable=False, size=size)
+        insert_content(store, tag, checksums, size, content_source)
         with tarfile.open(archive_path, 'r|*') as tar:
             for member in tar:
                 if member.isfile():
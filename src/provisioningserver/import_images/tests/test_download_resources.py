@@ -7,10 +7,13 @@ __all__ = []
 
 from datetime import datetime
 import hashlib
+from http import HTTPStatus
+from io import BytesIO
 import os
 import random
 import tarfile
 from unittest import mock
+from unittest.mock import sentinel
 
 from maastesting.factory import factory
 from maastesting.matchers import (
@@ -75,6 +78,176 @@ class TestDownloadAllBootResources(MAASTestCase):
                 keyring_file=source['keyring']))
 
 
+class FakeResponse(BytesIO):
+    """A fake response from `urlopen`."""
+
+    def __init__(self, content, status):
+        super(FakeResponse, self).__init__(content)
+        self.status = status
+
+
+class TestDownloadFile(MAASTestCase):
+    """Tests for `download_file`."""
+
+    def make_content(self, size=350):
+        content = factory.make_bytes(size=size)
+        checksums = {'sha256': hashlib.sha256(content).hexdigest()}
+        return content, checksums
+
+    def patch_urlopen(self, content, ranges=True):
+        """Serve `content`, honouring Range headers if `ranges`.
+
+        :return: A list of the Range headers requested.
+        """
+        requested = []
+
+        def urlopen(request):
+            header = request.get_header("Range")
+            requested.append(header)
+            if ranges and header is not None:
+                first, last = header[len("bytes="):].split("-")
+                return FakeResponse(
+                    content[int(first):int(last) + 1],
+                    HTTPStatus.PARTIAL_CONTENT)
+            else:
+                return FakeResponse(content, HTTPStatus.OK)
+
+        self.patch(download_resources.urllib.request, "urlopen", urlopen)
+        return requested
+
+    def test_downloads_file(self):
+        content, checksums = self.make_content()
+        requested = self.patch_urlopen(content)
+        path = os.path.join(self.make_dir(), "file")
+        download_resources.download_file(
+            "http://example.com/file", path, checksums, len(content))
+        with open(path, "rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertEqual(["bytes=0-%d" % (len(content) - 1)], requested)
+        self.assertEqual(["file"], os.listdir(os.path.dirname(path)))
+
+    def test_resumes_partial_download(self):
+        content, checksums = self.make_content()
+        requested = self.patch_urlopen(content)
+        directory = self.make_dir()
+        path = os.path.join(directory, "file")
+        factory.make_file(directory, ".file.part", content[:100])
+        download_resources.download_file(
+            "http://example.com/file", path, checksums, len(content))
+        with open(path, "rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertEqual(["bytes=100-%d" % (len(content) - 1)], requested)
+
+    def test_downloads_segments(self):
+        self.patch(download_resources, "SEGMENT_SIZE", 100)
+        content, checksums = self.make_content(size=350)
+        requested = self.patch_urlopen(content)
+        path = os.path.join(self.make_dir(), "file")
+        download_resources.download_file(
+            "http://example.com/file", path, checksums, len(content))
+        with open(path, "rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertItemsEqual(
+            ["bytes=0-99", "bytes=100-199", "bytes=200-299", "bytes=300-349"],
+            requested)
+        self.assertEqual(["file"], os.listdir(os.path.dirname(path)))
+
+    def test_resumes_segments(self):
+        self.patch(download_resources, "SEGMENT_SIZE", 100)
+        content, checksums = self.make_content(size=350)
+        requested = self.patch_urlopen(content)
+        directory = self.make_dir()
+        path = os.path.join(directory, "file")
+        factory.make_file(directory, ".file.part", content[:100])
+        factory.make_file(directory, ".file.part.200", content[200:250])
+        download_resources.download_file(
+            "http://example.com/file", path, checksums, len(content))
+        with open(path, "rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertItemsEqual(
+            ["bytes=100-199", "bytes=250-299", "bytes=300-349"], requested)
+
+    def test_downloads_whole_file_without_range_support(self):
+        self.patch(download_resources, "SEGMENT_SIZE", 100)
+        content, checksums = self.make_content(size=350)
+        self.patch_urlopen(content, ranges=False)
+        path = os.path.join(self.make_dir(), "file")
+        download_resources.download_file(
+            "http://example.com/file", path, checksums, len(content))
+        with open(path, "rb") as stream:
+            self.assertEqual(content, stream.read())
+        self.assertEqual(["file"], os.listdir(os.path.dirname(path)))
+
+    def test_discards_download_with_bad_checksum(self):
+        content, _ = self.make_content()
+        _, checksums = self.make_content()
+        self.patch_urlopen(content)
+        path = os.path.join(self.make_dir(), "file")
+        self.assertRaises(
+            ValueError, download_resources.download_file,
+            "http://example.com/file", path, checksums, len(content))
+        self.assertEqual([], os.listdir(os.path.dirname(path)))
+
+    def test_keeps_partial_download_on_failure(self):
+        content, checksums = self.make_content()
+
+        def urlopen(request):
+            return FakeResponse(content[:100], HTTPStatus.PARTIAL_CONTENT)
+
+        self.patch(download_resources.urllib.request, "urlopen", urlopen)
+        directory = self.make_dir()
+        path = os.path.join(directory, "file")
+        self.assertRaises(
+            IOError, download_resources.download_file,
+            "http://example.com/file", path, checksums, len(content))
+        self.assertEqual([".file.part"], os.listdir(directory))
+
+
+class TestInsertContent(MAASTestCase):
+    """Tests for `insert_content`."""
+
+    def test_downloads_from_http_content_source(self):
+        store = FileStore(self.make_dir())
+        content_source = mock.Mock(url="http://example.com/file", spec=["url"])
+        download_file = self.patch(download_resources, "download_file")
+        download_resources.insert_content(
+            store, "tag", sentinel.checksums, "100", content_source)
+        self.assertThat(download_file, MockCalledOnceWith(
+            "http://example.com/file", store._fullpath("tag"),
+            sentinel.checksums, 100))
+
+    def test_downloads_from_wrapped_http_content_source(self):
+        store = FileStore(self.make_dir())
+        content_source = mock.Mock(
+            url=None, cs=mock.Mock(url="https://example.com/file"))
+        download_file = self.patch(download_resources, "download_file")
+        download_resources.insert_content(
+            store, "tag", sentinel.checksums, 100, content_source)
+        self.assertThat(download_file, MockCalledOnceWith(
+            "https://example.com/file", store._fullpath("tag"),
+            sentinel.checksums, 100))
+
+    def test_skips_download_if_file_exists(self):
+        store = FileStore(self.make_dir())
+        factory.make_file(store._fullpath(""), "tag")
+        content_source = mock.Mock(url="http://example.com/file", spec=["url"])
+        download_file = self.patch(download_resources, "download_file")
+        download_resources.insert_content(
+            store, "tag", sentinel.checksums, 100, content_source)
+        self.assertThat(download_file, MockNotCalled())
+
+    def test_inserts_other_content_sources_into_store(self):
+        store = mock.Mock()
+        content_source = mock.Mock(url="file:///srv/file", spec=["url"])
+        download_file = self.patch(download_resources, "download_file")
+        download_resources.insert_content(
+            store, "tag", sentinel.checksums, 100, content_source)
+        self.assertThat(download_file, MockNotCalled())
+        self.assertThat(store.insert, MockCalledOnceWith(
+            "tag", content_source, sentinel.checksums, mutable=False,
+            size=100))
+
+
 class TestDownloadBootResources(MAASTestCase):
     """Tests for `download_boot_resources()`."""
 
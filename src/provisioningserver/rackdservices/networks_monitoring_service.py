@@ -16,6 +16,7 @@ from provisioningserver.rpc.region import (
     RequestRackRefresh,
     UpdateInterfaces,
 )
+from provisioningserver.utils.network import get_interfaces_fingerprint
 from provisioningserver.utils.services import NetworksMonitoringService
 from provisioningserver.utils.twisted import pause
 from twisted.internet.defer import inlineCallbacks
@@ -60,7 +61,8 @@ class RackNetworksMonitoringService(NetworksMonitoringService):
                 yield client(RequestRackRefresh, system_id=client.localIdent)
             yield client(
                 UpdateInterfaces, system_id=client.localIdent,
-                interfaces=interfaces, topology_hints=hints)
+                interfaces=interfaces, topology_hints=hints,
+                fingerprint=get_interfaces_fingerprint(interfaces))
             break
 
     def reportNeighbours(self, neighbours):
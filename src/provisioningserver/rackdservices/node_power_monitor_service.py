@@ -1,4 +1,4 @@
-# Copyright 2014-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2014-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Service to periodically query the power state on this cluster's nodes."""
@@ -8,8 +8,10 @@ __all__ = [
     "NodePowerMonitorService"
 ]
 
+from collections import deque
 from datetime import timedelta
 
+from provisioningserver.drivers.power.registry import PowerDriverRegistry
 from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
@@ -19,10 +21,20 @@ from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
     NoSuchCluster,
 )
-from provisioningserver.rpc.power import query_all_nodes
+from provisioningserver.rpc.power import (
+    power_action_registry,
+    query_node,
+)
 from provisioningserver.rpc.region import ListNodePowerParameters
 from twisted.application.internet import TimerService
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    Deferred,
+    DeferredList,
+    inlineCallbacks,
+    maybeDeferred,
+    succeed,
+)
 from twisted.internet.error import ConnectionDone
 
 
@@ -30,10 +42,121 @@ maaslog = get_maas_logger("power_monitor_service")
 log = LegacyLogger()
 
 
+class PowerQueryLimiter:
+    """Limit how many power queries of one power type run at once.
+
+    The limit adapts to how queries fare. After every `limit` queries it
+    grows by one if almost none failed or were slow, and halves if most
+    did; a struggling BMC network or management controller shows up that
+    way first.
+    """
+
+    minimum = 1
+    maximum = 50
+
+    # Queries that take longer than this are counted as slow.
+    slow = timedelta(seconds=10).total_seconds()
+
+    # Fractions of failed or slow queries below which the limit grows, and
+    # above which it shrinks.
+    grow_below = 0.1
+    shrink_above = 0.5
+
+    def __init__(self, limit):
+        super(PowerQueryLimiter, self).__init__()
+        self.limit = limit
+        self.running = 0
+        self.waiting = deque()
+        self._completed = 0
+        self._troubled = 0
+
+    def acquire(self):
+        """Return a `Deferred` that fires when a query may start."""
+        if self.running < self.limit:
+            self.running += 1
+            return succeed(None)
+        else:
+            d = Deferred()
+            self.waiting.append(d)
+            return d
+
+    def release(self, latency, failed):
+        """Note that a query has finished, and start others if allowed.
+
+        :param latency: How long the query took, in seconds.
+        :param failed: Whether the query failed.
+        """
+        self._completed += 1
+        if failed or latency > self.slow:
+            self._troubled += 1
+        if self._completed >= self.limit:
+            troubled = self._troubled / self._completed
+            if troubled < self.grow_below:
+                self.limit = min(self.maximum, self.limit + 1)
+            elif troubled > self.shrink_above:
+                self.limit = max(self.minimum, self.limit // 2)
+            self._completed = self._troubled = 0
+        self.running -= 1
+        while len(self.waiting) > 0 and self.running < self.limit:
+            self.running += 1
+            self.waiting.popleft().callback(None)
+
+
+class PowerSweep:
+    """Statistics for one sweep over the nodes the region hands out.
+
+    :ivar listed: The number of nodes the region handed out.
+    :ivar queried: The number of nodes whose power state was queried.
+    :ivar failed: The number of those queries that failed.
+    :ivar skipped: The number of nodes skipped because a power action was
+        already in progress.
+    :ivar longest_wait: The longest time, in seconds, that a node waited to
+        be queried after the region handed it out.
+    """
+
+    def __init__(self, started):
+        super(PowerSweep, self).__init__()
+        self.started = started
+        self.finished = None
+        self.listed = 0
+        self.queried = 0
+        self.failed = 0
+        self.skipped = 0
+        self.longest_wait = 0.0
+
+    @property
+    def coverage(self):
+        """The fraction of listed nodes that were successfully queried."""
+        if self.listed == 0:
+            return 1.0
+        else:
+            return (self.queried - self.failed) / self.listed
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+    def __str__(self):
+        return (
+            "%d nodes listed, %d queried, %d failed, %d skipped; "
+            "%.0f%% coverage in %.1f seconds; longest wait %.1f seconds" % (
+                self.listed, self.queried, self.failed, self.skipped,
+                self.coverage * 100, self.duration, self.longest_wait))
+
+
 class NodePowerMonitorService(TimerService, object):
-    """Service to monitor the power status of all nodes in this cluster."""
+    """Service to monitor the power status of all nodes in this cluster.
+
+    Nodes are queried as soon as a slot is free for their power type, and
+    the next batch is requested from the region while the current one is
+    still being queried, so that a sweep is not held up by round trips to
+    the region or by the slowest node in each batch.
+    """
 
     check_interval = timedelta(seconds=15).total_seconds()
+
+    # How many nodes of each power type to query at once, initially. See
+    # `PowerQueryLimiter` for how this changes.
     max_nodes_at_once = 5
 
     def __init__(self, clock=None):
@@ -41,6 +164,9 @@ class NodePowerMonitorService(TimerService, object):
         super(NodePowerMonitorService, self).__init__(
             self.check_interval, self.try_query_nodes)
         self.clock = clock
+        self.limiters = {}
+        self.last_sweep = None
+        self._backlog_waiters = []
 
     def try_query_nodes(self):
         """Attempt to query nodes' power states.
@@ -58,20 +184,105 @@ class NodePowerMonitorService(TimerService, object):
             d.addErrback(self.query_nodes_failed, client.localIdent)
             return d
 
+    def _get_clock(self):
+        return reactor if self.clock is None else self.clock
+
     @inlineCallbacks
     def query_nodes(self, client):
         # Get the nodes' power parameters from the region. Keep getting more
         # power parameters until the region returns an empty list.
-        while True:
-            response = yield client(
-                ListNodePowerParameters, uuid=client.localIdent)
-            power_parameters = response['nodes']
-            if len(power_parameters) > 0:
-                yield query_all_nodes(
-                    power_parameters, max_concurrency=self.max_nodes_at_once,
-                    clock=self.clock)
+        clock = self._get_clock()
+        sweep = PowerSweep(clock.seconds())
+        queries = []
+        try:
+            while True:
+                response = yield client(
+                    ListNodePowerParameters, uuid=client.localIdent)
+                power_parameters = response['nodes']
+                if len(power_parameters) > 0:
+                    sweep.listed += len(power_parameters)
+                    queries.extend(
+                        self.query_node(node, sweep)
+                        for node in power_parameters
+                        if node['power_type'] in PowerDriverRegistry)
+                    # Ask for more once few of these are still waiting, so
+                    # that the next batch arrives while the rest are queried.
+                    yield self.wait_for_backlog(self.max_nodes_at_once)
+                else:
+                    break
+        finally:
+            yield DeferredList(queries, consumeErrors=True)
+        sweep.finished = clock.seconds()
+        self.last_sweep = sweep
+        self.report_sweep(sweep)
+
+    def get_limiter(self, power_type):
+        """Return the `PowerQueryLimiter` for `power_type`."""
+        limiter = self.limiters.get(power_type)
+        if limiter is None:
+            limiter = self.limiters[power_type] = PowerQueryLimiter(
+                self.max_nodes_at_once)
+        return limiter
+
+    @property
+    def backlog(self):
+        """The number of nodes waiting for their turn to be queried."""
+        return sum(
+            len(limiter.waiting) for limiter in self.limiters.values())
+
+    def wait_for_backlog(self, size):
+        """Return a `Deferred` that fires once `backlog` is at most `size`."""
+        if self.backlog <= size:
+            return succeed(None)
+        else:
+            d = Deferred()
+            self._backlog_waiters.append((size, d))
+            return d
+
+    def _check_backlog(self):
+        backlog = self.backlog
+        waiters, self._backlog_waiters = self._backlog_waiters, []
+        for size, d in waiters:
+            if backlog <= size:
+                d.callback(None)
             else:
-                break
+                self._backlog_waiters.append((size, d))
+
+    @inlineCallbacks
+    def query_node(self, node, sweep):
+        """Query `node` once its power type has a free slot."""
+        clock = self._get_clock()
+        listed = clock.seconds()
+        limiter = self.get_limiter(node['power_type'])
+        yield limiter.acquire()
+        started = clock.seconds()
+        sweep.longest_wait = max(sweep.longest_wait, started - listed)
+        skipped = node['system_id'] in power_action_registry
+        power_state = None
+        try:
+            power_state = yield maybeDeferred(query_node, node, clock)
+        finally:
+            if skipped:
+                sweep.skipped += 1
+                failed = False
+            else:
+                sweep.queried += 1
+                # `query_node` reports and logs failures, returning None.
+                failed = power_state is None
+                if failed:
+                    sweep.failed += 1
+            limiter.release(clock.seconds() - started, failed)
+            self._check_backlog()
+
+    def report_sweep(self, sweep):
+        """Log how the sweep went; warn if it took longer than it should."""
+        if sweep.duration > self.check_interval:
+            maaslog.warning(
+                "Power state sweep took %.1f seconds, longer than the %.1f "
+                "second interval: %s", sweep.duration, self.check_interval,
+                sweep)
+        else:
+            log.debug("Power state sweep: {sweep}", sweep=sweep)
 
     def query_nodes_failed(self, failure, localIdent):
         if failure.check(NoSuchCluster):
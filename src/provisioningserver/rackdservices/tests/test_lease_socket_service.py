@@ -10,12 +10,16 @@ import os
 import socket
 import time
 from unittest.mock import (
+    call,
     MagicMock,
     sentinel,
 )
 
 from maastesting.factory import factory
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
 from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
@@ -25,7 +29,10 @@ from provisioningserver.rackdservices.lease_socket_service import (
     LeaseSocketService,
 )
 from provisioningserver.rpc import getRegionClient
-from provisioningserver.rpc.region import UpdateLease
+from provisioningserver.rpc.region import (
+    UpdateLease,
+    UpdateLeases,
+)
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
 from provisioningserver.utils.twisted import (
     DeferredValue,
@@ -33,6 +40,7 @@ from provisioningserver.utils.twisted import (
     retries,
 )
 from testtools.matchers import (
+    Equals,
     Not,
     PathExists,
 )
@@ -61,6 +69,22 @@ class TestLeaseSocketService(MAASTestCase):
         protocol, connecting = fixture.makeEventLoop(UpdateLease)
         return protocol, connecting
 
+    def patch_rpc_UpdateLeases(self):
+        fixture = self.useFixture(MockLiveClusterToRegionRPCFixture())
+        protocol, connecting = fixture.makeEventLoop(UpdateLease, UpdateLeases)
+        return protocol, connecting
+
+    def make_notification(self):
+        return {
+            "action": "commit",
+            "mac": factory.make_mac_address(),
+            "ip_family": "ipv4",
+            "ip": factory.make_ipv4_address(),
+            "timestamp": int(time.time()),
+            "lease_time": 30,
+            "hostname": factory.make_name("host"),
+        }
+
     def send_notification(self, socket_path, payload):
         conn = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
         conn.connect(socket_path)
@@ -128,16 +152,18 @@ class TestLeaseSocketService(MAASTestCase):
         self.assertEquals([packet], list(service.notifications))
 
     @defer.inlineCallbacks
-    def test_processNotification_gets_called_with_notification(self):
+    def test_processNotificationBatch_gets_called_with_notification(self):
         socket_path = self.patch_socket_path()
         service = LeaseSocketService(
             sentinel.service, reactor)
         dv = DeferredValue()
 
-        # Mock processNotifcation to catch the call.
-        def mock_processNotification(*args, **kwargs):
+        # Mock processNotificationBatch to catch the call.
+        def mock_processNotificationBatch(*args, **kwargs):
             dv.set(args)
-        self.patch(service, "processNotification", mock_processNotification)
+        self.patch(
+            service, "processNotificationBatch",
+            mock_processNotificationBatch)
 
         # Start the service and stop it at the end of the test.
         service.startService()
@@ -152,11 +178,11 @@ class TestLeaseSocketService(MAASTestCase):
         yield deferToThread(self.send_notification, socket_path, packet)
         yield dv.get(timeout=10)
 
-        # Packet should be the argument passed to processNotifcation
-        self.assertEquals((packet,), dv.value)
+        # Packet should be the argument passed to processNotificationBatch.
+        self.assertEquals(([packet],), dv.value)
 
     @defer.inlineCallbacks
-    def test_processNotification_gets_called_multiple_times(self):
+    def test_processNotificationBatch_gets_called_with_batches(self):
         socket_path = self.patch_socket_path()
         service = LeaseSocketService(
             sentinel.service, reactor)
@@ -165,13 +191,16 @@ class TestLeaseSocketService(MAASTestCase):
             DeferredValue(),
         ]
 
-        # Mock processNotifcation to catch the call.
-        def mock_processNotification(*args, **kwargs):
+        # Mock processNotificationBatch to catch the calls.
+        def mock_processNotificationBatch(*args, **kwargs):
             for dv in dvs:
                 if not dv.isSet:
                     dv.set(args)
                     break
-        self.patch(service, "processNotification", mock_processNotification)
+        self.patch(
+            service, "processNotificationBatch",
+            mock_processNotificationBatch)
+        service.batch_size = 1
 
         # Start the service and stop it at the end of the test.
         service.startService()
@@ -191,10 +220,10 @@ class TestLeaseSocketService(MAASTestCase):
         yield dvs[0].get(timeout=10)
         yield dvs[1].get(timeout=10)
 
-        # Packet should be the argument passed to processNotification in
-        # order.
-        self.assertEquals((packet1,), dvs[0].value)
-        self.assertEquals((packet2,), dvs[1].value)
+        # Packets should be passed to processNotificationBatch in batches
+        # no bigger than batch_size, in order.
+        self.assertEquals(([packet1],), dvs[0].value)
+        self.assertEquals(([packet2],), dvs[1].value)
 
     @defer.inlineCallbacks
     def test_processNotification_send_to_region(self):
@@ -230,3 +259,46 @@ class TestLeaseSocketService(MAASTestCase):
                 timestamp=packet["timestamp"],
                 lease_time=packet["lease_time"],
                 hostname=packet["hostname"]))
+
+    @defer.inlineCallbacks
+    def test_processNotificationBatch_send_to_region(self):
+        protocol, connecting = self.patch_rpc_UpdateLeases()
+        self.addCleanup((yield connecting))
+
+        client = getRegionClient()
+        rpc_service = MagicMock()
+        rpc_service.getClientNow.return_value = defer.succeed(client)
+        service = LeaseSocketService(
+            rpc_service, reactor)
+
+        # Notifications to region.
+        packets = [self.make_notification() for _ in range(3)]
+        yield service.processNotificationBatch(
+            [dict(packet) for packet in packets], clock=reactor)
+        self.assertThat(
+            protocol.UpdateLeases,
+            MockCalledOnceWith(
+                protocol, cluster_uuid=client.localIdent, updates=packets))
+        self.assertThat(protocol.UpdateLease, MockNotCalled())
+
+    @defer.inlineCallbacks
+    def test_processNotificationBatch_falls_back_to_UpdateLease(self):
+        # The region does not know about UpdateLeases.
+        protocol, connecting = self.patch_rpc_UpdateLease()
+        self.addCleanup((yield connecting))
+
+        client = getRegionClient()
+        rpc_service = MagicMock()
+        rpc_service.getClientNow.return_value = defer.succeed(client)
+        service = LeaseSocketService(
+            rpc_service, reactor)
+
+        # Notifications to region, sent one at a time by older regions.
+        packets = [self.make_notification() for _ in range(2)]
+        yield service.processNotificationBatch(
+            [dict(packet) for packet in packets], clock=reactor)
+        self.assertThat(
+            protocol.UpdateLease.call_args_list, Equals([
+                call(protocol, cluster_uuid=client.localIdent, **packet)
+                for packet in packets
+            ]))
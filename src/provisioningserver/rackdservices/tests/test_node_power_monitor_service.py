@@ -1,4 +1,4 @@
-# Copyright 2014-2016 Canonical Ltd.  This software is licensed under the
+# Copyright 2014-2018 Canonical Ltd.  This software is licensed under the
 # GNU Affero General Public License version 3 (see the file LICENSE).
 
 """Tests for
@@ -14,7 +14,10 @@ from unittest.mock import (
 
 from fixtures import FakeLogger
 from maastesting.factory import factory
-from maastesting.matchers import MockCalledOnceWith
+from maastesting.matchers import (
+    MockCalledOnceWith,
+    MockNotCalled,
+)
 from maastesting.testcase import (
     MAASTestCase,
     MAASTwistedRunTest,
@@ -34,6 +37,7 @@ from provisioningserver.rpc import (
 from provisioningserver.rpc.testing import MockClusterToRegionRPCFixture
 from testtools.matchers import MatchesStructure
 from twisted.internet.defer import (
+    Deferred,
     fail,
     succeed,
 )
@@ -73,18 +77,19 @@ class TestNodePowerMonitorService(MAASTestCase):
             proto_region.ListNodePowerParameters,
             MockCalledOnceWith(ANY, uuid=client.localIdent))
 
-    def test_query_nodes_calls_query_all_nodes(self):
-        service = self.make_monitor_service()
-        service.max_nodes_at_once = sentinel.max_nodes_at_once
-
-        example_power_parameters = {
+    def make_power_parameters(self, power_type="ipmi"):
+        return {
             "system_id": factory.make_UUID(),
             "hostname": factory.make_hostname(),
             "power_state": factory.make_name("power_state"),
-            "power_type": factory.make_name("power_type"),
+            "power_type": power_type,
             "context": {},
         }
 
+    def test_query_nodes_queries_each_node(self):
+        service = self.make_monitor_service()
+        example_power_parameters = self.make_power_parameters()
+
         rpc_fixture = self.useFixture(MockClusterToRegionRPCFixture())
         proto_region, io = rpc_fixture.makeEventLoop(
             region.ListNodePowerParameters)
@@ -93,18 +98,107 @@ class TestNodePowerMonitorService(MAASTestCase):
             succeed({"nodes": []}),
         ]
 
-        query_all_nodes = self.patch(npms, "query_all_nodes")
+        query_node = self.patch(npms, "query_node")
+        query_node.return_value = succeed("on")
 
         d = service.query_nodes(getRegionClient())
         io.flush()
 
         self.assertEqual(None, extract_result(d))
         self.assertThat(
-            query_all_nodes,
-            MockCalledOnceWith(
-                [example_power_parameters],
-                max_concurrency=sentinel.max_nodes_at_once,
-                clock=service.clock))
+            query_node, MockCalledOnceWith(
+                example_power_parameters, service.clock))
+        self.assertThat(service.last_sweep, MatchesStructure.byEquality(
+            listed=1, queried=1, failed=0, skipped=0, coverage=1.0))
+
+    def test_query_nodes_skips_unknown_power_types(self):
+        service = self.make_monitor_service()
+        client = Mock(side_effect=[
+            succeed({"nodes": [self.make_power_parameters("unknown")]}),
+            succeed({"nodes": []}),
+        ])
+        query_node = self.patch(npms, "query_node")
+
+        extract_result(service.query_nodes(client))
+
+        self.assertThat(query_node, MockNotCalled())
+        self.assertThat(service.last_sweep, MatchesStructure.byEquality(
+            listed=1, queried=0, coverage=0.0))
+
+    def test_query_nodes_asks_for_more_while_querying(self):
+        service = self.make_monitor_service()
+        service.max_nodes_at_once = 2
+        batches = [
+            [self.make_power_parameters() for _ in range(5)],
+            [self.make_power_parameters() for _ in range(5)],
+            [],
+        ]
+        client = Mock(side_effect=[
+            succeed({"nodes": batch}) for batch in batches])
+        queries = []
+
+        def query_node(node, clock):
+            queries.append(Deferred())
+            return queries[-1]
+
+        self.patch(npms, "query_node", query_node)
+
+        d = service.query_nodes(client)
+        # Two of the first batch are being queried, three wait.
+        self.assertEqual(2, len(queries))
+        self.assertEqual(1, client.call_count)
+        # Once few enough are waiting, the next batch is requested, before
+        # the first batch has finished.
+        queries[0].callback("on")
+        self.assertEqual(2, client.call_count)
+        self.assertEqual(3, len(queries))
+        # Everything gets queried eventually.
+        while not d.called:
+            [query] = [query for query in queries if not query.called][:1]
+            query.callback("off")
+        self.assertEqual(None, extract_result(d))
+        self.assertEqual(3, client.call_count)
+        self.assertEqual(10, len(queries))
+        self.assertThat(service.last_sweep, MatchesStructure.byEquality(
+            listed=10, queried=10, failed=0))
+
+    def test_query_nodes_counts_failures(self):
+        service = self.make_monitor_service()
+        client = Mock(side_effect=[
+            succeed({"nodes": [
+                self.make_power_parameters(),
+                self.make_power_parameters(),
+            ]}),
+            succeed({"nodes": []}),
+        ])
+        # `query_node` returns None when the query failed.
+        self.patch(npms, "query_node").side_effect = [
+            succeed(None), succeed("on")]
+
+        extract_result(service.query_nodes(client))
+
+        self.assertThat(service.last_sweep, MatchesStructure.byEquality(
+            listed=2, queried=2, failed=1, coverage=0.5))
+
+    def test_query_nodes_warns_when_sweep_overruns(self):
+        service = self.make_monitor_service()
+        query = Deferred()
+        client = Mock(side_effect=[
+            succeed({"nodes": [self.make_power_parameters()]}),
+            succeed({"nodes": []}),
+        ])
+        self.patch(npms, "query_node").return_value = query
+
+        d = service.query_nodes(client)
+        service.clock.advance(service.check_interval + 1)
+        with FakeLogger("maas") as maaslog:
+            query.callback("on")
+        self.assertEqual(None, extract_result(d))
+        self.assertDocTestMatches(
+            "Power state sweep took 16.0 seconds, longer than the 15.0 "
+            "second interval: 1 nodes listed, 1 queried, 0 failed, "
+            "0 skipped; 100% coverage in 16.0 seconds; longest wait "
+            "0.0 seconds", maaslog.output)
 
     def test_query_nodes_copes_with_NoSuchCluster(self):
         service = self.make_monitor_service()
@@ -156,3 +250,51 @@ class TestNodePowerMonitorService(MAASTestCase):
             "Failed to query nodes' power status: "
             "Such a shame I can't divide by zero",
             maaslog.output)
+
+
+class TestPowerQueryLimiter(MAASTestCase):
+    """Tests for `PowerQueryLimiter`."""
+
+    def test_starts_queries_up_to_the_limit(self):
+        limiter = npms.PowerQueryLimiter(2)
+        acquired = [limiter.acquire() for _ in range(3)]
+        self.assertEqual([True, True, False], [d.called for d in acquired])
+        limiter.release(1.0, False)
+        self.assertTrue(acquired[2].called)
+        self.assertEqual(2, limiter.running)
+
+    def test_grows_when_queries_go_well(self):
+        limiter = npms.PowerQueryLimiter(2)
+        for _ in range(2):
+            limiter.acquire()
+        for _ in range(2):
+            limiter.release(1.0, False)
+        self.assertEqual(3, limiter.limit)
+
+    def test_shrinks_when_queries_fail(self):
+        limiter = npms.PowerQueryLimiter(8)
+        for _ in range(8):
+            limiter.acquire()
+        for _ in range(8):
+            limiter.release(1.0, True)
+        self.assertEqual(4, limiter.limit)
+
+    def test_shrinks_when_queries_are_slow(self):
+        limiter = npms.PowerQueryLimiter(2)
+        for _ in range(2):
+            limiter.acquire()
+        for _ in range(2):
+            limiter.release(limiter.slow + 1, False)
+        self.assertEqual(1, limiter.limit)
+
+    def test_stays_within_bounds(self):
+        limiter = npms.PowerQueryLimiter(1)
+        limiter.acquire()
+        limiter.release(1.0, True)
+        self.assertEqual(limiter.minimum, limiter.limit)
+        limiter = npms.PowerQueryLimiter(limiter.maximum)
+        for _ in range(limiter.maximum):
+            limiter.acquire()
+        for _ in range(limiter.maximum):
+            limiter.release(1.0, False)
+        self.assertEqual(limiter.maximum, limiter.limit)
@@ -48,6 +48,9 @@ from provisioningserver.rackdservices.tftp import (
     TFTPService,
     UDPServer,
 )
+from provisioningserver.rpc import boot_images as boot_images_module
+from provisioningserver.rpc.boot_config import BootConfigCache
+from provisioningserver.rpc.boot_images import index_boot_images
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import GetBootConfig
 from provisioningserver.testing.boot_images import (
@@ -62,9 +65,11 @@ from testtools.matchers import (
     AllMatch,
     Equals,
     HasLength,
+    Is,
     IsInstance,
     MatchesAll,
     MatchesStructure,
+    Not,
 )
 from tftp.backend import IReader
 from tftp.errors import (
@@ -90,6 +95,14 @@ from twisted.python import context
 from zope.interface.verify import verifyObject
 
 
+def patch_boot_images(testcase, images):
+    """Make `images` the rack's cached boot images for `testcase`."""
+    testcase.patch(boot_images_module, "CACHED_BOOT_IMAGES", images)
+    testcase.patch(
+        boot_images_module, "CACHED_BOOT_IMAGE_INDEX",
+        index_boot_images(images))
+
+
 class TestGetBootImage(MAASTestCase):
     """Tests for `get_boot_image`."""
 
@@ -116,7 +129,7 @@ class TestGetBootImage(MAASTestCase):
         return images, return_image
 
     def patch_list_boot_images(self, images):
-        self.patch(tftp_module, "list_boot_images").return_value = images
+        patch_boot_images(self, images)
 
     def get_params_from_boot_image(self, image):
         return {
@@ -217,6 +230,7 @@ class TestTFTPBackend(MAASTestCase):
         from provisioningserver import boot
         self.patch(boot, "find_mac_via_arp")
         self.patch(tftp_module, 'log_request')
+        self.patch(tftp_module, 'boot_config_cache', BootConfigCache())
 
     def test_init(self):
         temp_dir = self.make_dir()
@@ -377,7 +391,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the cached boot images so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -388,7 +402,7 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        patch_boot_images(self, [boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -448,7 +462,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the cached boot images so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -459,7 +473,7 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        patch_boot_images(self, [boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -522,7 +536,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the cached boot images so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -533,7 +547,7 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        patch_boot_images(self, [boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -600,7 +614,7 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters()
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the cached boot images so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -611,7 +625,7 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        patch_boot_images(self, [boot_image])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -698,8 +712,8 @@ class TestTFTPBackend(MAASTestCase):
         fake_kernel_params = make_kernel_parameters(label='no-such-image')
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so no images exist.
-        self.patch(tftp_module, "list_boot_images").return_value = []
+        # Stub the cached boot images so no images exist.
+        patch_boot_images(self, [])
         del fake_params["label"]
 
         # Stub RPC call to return the fake configuration parameters.
@@ -744,7 +758,7 @@ class TestTFTPBackend(MAASTestCase):
             purpose="local", label="local", osystem="caringo")
         fake_params = fake_kernel_params._asdict()
 
-        # Stub the output of list_boot_images so the label is set in the
+        # Stub the cached boot images so the label is set in the
         # kernel parameters.
         boot_image = {
             "osystem": fake_params["osystem"],
@@ -755,7 +769,7 @@ class TestTFTPBackend(MAASTestCase):
             "supported_subarches": "",
             "label": fake_params["label"],
         }
-        self.patch(tftp_module, "list_boot_images").return_value = [boot_image]
+        patch_boot_images(self, [boot_image])
 
         del fake_params["label"]
 
@@ -847,6 +861,61 @@ class TestTFTPBackend(MAASTestCase):
             backend.fetcher, MockCalledOnceWith(
                 client, GetBootConfig, **params_okay))
 
+    def make_boot_config_backend(self):
+        params = {
+            name.decode("ascii"): factory.make_name("value")
+            for name, _ in GetBootConfig.arguments
+        }
+        client = Mock()
+        client.localIdent = params["system_id"]
+        client_service = Mock()
+        client_service.getClientNow.return_value = succeed(client)
+        backend = TFTPBackend(self.make_dir(), client_service)
+        backend.fetcher = Mock()
+        backend.get_boot_image = Mock(
+            side_effect=lambda data, client, remote_ip: data)
+        self.patch(tftp_module, "KernelParameters", dict)
+        return backend, params
+
+    @inlineCallbacks
+    def test_get_kernel_params_caches_boot_config(self):
+        backend, params = self.make_boot_config_backend()
+        config = {"osystem": factory.make_name("osystem")}
+        backend.fetcher.return_value = succeed(config)
+
+        first = yield backend.get_kernel_params(params)
+        second = yield backend.get_kernel_params(params)
+
+        self.expectThat(backend.fetcher, MockCalledOnceWith(
+            ANY, GetBootConfig, **params))
+        self.expectThat(first, Equals(config))
+        self.expectThat(second, Equals(config))
+        self.expectThat(second, Not(Is(first)))
+
+    @inlineCallbacks
+    def test_get_kernel_params_refetches_invalidated_boot_config(self):
+        backend, params = self.make_boot_config_backend()
+        backend.fetcher.return_value = succeed({})
+
+        yield backend.get_kernel_params(params)
+        backend.boot_configs.invalidate([params["mac"]])
+        yield backend.get_kernel_params(params)
+
+        self.assertThat(backend.fetcher.call_count, Equals(2))
+
+    @inlineCallbacks
+    def test_get_kernel_params_caches_no_response(self):
+        backend, params = self.make_boot_config_backend()
+        backend.fetcher.return_value = fail(BootConfigNoResponse())
+
+        with ExpectedException(BootConfigNoResponse):
+            yield backend.get_kernel_params(params)
+        with ExpectedException(BootConfigNoResponse):
+            yield backend.get_kernel_params(params)
+
+        self.assertThat(backend.fetcher, MockCalledOnceWith(
+            ANY, GetBootConfig, **params))
+
 
 class TestTFTPService(MAASTestCase):
 
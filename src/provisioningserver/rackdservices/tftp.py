@@ -27,7 +27,8 @@ from provisioningserver.logger import (
     get_maas_logger,
     LegacyLogger,
 )
-from provisioningserver.rpc.boot_images import list_boot_images
+from provisioningserver.rpc.boot_config import boot_config_cache
+from provisioningserver.rpc.boot_images import find_boot_image
 from provisioningserver.rpc.exceptions import BootConfigNoResponse
 from provisioningserver.rpc.region import (
     GetBootConfig,
@@ -61,6 +62,7 @@ from twisted.internet.address import (
     IPv6Address,
 )
 from twisted.internet.defer import (
+    fail,
     inlineCallbacks,
     maybeDeferred,
     returnValue,
@@ -81,32 +83,9 @@ def get_boot_image(params):
     if purpose == "enlist":
         purpose = "commissioning"
 
-    # Get the matching boot images, minus subarchitecture.
-    boot_images = list_boot_images()
-    boot_images = [
-        image
-        for image in boot_images
-        if (image['osystem'] == params['osystem'] and
-            image['release'] == params['release'] and
-            image['architecture'] == params['arch'] and
-            image['purpose'] == purpose)
-    ]
-
-    # See if exact subarchitecture match.
-    for image in boot_images:
-        if image["subarchitecture"] == params["subarch"]:
-            return image
-
-    # Not exact match check if subarchitecture is in the supported
-    # subarchitectures list.
-    for image in boot_images:
-        subarches = image.get("supported_subarches", "")
-        subarches = subarches.split(",")
-        if params["subarch"] in subarches:
-            return image
-
-    # No matching boot image was found.
-    return None
+    return find_boot_image(
+        params["osystem"], params["release"], params["arch"],
+        params["subarch"], purpose)
 
 
 def log_request(file_name, clock=reactor):
@@ -166,6 +145,7 @@ class TFTPBackend(FilesystemSynchronousBackend):
         self.client_to_remote = {}
         self.client_service = client_service
         self.fetcher = RPCFetcher()
+        self.boot_configs = boot_config_cache
 
     def _get_new_client_for_remote(self, remote_ip):
         """Return a new client for the `remote_ip`.
@@ -292,7 +272,15 @@ class TFTPBackend(FilesystemSynchronousBackend):
 
         def fetch(client, params):
             params["system_id"] = client.localIdent
-            d = self.fetcher(client, GetBootConfig, **params)
+            try:
+                d = succeed(self.boot_configs.get(params))
+            except KeyError:
+                d = self.fetcher(client, GetBootConfig, **params)
+                d.addCallbacks(
+                    self.boot_config_fetched, self.boot_config_unavailable,
+                    callbackArgs=(params,), errbackArgs=(params,))
+            except BootConfigNoResponse:
+                d = fail()
             d.addCallback(self.get_boot_image, client, params['remote_ip'])
             d.addCallback(lambda data: KernelParameters(**data))
             return d
@@ -301,6 +289,17 @@ class TFTPBackend(FilesystemSynchronousBackend):
         d.addCallback(fetch, params)
         return d
 
+    def boot_config_fetched(self, data, params):
+        """Cache the boot configuration `data` obtained for `params`."""
+        self.boot_configs.set(params, data)
+        return dict(data)
+
+    def boot_config_unavailable(self, failure, params):
+        """Cache that the region declined to respond for `params`."""
+        failure.trap(BootConfigNoResponse)
+        self.boot_configs.set(params, None)
+        return failure
+
     @deferred
     def get_boot_method_reader(self, boot_method, params):
         """Return an `IReader` for a boot method.
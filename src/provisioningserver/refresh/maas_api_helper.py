@@ -10,7 +10,11 @@ __all__ = [
     ]
 
 from collections import OrderedDict
-from email.utils import parsedate
+from email.utils import (
+    mktime_tz,
+    parsedate,
+    parsedate_tz,
+)
 import json
 import mimetypes
 import os
@@ -69,6 +73,25 @@ def warn(msg):
     sys.stderr.write(msg + "\n")
 
 
+def get_retry_after(headers, default):
+    """Return the seconds to wait before retrying, from a Retry-After header.
+
+    The header can give a number of seconds or an HTTP date. `default` is
+    returned if it's missing or can't be understood.
+    """
+    retry_after = headers.get('retry-after')
+    if retry_after is None:
+        return default
+    try:
+        return max(0, int(retry_after))
+    except ValueError:
+        pass
+    date = parsedate_tz(retry_after)
+    if date is None:
+        return default
+    return max(0, mktime_tz(date) - time.time())
+
+
 def geturl(url, creds, headers=None, data=None):
     # Takes a dict of creds to be passed through to oauth_headers,
     #   so it should have consumer_key, token_key, ...
@@ -87,6 +110,9 @@ def geturl(url, creds, headers=None, data=None):
             return urllib.request.urlopen(req)
         except urllib.error.HTTPError as exc:
             error = exc
+            if exc.code == 503:
+                # MAAS is too busy; wait for as long as it asks.
+                naptime = get_retry_after(exc.headers, naptime)
             if 'date' not in exc.headers:
                 warn("date field not in %d headers" % exc.code)
                 pass
@@ -101,6 +127,9 @@ def geturl(url, creds, headers=None, data=None):
         except Exception as exc:
             error = exc
 
+        # Add jitter so that many nodes failing at the same moment, or asked
+        # to retry after the same time, do not all come back together.
+        naptime += random.uniform(0, naptime / 2)
         warn("request to %s failed. sleeping %d.: %s" % (url, naptime, error))
         time.sleep(naptime)
 
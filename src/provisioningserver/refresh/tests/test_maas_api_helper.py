@@ -18,7 +18,10 @@ from subprocess import (
     TimeoutExpired,
 )
 import time
-from unittest.mock import MagicMock
+from unittest.mock import (
+    MagicMock,
+    sentinel,
+)
 import urllib
 
 from lxml import etree
@@ -107,7 +110,10 @@ class TestHeaders(MAASTestCase):
 class MAASMockHTTPHandler(urllib.request.HTTPHandler):
 
     def http_open(self, req):
-        if 'broken_with_date' in req.get_full_url():
+        if 'busy' in req.get_full_url():
+            code = 503
+            headers = {'retry-after': '10'}
+        elif 'broken_with_date' in req.get_full_url():
             code = random.choice([401, 403])
             headers = {'date': formatdate()}
         elif 'broken' in req.get_full_url():
@@ -160,6 +166,59 @@ class TestGetUrl(MAASTestCase):
         ]
         self.assertEquals(14, len(clock_shew_updates))
 
+    def test_geturl_adds_jitter_to_backoff(self):
+        sleep = self.patch(maas_api_helper.time, 'sleep')
+        self.patch(maas_api_helper, 'warn')
+        self.assertRaises(
+            urllib.error.HTTPError,
+            maas_api_helper.geturl,
+            "http://%s-broken" % factory.make_hostname(),
+            {})
+        for (naptime,), _ in sleep.call_args_list:
+            self.assertThat(naptime, GreaterThanOrEqual(1))
+        self.assertThat(
+            sleep.call_args_list[-1][0][0],
+            MatchesAll(GreaterThanOrEqual(32), LessThanOrEqual(48)))
+
+    def test_geturl_honours_retry_after_when_busy(self):
+        sleep = self.patch(maas_api_helper.time, 'sleep')
+        self.patch(maas_api_helper, 'warn')
+        self.assertRaises(
+            urllib.error.HTTPError,
+            maas_api_helper.geturl,
+            "http://%s-busy" % factory.make_hostname(),
+            {})
+        self.assertEquals(7, sleep.call_count)
+        for (naptime,), _ in sleep.call_args_list:
+            self.assertThat(
+                naptime,
+                MatchesAll(GreaterThanOrEqual(10), LessThanOrEqual(15)))
+
+
+class TestGetRetryAfter(MAASTestCase):
+
+    def test_returns_default_when_missing(self):
+        self.assertEqual(
+            sentinel.default,
+            maas_api_helper.get_retry_after({}, sentinel.default))
+
+    def test_returns_seconds(self):
+        self.assertEqual(
+            30, maas_api_helper.get_retry_after(
+                {'retry-after': '30'}, sentinel.default))
+
+    def test_returns_seconds_until_date(self):
+        retry_after = formatdate(time.time() + 60)
+        self.assertThat(
+            maas_api_helper.get_retry_after(
+                {'retry-after': retry_after}, sentinel.default),
+            MatchesAll(GreaterThanOrEqual(50), LessThanOrEqual(60)))
+
+    def test_returns_default_when_invalid(self):
+        self.assertEqual(
+            sentinel.default, maas_api_helper.get_retry_after(
+                {'retry-after': factory.make_name('junk')}, sentinel.default))
+
 
 class TestEncode(MAASTestCase):
 
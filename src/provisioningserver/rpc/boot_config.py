@@ -0,0 +1,148 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Rack-side cache of boot configurations obtained from the region."""
+
+__all__ = [
+    "BootConfigCache",
+    "boot_config_cache",
+    ]
+
+from collections import defaultdict
+
+from provisioningserver.rpc.exceptions import BootConfigNoResponse
+from twisted.internet import reactor
+
+
+def normalise_identifier(identifier):
+    """Normalise a MAC address or hardware UUID for use in the cache.
+
+    Boot methods report MAC addresses separated by either colons or hyphens,
+    and the region reports them separated by colons. Hardware UUIDs pass
+    through the same transformation, so they still compare consistently.
+    """
+    return identifier.lower().replace("-", ":")
+
+
+class BootConfigCache:
+    """A short-lived cache of `GetBootConfig` responses.
+
+    Booting machines ask for their configuration at several paths in quick
+    succession, and a powered-on rack of machines asks for the same thing
+    many times over. Responses -- including the region declining to respond
+    -- are kept for `ttl` seconds so that these requests do not each become
+    a region transaction.
+
+    The region tells the rack when a machine's boot configuration may have
+    changed, at which point the entries for that machine's MAC addresses and
+    hardware UUID are discarded; see `invalidate`.
+    """
+
+    # Parameters to `GetBootConfig` that select the configuration returned.
+    key_names = (
+        "mac",
+        "hardware_uuid",
+        "arch",
+        "subarch",
+        "local_ip",
+        "remote_ip",
+        "bios_boot_method",
+    )
+
+    def __init__(self, ttl=30, clock=reactor):
+        super(BootConfigCache, self).__init__()
+        self.ttl = ttl
+        self.clock = clock
+        # Maps keys to (expiry time, response or `None`).
+        self.entries = {}
+        # Maps MAC addresses and hardware UUIDs to keys.
+        self.identifiers = defaultdict(set)
+        self.pruned = clock.seconds()
+
+    def make_key(self, params):
+        """Return the cache key for the `GetBootConfig` `params`."""
+        return tuple(params.get(name) for name in self.key_names)
+
+    def get(self, params):
+        """Return the cached response for `params`.
+
+        A copy of the response is returned because callers fill it in with
+        further details about the boot.
+
+        :raise KeyError: When nothing is cached or the entry has expired.
+        :raise BootConfigNoResponse: When the region declined to respond.
+        """
+        key = self.make_key(params)
+        expires, response = self.entries[key]
+        if expires <= self.clock.seconds():
+            self._discard(key)
+            raise KeyError(key)
+        elif response is None:
+            raise BootConfigNoResponse()
+        else:
+            return dict(response)
+
+    def set(self, params, response):
+        """Cache `response` for `params`.
+
+        :param response: The `GetBootConfig` response, or `None` if the region
+            declined to respond.
+        """
+        now = self.clock.seconds()
+        if now - self.pruned >= self.ttl:
+            self._prune(now)
+        key = self.make_key(params)
+        if response is not None:
+            response = dict(response)
+        self.entries[key] = now + self.ttl, response
+        for identifier in self._get_identifiers(key):
+            self.identifiers[identifier].add(key)
+
+    def invalidate(self, identifiers=None):
+        """Discard cached responses.
+
+        :param identifiers: MAC addresses and hardware UUIDs of machines whose
+            configurations have changed, or `None` to discard everything.
+        """
+        if identifiers is None:
+            self.entries.clear()
+            self.identifiers.clear()
+        else:
+            for identifier in identifiers:
+                identifier = normalise_identifier(identifier)
+                for key in self.identifiers.pop(identifier, ()):
+                    self._discard(key)
+
+    def _get_identifiers(self, key):
+        """Return the MAC address and hardware UUID in `key`."""
+        params = dict(zip(self.key_names, key))
+        return {
+            normalise_identifier(identifier)
+            for identifier in (params["mac"], params["hardware_uuid"])
+            if identifier
+        }
+
+    def _prune(self, now):
+        """Remove expired entries from the cache."""
+        expired = [
+            key for key, (expires, _) in self.entries.items()
+            if expires <= now
+        ]
+        for key in expired:
+            self._discard(key)
+        self.pruned = now
+
+    def _discard(self, key):
+        """Remove `key` from the cache."""
+        self.entries.pop(key, None)
+        for identifier in self._get_identifiers(key):
+            keys = self.identifiers.get(identifier)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self.identifiers[identifier]
+
+
+# The boot configurations cached by this rack controller. The region
+# invalidates entries through the `InvalidateBootConfig` RPC call.
+boot_config_cache = BootConfigCache()
@@ -4,6 +4,7 @@
 """RPC relating to boot images."""
 
 __all__ = [
+    "find_boot_image",
     "import_boot_images",
     "list_boot_images",
     "is_import_boot_images_running",
@@ -35,6 +36,46 @@ log = LegacyLogger()
 
 
 CACHED_BOOT_IMAGES = None
+CACHED_BOOT_IMAGE_INDEX = None
+
+
+def index_boot_images(images):
+    """Index `images` for lookup by `find_boot_image`.
+
+    The index maps `(osystem, release, architecture, purpose)` to a mapping
+    of subarchitecture to image. Exact subarchitecture matches take
+    precedence over matches through `supported_subarches`, and the first
+    image in `images` wins for each subarchitecture, mirroring a linear
+    search over `images`.
+    """
+    index = {}
+    for image in images:
+        key = (
+            image["osystem"], image["release"],
+            image["architecture"], image["purpose"])
+        subarches = index.setdefault(key, {})
+        subarches.setdefault(image["subarchitecture"], image)
+    for image in images:
+        key = (
+            image["osystem"], image["release"],
+            image["architecture"], image["purpose"])
+        subarches = index[key]
+        for subarch in image.get("supported_subarches", "").split(","):
+            subarches.setdefault(subarch, image)
+    return index
+
+
+def _cache_boot_images(images):
+    """Cache `images` and their index.
+
+    The index is built before either global is replaced, and lookups only
+    ever read `CACHED_BOOT_IMAGE_INDEX`, so a reload in a thread never
+    exposes a partially built index to the reactor.
+    """
+    global CACHED_BOOT_IMAGES, CACHED_BOOT_IMAGE_INDEX
+    index = index_boot_images(images)
+    CACHED_BOOT_IMAGES = images
+    CACHED_BOOT_IMAGE_INDEX = index
 
 
 def list_boot_images():
@@ -44,22 +85,39 @@ def list_boot_images():
     of IO, as this function is called often. To update the cache call
     `reload_boot_images`.
     """
-
-    global CACHED_BOOT_IMAGES
     if CACHED_BOOT_IMAGES is None:
         with ClusterConfiguration.open() as config:
             tftp_root = config.tftp_root
-        CACHED_BOOT_IMAGES = tftppath.list_boot_images(tftp_root)
+        _cache_boot_images(tftppath.list_boot_images(tftp_root))
     return CACHED_BOOT_IMAGES
 
 
 def reload_boot_images():
     """Update the cached boot images so `list_boot_images` returns the
     most up-to-date boot images list."""
-    global CACHED_BOOT_IMAGES
     with ClusterConfiguration.open() as config:
         tftp_root = config.tftp_root
-    CACHED_BOOT_IMAGES = tftppath.list_boot_images(tftp_root)
+    _cache_boot_images(tftppath.list_boot_images(tftp_root))
+
+
+def find_boot_image(osystem, release, arch, subarch, purpose):
+    """Find the cached boot image matching the given parameters.
+
+    An image whose subarchitecture is `subarch` is preferred, otherwise an
+    image listing `subarch` in its supported subarchitectures is returned.
+
+    :return: The image, as returned by `list_boot_images`, or `None`.
+    """
+    global CACHED_BOOT_IMAGE_INDEX
+    index = CACHED_BOOT_IMAGE_INDEX
+    if index is None:
+        index = CACHED_BOOT_IMAGE_INDEX = index_boot_images(
+            list_boot_images())
+    subarches = index.get((osystem, release, arch, purpose))
+    if subarches is None:
+        return None
+    else:
+        return subarches.get(subarch)
 
 
 def get_hosts_from_sources(sources):
@@ -18,6 +18,7 @@ __all__ = [
     "DescribeNOSTypes",
     "GetPreseedData",
     "Identify",
+    "InvalidateBootConfig",
     "ListBootImages",
     "ListOperatingSystems",
     "ListSupportedArchitectures",
@@ -576,6 +577,21 @@ class EvaluateTag(amp.Command):
     errors = []
 
 
+class InvalidateBootConfig(amp.Command):
+    """Discard boot configurations cached by the rack controller.
+
+    :since: 2.5
+    """
+
+    arguments = [
+        # MAC addresses and hardware UUIDs of the machines whose boot
+        # configurations have changed. When omitted, all are discarded.
+        (b"identifiers", amp.ListOf(amp.Unicode(), optional=True)),
+    ]
+    response = []
+    errors = []
+
+
 class IsImportBootImagesRunning(amp.Command):
     """Check if the import boot images task is running on the cluster.
 
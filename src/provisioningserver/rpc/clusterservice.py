@@ -58,6 +58,7 @@ from provisioningserver.rpc import (
     pods,
     region,
 )
+from provisioningserver.rpc.boot_config import boot_config_cache
 from provisioningserver.rpc.boot_images import (
     import_boot_images,
     is_import_boot_images_running,
@@ -309,6 +310,16 @@ class Cluster(RPCProtocol):
             https_proxy=get_proxy_url(https_proxy))
         return {}
 
+    @cluster.InvalidateBootConfig.responder
+    def invalidate_boot_config(self, identifiers=None):
+        """invalidate_boot_config()
+
+        Implementation of
+        :py:class:`~provisioningserver.rpc.cluster.InvalidateBootConfig`.
+        """
+        boot_config_cache.invalidate(identifiers)
+        return {}
+
     @cluster.IsImportBootImagesRunning.responder
     def is_import_boot_images_running(self):
         """is_import_boot_images_running()
@@ -33,6 +33,7 @@ __all__ = [
     "SendEventMACAddress",
     "UpdateInterfaces",
     "UpdateLastImageSync",
+    "UpdateLeases",
     "UpdateNodePowerState",
 ]
 
@@ -480,6 +481,9 @@ class CommissionNode(amp.Command):
 class UpdateInterfaces(amp.Command):
     """Called by a rack controller to update its interface definition.
 
+    The optional fingerprint of the interfaces is that calculated by
+    `get_interfaces_fingerprint`.
+
     :since: 2.0
     """
 
@@ -487,6 +491,7 @@ class UpdateInterfaces(amp.Command):
         (b'system_id', amp.Unicode()),
         (b'interfaces', StructureAsJSON()),
         (b'topology_hints', StructureAsJSON(optional=True)),
+        (b'fingerprint', amp.Unicode(optional=True)),
     ]
     response = []
     errors = []
@@ -555,6 +560,31 @@ class UpdateLease(amp.Command):
     }
 
 
+class UpdateLeases(amp.Command):
+    """Report many DHCP lease updates from a cluster at once.
+
+    Each update carries the same information as an `UpdateLease` call. The
+    region applies them in the order given.
+
+    :since: 2.5
+    """
+    arguments = [
+        (b"cluster_uuid", amp.Unicode()),
+        (b"updates", AmpList(
+            [(b"action", amp.Unicode()),
+             (b"mac", amp.Unicode()),
+             (b"ip_family", amp.Unicode()),
+             (b"ip", amp.Unicode()),
+             (b"timestamp", amp.Integer()),
+             (b"lease_time", amp.Integer(optional=True)),
+             (b"hostname", amp.Unicode(optional=True))])),
+    ]
+    response = []
+    errors = {
+        NoSuchCluster: b"NoSuchCluster",
+    }
+
+
 class UpdateServices(amp.Command):
     """Report service statuses that are monitored on the rackd.
 
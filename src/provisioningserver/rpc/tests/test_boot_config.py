@@ -0,0 +1,113 @@
+# Copyright 2018 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for :py:module:`~provisioningserver.rpc.boot_config`."""
+
+__all__ = []
+
+from maastesting.factory import factory
+from maastesting.testcase import MAASTestCase
+from provisioningserver.rpc.boot_config import BootConfigCache
+from provisioningserver.rpc.exceptions import BootConfigNoResponse
+from testtools import ExpectedException
+from testtools.matchers import (
+    Equals,
+    Is,
+    Not,
+)
+from twisted.internet.task import Clock
+
+
+def make_params(**params):
+    defaults = {
+        "system_id": factory.make_name("system_id"),
+        "mac": factory.make_mac_address(),
+        "hardware_uuid": factory.make_UUID(),
+        "arch": factory.make_name("arch"),
+        "subarch": factory.make_name("subarch"),
+        "local_ip": factory.make_ipv4_address(),
+        "remote_ip": factory.make_ipv4_address(),
+        "bios_boot_method": factory.make_name("bios"),
+    }
+    defaults.update(params)
+    return defaults
+
+
+class TestBootConfigCache(MAASTestCase):
+
+    def make_cache(self, ttl=30):
+        clock = Clock()
+        return BootConfigCache(ttl=ttl, clock=clock), clock
+
+    def test_get_raises_KeyError_when_not_cached(self):
+        cache, _ = self.make_cache()
+        self.assertRaises(KeyError, cache.get, make_params())
+
+    def test_get_returns_copy_of_cached_response(self):
+        cache, _ = self.make_cache()
+        params = make_params()
+        response = {"osystem": factory.make_name("osystem")}
+        cache.set(params, response)
+        cached = cache.get(params)
+        self.expectThat(cached, Equals(response))
+        self.expectThat(cached, Not(Is(response)))
+
+    def test_get_ignores_system_id(self):
+        cache, _ = self.make_cache()
+        params = make_params()
+        response = {"osystem": factory.make_name("osystem")}
+        cache.set(params, response)
+        params["system_id"] = factory.make_name("system_id")
+        self.assertThat(cache.get(params), Equals(response))
+
+    def test_get_raises_BootConfigNoResponse_when_region_declined(self):
+        cache, _ = self.make_cache()
+        params = make_params()
+        cache.set(params, None)
+        with ExpectedException(BootConfigNoResponse):
+            cache.get(params)
+
+    def test_get_raises_KeyError_when_expired(self):
+        cache, clock = self.make_cache(ttl=10)
+        params = make_params()
+        cache.set(params, {})
+        clock.advance(10)
+        self.assertRaises(KeyError, cache.get, params)
+        self.assertThat(cache.entries, Equals({}))
+        self.assertThat(cache.identifiers, Equals({}))
+
+    def test_set_prunes_expired_entries(self):
+        cache, clock = self.make_cache(ttl=10)
+        old_params = make_params()
+        cache.set(old_params, {})
+        clock.advance(10)
+        new_params = make_params()
+        cache.set(new_params, {})
+        self.assertThat(
+            list(cache.entries), Equals([cache.make_key(new_params)]))
+
+    def test_invalidate_discards_entries_for_mac(self):
+        cache, _ = self.make_cache()
+        params = make_params(mac="AA-BB-CC-DD-EE-FF")
+        other_params = make_params()
+        cache.set(params, {})
+        cache.set(other_params, {})
+        cache.invalidate(["aa:bb:cc:dd:ee:ff"])
+        self.assertRaises(KeyError, cache.get, params)
+        self.assertThat(cache.get(other_params), Equals({}))
+
+    def test_invalidate_discards_entries_for_hardware_uuid(self):
+        cache, _ = self.make_cache()
+        params = make_params(mac=None)
+        cache.set(params, {})
+        cache.invalidate([params["hardware_uuid"].upper()])
+        self.assertRaises(KeyError, cache.get, params)
+        self.assertThat(cache.identifiers, Equals({}))
+
+    def test_invalidate_discards_everything_without_identifiers(self):
+        cache, _ = self.make_cache()
+        for _ in range(3):
+            cache.set(make_params(), {})
+        cache.invalidate()
+        self.assertThat(cache.entries, Equals({}))
+        self.assertThat(cache.identifiers, Equals({}))
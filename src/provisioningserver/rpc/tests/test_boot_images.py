@@ -31,15 +31,21 @@ from provisioningserver.rpc import (
 )
 from provisioningserver.rpc.boot_images import (
     _run_import,
+    find_boot_image,
     fix_sources_for_cluster,
     get_hosts_from_sources,
     import_boot_images,
+    index_boot_images,
     is_import_boot_images_running,
     list_boot_images,
     reload_boot_images,
 )
 from provisioningserver.rpc.region import UpdateLastImageSync
 from provisioningserver.rpc.testing import MockLiveClusterToRegionRPCFixture
+from provisioningserver.testing.boot_images import (
+    make_boot_image_params,
+    make_image,
+)
 from provisioningserver.testing.config import (
     BootSourcesFixture,
     ClusterConfigurationFixture,
@@ -82,6 +88,7 @@ class TestListBootImages(MAASTestCase):
 
     def test__calls_list_boot_images_with_boot_resource_storage(self):
         self.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
         mock_list_boot_images = self.patch(tftppath, 'list_boot_images')
         list_boot_images()
         self.assertThat(
@@ -90,6 +97,7 @@ class TestListBootImages(MAASTestCase):
 
     def test__calls_list_boot_images_when_cache_is_None(self):
         self.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
         mock_list_boot_images = self.patch(tftppath, 'list_boot_images')
         list_boot_images()
         self.assertThat(
@@ -111,13 +119,116 @@ class TestReloadBootImages(MAASTestCase):
     def test__sets_CACHED_BOOT_IMAGES(self):
         self.patch(
             boot_images, 'CACHED_BOOT_IMAGES', factory.make_name('old_cache'))
-        fake_boot_images = [factory.make_name('image') for _ in range(3)]
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
+        fake_boot_images = [
+            make_image(make_boot_image_params(), "install")
+            for _ in range(3)
+        ]
         mock_list_boot_images = self.patch(tftppath, 'list_boot_images')
         mock_list_boot_images.return_value = fake_boot_images
         reload_boot_images()
         self.assertEqual(
             boot_images.CACHED_BOOT_IMAGES, fake_boot_images)
 
+    def test__sets_CACHED_BOOT_IMAGE_INDEX(self):
+        self.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
+        fake_boot_images = [
+            make_image(make_boot_image_params(), "install")
+            for _ in range(3)
+        ]
+        mock_list_boot_images = self.patch(tftppath, 'list_boot_images')
+        mock_list_boot_images.return_value = fake_boot_images
+        reload_boot_images()
+        self.assertEqual(
+            boot_images.CACHED_BOOT_IMAGE_INDEX,
+            index_boot_images(fake_boot_images))
+
+
+class TestIndexBootImages(MAASTestCase):
+
+    def test__indexes_by_params_and_subarchitecture(self):
+        image = make_image(make_boot_image_params(), "install")
+        index = index_boot_images([image])
+        key = (
+            image["osystem"], image["release"],
+            image["architecture"], "install")
+        self.assertThat(
+            index[key][image["subarchitecture"]], Is(image))
+
+    def test__indexes_by_supported_subarches(self):
+        params = make_boot_image_params()
+        params["supported_subarches"] = "hwe-a,hwe-b"
+        image = make_image(params, "install")
+        index = index_boot_images([image])
+        key = (
+            image["osystem"], image["release"],
+            image["architecture"], "install")
+        self.assertEqual(
+            {image["subarchitecture"], "hwe-a", "hwe-b"}, set(index[key]))
+
+    def test__prefers_exact_subarchitecture_match(self):
+        params = make_boot_image_params()
+        params["supported_subarches"] = "hwe-a"
+        supporting = make_image(params, "install")
+        exact = make_image(dict(params, subarchitecture="hwe-a"), "install")
+        index = index_boot_images([supporting, exact])
+        key = (
+            params["osystem"], params["release"],
+            params["architecture"], "install")
+        self.assertThat(index[key]["hwe-a"], Is(exact))
+
+    def test__prefers_first_image(self):
+        params = make_boot_image_params()
+        first = make_image(params, "install")
+        second = make_image(params, "install")
+        index = index_boot_images([first, second])
+        key = (
+            params["osystem"], params["release"],
+            params["architecture"], "install")
+        self.assertThat(index[key][params["subarchitecture"]], Is(first))
+
+
+class TestFindBootImage(MAASTestCase):
+
+    def patch_boot_images(self, images):
+        self.patch(boot_images, 'CACHED_BOOT_IMAGES', images)
+        self.patch(
+            boot_images, 'CACHED_BOOT_IMAGE_INDEX', index_boot_images(images))
+
+    def test__returns_matching_image(self):
+        image = make_image(make_boot_image_params(), "install")
+        self.patch_boot_images([image])
+        self.assertThat(
+            find_boot_image(
+                image["osystem"], image["release"], image["architecture"],
+                image["subarchitecture"], "install"),
+            Is(image))
+
+    def test__returns_None_when_no_image_matches(self):
+        image = make_image(make_boot_image_params(), "install")
+        self.patch_boot_images([image])
+        self.assertIsNone(
+            find_boot_image(
+                image["osystem"], image["release"], image["architecture"],
+                image["subarchitecture"], "commissioning"))
+        self.assertIsNone(
+            find_boot_image(
+                image["osystem"], image["release"], image["architecture"],
+                factory.make_name("subarch"), "install"))
+
+    def test__builds_index_from_cached_boot_images(self):
+        image = make_image(make_boot_image_params(), "install")
+        self.patch(boot_images, 'CACHED_BOOT_IMAGES', [image])
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
+        self.assertThat(
+            find_boot_image(
+                image["osystem"], image["release"], image["architecture"],
+                image["subarchitecture"], "install"),
+            Is(image))
+        self.assertEqual(
+            index_boot_images([image]), boot_images.CACHED_BOOT_IMAGE_INDEX)
+
 
 class TestGetHostsFromSources(MAASTestCase):
 
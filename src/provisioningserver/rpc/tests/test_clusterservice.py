@@ -251,6 +251,7 @@ class TestClusterProtocol_ListBootImages_and_ListBootImagesV2(MAASTestCase):
     def test_list_boot_images_can_be_called(self):
         self.useFixture(ClusterConfigurationFixture())
         self.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
         list_boot_images = self.patch(tftppath, "list_boot_images")
         list_boot_images.return_value = []
 
@@ -283,6 +284,7 @@ class TestClusterProtocol_ListBootImages_and_ListBootImagesV2(MAASTestCase):
         self.useFixture(ClusterConfigurationFixture(
             tftp_root=os.path.join(tftpdir, "current")))
         self.patch(boot_images, 'CACHED_BOOT_IMAGES', None)
+        self.patch(boot_images, 'CACHED_BOOT_IMAGE_INDEX', None)
 
         expected_images = [
             {
@@ -394,6 +396,36 @@ class TestClusterProtocol_ImportBootImages(MAASTestCase):
                 http_proxy=proxy, https_proxy=proxy))
 
 
+class TestClusterProtocol_InvalidateBootConfig(MAASTestCase):
+
+    run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
+
+    def test_invalidate_boot_config_is_registered(self):
+        protocol = Cluster()
+        responder = protocol.locateResponder(
+            cluster.InvalidateBootConfig.commandName)
+        self.assertIsNotNone(responder)
+
+    @inlineCallbacks
+    def test_invalidate_boot_config_invalidates_identifiers(self):
+        mock_cache = self.patch(clusterservice, "boot_config_cache")
+        identifiers = [factory.make_mac_address(), factory.make_UUID()]
+        response = yield call_responder(
+            Cluster(), cluster.InvalidateBootConfig,
+            {"identifiers": identifiers})
+        self.assertEqual({}, response)
+        self.assertThat(
+            mock_cache.invalidate, MockCalledOnceWith(identifiers))
+
+    @inlineCallbacks
+    def test_invalidate_boot_config_invalidates_everything(self):
+        mock_cache = self.patch(clusterservice, "boot_config_cache")
+        response = yield call_responder(
+            Cluster(), cluster.InvalidateBootConfig, {})
+        self.assertEqual({}, response)
+        self.assertThat(mock_cache.invalidate, MockCalledOnceWith(None))
+
+
 class TestClusterProtocol_IsImportBootImagesRunning(MAASTestCase):
 
     run_tests_with = MAASTwistedRunTest.make_factory(timeout=5)
@@ -4,15 +4,19 @@
 """Cluster-side evaluation of tags."""
 
 __all__ = [
+    'MergedDetailsCache',
     'merge_details',
     'merge_details_cleanly',
+    'merged_details_cache',
     'process_node_tags',
     ]
 
 from collections import OrderedDict
 from functools import partial
+import hashlib
 import http.client
 import json
+import threading
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -38,6 +42,12 @@ maaslog = get_maas_logger("tag_processing")
 # face of it, appears excessive.
 DEFAULT_BATCH_SIZE = 100
 
+# The amount of XML, in bytes, from which the documents held by a
+# `MergedDetailsCache` may have been parsed. A parsed document takes several
+# times as much memory as its XML, so this allows for a few hundred nodes'
+# worth of documents in a few hundred megabytes.
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
 
 def process_response(response):
     """All responses should be httplib.OK.
@@ -227,6 +237,136 @@ def merge_details_cleanly(details):
     return _details_do_merge(details, root)
 
 
+class MergedDetailsCache:
+    """A cache of documents made by `merge_details`.
+
+    Documents are keyed by a hash of the details they were merged from, so a
+    node's document is reused for as long as its commissioning output stays
+    the same, and nodes with identical output share one document. Documents
+    must therefore not be modified.
+
+    Documents are evicted once the total size of the XML that the cached
+    documents were parsed from exceeds `max_size`. A tag pass visits every
+    node once, in the same order each time, so with more nodes than fit
+    least-recently-used eviction would never hit. Instead, documents that
+    have not been reused since they were cached are evicted newest first,
+    leaving the rest of the cache to be reused by the next pass; reused
+    documents are evicted least recently used first, once there are no
+    others. A reused document that has gone unused for more than twice the
+    longest interval, in lookups, at which any document has been reused is
+    stale, e.g. the node was commissioned again, and is evicted first.
+
+    The cache can be used from several threads at once. Documents are merged
+    outside of the lock.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # Documents not reused since they were cached, oldest first, and
+        # reused documents, least recently used first. Both map keys to
+        # (document, size, lookup count when it was last used).
+        self._new = OrderedDict()
+        self._reused = OrderedDict()
+        # The longest interval, in lookups, at which a document was reused.
+        self._reuse_interval = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._new) + len(self._reused)
+
+    @staticmethod
+    def get_key(details):
+        """Return a hash of `details`, in the form `merge_details` takes."""
+        digest = hashlib.sha256()
+        for namespace in sorted(details):
+            xmldata = details[namespace]
+            digest.update(namespace.encode("utf-8"))
+            if xmldata is None:
+                digest.update(b"\0")
+            else:
+                digest.update(b"\1%d\0" % len(xmldata))
+                digest.update(xmldata)
+        return digest.hexdigest()
+
+    def _lookup(self, key):
+        """Return the document for `key`, or None, noting its reuse.
+
+        Call with the lock held.
+        """
+        lookups = self.hits + self.misses
+        cached = self._new.pop(key, None)
+        if cached is None:
+            cached = self._reused.pop(key, None)
+        if cached is None:
+            return None
+        doc, size, last_used = cached
+        self._reuse_interval = max(
+            self._reuse_interval, lookups - last_used)
+        self._reused[key] = doc, size, lookups
+        return doc
+
+    def _evict(self):
+        """Evict one document to make space for another.
+
+        Call with the lock held.
+        """
+        lookups = self.hits + self.misses
+        if len(self._reused) != 0:
+            _, (_, _, last_used) = next(iter(self._reused.items()))
+            stale = lookups - last_used > 2 * self._reuse_interval
+        else:
+            stale = False
+        if len(self._new) != 0 and not stale:
+            _, (_, evicted_size, _) = self._new.popitem(last=True)
+        else:
+            _, (_, evicted_size, _) = self._reused.popitem(last=False)
+        self.size -= evicted_size
+
+    def get(self, details):
+        """Return the result of `merge_details` for `details`.
+
+        The document is merged and cached if it isn't already.
+        """
+        key = self.get_key(details)
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                return cached
+        doc = merge_details(details)
+        size = sum(
+            len(xmldata) for xmldata in details.values()
+            if xmldata is not None)
+        with self._lock:
+            cached = self._lookup(key)
+            if cached is not None:
+                # Another thread merged the same details in the meantime.
+                return cached
+            while self.size + size > self.max_size and len(self) != 0:
+                self._evict()
+            self._new[key] = doc, size, self.hits + self.misses
+            self.size += size
+        return doc
+
+    def clear(self):
+        """Remove all documents from the cache."""
+        with self._lock:
+            self._new.clear()
+            self._reused.clear()
+            self._reuse_interval = 0
+            self.size = 0
+
+
+# Documents merged from node details, shared by everything in this process
+# that evaluates tags.
+merged_details_cache = MergedDetailsCache()
+
+
 def gen_batch_slices(count, size):
     """Generate `slice`s to split `count` objects into batches.
 
@@ -271,7 +411,7 @@ def gen_node_details(client, batches):
     get_details = partial(get_details_for_nodes, client)
     for batch in batches:
         for system_id, details in get_details(batch).items():
-            yield system_id, merge_details(details)
+            yield system_id, merged_details_cache.get(details)
 
 
 def process_all(client, rack_id, tag_name, tag_definition, system_ids,
@@ -10,6 +10,7 @@ import http.client
 from itertools import chain
 import json
 from textwrap import dedent
+import threading
 from unittest.mock import (
     call,
     MagicMock,
@@ -352,6 +353,139 @@ class TestMergeDetails(TestMergeDetailsCleanly):
             self.logger.output)
 
 
+class TestMergedDetailsCache(MAASTestCase):
+
+    def test_get_merges_details(self):
+        details = {
+            "lshw": b"<list><foo>Hello</foo></list>",
+            "lldp": b"<node><foo>Hello</foo></node>",
+        }
+        cache = tags.MergedDetailsCache()
+        self.assertEqual(
+            etree.tostring(tags.merge_details(details)),
+            etree.tostring(cache.get(details)))
+
+    def test_get_returns_cached_document_for_same_details(self):
+        cache = tags.MergedDetailsCache()
+        doc = cache.get({"lshw": b"<list/>", "lldp": None})
+        self.assertIs(doc, cache.get({"lldp": None, "lshw": b"<list/>"}))
+        self.assertThat(cache, MatchesStructure.byEquality(
+            hits=1, misses=1, size=len(b"<list/>")))
+
+    def test_get_distinguishes_different_details(self):
+        cache = tags.MergedDetailsCache()
+        docs = [
+            cache.get({"lshw": b"<list/>"}),
+            cache.get({"lshw": b"<list><foo/></list>"}),
+            cache.get({"lldp": b"<list/>"}),
+            cache.get({"lshw": b"<list/>", "lldp": None}),
+            cache.get({"lshw": b"<list/>", "lldp": b""}),
+        ]
+        self.assertEqual(len(docs), len(set(map(id, docs))))
+        self.assertEqual(len(docs), len(cache))
+
+    def test_evicts_documents_not_reused_first(self):
+        cache = tags.MergedDetailsCache(max_size=2 * len(b"<a/>"))
+        doc_a = cache.get({"lshw": b"<a/>"})
+        cache.get({"lshw": b"<b/>"})
+        cache.get({"lshw": b"<a/>"})
+        cache.get({"lshw": b"<c/>"})
+        self.assertEqual(2, len(cache))
+        self.assertEqual(2 * len(b"<a/>"), cache.size)
+        self.assertIs(doc_a, cache.get({"lshw": b"<a/>"}))
+        self.assertEqual(3, cache.misses)
+
+    def test_second_pass_over_more_documents_than_fit_hits_cache(self):
+        # Ten documents fit, but a tag pass visits thirty nodes.
+        cache = tags.MergedDetailsCache(max_size=10 * len(b"<a00/>"))
+        details = [{"lshw": b"<a%02d/>" % index} for index in range(30)]
+        for _ in range(3):
+            for node_details in details:
+                cache.get(node_details)
+        # The first nine documents were cached in the first pass and reused
+        # in each pass since. The last slot is taken by each miss in turn.
+        self.assertThat(cache, MatchesStructure.byEquality(
+            hits=2 * 9, misses=30 + 2 * 21, size=10 * len(b"<a00/>")))
+
+    def test_evicts_stale_documents_first(self):
+        cache = tags.MergedDetailsCache(max_size=2 * len(b"<a/>"))
+        for lshw in (b"<a/>", b"<b/>", b"<a/>", b"<b/>"):
+            cache.get({"lshw": lshw})
+        # The nodes are commissioned again and now have other details. Once
+        # the old documents have gone unused for long enough, they make way.
+        for _ in range(3):
+            cache.get({"lshw": b"<c/>"})
+            cache.get({"lshw": b"<d/>"})
+        hits = cache.hits
+        cache.get({"lshw": b"<c/>"})
+        cache.get({"lshw": b"<d/>"})
+        self.assertEqual(hits + 2, cache.hits)
+
+    def test_keeps_newest_document_even_if_too_large(self):
+        cache = tags.MergedDetailsCache(max_size=1)
+        doc = cache.get({"lshw": b"<list/>"})
+        self.assertIs(doc, cache.get({"lshw": b"<list/>"}))
+        self.assertEqual(1, len(cache))
+
+    def test_clear_removes_all_documents(self):
+        cache = tags.MergedDetailsCache()
+        cache.get({"lshw": b"<list/>"})
+        cache.clear()
+        self.assertEqual(0, len(cache))
+        self.assertEqual(0, cache.size)
+
+    def test_concurrent_misses_for_same_details_store_one_document(self):
+        cache = tags.MergedDetailsCache()
+        details = {"lshw": b"<list/>"}
+        # Make both threads merge the details before either stores them.
+        barrier = threading.Barrier(2, timeout=10)
+        merge_details = tags.merge_details
+
+        def merge_details_together(details):
+            barrier.wait()
+            return merge_details(details)
+
+        self.patch(tags, "merge_details", merge_details_together)
+        docs = []
+        threads = [
+            threading.Thread(target=lambda: docs.append(cache.get(details)))
+            for _ in range(2)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2, len(docs))
+        self.assertIs(docs[0], docs[1])
+        self.assertThat(cache, MatchesStructure.byEquality(
+            misses=2, size=len(b"<list/>")))
+        self.assertEqual(1, len(cache))
+
+    def test_concurrent_use_keeps_size_consistent(self):
+        cache = tags.MergedDetailsCache(max_size=3 * len(b"<a0/>"))
+        errors = []
+
+        def use_cache(thread_id):
+            try:
+                for i in range(200):
+                    cache.get({"lshw": b"<a%d/>" % ((thread_id + i) % 10)})
+            except Exception as error:
+                errors.append(error)
+
+        threads = [
+            threading.Thread(target=use_cache, args=(thread_id,))
+            for thread_id in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(3, len(cache))
+        self.assertEqual(3 * len(b"<a0/>"), cache.size)
+        self.assertEqual(8 * 200, cache.hits + cache.misses)
+
+
 class TestGenBatchSlices(MAASTestCase):
 
     def test_batch_of_1_no_things(self):
@@ -451,13 +585,14 @@ class TestGenNodeDetails(MAASTestCase):
         self.patch(
             tags, "merge_details",
             lambda mapping: "merged:" + "+".join(mapping))
+        self.patch(tags, "merged_details_cache", tags.MergedDetailsCache())
 
     def test__generates_node_details(self):
         batches = [["s1", "s2"], ["s3"]]
         responses = [
-            {"s1": {"foo": "<node>s1</node>"},
-             "s2": {"bar": "<node>s2</node>"}},
-            {"s3": {"cob": "<node>s3</node>"}},
+            {"s1": {"foo": b"<node>s1</node>"},
+             "s2": {"bar": b"<node>s2</node>"}},
+            {"s3": {"cob": b"<node>s3</node>"}},
         ]
         get_details_for_nodes = self.patch(tags, "get_details_for_nodes")
         get_details_for_nodes.side_effect = lambda *args: responses.pop(0)
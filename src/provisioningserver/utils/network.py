@@ -21,6 +21,8 @@ __all__ = [
 
 import codecs
 from collections import namedtuple
+import hashlib
+import json
 from operator import attrgetter
 import random
 import re
@@ -1224,6 +1226,21 @@ def get_all_interfaces_definition(annotate_with_monitored: bool=True) -> dict:
     return interfaces
 
 
+def get_interfaces_fingerprint(interfaces: dict) -> str:
+    """Return a fingerprint of an interfaces definition.
+
+    The fingerprint is a SHA256 hex digest of the definition's canonical JSON
+    form, so equal definitions, however they were built, have equal
+    fingerprints. The region uses it to recognise that a rack controller's
+    interfaces have not changed since they were last recorded.
+
+    :param interfaces: An interfaces definition, as returned by
+        `get_all_interfaces_definition`.
+    """
+    canonical = json.dumps(interfaces, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 def get_all_interface_subnets():
     """Returns all subnets that this machine has access to.
 
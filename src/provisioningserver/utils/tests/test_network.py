@@ -65,6 +65,7 @@ from provisioningserver.utils.network import (
     get_ifname_for_label,
     get_ifname_ifdata_for_destination,
     get_interface_children,
+    get_interfaces_fingerprint,
     get_mac_organization,
     get_source_address,
     has_ipv4_address,
@@ -96,6 +97,7 @@ from testtools.matchers import (
     HasLength,
     Is,
     MatchesDict,
+    MatchesRegex,
     MatchesSetwise,
     Not,
     StartsWith,
@@ -1572,6 +1574,46 @@ class TestGetAllInterfacesDefinition(MAASTestCase):
         self.assertInterfacesResult(ip_addr, iproute_info, {}, expected_result)
 
 
+class TestGetInterfacesFingerprint(MAASTestCase):
+    """Tests for `get_interfaces_fingerprint()`."""
+
+    def make_interfaces(self):
+        return {
+            factory.make_name("eth"): {
+                "type": "physical",
+                "mac_address": factory.make_mac_address(),
+                "parents": [],
+                "links": [{"mode": "dhcp"}],
+                "enabled": True,
+            },
+        }
+
+    def test_returns_sha256_hex_digest(self):
+        fingerprint = get_interfaces_fingerprint(self.make_interfaces())
+        self.assertThat(fingerprint, MatchesRegex("^[0-9a-f]{64}$"))
+
+    def test_ignores_key_order(self):
+        interfaces = {
+            "eth0": {"type": "physical", "enabled": True},
+            "eth1": {"enabled": False, "type": "physical"},
+        }
+        reordered = {
+            "eth1": {"type": "physical", "enabled": False},
+            "eth0": {"enabled": True, "type": "physical"},
+        }
+        self.assertEqual(
+            get_interfaces_fingerprint(interfaces),
+            get_interfaces_fingerprint(reordered))
+
+    def test_changes_with_interfaces(self):
+        interfaces = self.make_interfaces()
+        fingerprint = get_interfaces_fingerprint(interfaces)
+        for interface in interfaces.values():
+            interface["enabled"] = False
+        self.assertNotEqual(
+            fingerprint, get_interfaces_fingerprint(interfaces))
+
+
 class TestGetAllInterfacesSubnets(MAASTestCase):
     """Tests for `get_all_interface_subnets()`."""
 